@@ -0,0 +1,255 @@
+"""
+Columnar sidecars for imported CSV reports.
+
+A CSV is parsed once into `<AGENT_CSV_DIR>/.columnar/<filename>.mjcol`:
+
+  MAGIC | header length (<Q) | JSON header | column segments
+
+Clean numeric columns are stored as native int64/float64 arrays (float
+columns flag their integer cells in a byte mask); a cell that does not fit
+(blank, '-', text) is kept in the column's "exceptions" map by row number. Every other column is dictionary encoded: a JSON list
+of distinct values plus a uint32 code per row. Values come back exactly
+as data_service._read_csv_file would return them.
+
+Readers memory-map the sidecar and decode only the rows they are asked
+for. A sidecar is stale once the CSV's size or mtime differ from the ones
+recorded in its header.
+"""
+import csv
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'MJCOL1\n\0'
+SIDECAR_DIR = '.columnar'
+SIDECAR_SUFFIX = '.mjcol'
+
+# A numeric column with more exceptions than this share of its rows is
+# dictionary encoded instead
+MAX_EXCEPTION_RATIO = 0.25
+
+_HEADER_LEN = struct.Struct('<Q')
+_TYPECODES = {'int': 'q', 'float': 'd', 'dict': 'I'}
+
+
+def sidecar_path(filepath):
+    directory, name = os.path.split(filepath)
+    return os.path.join(directory, SIDECAR_DIR, name + SIDECAR_SUFFIX)
+
+
+def _source_stat(filepath):
+    stat = os.stat(filepath)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _pad(buffer, fill=b'\0'):
+    """Align the next segment to 8 bytes."""
+    buffer.extend(fill * (-len(buffer) % 8))
+
+
+def _encode_column(values, parse_number):
+    """Pick the encoding for one column of raw CSV values.
+
+    Returns (meta, segments): the column header entry and its byte segments.
+    """
+    parsed = []
+    for raw in values:
+        num = parse_number(raw)
+        parsed.append(num if num is not None else raw)
+
+    numeric = [value for value in parsed if isinstance(value, (int, float))]
+    if numeric and len(parsed) - len(numeric) <= len(parsed) * MAX_EXCEPTION_RATIO:
+        kind = 'float' if any(isinstance(value, float) for value in numeric) else 'int'
+        target = array(_TYPECODES[kind])
+        # In float columns, integer cells are flagged so they decode as ints
+        int_mask = array('B') if kind == 'float' else None
+        exceptions = {}
+        for index, value in enumerate(parsed):
+            is_int = isinstance(value, int)
+            if int_mask is not None:
+                int_mask.append(1 if is_int else 0)
+            if isinstance(value, float) or (is_int and (kind == 'int' or float(value) == value)):
+                try:
+                    target.append(value)
+                    continue
+                except OverflowError:
+                    pass
+            target.append(0)
+            exceptions[index] = value
+        if len(exceptions) <= len(parsed) * MAX_EXCEPTION_RATIO:
+            segments = {'data': target.tobytes()}
+            if int_mask is not None and any(int_mask):
+                segments['int_mask'] = int_mask.tobytes()
+            return {'kind': kind, 'exceptions': exceptions}, segments
+
+    table = {}
+    distinct = []
+    codes = array('I')
+    for value in parsed:
+        key = (type(value).__name__, value)
+        code = table.get(key)
+        if code is None:
+            code = table[key] = len(distinct)
+            distinct.append(value)
+        codes.append(code)
+    return {'kind': 'dict', 'values': distinct}, {'data': codes.tobytes()}
+
+
+def build_sidecar(filepath, parse_number):
+    """Parse a CSV into its sidecar and return it opened as a ColumnarReport."""
+    columns = []
+    raw_columns = []
+    with open(filepath, 'r', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        columns = list(reader.fieldnames or [])
+        raw_columns = [[] for _ in columns]
+        for row in reader:
+            for position, col in enumerate(columns):
+                raw_columns[position].append(row.get(col, ''))
+    row_count = len(raw_columns[0]) if raw_columns else 0
+
+    source_size, source_mtime_ns = _source_stat(filepath)
+    data = bytearray()
+    column_meta = []
+    for name, raw in zip(columns, raw_columns):
+        meta, segments = _encode_column(raw, parse_number)
+        meta['name'] = name
+        meta['exceptions'] = {str(k): v for k, v in meta.get('exceptions', {}).items()}
+        for segment, payload in segments.items():
+            meta[segment] = [len(data), len(payload)]
+            data.extend(payload)
+            _pad(data)
+        column_meta.append(meta)
+
+    header = bytearray(json.dumps({
+        'byteorder': sys.byteorder,
+        'source_size': source_size,
+        'source_mtime_ns': source_mtime_ns,
+        'row_count': row_count,
+        'columns': column_meta,
+    }).encode('utf-8'))
+    _pad(header, fill=b' ')
+
+    target = sidecar_path(filepath)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(_HEADER_LEN.pack(len(header)))
+            f.write(header)
+            f.write(data)
+        os.replace(tmp, target)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    return ColumnarReport(target)
+
+
+def remove_sidecar(filepath):
+    try:
+        os.remove(sidecar_path(filepath))
+    except FileNotFoundError:
+        pass
+
+
+class ColumnarReport:
+    """Read-only, memory-mapped view of a sidecar. Use as a context manager."""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Empty columnar sidecar: {path}")
+        self._views = []
+        if len(self._mmap) < len(MAGIC) + _HEADER_LEN.size or self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"Not a columnar sidecar: {path}")
+        (header_len,) = _HEADER_LEN.unpack_from(self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + _HEADER_LEN.size
+        self.header = json.loads(bytes(self._mmap[header_start:header_start + header_len]))
+        self._data_start = header_start + header_len
+        self.row_count = self.header['row_count']
+        self.columns = [meta['name'] for meta in self.header['columns']]
+        self._decoded = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._decoded = {}
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def is_fresh_for(self, filepath):
+        if self.header.get('byteorder') != sys.byteorder:
+            return False
+        try:
+            size, mtime_ns = _source_stat(filepath)
+        except OSError:
+            return False
+        return self.header['source_size'] == size and self.header['source_mtime_ns'] == mtime_ns
+
+    def _segment(self, meta, segment, typecode):
+        offset, length = meta[segment]
+        start = self._data_start + offset
+        raw = memoryview(self._mmap)[start:start + length]
+        view = raw.cast(typecode)
+        self._views.extend((view, raw))
+        return view
+
+    def _column(self, position):
+        decoded = self._decoded.get(position)
+        if decoded is None:
+            meta = self.header['columns'][position]
+            view = self._segment(meta, 'data', _TYPECODES[meta['kind']])
+            int_mask = self._segment(meta, 'int_mask', 'B') if 'int_mask' in meta else None
+            exceptions = {int(k): v for k, v in meta.get('exceptions', {}).items()}
+            decoded = self._decoded[position] = (meta, view, int_mask, exceptions)
+        return decoded
+
+    def column(self, name, start=0, stop=None):
+        """Values of one column for rows [start, stop)."""
+        meta, view, int_mask, exceptions = self._column(self.columns.index(name))
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        if meta['kind'] == 'dict':
+            values = meta['values']
+            return [values[code] for code in view[start:stop]]
+        values = []
+        for index in range(start, stop):
+            if index in exceptions:
+                values.append(exceptions[index])
+            elif int_mask is not None and int_mask[index]:
+                values.append(int(view[index]))
+            else:
+                values.append(view[index])
+        return values
+
+    def rows(self, start=0, stop=None):
+        """Row dicts for rows [start, stop), in file order."""
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        columns = {name: self.column(name, start, stop) for name in self.columns}
+        return [
+            {name: values[index] for name, values in columns.items()}
+            for index in range(max(stop - start, 0))
+        ]
@@ -7,9 +7,13 @@ import logging
 
 ALLOWED_EXTENSIONS = ('.csv', '.xlsx', '.xls')
 
+TOP_CAMPAIGNS = 10
+
 from django.conf import settings
+from django.db import transaction
 
-from .models import ImportedCSVFile
+from . import columnar_store
+from .models import ImportedCSVFile, ImportedReportSummary
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +55,172 @@ def _read_csv_file(filepath):
     return columns, rows
 
 
+def _open_columnar(filepath):
+    """Open the columnar cache of a CSV, building it when missing or stale.
+
+    Returns None for non-CSV files or when the cache cannot be built.
+    """
+    if not filepath.lower().endswith('.csv') or not os.path.isfile(filepath):
+        return None
+    try:
+        report = columnar_store.ColumnarReport(columnar_store.sidecar_path(filepath))
+    except (OSError, ValueError, KeyError):
+        report = None
+    if report is not None:
+        if report.is_fresh_for(filepath):
+            return report
+        report.close()
+    try:
+        return columnar_store.build_sidecar(filepath, _parse_number)
+    except Exception as e:
+        logger.error(f"Error building columnar cache for {filepath}: {e}")
+        return None
+
+
+def _read_report_file(filepath):
+    """Same as _read_csv_file, served from the columnar cache when possible."""
+    report = _open_columnar(filepath)
+    if report is None:
+        return _read_csv_file(filepath)
+    with report:
+        return list(report.columns), report.rows()
+
+
+def _report_kpis(rows):
+    """KPI contribution of one report's rows, as stored on ImportedCSVFile.kpi_summary."""
+    total_cost = 0
+    total_revenue = 0
+    total_rows = 0
+    campaign_data = []
+    for row in rows:
+        cost = row.get('Cost', 0) or 0
+        revenue = row.get('Total Revenue', row.get('Revenue', 0)) or 0
+        roas = row.get('ROAS', 0) or 0
+        name = row.get('Name', 'Unknown')
+        if isinstance(cost, (int, float)):
+            total_cost += cost
+        if isinstance(revenue, (int, float)):
+            total_revenue += revenue
+        total_rows += 1
+        if isinstance(cost, (int, float)) and cost > 0:
+            campaign_data.append({
+                'name': name,
+                'cost': cost,
+                'revenue': revenue if isinstance(revenue, (int, float)) else 0,
+                'roas': roas if isinstance(roas, (int, float)) else 0,
+            })
+    return {
+        'total_cost': total_cost,
+        'total_revenue': total_revenue,
+        'row_count': total_rows,
+        'top_campaigns': _top_campaigns(campaign_data),
+    }
+
+
+def _top_campaigns(campaigns):
+    return sorted(campaigns, key=lambda x: x['roas'], reverse=True)[:TOP_CAMPAIGNS]
+
+
+def _file_kpis(filepath):
+    """KPIs of a report file on disk, or None when the file is missing."""
+    if not os.path.isfile(filepath):
+        return None
+    if not filepath.lower().endswith('.csv'):
+        # Excel reports are not read as CSV, so they add no KPIs
+        return _report_kpis([])
+    report = _open_columnar(filepath)
+    if report is None:
+        return _report_kpis(_read_csv_file(filepath)[1])
+    with report:
+        # Only the KPI columns are decoded
+        wanted = [c for c in ('Cost', 'Total Revenue', 'Revenue', 'ROAS', 'Name') if c in report.columns]
+        if not wanted:
+            return _report_kpis({} for _ in range(report.row_count))
+        columns = [report.column(c) for c in wanted]
+        return _report_kpis(dict(zip(wanted, values)) for values in zip(*columns))
+
+
+def rebuild_reports_summary(project):
+    """Recompute the project's ImportedReportSummary from its files' stored KPIs.
+
+    Files uploaded before KPIs were stored are read (once) to fill them in.
+    """
+    with transaction.atomic():
+        summary, _ = ImportedReportSummary.objects.get_or_create(project=project)
+        summary = ImportedReportSummary.objects.select_for_update().get(pk=summary.pk)
+        records = ImportedCSVFile.objects.filter(project=project, is_deleted=False)
+        csv_dir = _get_csv_dir()
+        total_cost = 0
+        total_revenue = 0
+        total_rows = 0
+        campaigns = []
+        file_count = 0
+        for record in records:
+            file_count += 1
+            if record.kpi_summary is None:
+                record.kpi_summary = _file_kpis(os.path.join(csv_dir, os.path.basename(record.filename)))
+                if record.kpi_summary is None:
+                    continue
+                record.save(update_fields=['kpi_summary', 'updated_at'])
+            total_cost += record.kpi_summary['total_cost']
+            total_revenue += record.kpi_summary['total_revenue']
+            total_rows += record.kpi_summary['row_count']
+            campaigns.extend(record.kpi_summary['top_campaigns'])
+
+        summary.total_cost = total_cost
+        summary.total_revenue = total_revenue
+        summary.row_count = total_rows
+        summary.file_count = file_count
+        summary.top_campaigns = _top_campaigns(campaigns)
+        summary.save()
+    return summary
+
+
+def _add_to_summary(record):
+    """Fold a newly uploaded file into the project summary."""
+    with transaction.atomic():
+        summary, created = ImportedReportSummary.objects.get_or_create(project_id=record.project_id)
+        if created:
+            # A new row starts empty; count every file, this one included
+            rebuild_reports_summary(record.project)
+            return
+        summary = ImportedReportSummary.objects.select_for_update().get(pk=summary.pk)
+        kpis = record.kpi_summary
+        summary.file_count += 1
+        if kpis:
+            summary.total_cost += kpis['total_cost']
+            summary.total_revenue += kpis['total_revenue']
+            summary.row_count += kpis['row_count']
+            # Newest file first, as in the records' ordering
+            summary.top_campaigns = _top_campaigns(kpis['top_campaigns'] + summary.top_campaigns)
+        summary.save()
+
+
+def _remove_from_summary(record):
+    """Take a deleted file out of the project summary."""
+    with transaction.atomic():
+        summary = ImportedReportSummary.objects.select_for_update().filter(
+            project_id=record.project_id,
+        ).first()
+        if summary is None:
+            return
+        kpis = record.kpi_summary
+        summary.file_count -= 1
+        if kpis:
+            summary.total_cost -= kpis['total_cost']
+            summary.total_revenue -= kpis['total_revenue']
+            summary.row_count -= kpis['row_count']
+            # The runners-up are only known per file, so the ranking is
+            # rebuilt from the remaining files' stored KPIs
+            campaigns = []
+            for remaining in ImportedCSVFile.objects.filter(
+                project_id=record.project_id, is_deleted=False, kpi_summary__isnull=False,
+            ).values_list('kpi_summary', flat=True):
+                campaigns.extend(remaining['top_campaigns'])
+            summary.top_campaigns = _top_campaigns(campaigns)
+        summary.save()
+
+
 def list_reports(project):
     """List all imported CSV files for the given project from database."""
     records = ImportedCSVFile.objects.filter(
@@ -71,8 +241,12 @@ def list_reports(project):
     ]
 
 
-def get_report_data(file_id, project):
-    """Read a specific CSV file by database ID and return full parsed data."""
+def get_report_data(file_id, project, offset=None, limit=None):
+    """Read a specific CSV file by database ID and return its parsed data.
+
+    With offset/limit only that page of rows is returned; row_count stays
+    the file's total.
+    """
     try:
         record = ImportedCSVFile.objects.get(
             id=file_id,
@@ -89,13 +263,28 @@ def get_report_data(file_id, project):
     if not os.path.isfile(filepath):
         return None
 
-    columns, rows = _read_csv_file(filepath)
-    return {
+    start = offset or 0
+    stop = start + limit if limit is not None else None
+    report = _open_columnar(filepath)
+    if report is None:
+        columns, rows = _read_csv_file(filepath)
+        row_count = len(rows)
+        rows = rows[start:stop]
+    else:
+        with report:
+            columns = list(report.columns)
+            row_count = report.row_count
+            rows = report.rows(start, stop)
+    data = {
         'filename': safe_name,
         'columns': columns,
         'rows': rows,
-        'row_count': len(rows),
+        'row_count': row_count,
     }
+    if offset is not None or limit is not None:
+        data['offset'] = start
+        data['limit'] = limit
+    return data
 
 
 def save_uploaded_csv(uploaded_file, user, project):
@@ -139,16 +328,22 @@ def save_uploaded_csv(uploaded_file, user, project):
 
         file_size = os.path.getsize(filepath)
 
-        # Create database record
-        record = ImportedCSVFile.objects.create(
-            filename=safe_name,
-            original_filename=original_name,
-            user=user,
-            project=project,
-            row_count=row_count,
-            column_count=col_count,
-            file_size=file_size,
-        )
+        # Parse once into the columnar cache and keep this file's KPIs
+        kpis = _file_kpis(filepath)
+
+        # The record only exists if the summary took it in
+        with transaction.atomic():
+            record = ImportedCSVFile.objects.create(
+                filename=safe_name,
+                original_filename=original_name,
+                user=user,
+                project=project,
+                row_count=row_count,
+                column_count=col_count,
+                file_size=file_size,
+                kpi_summary=kpis,
+            )
+            _add_to_summary(record)
 
         return {
             'id': str(record.id),
@@ -163,6 +358,7 @@ def save_uploaded_csv(uploaded_file, user, project):
         # Clean up partial file
         if os.path.exists(filepath):
             os.remove(filepath)
+        columnar_store.remove_sidecar(filepath)
         return None
 
 
@@ -230,15 +426,22 @@ def save_uploaded_file(uploaded_file, user, project):
 
         file_size = os.path.getsize(filepath)
 
-        record = ImportedCSVFile.objects.create(
-            filename=safe_name,
-            original_filename=original_name,
-            user=user,
-            project=project,
-            row_count=row_count,
-            column_count=col_count,
-            file_size=file_size,
-        )
+        # Parse once into the columnar cache and keep this file's KPIs
+        kpis = _file_kpis(filepath)
+
+        # The record only exists if the summary took it in
+        with transaction.atomic():
+            record = ImportedCSVFile.objects.create(
+                filename=safe_name,
+                original_filename=original_name,
+                user=user,
+                project=project,
+                row_count=row_count,
+                column_count=col_count,
+                file_size=file_size,
+                kpi_summary=kpis,
+            )
+            _add_to_summary(record)
 
         return {
             'id': str(record.id),
@@ -252,56 +455,31 @@ def save_uploaded_file(uploaded_file, user, project):
         logger.error(f"Error saving uploaded file: {e}")
         if os.path.exists(filepath):
             os.remove(filepath)
+        columnar_store.remove_sidecar(filepath)
         return None
 
 
 def get_reports_summary(project):
     """Aggregate KPI data from all imported CSV files for the project."""
-    records = ImportedCSVFile.objects.filter(project=project, is_deleted=False)
-    if not records.exists():
+    summary = ImportedReportSummary.objects.filter(project=project).first()
+    if summary is None:
+        if not ImportedCSVFile.objects.filter(project=project, is_deleted=False).exists():
+            return None
+        summary = rebuild_reports_summary(project)
+    if not summary.file_count:
         return None
 
-    total_cost = 0
-    total_revenue = 0
-    total_rows = 0
-    campaign_data = []
-
-    csv_dir = _get_csv_dir()
-    for record in records:
-        filepath = os.path.join(csv_dir, os.path.basename(record.filename))
-        if not os.path.isfile(filepath):
-            continue
-        columns, rows = _read_csv_file(filepath)
-        for row in rows:
-            cost = row.get('Cost', 0) or 0
-            revenue = row.get('Total Revenue', row.get('Revenue', 0)) or 0
-            roas = row.get('ROAS', 0) or 0
-            name = row.get('Name', 'Unknown')
-            if isinstance(cost, (int, float)):
-                total_cost += cost
-            if isinstance(revenue, (int, float)):
-                total_revenue += revenue
-            total_rows += 1
-            if isinstance(cost, (int, float)) and cost > 0:
-                campaign_data.append({
-                    'name': name,
-                    'cost': cost,
-                    'revenue': revenue if isinstance(revenue, (int, float)) else 0,
-                    'roas': roas if isinstance(roas, (int, float)) else 0,
-                })
-
+    total_cost = summary.total_cost
+    total_revenue = summary.total_revenue
     avg_roas = total_revenue / total_cost if total_cost > 0 else 0
 
-    sorted_campaigns = sorted(campaign_data, key=lambda x: x['roas'], reverse=True)
-    top10 = sorted_campaigns[:10]
-
     return {
         'total_cost': round(total_cost, 2),
         'total_revenue': round(total_revenue, 2),
         'avg_roas': round(avg_roas, 2),
-        'active_campaigns': total_rows,
-        'file_count': records.count(),
-        'top_campaigns': top10,
+        'active_campaigns': summary.row_count,
+        'file_count': summary.file_count,
+        'top_campaigns': summary.top_campaigns,
         'bottom_campaigns': [],
     }
 
@@ -311,14 +489,17 @@ def delete_report(file_id, project):
 
     Returns True if deleted, False if not found.
     """
-    try:
-        record = ImportedCSVFile.objects.get(
-            id=file_id,
-            project=project,
-            is_deleted=False,
-        )
+    # The record is only deleted if the summary let it go
+    with transaction.atomic():
+        try:
+            record = ImportedCSVFile.objects.select_for_update().get(
+                id=file_id,
+                project=project,
+                is_deleted=False,
+            )
+        except ImportedCSVFile.DoesNotExist:
+            return False
         record.is_deleted = True
         record.save(update_fields=['is_deleted', 'updated_at'])
+        _remove_from_summary(record)
         return True
-    except ImportedCSVFile.DoesNotExist:
-        return False
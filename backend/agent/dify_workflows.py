@@ -1,6 +1,9 @@
+import asyncio
 import json
 import time
+import weakref
 
+import httpx
 import requests
 
 
@@ -157,6 +160,36 @@ def run_dify_workflow(*, api_url: str, api_key: str, inputs: dict, user_id=None,
     return payload.get("data", {}).get("outputs", {})
 
 
+# One pooled client per event loop: connections are bound to the loop that
+# opened them, and sync_to_async/async_to_sync can run more than one
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _async_clients[loop] = httpx.AsyncClient()
+    return client
+
+
+async def arun_dify_workflow(*, api_url: str, api_key: str, inputs: dict, user_id=None, timeout: int = 120):
+    """Async counterpart of run_dify_workflow (blocking response mode) for ASGI streams."""
+    response = await _get_async_client().post(
+        f"{api_url.rstrip('/')}/v1/workflows/run",
+        headers=_workflow_headers(api_key),
+        json={
+            "inputs": inputs,
+            "response_mode": "blocking",
+            "user": str(user_id or "agent"),
+        },
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    payload = response.json()
+    return payload.get("data", {}).get("outputs", {})
+
+
 def json_input(value) -> str:
     """Serialize an input for Dify while tolerating non-JSON-native values."""
     return json.dumps(value, default=str)
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.23 on 2026-10-16 13:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('agent', '0007_agentworkflowrun_chat_follow_up_started'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importedcsvfile',
+            name='kpi_summary',
+            field=models.JSONField(blank=True, help_text="This file's contribution to the project's ImportedReportSummary", null=True),
+        ),
+        migrations.CreateModel(
+            name='ImportedReportSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('total_cost', models.FloatField(default=0)),
+                ('total_revenue', models.FloatField(default=0)),
+                ('row_count', models.IntegerField(default=0)),
+                ('file_count', models.IntegerField(default=0)),
+                ('top_campaigns', models.JSONField(blank=True, default=list)),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='imported_report_summary', to='core.project')),
+            ],
+        ),
+    ]
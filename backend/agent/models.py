@@ -85,6 +85,11 @@ class ImportedCSVFile(TimeStampedModel):
     row_count = models.IntegerField(default=0)
     column_count = models.IntegerField(default=0)
     file_size = models.BigIntegerField(default=0)
+    kpi_summary = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="This file's contribution to the project's ImportedReportSummary",
+    )
 
     class Meta:
         ordering = ['-created_at']
@@ -93,6 +98,23 @@ class ImportedCSVFile(TimeStampedModel):
         return f"{self.original_filename} ({self.row_count} rows)"
 
 
+class ImportedReportSummary(TimeStampedModel):
+    """KPI totals over a project's imported reports, updated on upload and delete."""
+    project = models.OneToOneField(
+        'core.Project',
+        on_delete=models.CASCADE,
+        related_name='imported_report_summary',
+    )
+    total_cost = models.FloatField(default=0)
+    total_revenue = models.FloatField(default=0)
+    row_count = models.IntegerField(default=0)
+    file_count = models.IntegerField(default=0)
+    top_campaigns = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return f"Report summary for project {self.project_id}"
+
+
 class AgentWorkflowDefinition(TimeStampedModel):
     STATUS_CHOICES = [
         ('active', 'Active'),
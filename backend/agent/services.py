@@ -1,14 +1,16 @@
 import json
 import logging
 import os
+import httpx
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Max
 
 from django.utils import timezone as django_timezone
 
-from spreadsheet.models import Spreadsheet, Sheet, Cell
+from spreadsheet.models import Spreadsheet, Sheet
 from decision.models import Decision, Signal, Option
 from task.models import Task
 from .models import (
@@ -17,7 +19,8 @@ from .models import (
 )
 from . import data_service
 from . import file_parser
-from .dify_workflows import json_input, run_dify_workflow, serialize_agent_messages
+from . import sheet_extractor
+from .dify_workflows import arun_dify_workflow, json_input, run_dify_workflow, serialize_agent_messages
 
 logger = logging.getLogger(__name__)
 
@@ -59,40 +62,7 @@ def _get_llm_client():
 
 def _extract_spreadsheet_data(spreadsheet):
     """Extract spreadsheet data into a structured dict for LLM analysis."""
-    data = {"name": spreadsheet.name, "sheets": []}
-    for sheet in spreadsheet.sheets.filter(is_deleted=False).order_by('position'):
-        columns = list(
-            sheet.columns.filter(is_deleted=False)
-            .order_by('position')
-            .values_list('name', flat=True)
-        )
-        rows_data = []
-        rows = sheet.rows.filter(is_deleted=False).order_by('position')[:100]  # limit rows
-        for row in rows:
-            cells = Cell.objects.filter(
-                sheet=sheet, row=row, is_deleted=False
-            ).select_related('column').order_by('column__position')
-            row_dict = {}
-            for cell in cells:
-                col_name = cell.column.name if cell.column else f"col_{cell.column_id}"
-                if cell.computed_type == 'NUMBER' and cell.computed_number is not None:
-                    row_dict[col_name] = float(cell.computed_number)
-                elif cell.computed_string:
-                    row_dict[col_name] = cell.computed_string
-                elif cell.string_value:
-                    row_dict[col_name] = cell.string_value
-                elif cell.number_value is not None:
-                    row_dict[col_name] = float(cell.number_value)
-                elif cell.boolean_value is not None:
-                    row_dict[col_name] = cell.boolean_value
-            if row_dict:
-                rows_data.append(row_dict)
-        data["sheets"].append({
-            "name": sheet.name,
-            "columns": columns,
-            "rows": rows_data,
-        })
-    return data
+    return sheet_extractor.extract_spreadsheet_data(spreadsheet)
 
 
 def _call_llm(client, spreadsheet_data):
@@ -301,36 +271,73 @@ def _normalize_dify_chat_output(output):
     return None
 
 
-def _call_dify_chat(
+def _dify_chat_request(
     chat_messages,
     user_id=None,
     analysis_result=None,
     project_members=None,
     current_username='',
 ):
-    """Call Dify chat workflow API with conversation context."""
+    """Keyword arguments for run_dify_workflow / arun_dify_workflow for a follow-up chat turn."""
     api_url = getattr(settings, 'DIFY_API_URL', '') or os.environ.get('DIFY_API_URL', '')
     api_key = getattr(settings, 'DIFY_CHAT_API_KEY', '') or os.environ.get('DIFY_CHAT_API_KEY', '')
     if not api_url or not api_key:
         raise RuntimeError("Dify chat not configured (DIFY_API_URL / DIFY_CHAT_API_KEY missing)")
+    return {
+        'api_url': api_url,
+        'api_key': api_key,
+        'inputs': {
+            'chat_messages': chat_messages,
+            'analysis_result': json_input(analysis_result) if analysis_result else '',
+            'project_members': json_input(project_members or []),
+            'current_username': current_username or '',
+        },
+        'user_id': user_id,
+    }
 
+
+def _call_dify_chat(
+    chat_messages,
+    user_id=None,
+    analysis_result=None,
+    project_members=None,
+    current_username='',
+):
+    """Call Dify chat workflow API with conversation context."""
+    request = _dify_chat_request(
+        chat_messages, user_id, analysis_result, project_members, current_username,
+    )
     try:
-        outputs = run_dify_workflow(
-            api_url=api_url,
-            api_key=api_key,
-            inputs={
-                'chat_messages': chat_messages,
-                'analysis_result': json_input(analysis_result) if analysis_result else '',
-                'project_members': json_input(project_members or []),
-                'current_username': current_username or '',
-            },
-            user_id=user_id,
-        )
+        outputs = run_dify_workflow(**request)
     except requests.HTTPError as e:
         status_code = getattr(getattr(e, 'response', None), 'status_code', None)
         logger.error(f"Dify chat API error: HTTP {status_code}")
         raise RuntimeError(f"Dify chat API returned {status_code}") from e
+    return _parse_dify_chat_outputs(outputs)
+
+
+async def _acall_dify_chat(
+    chat_messages,
+    user_id=None,
+    analysis_result=None,
+    project_members=None,
+    current_username='',
+):
+    """Async counterpart of _call_dify_chat on an async HTTP client."""
+    request = _dify_chat_request(
+        chat_messages, user_id, analysis_result, project_members, current_username,
+    )
+    try:
+        outputs = await arun_dify_workflow(**request)
+    except httpx.HTTPStatusError as e:
+        status_code = e.response.status_code
+        logger.error(f"Dify chat API error: HTTP {status_code}")
+        raise RuntimeError(f"Dify chat API returned {status_code}") from e
+    return _parse_dify_chat_outputs(outputs)
+
 
+def _parse_dify_chat_outputs(outputs):
+    """Extract {status, text, forwards} (or the legacy {reply, forwards}) from Dify chat outputs."""
     if isinstance(outputs, dict):
         candidates = [outputs]
         for key in ('result', 'text', 'output', 'answer'):
@@ -645,6 +652,44 @@ class AgentOrchestrator:
             message, spreadsheet_id, csv_filename, action, file_id
         )
 
+    async def ahandle_message(self, message, spreadsheet_id=None, csv_filename=None,
+                              action=None, file_id=None, calendar_context=None, workflow_id=None):
+        """Async variant of handle_message for ASGI streaming; yields the same chunks.
+
+        Calendar questions and follow-up chat await Dify without holding a
+        thread. Every other route runs the sync handle_message, one chunk per
+        sync_to_async hop.
+        """
+        if calendar_context:
+            async for chunk in self.aanswer_calendar_question(message, calendar_context):
+                yield chunk
+            yield {"type": "done"}
+            return
+
+        if not (action or file_id or spreadsheet_id or csv_filename):
+            latest_run = await sync_to_async(self._active_follow_up_run)()
+            if latest_run:
+                async for chunk in self._afollow_up_chat(message, latest_run):
+                    yield chunk
+                yield {"type": "done"}
+                return
+
+        chunks = self.handle_message(
+            message,
+            spreadsheet_id=spreadsheet_id,
+            csv_filename=csv_filename,
+            action=action,
+            file_id=file_id,
+            calendar_context=calendar_context,
+            workflow_id=workflow_id,
+        )
+        step = sync_to_async(next)
+        while True:
+            chunk = await step(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
     def _fetch_events_for_context(self, calendar_context):
         """Fetch calendar events for the given context.
 
@@ -783,6 +828,66 @@ class AgentOrchestrator:
         """Answer calendar-related questions using real event data via Dify AI."""
         yield {"type": "text", "content": "Looking up your calendar data..."}
 
+        request = self._build_calendar_request(message, calendar_context)
+        if request is None:
+            yield {"type": "error", "content": "Calendar AI is not configured. Please set DIFY_CALENDAR_API_KEY."}
+            return
+
+        try:
+            resp = requests.post(
+                f"{request['api_url']}/v1/workflows/run",
+                headers={
+                    "Authorization": f"Bearer {request['api_key']}",
+                    "Content-Type": "application/json",
+                },
+                json={
+                    "inputs": request['inputs'],
+                    "response_mode": "blocking",
+                    "user": request['user_id'],
+                },
+                timeout=90,
+            )
+            resp.raise_for_status()
+            result = resp.json()
+            raw_answer = result.get("data", {}).get("outputs", {}).get("answer", "")
+        except Exception as e:
+            logger.error(f"Dify calendar workflow error: {e}")
+            yield {"type": "error", "content": "Failed to get AI response. Please try again."}
+            return
+
+        yield from self._finish_calendar_answer(raw_answer, request['user_tz'])
+
+    async def aanswer_calendar_question(self, message, calendar_context):
+        """Async counterpart of answer_calendar_question; the Dify call does not hold a thread."""
+        yield {"type": "text", "content": "Looking up your calendar data..."}
+
+        request = await sync_to_async(self._build_calendar_request)(message, calendar_context)
+        if request is None:
+            yield {"type": "error", "content": "Calendar AI is not configured. Please set DIFY_CALENDAR_API_KEY."}
+            return
+
+        try:
+            outputs = await arun_dify_workflow(
+                api_url=request['api_url'],
+                api_key=request['api_key'],
+                inputs=request['inputs'],
+                user_id=request['user_id'],
+                timeout=90,
+            )
+            raw_answer = outputs.get("answer", "")
+        except Exception as e:
+            logger.error(f"Dify calendar workflow error: {e}")
+            yield {"type": "error", "content": "Failed to get AI response. Please try again."}
+            return
+
+        for chunk in await sync_to_async(self._finish_calendar_answer)(raw_answer, request['user_tz']):
+            yield chunk
+
+    def _build_calendar_request(self, message, calendar_context):
+        """Collect events for the calendar context into Dify workflow inputs.
+
+        Returns None when the calendar workflow is not configured.
+        """
         events = self._fetch_events_for_context(calendar_context)
 
         # Resolve user timezone from context (fallback to UTC)
@@ -825,34 +930,22 @@ class AgentOrchestrator:
         dify_api_url = getattr(settings, 'DIFY_API_URL', '') or os.environ.get('DIFY_API_URL', 'https://api.dify.ai')
 
         if not dify_api_key:
-            yield {"type": "error", "content": "Calendar AI is not configured. Please set DIFY_CALENDAR_API_KEY."}
-            return
+            return None
 
-        try:
-            resp = requests.post(
-                f"{dify_api_url}/v1/workflows/run",
-                headers={
-                    "Authorization": f"Bearer {dify_api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "inputs": {
-                        "calendar_data": calendar_data_str,
-                        "user_question": message,
-                    },
-                    "response_mode": "blocking",
-                    "user": str(self.user.id),
-                },
-                timeout=90,
-            )
-            resp.raise_for_status()
-            result = resp.json()
-            raw_answer = result.get("data", {}).get("outputs", {}).get("answer", "")
-        except Exception as e:
-            logger.error(f"Dify calendar workflow error: {e}")
-            yield {"type": "error", "content": "Failed to get AI response. Please try again."}
-            return
+        return {
+            'api_url': dify_api_url,
+            'api_key': dify_api_key,
+            'inputs': {
+                "calendar_data": calendar_data_str,
+                "user_question": message,
+            },
+            'user_id': str(self.user.id),
+            'user_tz': user_tz,
+        }
 
+    def _finish_calendar_answer(self, raw_answer, user_tz):
+        """Parse the Dify answer, create any requested events and return the chunks to stream."""
+        chunks = []
         # Parse AI response (expects JSON with answer + create_events array)
         text = raw_answer.strip()
         for fence in ('```json', '```'):
@@ -901,20 +994,21 @@ class AgentOrchestrator:
             if failed_count:
                 answer_text += f"\n⚠️ {failed_count} event{'s' if failed_count != 1 else ''} could not be created automatically."
 
-        yield {
+        chunks.append({
             "type": "text",
             "content": answer_text,
-        }
+        })
         if created_count:
             # Notify the calendar page to refresh
-            yield {"type": "calendar_updated"}
+            chunks.append({"type": "calendar_updated"})
         elif not had_creation_intent:
             # Only invite when the user asked a general calendar question,
             # not when they explicitly requested creation (even if Dify declined).
-            yield {
+            chunks.append({
                 "type": "calendar_invite",
                 "content": "Do you need me to create an event for you? If so, please tell me the specific time (down to the hour).",
-            }
+            })
+        return chunks
 
     def analyze_file(self, file_id):
         """Analyse any uploaded file (CSV/Excel) by its DB id."""
@@ -1037,7 +1131,7 @@ class AgentOrchestrator:
             yield {"type": "error", "content": f"CSV file not found on disk: {safe_name}"}
             return
 
-        columns, rows = data_service._read_csv_file(filepath)
+        columns, rows = data_service._read_report_file(filepath)
         if not rows:
             yield {"type": "error", "content": "CSV file is empty or could not be parsed."}
             return
@@ -1313,7 +1407,7 @@ class AgentOrchestrator:
             )
             csv_dir = data_service._get_csv_dir()
             filepath = _os.path.join(csv_dir, _os.path.basename(record.filename))
-            columns, rows = data_service._read_csv_file(filepath)
+            columns, rows = data_service._read_report_file(filepath)
             return {
                 'spreadsheet_data': {
                     'name': record.original_filename,
@@ -1501,67 +1595,14 @@ class AgentOrchestrator:
                 yield {"type": "error", "content": "No analysis found to create tasks from."}
         else:
             # Follow-up chat path
-            latest_run = self.session.workflow_runs.filter(
-                status='awaiting_confirmation',
-                chat_follow_up_started=True,
-                chat_followed_up=False,
-            ).order_by('-created_at').first()
+            latest_run = self._active_follow_up_run()
 
             if latest_run:
                 yield {"type": "text", "content": "Thinking..."}
-                history = AgentMessage.objects.filter(
-                    session=self.session
-                ).order_by('created_at')
-                chat_context = serialize_agent_messages(history)
-                full_input = f"{chat_context}\n\n[user]: {message}"
                 try:
-                    from core.utils.bot_user import get_agent_bot_user
-
-                    bot = get_agent_bot_user()
-                    project_members = _serialize_project_members(
-                        self.project,
-                        excluded_users=[bot],
-                    )
-                    logger.info(
-                        "Running agent follow-up chat for project=%s session=%s workflow_run=%s user=%s project_members=%s",
-                        self.project.id,
-                        self.session.id,
-                        latest_run.id,
-                        self.user.id,
-                        len(project_members),
-                    )
-                    result = _call_dify_chat(
-                        full_input,
-                        user_id=self.user.id,
-                        analysis_result=latest_run.analysis_result,
-                        project_members=project_members,
-                        current_username=self.user.username or '',
-                    )
-                    follow_up_status = result.get("status", "completed")
-                    reply = result.get("text") or result.get("reply", "")
-                    forwards = result.get("forwards", [])
-                    close_follow_up = follow_up_status == 'completed' or bool(forwards)
-                    logger.info(
-                        "Agent follow-up chat completed for workflow_run=%s status=%s forwards=%s close_follow_up=%s",
-                        latest_run.id,
-                        follow_up_status,
-                        len(forwards),
-                        close_follow_up,
-                    )
-
-                    if close_follow_up:
-                        latest_run.chat_followed_up = True
-                        latest_run.save(update_fields=['chat_followed_up'])
-                    yield {"type": "text", "content": reply}
-
-                    if forwards:
-                        fwd_results = _forward_to_users(forwards, self.user, self.project)
-                        sent = [r["username"] for r in fwd_results if r["status"] == "sent"]
-                        failed = [r["username"] for r in fwd_results if r["status"] != "sent"]
-                        if sent:
-                            yield {"type": "text", "content": f"Message forwarded to: {', '.join(sent)}"}
-                        if failed:
-                            yield {"type": "text", "content": f"Could not forward to: {', '.join(failed)}"}
+                    full_input, chat_kwargs = self._follow_up_request(message, latest_run)
+                    result = _call_dify_chat(full_input, **chat_kwargs)
+                    yield from self._apply_follow_up_result(result, latest_run)
                 except Exception as e:
                     logger.error(f"Dify chat call failed: {e}")
                     yield {"type": "error", "content": str(e)}
@@ -1574,3 +1615,81 @@ class AgentOrchestrator:
                     ),
                 }
         yield {"type": "done"}
+
+    def _active_follow_up_run(self):
+        return self.session.workflow_runs.filter(
+            status='awaiting_confirmation',
+            chat_follow_up_started=True,
+            chat_followed_up=False,
+        ).order_by('-created_at').first()
+
+    def _follow_up_request(self, message, latest_run):
+        """Build the chat input and _call_dify_chat kwargs for a follow-up message."""
+        history = AgentMessage.objects.filter(
+            session=self.session
+        ).order_by('created_at')
+        chat_context = serialize_agent_messages(history)
+        full_input = f"{chat_context}\n\n[user]: {message}"
+
+        from core.utils.bot_user import get_agent_bot_user
+
+        bot = get_agent_bot_user()
+        project_members = _serialize_project_members(
+            self.project,
+            excluded_users=[bot],
+        )
+        logger.info(
+            "Running agent follow-up chat for project=%s session=%s workflow_run=%s user=%s project_members=%s",
+            self.project.id,
+            self.session.id,
+            latest_run.id,
+            self.user.id,
+            len(project_members),
+        )
+        return full_input, {
+            'user_id': self.user.id,
+            'analysis_result': latest_run.analysis_result,
+            'project_members': project_members,
+            'current_username': self.user.username or '',
+        }
+
+    def _apply_follow_up_result(self, result, latest_run):
+        """Close the follow-up when Dify is done, forward messages and return the chunks to stream."""
+        follow_up_status = result.get("status", "completed")
+        reply = result.get("text") or result.get("reply", "")
+        forwards = result.get("forwards", [])
+        close_follow_up = follow_up_status == 'completed' or bool(forwards)
+        logger.info(
+            "Agent follow-up chat completed for workflow_run=%s status=%s forwards=%s close_follow_up=%s",
+            latest_run.id,
+            follow_up_status,
+            len(forwards),
+            close_follow_up,
+        )
+
+        if close_follow_up:
+            latest_run.chat_followed_up = True
+            latest_run.save(update_fields=['chat_followed_up'])
+        chunks = [{"type": "text", "content": reply}]
+
+        if forwards:
+            fwd_results = _forward_to_users(forwards, self.user, self.project)
+            sent = [r["username"] for r in fwd_results if r["status"] == "sent"]
+            failed = [r["username"] for r in fwd_results if r["status"] != "sent"]
+            if sent:
+                chunks.append({"type": "text", "content": f"Message forwarded to: {', '.join(sent)}"})
+            if failed:
+                chunks.append({"type": "text", "content": f"Could not forward to: {', '.join(failed)}"})
+        return chunks
+
+    async def _afollow_up_chat(self, message, latest_run):
+        """Async follow-up chat; only the DB work is handed to a thread."""
+        yield {"type": "text", "content": "Thinking..."}
+        try:
+            full_input, chat_kwargs = await sync_to_async(self._follow_up_request)(message, latest_run)
+            result = await _acall_dify_chat(full_input, **chat_kwargs)
+            for chunk in await sync_to_async(self._apply_follow_up_result)(result, latest_run):
+                yield chunk
+        except Exception as e:
+            logger.error(f"Dify chat call failed: {e}")
+            yield {"type": "error", "content": str(e)}
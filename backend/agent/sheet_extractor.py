@@ -0,0 +1,184 @@
+"""
+Spreadsheet → analysis JSON extraction.
+
+Output format matches file_parser:
+  {"name": "...", "sheets": [{"name": "Sheet1", "columns": [...], "rows": [{...}, ...]}]}
+
+Each sheet costs three queries: columns, row positions and one projected
+cell query ordered by (row, column) that is streamed into row dicts. Sheets
+longer than the row limit are sampled (head, tail or stratified) and the
+whole payload is trimmed to a token budget; a trimmed sheet reports its
+"total_rows" and the "sampling" used.
+"""
+import json
+import logging
+from bisect import bisect_right
+from itertools import accumulate, groupby
+
+from django.conf import settings
+
+from spreadsheet.models import Cell
+
+logger = logging.getLogger(__name__)
+
+SAMPLING_HEAD = 'head'
+SAMPLING_TAIL = 'tail'
+SAMPLING_STRATIFIED = 'stratified'
+SAMPLING_STRATEGIES = (SAMPLING_HEAD, SAMPLING_TAIL, SAMPLING_STRATIFIED)
+
+# Rough size of a token in characters of JSON, used for budgeting
+CHARS_PER_TOKEN = 4
+
+_CELL_FIELDS = (
+    'row_id',
+    'column_id',
+    'column__name',
+    'computed_type',
+    'computed_number',
+    'computed_string',
+    'string_value',
+    'number_value',
+    'boolean_value',
+)
+
+
+def sample_indices(total, limit, strategy=SAMPLING_HEAD):
+    """Indices (ascending) of the `limit` items kept out of `total`."""
+    if limit is None or total <= limit:
+        return list(range(total))
+    if limit <= 0:
+        return []
+    if strategy == SAMPLING_TAIL:
+        # Headers come from the column names, so row 0 is data like any other
+        return list(range(total - limit, total))
+    if strategy == SAMPLING_STRATIFIED:
+        if limit == 1:
+            return [0]
+        step = (total - 1) / (limit - 1)
+        return sorted({round(i * step) for i in range(limit)})
+    return list(range(limit))
+
+
+def _cell_value(computed_type, computed_number, computed_string, string_value, number_value, boolean_value):
+    if computed_type == 'NUMBER' and computed_number is not None:
+        return float(computed_number)
+    if computed_string:
+        return computed_string
+    if string_value:
+        return string_value
+    if number_value is not None:
+        return float(number_value)
+    if boolean_value is not None:
+        return boolean_value
+    return None
+
+
+def _sheet_rows(sheet, row_ids):
+    """Row dicts for the given rows, in row order; empty rows are skipped."""
+    cells = Cell.objects.filter(sheet=sheet, is_deleted=False, row__is_deleted=False)
+    if row_ids is not None:
+        cells = cells.filter(row_id__in=row_ids)
+    cells = (
+        cells.order_by('row__position', 'column__position')
+        .values_list(*_CELL_FIELDS)
+        .iterator()
+    )
+
+    rows = []
+    for _, row_cells in groupby(cells, key=lambda cell: cell[0]):
+        row_dict = {}
+        for _, column_id, column_name, *values in row_cells:
+            value = _cell_value(*values)
+            if value is not None:
+                row_dict[column_name or f"col_{column_id}"] = value
+        if row_dict:
+            rows.append(row_dict)
+    return rows
+
+
+def _estimate_tokens(value):
+    return len(json.dumps(value, default=str)) // CHARS_PER_TOKEN + 1
+
+
+def _rows_within(row_tokens, share, strategy):
+    """Indices of the most rows `strategy` keeps whose tokens fit in `share`."""
+    total = len(row_tokens)
+    if strategy in (SAMPLING_HEAD, SAMPLING_TAIL):
+        ordered = row_tokens if strategy == SAMPLING_HEAD else row_tokens[::-1]
+        # Head and tail samples are prefixes / suffixes, so running sums give the count directly
+        return sample_indices(total, bisect_right(list(accumulate(ordered)), share), strategy)
+    # Stratified samples grow with the limit; search the largest that fits
+    low, high = 0, total
+    while low < high:
+        middle = (low + high + 1) // 2
+        if sum(row_tokens[i] for i in sample_indices(total, middle, strategy)) <= share:
+            low = middle
+        else:
+            high = middle - 1
+    return sample_indices(total, low, strategy)
+
+
+def _fit_to_budget(sheets, token_budget, strategy):
+    """Thin sheet rows with the sampling strategy until the payload fits the budget.
+
+    The budget is shared evenly between sheets; what a small sheet leaves
+    unused passes on to the ones after it.
+    """
+    remaining = token_budget - sum(_estimate_tokens({**sheet, 'rows': []}) for sheet in sheets)
+    for position, sheet in enumerate(sheets):
+        share = max(remaining, 0) // (len(sheets) - position)
+        row_tokens = [_estimate_tokens(row) for row in sheet['rows']]
+        used = sum(row_tokens)
+        if used > share:
+            keep = _rows_within(row_tokens, share, strategy)
+            sheet.setdefault('total_rows', len(sheet['rows']))
+            sheet['sampling'] = strategy
+            sheet['rows'] = [sheet['rows'][i] for i in keep]
+            used = sum(row_tokens[i] for i in keep)
+        remaining -= used
+    return sheets
+
+
+def extract_spreadsheet_data(spreadsheet, max_rows=None, sampling=None, token_budget=None):
+    """Extract spreadsheet data into a structured dict for LLM analysis.
+
+    max_rows, sampling and token_budget default to the
+    AGENT_SPREADSHEET_MAX_ROWS, AGENT_SPREADSHEET_SAMPLING and
+    AGENT_SPREADSHEET_TOKEN_BUDGET settings; a budget of 0 disables trimming.
+    """
+    if max_rows is None:
+        max_rows = settings.AGENT_SPREADSHEET_MAX_ROWS
+    if sampling is None:
+        sampling = settings.AGENT_SPREADSHEET_SAMPLING
+    if token_budget is None:
+        token_budget = settings.AGENT_SPREADSHEET_TOKEN_BUDGET
+    if sampling not in SAMPLING_STRATEGIES:
+        logger.warning(f"Unknown spreadsheet sampling '{sampling}', using '{SAMPLING_HEAD}'")
+        sampling = SAMPLING_HEAD
+
+    data = {"name": spreadsheet.name, "sheets": []}
+    for sheet in spreadsheet.sheets.filter(is_deleted=False).order_by('position'):
+        columns = list(
+            sheet.columns.filter(is_deleted=False)
+            .order_by('position')
+            .values_list('name', flat=True)
+        )
+        row_ids = list(
+            sheet.rows.filter(is_deleted=False)
+            .order_by('position')
+            .values_list('id', flat=True)
+        )
+        keep = sample_indices(len(row_ids), max_rows, sampling)
+        sheet_data = {
+            "name": sheet.name,
+            "columns": columns,
+            "rows": _sheet_rows(sheet, None if len(keep) == len(row_ids) else [row_ids[i] for i in keep]),
+        }
+        if len(keep) < len(row_ids):
+            sheet_data["total_rows"] = len(row_ids)
+            sheet_data["sampling"] = sampling
+        data["sheets"].append(sheet_data)
+
+    if token_budget:
+        _fit_to_budget(data["sheets"], token_budget, sampling)
+    return data
@@ -1,8 +1,14 @@
 import json
+import os
+import shutil
+import tempfile
 import uuid
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock
 
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 
@@ -14,6 +20,10 @@ from .models import (
 from .services import AgentOrchestrator, _forward_to_users
 
 
+async def _collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
 def _test_analysis_data():
     """Minimal valid analysis structure for tests."""
     return {
@@ -234,6 +244,23 @@ class ChatAPITests(APITestCase):
         self.session.refresh_from_db()
         self.assertEqual(self.session.title, 'Analyze my campaign data')
 
+    def test_streamed_message_keeps_its_place_before_status_messages(self):
+        from .services import _create_agent_status_message
+        from .views import _AssistantMessageBuffer, _persist_messages
+
+        buffer = _AssistantMessageBuffer(self.session)
+        buffer.feed({'type': 'text', 'content': 'Looking at your data'})
+        status_message = _create_agent_status_message(
+            self.session, 'Workflow started', event_type='workflow_started',
+        )
+        buffer.feed({'type': 'done'})
+        _persist_messages(buffer.take())
+
+        contents = list(
+            AgentMessage.objects.filter(session=self.session).values_list('content', flat=True)
+        )
+        self.assertEqual(contents, ['Looking at your data', status_message.content])
+
 
 class SpreadsheetListAPITests(APITestCase):
     def setUp(self):
@@ -398,6 +425,31 @@ class OrchestratorTests(TestCase):
         self.assertIn('alice', usernames)
         self.assertNotIn('agent-bot', usernames)
 
+    @patch('agent.services._call_dify_chat')
+    @patch('agent.services._acall_dify_chat', new_callable=AsyncMock)
+    def test_ahandle_message_follow_up_uses_async_dify_chat(self, mock_acall, mock_call):
+        workflow_run = AgentWorkflowRun.objects.create(
+            session=self.session,
+            status='awaiting_confirmation',
+            analysis_result=_test_analysis_data(),
+            chat_follow_up_started=True,
+        )
+        mock_acall.return_value = {
+            'status': 'completed',
+            'text': 'Prepared a summary.',
+            'forwards': [],
+        }
+
+        orchestrator = AgentOrchestrator(self.user, self.project, self.session)
+        chunks = async_to_sync(_collect)(orchestrator.ahandle_message("Explain this to me."))
+
+        self.assertIn({'type': 'text', 'content': 'Prepared a summary.'}, chunks)
+        self.assertEqual(chunks[-1], {'type': 'done'})
+        self.assertEqual(mock_acall.call_args.kwargs['current_username'], 'orchuser')
+        mock_call.assert_not_called()
+        workflow_run.refresh_from_db()
+        self.assertTrue(workflow_run.chat_followed_up)
+
     @patch('agent.services._call_dify_chat')
     def test_follow_up_needs_clarification_keeps_run_open(self, mock_call_dify_chat):
         workflow_run = AgentWorkflowRun.objects.create(
@@ -817,6 +869,154 @@ class DecisionFieldCompatibilityTests(TestCase):
         self.assertIsNotNone(draft_chunk['data']['decision_id'])
 
 
+class SpreadsheetExtractionTests(TestCase):
+    def setUp(self):
+        from spreadsheet.models import Sheet, Spreadsheet
+        from spreadsheet.services import CellService
+
+        org = Organization.objects.create(name='Test Org Extract', slug='test-org-extract')
+        user = CustomUser.objects.create_user(
+            email='extract@test.com',
+            username='extractuser',
+            password='testpass123',
+        )
+        project = Project.objects.create(name='Test Project Extract', organization=org, owner=user)
+        self.spreadsheet = Spreadsheet.objects.create(project=project, name='Campaigns')
+        sheet = Sheet.objects.create(spreadsheet=self.spreadsheet, name='Data', position=0)
+        operations = []
+        for r in range(10):
+            operations.append({'operation': 'set', 'row': r, 'column': 0, 'raw_input': f'Campaign {r}'})
+            operations.append({'operation': 'set', 'row': r, 'column': 1, 'raw_input': str(r * 10)})
+        CellService.batch_update_cells(sheet, operations)
+
+    def _extract(self, **kwargs):
+        from .sheet_extractor import extract_spreadsheet_data
+
+        kwargs.setdefault('token_budget', 0)
+        return extract_spreadsheet_data(self.spreadsheet, **kwargs)['sheets'][0]
+
+    def test_extracts_rows_in_one_cell_query(self):
+        # spreadsheet sheets, columns, row ids, cells
+        with self.assertNumQueries(4):
+            sheet = self._extract(max_rows=100)
+        self.assertEqual(sheet['columns'], ['A', 'B'])
+        self.assertEqual(len(sheet['rows']), 10)
+        self.assertEqual(sheet['rows'][3], {'A': 'Campaign 3', 'B': 30.0})
+        self.assertNotIn('total_rows', sheet)
+
+    def test_sampling_strategies(self):
+        def campaigns(sheet):
+            return [row['A'] for row in sheet['rows']]
+
+        head = self._extract(max_rows=4, sampling='head')
+        self.assertEqual(campaigns(head), ['Campaign 0', 'Campaign 1', 'Campaign 2', 'Campaign 3'])
+        self.assertEqual(head['total_rows'], 10)
+
+        tail = self._extract(max_rows=4, sampling='tail')
+        self.assertEqual(campaigns(tail), ['Campaign 6', 'Campaign 7', 'Campaign 8', 'Campaign 9'])
+
+        stratified = self._extract(max_rows=4, sampling='stratified')
+        self.assertEqual(campaigns(stratified), ['Campaign 0', 'Campaign 3', 'Campaign 6', 'Campaign 9'])
+        self.assertEqual(stratified['sampling'], 'stratified')
+
+    def test_token_budget_trims_rows(self):
+        from .sheet_extractor import _estimate_tokens
+
+        sheet = self._extract(max_rows=100, token_budget=60)
+        self.assertLess(len(sheet['rows']), 10)
+        self.assertEqual(sheet['total_rows'], 10)
+        self.assertLessEqual(_estimate_tokens(sheet['rows']), 60)
+
+
+class ImportedReportCacheTests(TestCase):
+    def setUp(self):
+        self.csv_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.csv_dir, ignore_errors=True)
+        settings_override = override_settings(AGENT_CSV_DIR=self.csv_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        org = Organization.objects.create(name='Test Org Reports', slug='test-org-reports')
+        self.user = CustomUser.objects.create_user(
+            email='reports@test.com',
+            username='reportsuser',
+            password='testpass123',
+        )
+        self.project = Project.objects.create(name='Test Project Reports', organization=org, owner=self.user)
+
+    def _upload(self, name, content):
+        from . import data_service
+
+        uploaded = SimpleUploadedFile(name, content.encode('utf-8'), content_type='text/csv')
+        return data_service.save_uploaded_file(uploaded, self.user, self.project)
+
+    def test_upload_builds_columnar_cache_and_pages_rows(self):
+        from . import columnar_store, data_service
+
+        result = self._upload('report.csv', 'Name,Cost,ROAS\nA,"1,000",2.5\nB,-,1\nC,10.5,3\n')
+        self.assertTrue(os.path.isfile(columnar_store.sidecar_path(os.path.join(self.csv_dir, 'report.csv'))))
+
+        data = data_service.get_report_data(result['id'], self.project)
+        self.assertEqual(data['rows'], [
+            {'Name': 'A', 'Cost': 1000, 'ROAS': 2.5},
+            {'Name': 'B', 'Cost': '-', 'ROAS': 1},
+            {'Name': 'C', 'Cost': 10.5, 'ROAS': 3},
+        ])
+        self.assertIsInstance(data['rows'][0]['Cost'], int)
+
+        page = data_service.get_report_data(result['id'], self.project, offset=1, limit=1)
+        self.assertEqual(page['rows'], [{'Name': 'B', 'Cost': '-', 'ROAS': 1}])
+        self.assertEqual(page['row_count'], 3)
+
+    def test_summary_is_updated_on_upload_and_delete(self):
+        from . import data_service
+        from .models import ImportedReportSummary
+
+        first = self._upload('first.csv', 'Name,Cost,Revenue,ROAS\nA,10,30,3\nB,20,20,1\n')
+        self._upload('second.csv', 'Name,Cost,Revenue,ROAS\nC,5,25,5\n')
+
+        with self.assertNumQueries(1):
+            summary = data_service.get_reports_summary(self.project)
+        self.assertEqual(summary['total_cost'], 35)
+        self.assertEqual(summary['total_revenue'], 75)
+        self.assertEqual(summary['active_campaigns'], 3)
+        self.assertEqual(summary['file_count'], 2)
+        self.assertEqual([c['name'] for c in summary['top_campaigns']], ['C', 'A', 'B'])
+
+        self.assertTrue(data_service.delete_report(first['id'], self.project))
+        summary = data_service.get_reports_summary(self.project)
+        self.assertEqual(summary['total_cost'], 5)
+        self.assertEqual(summary['file_count'], 1)
+        self.assertEqual([c['name'] for c in summary['top_campaigns']], ['C'])
+
+        # A rebuild from the files lands on the same numbers
+        ImportedReportSummary.objects.all().delete()
+        self.assertEqual(data_service.get_reports_summary(self.project), summary)
+
+    def test_failed_summary_update_leaves_no_record(self):
+        from .models import ImportedCSVFile
+
+        with patch('agent.data_service._add_to_summary', side_effect=RuntimeError('boom')):
+            result = self._upload('broken.csv', 'Name,Cost\nA,10\n')
+
+        self.assertIsNone(result)
+        self.assertFalse(ImportedCSVFile.objects.filter(project=self.project).exists())
+        self.assertFalse(os.path.exists(os.path.join(self.csv_dir, 'broken.csv')))
+
+    def test_failed_summary_update_keeps_record_on_delete(self):
+        from . import data_service
+        from .models import ImportedCSVFile
+
+        result = self._upload('kept.csv', 'Name,Cost\nA,10\n')
+
+        with patch('agent.data_service._remove_from_summary', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                data_service.delete_report(result['id'], self.project)
+
+        self.assertFalse(ImportedCSVFile.objects.get(id=result['id']).is_deleted)
+        self.assertEqual(data_service.get_reports_summary(self.project)['file_count'], 1)
+
+
 class CalendarAgentTests(TestCase):
     """
     Verify that answer_calendar_question() correctly routes calendar
@@ -897,6 +1097,24 @@ class CalendarAgentTests(TestCase):
         # requests.post should not have been called for the calendar workflow
         self.assertFalse(mock_post.called)
 
+    @patch.dict('os.environ', {'DIFY_CALENDAR_API_KEY': 'test-key'})
+    @patch('agent.services.requests.post')
+    @patch('agent.services.arun_dify_workflow', new_callable=AsyncMock)
+    def test_ahandle_message_awaits_calendar_workflow(self, mock_workflow, mock_post):
+        """The async path awaits Dify on the async client and yields the same chunks."""
+        mock_workflow.return_value = {'answer': '{"answer": "You have 1 event.", "create_events": []}'}
+        self._make_calendar_and_event(days_offset=1)
+
+        calendar_context = {'type': 'calendar', 'calendarIds': [], 'currentView': 'week'}
+        chunks = async_to_sync(_collect)(self.orchestrator.ahandle_message(
+            'What is on my calendar?',
+            calendar_context=calendar_context,
+        ))
+        self.assertIn({'type': 'text', 'content': 'You have 1 event.'}, chunks)
+        self.assertEqual(chunks[-1], {'type': 'done'})
+        self.assertIn('Team Standup', mock_workflow.call_args.kwargs['inputs']['calendar_data'])
+        self.assertFalse(mock_post.called)
+
     # ------------------------------------------------------------------ #
     # _fetch_events_for_context                                           #
     # ------------------------------------------------------------------ #
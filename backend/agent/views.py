@@ -2,9 +2,13 @@ import json
 import logging
 import os
 
+from asgiref.sync import sync_to_async
 from django.conf import settings as django_settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
 from django.db.models import Count, Max, Q
 from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django.utils.translation import activate as activate_language
 from rest_framework import viewsets, status
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -107,6 +111,139 @@ class AgentSessionViewSet(EnglishResponseMixin, viewsets.ModelViewSet):
         instance.save()
 
 
+class _AssistantMessageBuffer:
+    """Collects streamed chunks into unsaved assistant AgentMessages.
+
+    Messages are written by _persist_messages in one transaction when the
+    stream reaches 'done' (or fails), not once per chunk. Each keeps the time
+    its first chunk arrived as created_at, so it sorts correctly against the
+    status messages the orchestrator writes mid-stream.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.messages = []
+        self._reset()
+
+    def _reset(self):
+        self.content_parts = []
+        self.metadata = {}
+        self.message_type = 'text'
+        self.started_at = None
+
+    def flush(self):
+        """Close the accumulated content into a pending message."""
+        body = '\n'.join(p for p in self.content_parts if p)
+        if body:
+            self.messages.append(AgentMessage(
+                session=self.session,
+                role='assistant',
+                content=body,
+                message_type=self.message_type,
+                metadata=self.metadata,
+                created_at=self.started_at or timezone.now(),
+            ))
+        self._reset()
+
+    def feed(self, chunk):
+        chunk_type = chunk.get('type', 'text')
+        content = chunk.get('content', '')
+        data = chunk.get('data')
+
+        # Save calendar_invite as a separate message so it can be
+        # restored independently from the preceding calendar answer.
+        if chunk_type == 'calendar_invite':
+            self.flush()
+            if content:
+                self.messages.append(AgentMessage(
+                    session=self.session,
+                    role='assistant',
+                    content=content,
+                    message_type='calendar_invite',
+                    metadata={},
+                    created_at=timezone.now(),
+                ))
+            return
+
+        # Skip internal signalling events from content accumulation
+        if chunk_type not in ('done', 'calendar_updated'):
+            if content:
+                if self.started_at is None:
+                    self.started_at = timezone.now()
+                self.content_parts.append(content)
+            self.message_type = chunk_type
+            if data:
+                self.metadata.update(data)
+
+        if chunk_type == 'done':
+            self.flush()
+
+    def take(self):
+        """Flush and hand over the pending messages."""
+        self.flush()
+        messages, self.messages = self.messages, []
+        return messages
+
+
+def _persist_messages(messages):
+    if not messages:
+        return
+    # auto_now_add overwrites created_at on insert, so the stream time is
+    # restored with an update
+    streamed_at = [message.created_at for message in messages]
+    with transaction.atomic():
+        AgentMessage.objects.bulk_create(messages)
+        for message, created_at in zip(messages, streamed_at):
+            AgentMessage.objects.filter(pk=message.pk).update(created_at=created_at)
+            message.created_at = created_at
+
+
+def _sse(chunk):
+    return f"data: {json.dumps(chunk, default=str)}\n\n"
+
+
+_STREAM_ERROR = {
+    "type": "error",
+    "content": "An internal error occurred. Please try again.",
+}
+
+
+def _event_stream(orchestrator, session, message_text, chat_kwargs):
+    buffer = _AssistantMessageBuffer(session)
+    try:
+        for chunk in orchestrator.handle_message(message_text, **chat_kwargs):
+            buffer.feed(chunk)
+            yield _sse(chunk)
+            if chunk.get('type') == 'done':
+                _persist_messages(buffer.take())
+    except Exception:
+        logger.exception("Error during agent SSE stream")
+        _persist_messages(buffer.take())
+        yield _sse(_STREAM_ERROR)
+        yield _sse({'type': 'done'})
+    finally:
+        _persist_messages(buffer.take())
+
+
+async def _aevent_stream(orchestrator, session, message_text, chat_kwargs):
+    """ASGI variant of _event_stream; Dify calls are awaited instead of pinning a worker thread."""
+    buffer = _AssistantMessageBuffer(session)
+    persist = sync_to_async(_persist_messages)
+    try:
+        async for chunk in orchestrator.ahandle_message(message_text, **chat_kwargs):
+            buffer.feed(chunk)
+            yield _sse(chunk)
+            if chunk.get('type') == 'done':
+                await persist(buffer.take())
+    except Exception:
+        logger.exception("Error during agent SSE stream")
+        await persist(buffer.take())
+        yield _sse(_STREAM_ERROR)
+        yield _sse({'type': 'done'})
+    finally:
+        await persist(buffer.take())
+
+
 class ChatView(EnglishResponseMixin, APIView):
     permission_classes = [IsAuthenticated]
     renderer_classes = [EventStreamRenderer, JSONRenderer]
@@ -164,83 +301,21 @@ class ChatView(EnglishResponseMixin, APIView):
             session=session,
         )
 
-        def event_stream():
-            assistant_content_parts = []
-            assistant_metadata = {}
-            last_message_type = 'text'
-            standalone_message_types = {'miro_status', 'miro_suggestion'}
-
-            def _flush_message():
-                """Save accumulated content as an assistant message and reset state."""
-                nonlocal assistant_content_parts, assistant_metadata, last_message_type
-                body = '\n'.join(p for p in assistant_content_parts if p)
-                if body:
-                    AgentMessage.objects.create(
-                        session=session,
-                        role='assistant',
-                        content=body,
-                        message_type=last_message_type,
-                        metadata=assistant_metadata,
-                    )
-                assistant_content_parts = []
-                assistant_metadata = {}
-                last_message_type = 'text'
-
-            try:
-                for chunk in orchestrator.handle_message(
-                    message_text,
-                    spreadsheet_id=spreadsheet_id,
-                    csv_filename=csv_filename,
-                    action=action,
-                    file_id=file_id,
-                    calendar_context=calendar_context,
-                    workflow_id=workflow_id,
-                ):
-                    chunk_type = chunk.get('type', 'text')
-                    content = chunk.get('content', '')
-                    data = chunk.get('data')
-
-                    # Save calendar_invite as a separate message so it can be
-                    # restored independently from the preceding calendar answer.
-                    if chunk_type == 'calendar_invite':
-                        _flush_message()
-                        sse_data = json.dumps(chunk, default=str)
-                        yield f"data: {sse_data}\n\n"
-                        if content:
-                            AgentMessage.objects.create(
-                                session=session,
-                                role='assistant',
-                                content=content,
-                                message_type='calendar_invite',
-                                metadata={},
-                            )
-                        continue
-
-                    # Skip internal signalling events from content accumulation
-                    if chunk_type not in ('done', 'calendar_updated'):
-                        if content:
-                            assistant_content_parts.append(content)
-                        last_message_type = chunk_type
-                        if data:
-                            assistant_metadata.update(data)
-
-                    sse_data = json.dumps(chunk, default=str)
-                    yield f"data: {sse_data}\n\n"
-
-                    if chunk_type == 'done':
-                        _flush_message()
-            except Exception:
-                logger.exception("Error during agent SSE stream")
-                _flush_message()
-                error_payload = json.dumps({
-                    "type": "error",
-                    "content": "An internal error occurred. Please try again.",
-                })
-                yield f"data: {error_payload}\n\n"
-                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+        chat_kwargs = {
+            'spreadsheet_id': spreadsheet_id,
+            'csv_filename': csv_filename,
+            'action': action,
+            'file_id': file_id,
+            'calendar_context': calendar_context,
+            'workflow_id': workflow_id,
+        }
+        if isinstance(request._request, ASGIRequest):
+            stream = _aevent_stream(orchestrator, session, message_text, chat_kwargs)
+        else:
+            stream = _event_stream(orchestrator, session, message_text, chat_kwargs)
 
         response = StreamingHttpResponse(
-            event_stream(),
+            stream,
             content_type='text/event-stream',
         )
         response['Cache-Control'] = 'no-cache'
@@ -296,7 +371,22 @@ class DataReportDetailView(EnglishResponseMixin, APIView):
                 {"detail": "No active project."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        data = data_service.get_report_data(file_id, project)
+        # Optional row paging: ?offset=&limit=
+        paging = {}
+        for param in ('offset', 'limit'):
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                paging[param] = int(value)
+            except ValueError:
+                paging[param] = -1
+            if paging[param] < 0:
+                return Response(
+                    {"detail": f"{param} must be a non-negative integer."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        data = data_service.get_report_data(file_id, project, **paging)
         if data is None:
             return Response(
                 {"detail": "Report not found."},
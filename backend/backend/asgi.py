@@ -19,6 +19,7 @@ django.setup()
 
 from asset.routing import websocket_urlpatterns as asset_websocket_urlpatterns
 from chat.routing import websocket_urlpatterns as chat_websocket_urlpatterns
+from dashboard.routing import websocket_urlpatterns as dashboard_websocket_urlpatterns
 from asset.middleware import JWTAuthMiddleware
 
 
@@ -30,7 +31,8 @@ application = ProtocolTypeRouter({
     "websocket": JWTAuthMiddleware(
         URLRouter(
             asset_websocket_urlpatterns + 
-            chat_websocket_urlpatterns
+            chat_websocket_urlpatterns +
+            dashboard_websocket_urlpatterns
         )
     ),
 })
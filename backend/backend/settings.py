@@ -247,6 +247,12 @@ AGENT_CSV_DIR = config(
     default=os.path.join(BASE_DIR, 'agent_data')
 )
 
+# Spreadsheet extraction for agent analysis: rows kept per sheet, how they
+# are picked (head, tail or stratified) and the payload token budget (0 = off)
+AGENT_SPREADSHEET_MAX_ROWS = config('AGENT_SPREADSHEET_MAX_ROWS', default=100, cast=int)
+AGENT_SPREADSHEET_SAMPLING = config('AGENT_SPREADSHEET_SAMPLING', default='head')
+AGENT_SPREADSHEET_TOKEN_BUDGET = config('AGENT_SPREADSHEET_TOKEN_BUDGET', default=30000, cast=int)
+
 # Dify LLM Platform integration (optional)
 # Base config
 DIFY_API_URL = config('DIFY_API_URL', default='')
@@ -356,6 +362,30 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = config('TIME_ZONE', default='UTC')
 broker_connection_retry_on_startup = True
 
+# Seconds to wait before refreshing a pivot after a source edit, so bursts of
+# edits are coalesced into one recompute.
+SPREADSHEET_PIVOT_REFRESH_DELAY = config('SPREADSHEET_PIVOT_REFRESH_DELAY', default=2.0, cast=float)
+# Seconds after which a pivot refresh that is still marked running or queued is
+# assumed lost (dead worker, dropped task) and may be started again.
+SPREADSHEET_PIVOT_REFRESH_LEASE = config('SPREADSHEET_PIVOT_REFRESH_LEASE', default=300.0, cast=float)
+
+# Seconds between flushes of buffered chat read receipts.
+CHAT_READ_RECEIPT_FLUSH_INTERVAL = config('CHAT_READ_RECEIPT_FLUSH_INTERVAL', default=5.0, cast=float)
+
+# Days of recurring-event occurrences kept in the calendar occurrence index,
+# behind and ahead of today. Windows outside this span are expanded on the fly.
+CALENDAR_OCCURRENCE_PAST_DAYS = config('CALENDAR_OCCURRENCE_PAST_DAYS', default=180, cast=int)
+CALENDAR_OCCURRENCE_HORIZON_DAYS = config('CALENDAR_OCCURRENCE_HORIZON_DAYS', default=400, cast=int)
+
+# Seconds a dashboard summary read is cached (0 = read DashboardSummary every time).
+DASHBOARD_SUMMARY_CACHE_TIMEOUT = config('DASHBOARD_SUMMARY_CACHE_TIMEOUT', default=0, cast=int)
+
+# Seconds between folds of pending task-write deltas into DashboardSummary rows.
+DASHBOARD_SUMMARY_FOLD_INTERVAL = config('DASHBOARD_SUMMARY_FOLD_INTERVAL', default=60.0, cast=float)
+
+# Send each new ActivityEvent to its project's websocket group (ws/activity/projects/<id>/).
+ACTIVITY_STREAM_BROADCAST = config('ACTIVITY_STREAM_BROADCAST', default=False, cast=bool)
+
 # Celery Beat Configuration for Periodic Tasks
 CELERY_BEAT_SCHEDULE = {
     'reset-daily-usage': {
@@ -368,6 +398,34 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': crontab(hour=2, minute=0),  # Run daily at 02:00 UTC (low traffic period)
         'options': {'timezone': 'UTC'}
     },
+    'flush-chat-read-receipts': {
+        'task': 'chat.tasks.flush_read_receipts',
+        'schedule': CHAT_READ_RECEIPT_FLUSH_INTERVAL,
+    },
+    'cleanup-chat-online-status': {
+        'task': 'chat.tasks.cleanup_old_online_status',
+        'schedule': crontab(minute='*/15'),  # Lookups ignore expired heartbeats; this only frees memory
+        'options': {'timezone': 'UTC'}
+    },
+    'refresh-calendar-occurrence-index': {
+        'task': 'calendars.tasks.refresh_occurrence_index',
+        'schedule': crontab(hour=3, minute=0),  # Daily; edits are indexed as they happen
+        'options': {'timezone': 'UTC'}
+    },
+    'reconcile-chat-unread-counts': {
+        'task': 'chat.tasks.reconcile_unread_counts',
+        'schedule': crontab(minute=30),  # Hourly; counters are kept exact on the write path
+        'options': {'timezone': 'UTC'}
+    },
+    'rebuild-dashboard-summaries': {
+        'task': 'dashboard.tasks.rebuild_dashboard_summaries',
+        'schedule': crontab(hour=3, minute=30),  # Daily; task writes update the rows as they happen
+        'options': {'timezone': 'UTC'}
+    },
+    'fold-dashboard-summary-deltas': {
+        'task': 'dashboard.tasks.fold_dashboard_summary_deltas',
+        'schedule': DASHBOARD_SUMMARY_FOLD_INTERVAL,
+    },
 }
 
 # Redis Configuration
@@ -0,0 +1,225 @@
+"""
+Free/busy computation across calendars.
+
+Busy intervals for every requested calendar come from one query (the
+occurrence index, or the master rows outside its horizon) ordered by calendar
+and start, and are merged in a single streaming pass.
+
+For repeated scheduling lookups busy time is also available as per-calendar
+bitmaps of SLOT_MINUTES slots per UTC day. They are cached under a
+per-calendar version that every occurrence index write moves forward, so
+edits never serve stale slots.
+"""
+from __future__ import annotations
+
+import heapq
+import uuid
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from itertools import groupby
+from typing import Any, Iterable, Iterator
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Event, OccurrenceIndex
+from .occurrence_index import indexed_window, window_filter
+from .recurrence import expand_events
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+# Largest window (in days) slots are served for
+MAX_SLOT_DAYS = 62
+
+BITMAP_CACHE_TIMEOUT = 24 * 60 * 60
+
+_SLOT = timedelta(minutes=SLOT_MINUTES)
+
+
+# -----------------------------
+# Intervals
+# -----------------------------
+def merge_intervals(intervals: Iterable[tuple[datetime, datetime]]) -> Iterator[tuple[datetime, datetime]]:
+    """Merge start-ordered intervals; overlapping and touching ones are joined."""
+    current_start = current_end = None
+    for start, end in intervals:
+        if current_start is None:
+            current_start, current_end = start, end
+        elif start <= current_end:
+            current_end = max(current_end, end)
+        else:
+            yield current_start, current_end
+            current_start, current_end = start, end
+    if current_start is not None:
+        yield current_start, current_end
+
+
+def _ordered_rows(calendar_ids, time_min: datetime, time_max: datetime) -> Iterator[tuple[Any, datetime, datetime]]:
+    """(calendar_id, start, end) of every instance in the window, grouped by calendar and ordered by start."""
+    indexed_min, indexed_max = indexed_window()
+    if indexed_min <= time_min and time_max <= indexed_max:
+        yield from (
+            OccurrenceIndex.objects.filter(
+                calendar_id__in=calendar_ids,
+                occurrence_start__lt=time_max,
+                occurrence_end__gt=time_min,
+                event__is_deleted=False,
+            )
+            .order_by("calendar_id", "occurrence_start")
+            .values_list("calendar_id", "occurrence_start", "occurrence_end")
+            .iterator()
+        )
+        return
+
+    events_qs = (
+        Event.objects.select_related("recurrence_rule")
+        .filter(calendar_id__in=calendar_ids, is_deleted=False, start_datetime__lt=time_max)
+        .filter(window_filter(time_min))
+    )
+    rows = [
+        (inst.calendar_id, inst.start_datetime, inst.end_datetime)
+        for inst in expand_events(events_qs, time_min, time_max)
+        if inst.start_datetime < time_max and inst.end_datetime > time_min
+    ]
+    rows.sort(key=lambda row: (str(row[0]), row[1]))
+    yield from rows
+
+
+def busy_intervals(calendar_ids, time_min: datetime, time_max: datetime) -> dict[Any, list[tuple[datetime, datetime]]]:
+    """Merged busy intervals per calendar id; calendars without events map to []."""
+    calendar_ids = list(calendar_ids)
+    result: dict[Any, list[tuple[datetime, datetime]]] = {cal_id: [] for cal_id in calendar_ids}
+    if not calendar_ids:
+        return result
+    for cal_id, rows in groupby(_ordered_rows(calendar_ids, time_min, time_max), key=lambda row: row[0]):
+        result[cal_id] = list(merge_intervals((start, end) for _, start, end in rows))
+    return result
+
+
+def combined_busy(per_calendar: dict[Any, list[tuple[datetime, datetime]]]) -> list[tuple[datetime, datetime]]:
+    """Busy intervals of all calendars together (busy when any calendar is busy)."""
+    return list(merge_intervals(heapq.merge(*per_calendar.values())))
+
+
+# -----------------------------
+# Slot bitmaps
+# -----------------------------
+def _version_key(calendar_id) -> str:
+    return f"calendars:busy_version:{calendar_id}"
+
+
+def _bitmap_key(calendar_id, version: str, day: datetime) -> str:
+    return f"calendars:busy:{calendar_id}:{version}:{day.date().isoformat()}"
+
+
+def invalidate_busy_bitmaps(calendar_ids: Iterable[Any]) -> None:
+    """Retire the cached bitmaps of the given calendars by moving them to a new version."""
+    calendar_ids = set(calendar_ids)
+    if not calendar_ids:
+        return
+
+    def bump():
+        cache.set_many({_version_key(cal_id): uuid.uuid4().hex for cal_id in calendar_ids}, None)
+
+    bump()
+    # A lookup racing the write could cache pre-commit rows under the new
+    # version; moving again after commit retires those as well
+    transaction.on_commit(bump)
+
+
+def _versions(calendar_ids) -> dict[Any, str]:
+    keys = {cal_id: _version_key(cal_id) for cal_id in calendar_ids}
+    found = cache.get_many(list(keys.values()))
+    versions = {}
+    for cal_id, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            # Never fall back to a fixed default: bitmaps cached under it
+            # before an eviction could be stale
+            cache.add(key, uuid.uuid4().hex, None)
+            version = cache.get(key)
+        versions[cal_id] = version
+    return versions
+
+
+def _day_start(value: datetime) -> datetime:
+    return datetime.combine(value.astimezone(dt_timezone.utc).date(), time.min, tzinfo=dt_timezone.utc)
+
+
+def _day_bitmap(intervals: Iterable[tuple[datetime, datetime]], day: datetime) -> int:
+    bits = 0
+    day_end = day + timedelta(days=1)
+    for start, end in intervals:
+        if end <= day or start >= day_end:
+            continue
+        first = max((start - day) // _SLOT, 0)
+        last = min(-((day - end) // _SLOT), SLOTS_PER_DAY)
+        bits |= ((1 << (last - first)) - 1) << first
+    return bits
+
+
+def busy_bitmaps(calendar_ids, time_min: datetime, time_max: datetime) -> tuple[list[datetime], dict[Any, list[int]]]:
+    """
+    Per-calendar busy bitmaps for the UTC days overlapping [time_min, time_max).
+
+    Returns (days, {calendar_id: [bitmap per day]}); bit i of a day's bitmap is
+    set when any event overlaps slot i of that day. Only days missing from the
+    cache are computed, with one busy_intervals call for all of them.
+    """
+    calendar_ids = list(calendar_ids)
+    days = []
+    day = _day_start(time_min)
+    while day < time_max:
+        days.append(day)
+        day += timedelta(days=1)
+
+    versions = _versions(calendar_ids)
+    keys = {
+        (cal_id, day): _bitmap_key(cal_id, versions[cal_id], day)
+        for cal_id in calendar_ids
+        for day in days
+    }
+    cached = cache.get_many(list(keys.values()))
+    missing = [pair for pair, key in keys.items() if key not in cached]
+    if missing:
+        fresh = busy_intervals(
+            {cal_id for cal_id, _ in missing},
+            min(day for _, day in missing),
+            max(day for _, day in missing) + timedelta(days=1),
+        )
+        computed = {keys[(cal_id, day)]: _day_bitmap(fresh[cal_id], day) for cal_id, day in missing}
+        cache.set_many(computed, BITMAP_CACHE_TIMEOUT)
+        cached.update(computed)
+
+    return days, {cal_id: [cached[keys[(cal_id, day)]] for day in days] for cal_id in calendar_ids}
+
+
+def busy_slots(calendar_ids, time_min: datetime, time_max: datetime, combined: bool = False) -> dict[str, Any]:
+    """
+    Busy time as one character per SLOT_MINUTES slot ("1" busy, "0" free).
+
+    Slots run from time_min rounded down to a slot boundary up to time_max.
+    With combined=True a "combined" string ORs all calendars together.
+    """
+    days, bitmaps = busy_bitmaps(calendar_ids, time_min, time_max)
+    first_day = days[0]
+    first = (time_min - first_day) // _SLOT
+    last = -((first_day - time_max) // _SLOT)
+
+    def render(day_bitmaps: list[int]) -> str:
+        chars = []
+        for index in range(first, last):
+            day_index, bit = divmod(index, SLOTS_PER_DAY)
+            chars.append("1" if day_bitmaps[day_index] >> bit & 1 else "0")
+        return "".join(chars)
+
+    payload: dict[str, Any] = {
+        "slot_start": first_day + first * _SLOT,
+        "calendars": {cal_id: render(day_bitmaps) for cal_id, day_bitmaps in bitmaps.items()},
+    }
+    if combined:
+        merged = [0] * len(days)
+        for day_bitmaps in bitmaps.values():
+            merged = [a | b for a, b in zip(merged, day_bitmaps)]
+        payload["combined"] = render(merged)
+    return payload
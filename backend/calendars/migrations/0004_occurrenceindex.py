@@ -0,0 +1,184 @@
+# Generated by Django 4.2.23 on 2026-10-16 10:12
+
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dateutil import rrule
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Frozen copies of the settings and recurrence expansion this backfill was
+# written against; calendars.tasks.refresh_occurrence_index rebuilds every
+# series with the live code and configured horizon on its next run.
+PAST_DAYS = 180
+HORIZON_DAYS = 400
+MAX_OCCURRENCES = 2500
+WEEKDAYS = {'MO': 0, 'TU': 1, 'WE': 2, 'TH': 3, 'FR': 4, 'SA': 5, 'SU': 6}
+FREQUENCIES = {'DAILY': rrule.DAILY, 'WEEKLY': rrule.WEEKLY, 'MONTHLY': rrule.MONTHLY, 'YEARLY': rrule.YEARLY}
+
+
+def _aware(value):
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=dt_timezone.utc)
+    return value
+
+
+def _int_list(values, predicate):
+    result = []
+    for value in values or []:
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            continue
+        if predicate(value):
+            result.append(value)
+    return result
+
+
+def _by_weekday(values):
+    result = []
+    for raw in values or []:
+        token = str(raw).strip().upper()
+        weekday = WEEKDAYS.get(token[-2:])
+        ordinal = token[:-2].lstrip('+')
+        try:
+            ordinal = int(ordinal) if ordinal else None
+        except ValueError:
+            continue
+        if weekday is None or (ordinal is not None and not (ordinal != 0 and -53 <= ordinal <= 53)):
+            continue
+        result.append(rrule.weekday(weekday, ordinal))
+    return result
+
+
+def _occurrence_starts(rule, dtstart, duration, tz_name, window_start, window_end):
+    """UTC starts of a series intersecting the window; DTSTART is the first instance (RFC 5545)."""
+    try:
+        tz = ZoneInfo(tz_name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        tz = dt_timezone.utc
+    anchor = dtstart.astimezone(tz).replace(tzinfo=None)
+    until = _aware(rule.until)
+    last = window_end if until is None else min(window_end, until)
+    exdates = set()
+    for raw in rule.exception_dates or []:
+        value = raw if isinstance(raw, datetime) else parse_datetime(str(raw))
+        if value is not None:
+            exdates.add(_aware(value))
+
+    by_weekday = _by_weekday(rule.by_day) or None
+    by_month_day = _int_list(rule.by_month_day, lambda v: v != 0 and -31 <= v <= 31) or None
+    by_month = _int_list(rule.by_month, lambda v: 1 <= v <= 12) or None
+    if by_weekday is None and by_month_day is None:
+        if rule.frequency == 'WEEKLY':
+            by_weekday = [anchor.weekday()]
+        elif rule.frequency == 'MONTHLY':
+            by_month_day = [anchor.day]
+        elif rule.frequency == 'YEARLY':
+            by_month_day = [anchor.day]
+            by_month = by_month or [anchor.month]
+    expansion = rrule.rrule(
+        FREQUENCIES[rule.frequency],
+        dtstart=anchor,
+        interval=max(int(rule.interval or 1), 1),
+        wkst=rrule.MO,
+        byweekday=by_weekday,
+        bymonthday=by_month_day,
+        bymonth=by_month,
+        bysetpos=_int_list(rule.by_set_pos, lambda v: v != 0 and -366 <= v <= 366) or None,
+        until=datetime.combine(last.astimezone(tz).date() + timedelta(days=1), anchor.time()),
+    )
+
+    starts = []
+    emitted = 0
+    for local_start in [anchor] + [value for value in expansion if value > anchor]:
+        start = local_start.replace(tzinfo=tz).astimezone(dt_timezone.utc)
+        if start >= window_end or (until is not None and start > until):
+            break
+        emitted += 1
+        if rule.count and emitted > rule.count:
+            break
+        if start + duration > window_start and start not in exdates:
+            starts.append(start)
+            if len(starts) >= MAX_OCCURRENCES:
+                break
+    return starts
+
+
+def backfill_occurrence_index(apps, schema_editor):
+    Event = apps.get_model('calendars', 'Event')
+    OccurrenceIndex = apps.get_model('calendars', 'OccurrenceIndex')
+    RecurrenceException = apps.get_model('calendars', 'RecurrenceException')
+
+    today = datetime.combine(timezone.now().date(), time.min, tzinfo=dt_timezone.utc)
+    window_start = today - timedelta(days=PAST_DAYS + 1)
+    window_end = today + timedelta(days=HORIZON_DAYS + 7)
+
+    skipped = {}
+    for event_id, exception_date in RecurrenceException.objects.filter(
+        is_deleted=False
+    ).values_list('original_event_id', 'exception_date'):
+        skipped.setdefault(event_id, set()).add(exception_date)
+
+    rows = []
+    for event in Event.objects.select_related('recurrence_rule').filter(is_deleted=False).iterator():
+        if not (event.is_recurring and event.recurrence_rule_id):
+            rows.append(OccurrenceIndex(
+                event_id=event.id,
+                calendar_id=event.calendar_id,
+                occurrence_start=event.start_datetime,
+                occurrence_end=event.end_datetime,
+            ))
+        else:
+            duration = event.end_datetime - event.start_datetime
+            for start in _occurrence_starts(
+                event.recurrence_rule,
+                event.start_datetime,
+                duration,
+                event.timezone,
+                window_start,
+                window_end,
+            ):
+                if start in skipped.get(event.id, ()):
+                    continue
+                rows.append(OccurrenceIndex(
+                    event_id=event.id,
+                    calendar_id=event.calendar_id,
+                    occurrence_start=start,
+                    occurrence_end=start + duration,
+                ))
+        if len(rows) >= 1000:
+            OccurrenceIndex.objects.bulk_create(rows)
+            rows = []
+    OccurrenceIndex.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendars', '0003_calendarevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccurrenceIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('occurrence_start', models.DateTimeField()),
+                ('occurrence_end', models.DateTimeField()),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrence_index', to='calendars.calendar')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrence_index', to='calendars.event')),
+            ],
+            options={
+                'ordering': ['occurrence_start'],
+                'indexes': [models.Index(fields=['calendar', 'occurrence_start', 'occurrence_end'], name='calendars_o_calenda_725d37_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='occurrenceindex',
+            constraint=models.UniqueConstraint(fields=('event', 'occurrence_start'), name='unique_occurrence_per_event'),
+        ),
+        migrations.RunPython(backfill_occurrence_index, migrations.RunPython.noop),
+    ]
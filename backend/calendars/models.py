@@ -715,6 +715,38 @@ class RecurrenceException(TimeStampedModel):
         super().save(*args, **kwargs)
 
 
+# -----------------------------
+# Occurrence Index
+# -----------------------------
+class OccurrenceIndex(models.Model):
+    """
+    Materialized instance of an event, for range scans by calendar views and free/busy.
+
+    One-off events have a single row; recurring masters have one row per
+    occurrence inside the rolling horizon (see calendars.occurrence_index).
+    Cancelled and modified instances have no row of their own under the
+    master: a modified instance is indexed as its one-off event.
+    """
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="occurrence_index")
+    calendar = models.ForeignKey(Calendar, on_delete=models.CASCADE, related_name="occurrence_index")
+
+    occurrence_start = models.DateTimeField()
+    occurrence_end = models.DateTimeField()
+
+    class Meta:
+        ordering = ["occurrence_start"]
+        indexes = [
+            models.Index(fields=["calendar", "occurrence_start", "occurrence_end"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["event", "occurrence_start"], name="unique_occurrence_per_event"),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} @ {self.occurrence_start.isoformat()}"
+
+
 # -----------------------------
 # Attendees
 # -----------------------------
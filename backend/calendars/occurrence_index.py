@@ -0,0 +1,233 @@
+"""
+Materialized occurrence index (OccurrenceIndex) maintenance and reads.
+
+Every non-deleted event contributes rows: one for a one-off event, one per
+generated instance for a recurring master within the rolling horizon of
+CALENDAR_OCCURRENCE_PAST_DAYS back and CALENDAR_OCCURRENCE_HORIZON_DAYS ahead.
+Rows are rebuilt per event from signals on Event, RecurrenceRule and
+RecurrenceException writes; the refresh_occurrence_index beat task rolls the
+horizon forward and repairs anything written around the ORM.
+
+Windows that fall outside the horizon are expanded from the master rows
+instead (see instances_in_window).
+"""
+from __future__ import annotations
+
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Event, OccurrenceIndex, RecurrenceException
+from .recurrence import MAX_OCCURRENCES, EventOccurrence, RuleSpec, expand_events, iter_occurrences
+
+# Extra days materialized past the served horizon, so a missed beat run does
+# not leave the end of the horizon empty
+HORIZON_SLACK_DAYS = 7
+
+REFRESH_BATCH_SIZE = 200
+
+
+def indexed_window(now: datetime | None = None) -> tuple[datetime, datetime]:
+    """Span of time the index is guaranteed to cover for every series."""
+    today = datetime.combine((now or timezone.now()).date(), time.min, tzinfo=dt_timezone.utc)
+    return (
+        today - timedelta(days=settings.CALENDAR_OCCURRENCE_PAST_DAYS),
+        today + timedelta(days=settings.CALENDAR_OCCURRENCE_HORIZON_DAYS),
+    )
+
+
+def _build_window(now: datetime | None = None) -> tuple[datetime, datetime]:
+    start, end = indexed_window(now)
+    return start - timedelta(days=1), end + timedelta(days=HORIZON_SLACK_DAYS)
+
+
+def _occurrence_rows(event: Event, window: tuple[datetime, datetime], skipped: set[datetime]) -> list[OccurrenceIndex]:
+    if event.is_deleted:
+        return []
+    if not (event.is_recurring and event.recurrence_rule_id):
+        return [
+            OccurrenceIndex(
+                event=event,
+                calendar_id=event.calendar_id,
+                occurrence_start=event.start_datetime,
+                occurrence_end=event.end_datetime,
+            )
+        ]
+
+    duration = event.end_datetime - event.start_datetime
+    rows = []
+    for start in iter_occurrences(
+        RuleSpec.from_rule(event.recurrence_rule),
+        event.start_datetime,
+        duration,
+        window[0],
+        window[1],
+        event.timezone,
+    ):
+        if start in skipped:
+            continue
+        rows.append(
+            OccurrenceIndex(
+                event=event,
+                calendar_id=event.calendar_id,
+                occurrence_start=start,
+                occurrence_end=start + duration,
+            )
+        )
+        if len(rows) >= MAX_OCCURRENCES:
+            break
+    return rows
+
+
+def _exception_dates(event_ids: Iterable[Any], window: tuple[datetime, datetime]) -> dict[Any, set[datetime]]:
+    """Instance starts that are cancelled or replaced by a modified event, per master."""
+    result: dict[Any, set[datetime]] = {}
+    for event_id, exception_date in RecurrenceException.objects.filter(
+        original_event_id__in=list(event_ids),
+        is_deleted=False,
+        exception_date__gte=window[0] - timedelta(days=1),
+        exception_date__lt=window[1],
+    ).values_list("original_event_id", "exception_date"):
+        result.setdefault(event_id, set()).add(exception_date)
+    return result
+
+
+def sync_events(events: Iterable[Event], now: datetime | None = None) -> int:
+    """
+    Rebuild the index rows of the given events. Returns the number of rows written.
+    """
+    events = list(events)
+    if not events:
+        return 0
+    window = _build_window(now)
+    masters = [ev.id for ev in events if ev.is_recurring and ev.recurrence_rule_id]
+    skipped = _exception_dates(masters, window) if masters else {}
+
+    rows: list[OccurrenceIndex] = []
+    for event in events:
+        rows.extend(_occurrence_rows(event, window, skipped.get(event.id, set())))
+
+    from .freebusy import invalidate_busy_bitmaps  # Local import to avoid circulars
+
+    event_ids = [ev.id for ev in events]
+    with transaction.atomic():
+        # Old rows may sit under another calendar when an event was moved
+        touched = set(
+            OccurrenceIndex.objects.filter(event_id__in=event_ids).values_list("calendar_id", flat=True).distinct()
+        )
+        OccurrenceIndex.objects.filter(event_id__in=event_ids).delete()
+        OccurrenceIndex.objects.bulk_create(rows, batch_size=1000)
+    invalidate_busy_bitmaps(touched | {ev.calendar_id for ev in events})
+    return len(rows)
+
+
+def sync_event_ids(event_ids: Iterable[Any], now: datetime | None = None) -> int:
+    """Rebuild the index rows of the events with the given ids (missing ids are ignored)."""
+    event_ids = list(event_ids)
+    if not event_ids:
+        return 0
+    events = Event.objects.select_related("recurrence_rule").filter(id__in=event_ids)
+    return sync_events(events, now=now)
+
+
+def refresh_occurrence_index(now: datetime | None = None) -> dict[str, int]:
+    """
+    Roll the horizon forward for every recurring master and backfill any
+    one-off event that has no row.
+
+    Rebuilding a master also drops its rows that have fallen behind the
+    horizon, so the table size stays proportional to the horizon.
+    """
+    masters = (
+        Event.objects.select_related("recurrence_rule")
+        .filter(is_deleted=False, is_recurring=True, recurrence_rule__isnull=False)
+        .order_by("id")
+    )
+    missing = (
+        Event.objects.select_related("recurrence_rule")
+        .filter(is_deleted=False, occurrence_index__isnull=True)
+        .exclude(is_recurring=True, recurrence_rule__isnull=False)
+        .order_by("id")
+    )
+
+    stats = {"series": 0, "backfilled": 0, "rows": 0}
+    for key, queryset in (("series", masters), ("backfilled", missing)):
+        batch: list[Event] = []
+        for event in queryset.iterator(chunk_size=REFRESH_BATCH_SIZE):
+            batch.append(event)
+            if len(batch) >= REFRESH_BATCH_SIZE:
+                stats["rows"] += sync_events(batch, now=now)
+                stats[key] += len(batch)
+                batch = []
+        if batch:
+            stats["rows"] += sync_events(batch, now=now)
+            stats[key] += len(batch)
+
+    # Rows of deleted events written around the ORM (queryset.update) are not
+    # caught by signals
+    stale = OccurrenceIndex.objects.filter(event__is_deleted=True)
+    touched = set(stale.values_list("calendar_id", flat=True).distinct())
+    if touched:
+        from .freebusy import invalidate_busy_bitmaps  # Local import to avoid circulars
+
+        stale.delete()
+        invalidate_busy_bitmaps(touched)
+    return stats
+
+
+def instances_in_window(calendars, time_min: datetime, time_max: datetime) -> list[Any]:
+    """
+    Event instances of the given calendars that intersect [time_min, time_max).
+
+    Inside the indexed window this is one range scan on OccurrenceIndex plus a
+    primary-key fetch of the events involved; outside it, masters are loaded
+    and expanded on the fly.
+    """
+    indexed_min, indexed_max = indexed_window()
+    if time_min < indexed_min or time_max > indexed_max:
+        events_qs = (
+            Event.objects.select_related("calendar", "created_by", "recurrence_rule")
+            .filter(calendar__in=calendars, is_deleted=False, start_datetime__lt=time_max)
+            .filter(window_filter(time_min))
+        )
+        return expand_events(events_qs, time_min, time_max)
+
+    rows = list(
+        OccurrenceIndex.objects.filter(
+            calendar__in=calendars,
+            occurrence_start__lt=time_max,
+            occurrence_end__gt=time_min,
+        )
+        .order_by("occurrence_start", "event_id")
+        .values_list("event_id", "occurrence_start")
+    )
+    events = (
+        Event.objects.select_related("calendar", "created_by", "recurrence_rule")
+        .filter(is_deleted=False)
+        .in_bulk({event_id for event_id, _ in rows})
+    )
+
+    instances: list[Any] = []
+    for event_id, start in rows:
+        event = events.get(event_id)
+        if event is None:
+            continue
+        if event.is_recurring and event.recurrence_rule_id:
+            instances.append(EventOccurrence(event, start))
+        else:
+            instances.append(event)
+    return instances
+
+
+def window_filter(start_dt: datetime):
+    """
+    Events that may intersect a window starting at start_dt (combine with start_datetime__lt=end).
+
+    Recurring masters that began before the window still produce occurrences
+    inside it, so only one-off events are cut by their own end time.
+    """
+    return Q(end_datetime__gt=start_dt) | Q(is_recurring=True, recurrence_rule__isnull=False)
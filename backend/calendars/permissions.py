@@ -3,6 +3,9 @@ from __future__ import annotations
 from typing import Any
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
 from rest_framework import permissions
 
 from core.models import Organization, ProjectMember
@@ -64,6 +67,104 @@ def get_user_organization(user: User) -> Organization | None:
     return Organization.objects.filter(id=org_id).first()
 
 
+# Safety net only: writes that change access invalidate explicitly, but a
+# queryset update() made outside this app sends no signal
+ACCESSIBLE_CALENDARS_CACHE_TIMEOUT = 60
+
+
+def _accessible_cache_key(user_id) -> str:
+    return f"calendars:accessible:{user_id}"
+
+
+def _accessible_calendars_queryset(user: User, organization_id):
+    project_ids = ProjectMember.objects.filter(
+        user=user,
+        is_active=True,
+    ).values_list("project_id", flat=True)
+    access = Q(project_id__in=project_ids)
+
+    if organization_id:
+        shared_ids = CalendarShare.objects.filter(
+            organization_id=organization_id,
+            shared_with=user,
+            is_deleted=False,
+        ).values_list("calendar_id", flat=True)
+        subscribed_ids = CalendarSubscription.objects.filter(
+            organization_id=organization_id,
+            user=user,
+            is_deleted=False,
+            calendar__isnull=False,
+            is_hidden=False,
+        ).values_list("calendar_id", flat=True)
+        access |= Q(organization_id=organization_id) & (
+            Q(owner=user) | Q(pk__in=shared_ids) | Q(pk__in=subscribed_ids)
+        )
+
+    return Calendar.objects.filter(access, is_deleted=False)
+
+
+def accessible_calendar_entries(user: User) -> list[tuple[Any, int | None]]:
+    """
+    (calendar_id, project_id) of every calendar the user can see.
+
+    Owned, shared and subscribed (not hidden) calendars of the user's
+    organization, plus calendars of projects the user is an active member of.
+    Cached per user; see invalidate_accessible_calendars and
+    invalidate_calendar_audience.
+    """
+    organization_id = getattr(user, "organization_id", None)
+    key = _accessible_cache_key(user.pk)
+    cached = cache.get(key)
+    if cached is not None and cached["organization_id"] == organization_id:
+        entries = cached["entries"]
+    else:
+        entries = list(_accessible_calendars_queryset(user, organization_id).values_list("id", "project_id"))
+        cache.set(
+            key,
+            {"organization_id": organization_id, "entries": entries},
+            ACCESSIBLE_CALENDARS_CACHE_TIMEOUT,
+        )
+    return entries
+
+
+def invalidate_accessible_calendars(user_ids) -> None:
+    """
+    Drop cached accessible calendars of the given users, now and again once
+    the transaction commits so a read racing the write cannot re-cache the
+    old state.
+    """
+    keys = [_accessible_cache_key(user_id) for user_id in set(user_ids) if user_id]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_calendar_audience(calendar_ids=(), project_ids=(), user_ids=()) -> None:
+    """
+    Invalidate every user who may have the given calendars cached: owners,
+    share recipients, subscribers and members of the calendars' projects (and
+    of project_ids), plus user_ids.
+    """
+    calendar_ids = [calendar_id for calendar_id in calendar_ids if calendar_id]
+    project_ids = {project_id for project_id in project_ids if project_id}
+    affected = set(user_ids)
+    if calendar_ids:
+        for owner_id, project_id in Calendar.objects.filter(pk__in=calendar_ids).values_list("owner_id", "project_id"):
+            affected.add(owner_id)
+            project_ids.add(project_id)
+        affected.update(
+            CalendarShare.objects.filter(calendar_id__in=calendar_ids).values_list("shared_with_id", flat=True)
+        )
+        affected.update(
+            CalendarSubscription.objects.filter(calendar_id__in=calendar_ids).values_list("user_id", flat=True)
+        )
+    project_ids.discard(None)
+    if project_ids:
+        affected.update(ProjectMember.objects.filter(project_id__in=project_ids).values_list("user_id", flat=True))
+    invalidate_accessible_calendars(affected)
+
+
 class IsAuthenticatedInOrganization(permissions.BasePermission):
     """
     Ensures the user is authenticated and belongs to an organization.
@@ -0,0 +1,353 @@
+"""
+RFC 5545 recurrence expansion for RecurrenceRule, on top of dateutil.rrule.
+
+Supports FREQ=DAILY/WEEKLY/MONTHLY/YEARLY with INTERVAL, BYDAY (including
+ordinals such as "1MO" or "-1FR" for MONTHLY/YEARLY), BYMONTHDAY (negative
+values count from month end), BYMONTH, BYSETPOS, COUNT, UNTIL and the rule's
+exception_dates (EXDATE). Week starts on Monday (WKST=MO). As in RFC 5545,
+DTSTART is always the first occurrence and counts towards COUNT, even when it
+does not match the rule.
+
+Occurrences keep the master event's wall-clock time in its timezone, so a 09:00
+standup stays at 09:00 across DST changes: the rule is expanded in naive local
+time and each instance is localized afterwards. Without COUNT, expansion jumps
+straight to the period containing the window start instead of stepping from
+the master start.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Any, Iterator
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dateutil import rrule as du_rrule
+from django.core.cache import cache
+from django.utils.dateparse import parse_datetime
+
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+
+FREQUENCIES = {
+    "DAILY": du_rrule.DAILY,
+    "WEEKLY": du_rrule.WEEKLY,
+    "MONTHLY": du_rrule.MONTHLY,
+    "YEARLY": du_rrule.YEARLY,
+}
+
+# Upper bound on occurrences returned for one series and window
+MAX_OCCURRENCES = 2500
+
+OCCURRENCE_CACHE_TIMEOUT = 60 * 60
+
+
+@dataclass(frozen=True)
+class RuleSpec:
+    """Normalized, hashable view of a RecurrenceRule."""
+
+    frequency: str
+    interval: int = 1
+    by_day: tuple[tuple[int | None, int], ...] = ()
+    by_month_day: tuple[int, ...] = ()
+    by_month: tuple[int, ...] = ()
+    by_set_pos: tuple[int, ...] = ()
+    count: int | None = None
+    until: datetime | None = None
+    exdates: frozenset[datetime] = frozenset()
+
+    @classmethod
+    def from_rule(cls, rule) -> "RuleSpec":
+        return cls(
+            frequency=rule.frequency,
+            interval=max(int(rule.interval or 1), 1),
+            by_day=tuple(_parse_by_day(rule.by_day)),
+            by_month_day=tuple(_int_list(rule.by_month_day, lambda v: v != 0 and -31 <= v <= 31)),
+            by_month=tuple(_int_list(rule.by_month, lambda v: 1 <= v <= 12)),
+            by_set_pos=tuple(_int_list(rule.by_set_pos, lambda v: v != 0 and -366 <= v <= 366)),
+            count=rule.count or None,
+            until=_aware(rule.until),
+            exdates=frozenset(_parse_exdates(rule.exception_dates)),
+        )
+
+
+def _aware(value: datetime | None) -> datetime | None:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=dt_timezone.utc)
+    return value
+
+
+def _int_list(values, predicate) -> list[int]:
+    result = []
+    for value in values or []:
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            continue
+        if predicate(value):
+            result.append(value)
+    return result
+
+
+def _parse_by_day(values) -> list[tuple[int | None, int]]:
+    """'MO' -> (None, 0); '2TU' -> (2, 1); '-1FR' -> (-1, 4). Invalid tokens are skipped."""
+    result = []
+    for raw in values or []:
+        token = str(raw).strip().upper()
+        weekday = WEEKDAYS.get(token[-2:])
+        if weekday is None:
+            continue
+        ordinal = token[:-2].lstrip("+")
+        try:
+            ordinal = int(ordinal) if ordinal else None
+        except ValueError:
+            continue
+        if ordinal is not None and not (ordinal != 0 and -53 <= ordinal <= 53):
+            continue
+        result.append((ordinal, weekday))
+    return result
+
+
+def _parse_exdates(values) -> Iterator[datetime]:
+    for raw in values or []:
+        value = raw if isinstance(raw, datetime) else parse_datetime(str(raw))
+        if value is not None:
+            yield _aware(value)
+
+
+def _resolve_zone(name: str | None):
+    try:
+        return ZoneInfo(name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        return dt_timezone.utc
+
+
+# -----------------------------
+# Periods
+# -----------------------------
+def _period_ordinal(frequency: str, d: date) -> int:
+    if frequency == "DAILY":
+        return d.toordinal()
+    if frequency == "WEEKLY":
+        # date.fromordinal(1) is a Monday, so this numbers Monday-based weeks
+        return (d.toordinal() - 1) // 7
+    if frequency == "MONTHLY":
+        return d.year * 12 + d.month - 1
+    return d.year
+
+
+def _period_first_day(frequency: str, ordinal: int) -> date:
+    if frequency == "DAILY":
+        return date.fromordinal(ordinal)
+    if frequency == "WEEKLY":
+        return date.fromordinal(ordinal * 7 + 1)
+    if frequency == "MONTHLY":
+        year, month = divmod(ordinal, 12)
+        return date(year, month + 1, 1)
+    return date(ordinal, 1, 1)
+
+
+def _build_rrule(spec: RuleSpec, anchor: datetime, rule_start: datetime) -> du_rrule.rrule:
+    """
+    dateutil rule for ``spec`` expanded from ``rule_start`` (naive local time).
+
+    The parts dateutil would otherwise default from DTSTART (weekday, month day,
+    month) are taken from ``anchor``, the master's real start, so the expansion
+    may begin at a later period boundary without changing the series.
+    """
+    by_weekday = [
+        du_rrule.weekday(weekday, ordinal) for ordinal, weekday in spec.by_day
+    ] or None
+    by_month_day = list(spec.by_month_day) or None
+    by_month = list(spec.by_month) or None
+    if by_weekday is None and by_month_day is None:
+        if spec.frequency == "WEEKLY":
+            by_weekday = [anchor.weekday()]
+        elif spec.frequency == "MONTHLY":
+            by_month_day = [anchor.day]
+        elif spec.frequency == "YEARLY":
+            by_month_day = [anchor.day]
+            by_month = by_month or [anchor.month]
+    return du_rrule.rrule(
+        FREQUENCIES[spec.frequency],
+        dtstart=rule_start,
+        interval=spec.interval,
+        wkst=du_rrule.MO,
+        byweekday=by_weekday,
+        bymonthday=by_month_day,
+        bymonth=by_month,
+        bysetpos=list(spec.by_set_pos) or None,
+        byhour=anchor.hour,
+        byminute=anchor.minute,
+        bysecond=anchor.second,
+    )
+
+
+def _local_starts(spec: RuleSpec, anchor: datetime, rule_start: datetime) -> Iterator[datetime]:
+    """Naive local occurrence starts from rule_start on; the anchor (DTSTART) comes first."""
+    if rule_start == anchor:
+        yield anchor
+    for start in _build_rrule(spec, anchor, rule_start):
+        start = start.replace(microsecond=anchor.microsecond)
+        if start > anchor:
+            yield start
+
+
+# -----------------------------
+# Expansion
+# -----------------------------
+def iter_occurrences(
+    spec: RuleSpec,
+    dtstart: datetime,
+    duration: timedelta,
+    time_min: datetime,
+    time_max: datetime,
+    tz_name: str | None = "UTC",
+) -> Iterator[datetime]:
+    """
+    Yield occurrence starts (UTC) of a series whose span intersects [time_min, time_max).
+
+    Args:
+        spec: Normalized rule
+        dtstart: Master event start (aware)
+        duration: Master event duration
+        time_min, time_max: Window bounds (aware)
+        tz_name: IANA timezone the series' wall-clock time is anchored to
+    """
+    tz = _resolve_zone(tz_name)
+    anchor = dtstart.astimezone(tz).replace(tzinfo=None)
+
+    rule_start = anchor
+    if spec.count is None:
+        # COUNT needs every earlier occurrence; otherwise skip whole periods up front
+        base = _period_ordinal(spec.frequency, anchor.date())
+        earliest = (time_min - duration).astimezone(tz).date() - timedelta(days=1)
+        target = _period_ordinal(spec.frequency, earliest)
+        if target > base:
+            ordinal = base + (target - base) // spec.interval * spec.interval
+            rule_start = datetime.combine(_period_first_day(spec.frequency, ordinal), anchor.time())
+
+    emitted = 0
+    for local_start in _local_starts(spec, anchor, rule_start):
+        start = local_start.replace(tzinfo=tz).astimezone(dt_timezone.utc)
+        if start >= time_max or (spec.until is not None and start > spec.until):
+            return
+        emitted += 1
+        if spec.count is not None and emitted > spec.count:
+            return
+        if start + duration > time_min and start not in spec.exdates:
+            yield start
+
+
+def _occurrence_cache_key(event, rule, time_min: datetime, time_max: datetime) -> str:
+    # updated_at on both rows changes on every save, so edits to the rule or
+    # the master's times land on a new key without explicit invalidation
+    return "calendars:occurrences:{}:{}:{}:{}:{}:{}".format(
+        event.id,
+        event.updated_at.timestamp() if event.updated_at else 0,
+        rule.id,
+        rule.updated_at.timestamp() if rule.updated_at else 0,
+        int(time_min.timestamp()),
+        int(time_max.timestamp()),
+    )
+
+
+def occurrence_starts(event, time_min: datetime, time_max: datetime) -> list[datetime]:
+    """
+    Memoized occurrence starts of a recurring master event within a window.
+
+    The list depends only on the rule and the master's start, duration and
+    timezone; RecurrenceException rows are applied by the caller on every read.
+    """
+    rule = event.recurrence_rule
+    key = _occurrence_cache_key(event, rule, time_min, time_max)
+    starts = cache.get(key)
+    if starts is None:
+        starts = []
+        for start in iter_occurrences(
+            RuleSpec.from_rule(rule),
+            event.start_datetime,
+            event.end_datetime - event.start_datetime,
+            time_min,
+            time_max,
+            event.timezone,
+        ):
+            starts.append(start)
+            if len(starts) >= MAX_OCCURRENCES:
+                break
+        cache.set(key, starts, OCCURRENCE_CACHE_TIMEOUT)
+    return starts
+
+
+class EventOccurrence:
+    """
+    One generated instance of a recurring event.
+
+    Reads through to the master event; only the times differ. original_start
+    identifies the instance (it is what modify/cancel take).
+    """
+
+    def __init__(self, master, start: datetime):
+        self._master = master
+        self.start_datetime = start
+        self.end_datetime = start + (master.end_datetime - master.start_datetime)
+        self.original_start = start
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "_master":
+            raise AttributeError(name)
+        return getattr(self._master, name)
+
+
+def expand_events(events, time_min: datetime, time_max: datetime, max_results: int | None = None) -> list[Any]:
+    """
+    Replace recurring masters with their instances in [time_min, time_max).
+
+    Non-recurring events pass through unchanged. Exceptions for all masters are
+    loaded in one query: cancelled instances are dropped and modified ones are
+    replaced by their modified_event, unless that one-off event is already in
+    ``events`` (range queries over a calendar pick it up on their own).
+
+    Args:
+        events: Iterable of Event rows (recurrence_rule should be select_related)
+        time_min, time_max: Window bounds (aware)
+        max_results: Optional cap on instances per recurring master
+    """
+    from .models import RecurrenceException
+
+    events = list(events)
+    masters = [ev for ev in events if ev.is_recurring and ev.recurrence_rule_id]
+    exceptions: dict[Any, dict[datetime, Any]] = {}
+    if masters:
+        longest = max(ev.end_datetime - ev.start_datetime for ev in masters)
+        for exc in RecurrenceException.objects.filter(
+            original_event_id__in=[ev.id for ev in masters],
+            is_deleted=False,
+            exception_date__gt=time_min - longest,
+            exception_date__lt=time_max,
+        ).select_related("modified_event"):
+            exceptions.setdefault(exc.original_event_id, {})[exc.exception_date] = exc
+
+    seen = {ev.id for ev in events}
+    limit = min(max_results or MAX_OCCURRENCES, MAX_OCCURRENCES)
+    instances: list[Any] = []
+    for ev in events:
+        if not (ev.is_recurring and ev.recurrence_rule_id):
+            instances.append(ev)
+            continue
+        overrides = exceptions.get(ev.id, {})
+        for start in occurrence_starts(ev, time_min, time_max)[:limit]:
+            exc = overrides.get(start)
+            if exc is None:
+                instances.append(EventOccurrence(ev, start))
+                continue
+            modified = exc.modified_event
+            if (
+                exc.is_cancelled
+                or modified is None
+                or modified.is_deleted
+                or modified.id in seen
+                or not (modified.start_datetime < time_max and modified.end_datetime > time_min)
+            ):
+                continue
+            seen.add(modified.id)
+            instances.append(modified)
+    return instances
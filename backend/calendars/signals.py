@@ -1,10 +1,22 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 
+from core.models import ProjectMember
 from decision.models import Decision
 from task.models import Task
-from .models import CalendarEvent
+from .models import (
+    Calendar,
+    CalendarEvent,
+    CalendarShare,
+    CalendarSubscription,
+    Event,
+    RecurrenceException,
+    RecurrenceRule,
+)
+from .occurrence_index import sync_event_ids, sync_events
+from .permissions import invalidate_accessible_calendars, invalidate_calendar_audience
 
 
 @receiver(post_save, sender=Decision)
@@ -71,4 +83,100 @@ def generate_calendar_events_for_task(sender, instance, created, **kwargs):
                 'title': f"Task: {instance.summary}",
                 'start_time': start_time,
             }
-        )
\ No newline at end of file
+        )
+
+
+# ---------------------------------------------------------------------------
+# Occurrence index maintenance
+# ---------------------------------------------------------------------------
+# Saves rebuild the affected rows in the same transaction. Deletes defer to
+# on_commit: during a cascade the master may be about to go as well, and
+# writing rows for it would violate the foreign key.
+
+@receiver(post_save, sender=Event)
+def sync_occurrences_for_event(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    sync_events([instance])
+
+
+@receiver(post_save, sender=RecurrenceRule)
+def sync_occurrences_for_rule(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    sync_events(instance.events.select_related('recurrence_rule'))
+
+
+@receiver(pre_delete, sender=RecurrenceRule)
+def remember_events_for_rule(sender, instance, **kwargs):
+    # events.recurrence_rule is SET_NULL by a queryset update, which sends no signal
+    instance._occurrence_event_ids = list(instance.events.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=RecurrenceRule)
+def sync_occurrences_after_rule_delete(sender, instance, **kwargs):
+    event_ids = getattr(instance, '_occurrence_event_ids', [])
+    if event_ids:
+        transaction.on_commit(lambda: sync_event_ids(event_ids))
+
+
+@receiver(post_save, sender=RecurrenceException)
+def sync_occurrences_for_exception(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    sync_event_ids([instance.original_event_id])
+
+
+@receiver(post_delete, sender=RecurrenceException)
+def sync_occurrences_after_exception_delete(sender, instance, **kwargs):
+    event_id = instance.original_event_id
+    transaction.on_commit(lambda: sync_event_ids([event_id]))
+
+
+# ---------------------------------------------------------------------------
+# Accessible-calendar cache invalidation
+# ---------------------------------------------------------------------------
+
+@receiver(pre_save, sender=Calendar)
+def remember_calendar_audience(sender, instance, raw=False, **kwargs):
+    # Users who lose access through an owner or project change are only
+    # reachable through the previous values
+    instance._access_previous = None
+    if raw or not instance.pk:
+        return
+    instance._access_previous = (
+        Calendar.objects.filter(pk=instance.pk).values_list("owner_id", "project_id").first()
+    )
+
+
+@receiver(post_save, sender=Calendar)
+def invalidate_access_for_calendar(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous_owner_id, previous_project_id = getattr(instance, "_access_previous", None) or (None, None)
+    invalidate_calendar_audience(
+        calendar_ids=[instance.pk],
+        project_ids=[previous_project_id],
+        user_ids=[previous_owner_id],
+    )
+
+
+@receiver(post_delete, sender=Calendar)
+def invalidate_access_for_deleted_calendar(sender, instance, **kwargs):
+    # Shares and subscriptions are cascaded and invalidate their own users
+    invalidate_calendar_audience(project_ids=[instance.project_id], user_ids=[instance.owner_id])
+
+
+@receiver([post_save, post_delete], sender=CalendarShare)
+def invalidate_access_for_share(sender, instance, **kwargs):
+    invalidate_accessible_calendars([instance.shared_with_id])
+
+
+@receiver([post_save, post_delete], sender=CalendarSubscription)
+def invalidate_access_for_subscription(sender, instance, **kwargs):
+    invalidate_accessible_calendars([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=ProjectMember)
+def invalidate_access_for_project_member(sender, instance, **kwargs):
+    invalidate_accessible_calendars([instance.user_id])
@@ -0,0 +1,27 @@
+import logging
+
+from celery import shared_task
+
+from .occurrence_index import refresh_occurrence_index as _refresh_occurrence_index
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_occurrence_index():
+    """
+    Celery periodic task to roll the occurrence index horizon forward.
+
+    Edits keep the index current through signals; this extends every recurring
+    series to the new end of the horizon and backfills events that have no rows.
+    """
+    try:
+        stats = _refresh_occurrence_index()
+        logger.info(
+            f"Refreshed occurrence index: {stats['series']} series, "
+            f"{stats['backfilled']} backfilled events, {stats['rows']} rows"
+        )
+        return stats
+    except Exception as e:
+        logger.error(f"Error refreshing occurrence index: {e}")
+        raise
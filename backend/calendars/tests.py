@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
 
 from django.contrib.auth import get_user_model, models as auth_models
 from django.core.exceptions import ValidationError
@@ -9,6 +10,7 @@ from rest_framework import status
 from rest_framework.test import APIRequestFactory, force_authenticate
 
 from core.models import Organization, Project, ProjectMember
+from core.utils.project_calendars import soft_delete_project_calendars
 from calendars.models import (
     Calendar,
     CalendarShare,
@@ -16,6 +18,7 @@ from calendars.models import (
     Event,
     RecurrenceRule,
     RecurrenceException,
+    OccurrenceIndex,
     EventAttendee,
     EventReminder,
     EventCategory,
@@ -44,6 +47,8 @@ from calendars.views import (
     FreeBusyView,
     EventReminderListCreateView,
 )
+from calendars.occurrence_index import refresh_occurrence_index
+from calendars.recurrence import expand_events
 from calendars.exceptions import (
     calendar_error_response,
     _build_details_from_errors,
@@ -54,6 +59,7 @@ from calendars.permissions import (
     CalendarAccessPermission,
     EventAccessPermission,
     SubscriptionOwnerPermission,
+    accessible_calendar_entries,
 )
 
 
@@ -809,6 +815,220 @@ class RecurringEventAPITests(CalendarTestBase):
         self.assertEqual(resp_cancel.status_code, status.HTTP_204_NO_CONTENT)
 
 
+class RecurrenceExpansionTests(CalendarTestBase):
+    def _create_series(self, start, **rule_fields) -> Event:
+        rule = RecurrenceRule.objects.create(organization=self.organization, **rule_fields)
+        return Event.objects.create(
+            organization=self.organization,
+            calendar=self.calendar,
+            created_by=self.user,
+            title="Series",
+            start_datetime=start,
+            end_datetime=start + timedelta(hours=1),
+            timezone="UTC",
+            is_recurring=True,
+            recurrence_rule=rule,
+        )
+
+    def test_monthly_last_friday(self):
+        event = self._create_series(
+            datetime(2026, 1, 30, 15, 0, tzinfo=dt_timezone.utc),
+            frequency="MONTHLY",
+            by_day=["-1FR"],
+        )
+        instances = expand_events(
+            [event],
+            datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+            datetime(2026, 5, 1, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(
+            [inst.start_datetime.date().isoformat() for inst in instances],
+            ["2026-01-30", "2026-02-27", "2026-03-27", "2026-04-24"],
+        )
+        self.assertEqual(instances[0].title, "Series")
+
+    def test_count_limits_series(self):
+        event = self._create_series(
+            datetime(2026, 1, 1, 9, 0, tzinfo=dt_timezone.utc),
+            frequency="WEEKLY",
+            by_day=["MO", "TH"],
+            count=3,
+        )
+        instances = expand_events(
+            [event],
+            datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+            datetime(2026, 3, 1, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(
+            [inst.start_datetime.day for inst in instances],
+            [1, 5, 8],
+        )
+
+    def test_count_includes_unmatched_dtstart(self):
+        # RFC 5545: DTSTART is the first instance and counts towards COUNT
+        event = self._create_series(
+            datetime(2026, 1, 2, 9, 0, tzinfo=dt_timezone.utc),
+            frequency="WEEKLY",
+            by_day=["MO"],
+            count=3,
+        )
+        instances = expand_events(
+            [event],
+            datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+            datetime(2026, 3, 1, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(
+            [inst.start_datetime.day for inst in instances],
+            [2, 5, 12],
+        )
+
+    def test_monthly_bysetpos_last_weekday_across_dst(self):
+        event = self._create_series(
+            datetime(2026, 1, 30, 9, 0, tzinfo=ZoneInfo("Europe/Berlin")),
+            frequency="MONTHLY",
+            by_day=["MO", "TU", "WE", "TH", "FR"],
+            by_set_pos=[-1],
+        )
+        event.timezone = "Europe/Berlin"
+        event.save()
+        instances = expand_events(
+            [event],
+            datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+            datetime(2026, 5, 1, tzinfo=dt_timezone.utc),
+        )
+        local = [inst.start_datetime.astimezone(ZoneInfo("Europe/Berlin")) for inst in instances]
+        self.assertEqual(
+            [start.date().isoformat() for start in local],
+            ["2026-01-30", "2026-02-27", "2026-03-31", "2026-04-30"],
+        )
+        self.assertEqual({start.hour for start in local}, {9})
+
+    def test_cancelled_instance_is_dropped(self):
+        event = self._create_series(
+            datetime(2026, 1, 1, 9, 0, tzinfo=dt_timezone.utc),
+            frequency="DAILY",
+        )
+        RecurrenceException.objects.create(
+            organization=self.organization,
+            recurrence_rule=event.recurrence_rule,
+            original_event=event,
+            exception_date=datetime(2026, 1, 2, 9, 0, tzinfo=dt_timezone.utc),
+            is_cancelled=True,
+        )
+        instances = expand_events(
+            [event],
+            datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+            datetime(2026, 1, 4, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual([inst.start_datetime.day for inst in instances], [1, 3])
+
+    def test_month_view_includes_series_started_years_ago(self):
+        self._create_series(
+            datetime(2020, 1, 6, 9, 0, tzinfo=dt_timezone.utc),
+            frequency="WEEKLY",
+            by_day=["MO"],
+        )
+        view = MonthView.as_view()
+        request = self.factory.get("/api/v1/views/month/", {"year": "2026", "month": "2"})
+        force_authenticate(request, user=self.user)
+        response = view(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        starts = [e["start_datetime"] for e in response.data["events"] if e.get("title") == "Series"]
+        self.assertEqual(len(starts), 4)
+
+
+class OccurrenceIndexTests(CalendarTestBase):
+    def setUp(self):
+        super().setUp()
+        today = timezone.now().date()
+        self.series_start = datetime(today.year, today.month, today.day, 9, 0, tzinfo=dt_timezone.utc)
+        self.rule = RecurrenceRule.objects.create(
+            organization=self.organization,
+            frequency="DAILY",
+            interval=1,
+            count=5,
+        )
+        self.event = Event.objects.create(
+            organization=self.organization,
+            calendar=self.calendar,
+            created_by=self.user,
+            title="Indexed Series",
+            start_datetime=self.series_start,
+            end_datetime=self.series_start + timedelta(hours=1),
+            timezone="UTC",
+            is_recurring=True,
+            recurrence_rule=self.rule,
+        )
+
+    def _indexed_starts(self):
+        return list(
+            OccurrenceIndex.objects.filter(event=self.event).values_list("occurrence_start", flat=True)
+        )
+
+    def test_series_rows_follow_rule_and_exceptions(self):
+        self.assertEqual(len(self._indexed_starts()), 5)
+
+        second = self.series_start + timedelta(days=1)
+        exc = RecurrenceException.objects.create(
+            organization=self.organization,
+            recurrence_rule=self.rule,
+            original_event=self.event,
+            exception_date=second,
+            is_cancelled=True,
+        )
+        self.assertNotIn(second, self._indexed_starts())
+        self.assertEqual(len(self._indexed_starts()), 4)
+
+        self.rule.interval = 2
+        self.rule.save()
+        self.assertEqual(
+            self._indexed_starts(),
+            [self.series_start + timedelta(days=2 * i) for i in range(5)],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            exc.delete()
+        self.assertEqual(len(self._indexed_starts()), 5)
+
+    def test_soft_deleted_exception_restores_instance(self):
+        second = self.series_start + timedelta(days=1)
+        exc = RecurrenceException.objects.create(
+            organization=self.organization,
+            recurrence_rule=self.rule,
+            original_event=self.event,
+            exception_date=second,
+            is_cancelled=True,
+        )
+        self.assertNotIn(second, self._indexed_starts())
+
+        exc.is_deleted = True
+        exc.save(update_fields=["is_deleted", "updated_at"])
+        self.assertIn(second, self._indexed_starts())
+
+    def test_deleted_event_leaves_index(self):
+        self.event.is_deleted = True
+        self.event.save(update_fields=["is_deleted", "updated_at"])
+        self.assertEqual(self._indexed_starts(), [])
+
+    def test_week_view_reads_index_and_refresh_backfills(self):
+        OccurrenceIndex.objects.all().delete()
+
+        def week_titles():
+            view = WeekView.as_view()
+            request = self.factory.get(
+                "/api/v1/views/week/", {"start_date": self.series_start.date().isoformat()}
+            )
+            force_authenticate(request, user=self.user)
+            response = view(request)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return [e.get("title") for e in response.data["events"]]
+
+        self.assertNotIn("Indexed Series", week_titles())
+
+        refresh_occurrence_index()
+        self.assertEqual(week_titles().count("Indexed Series"), 5)
+
+
 class AttendeeAndRSVPAPITests(CalendarTestBase):
     def setUp(self):
         super().setUp()
@@ -873,6 +1093,94 @@ class AttendeeAndRSVPAPITests(CalendarTestBase):
         self.assertTrue(att.is_deleted)
 
 
+class AccessibleCalendarCacheTests(CalendarTestBase):
+    def _accessible_ids(self, user):
+        return {cal_id for cal_id, _ in accessible_calendar_entries(user)}
+
+    def test_entries_are_cached_until_access_changes(self):
+        self.assertEqual(self._accessible_ids(self.other_user), {self.other_calendar.id})
+        with self.assertNumQueries(0):
+            self._accessible_ids(self.other_user)
+
+        share = CalendarShare.objects.create(
+            organization=self.organization,
+            calendar=self.calendar,
+            shared_with=self.other_user,
+            permission="view_all",
+        )
+        self.assertIn(self.calendar.id, self._accessible_ids(self.other_user))
+
+        share.is_deleted = True
+        share.save()
+        self.assertNotIn(self.calendar.id, self._accessible_ids(self.other_user))
+
+    def test_calendar_and_membership_changes_invalidate(self):
+        project = Project.objects.create(
+            name="Cached Project",
+            organization=self.organization,
+            owner=self.user,
+        )
+        project_calendar = Calendar.objects.create(
+            organization=self.organization,
+            owner=self.user,
+            project=project,
+            name="Project Calendar",
+            timezone="UTC",
+        )
+        self.assertNotIn(project_calendar.id, self._accessible_ids(self.cross_org_user))
+
+        member = ProjectMember.objects.create(
+            user=self.cross_org_user,
+            project=project,
+            role="viewer",
+            is_active=True,
+        )
+        self.assertIn(project_calendar.id, self._accessible_ids(self.cross_org_user))
+
+        project_calendar.is_deleted = True
+        project_calendar.save(update_fields=["is_deleted", "updated_at"])
+        self.assertNotIn(project_calendar.id, self._accessible_ids(self.cross_org_user))
+
+        member.delete()
+        self.assertEqual(self._accessible_ids(self.cross_org_user), set())
+
+    def test_calendar_save_only_invalidates_its_audience(self):
+        self.assertEqual(self._accessible_ids(self.other_user), {self.other_calendar.id})
+
+        self.calendar.name = "Renamed"
+        self.calendar.save()
+        with self.assertNumQueries(0):
+            self._accessible_ids(self.other_user)
+
+        self.other_calendar.owner = self.user
+        self.other_calendar.save()
+        self.assertEqual(self._accessible_ids(self.other_user), set())
+
+    def test_soft_deleting_project_calendars_invalidates_members(self):
+        project = Project.objects.create(
+            name="Doomed Project",
+            organization=self.organization,
+            owner=self.user,
+        )
+        project_calendar = Calendar.objects.create(
+            organization=self.organization,
+            owner=self.user,
+            project=project,
+            name="Project Calendar",
+            timezone="UTC",
+        )
+        ProjectMember.objects.create(
+            user=self.cross_org_user,
+            project=project,
+            role="viewer",
+            is_active=True,
+        )
+        self.assertIn(project_calendar.id, self._accessible_ids(self.cross_org_user))
+
+        soft_delete_project_calendars(project)
+        self.assertNotIn(project_calendar.id, self._accessible_ids(self.cross_org_user))
+
+
 class CalendarShareAPITests(CalendarTestBase):
     def setUp(self):
         super().setUp()
@@ -1023,6 +1331,61 @@ class CalendarViewsAndFreeBusyTests(CalendarTestBase):
         self.assertEqual(bad_fb_resp.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(bad_fb_resp.data.get("error"), "BAD_REQUEST")
 
+    def test_freebusy_combined_and_slots(self):
+        second = Calendar.objects.create(
+            organization=self.organization,
+            owner=self.user,
+            name="Second Calendar",
+            timezone="UTC",
+        )
+        Event.objects.create(
+            organization=self.organization,
+            calendar=second,
+            created_by=self.user,
+            title="Overlap",
+            start_datetime=datetime(2026, 1, 16, 9, 30, tzinfo=dt_timezone.utc),
+            end_datetime=datetime(2026, 1, 16, 10, 30, tzinfo=dt_timezone.utc),
+            timezone="UTC",
+        )
+        payload = {
+            "time_min": "2026-01-16T00:00:00Z",
+            "time_max": "2026-01-17T00:00:00Z",
+            "calendar_ids": [str(self.calendar.id), str(second.id)],
+            "combined": True,
+            "include_slots": True,
+        }
+        request = self.factory.post("/api/v1/freebusy/", payload, format="json")
+        force_authenticate(request, user=self.user)
+        response = FreeBusyView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        own = response.data["calendars"][str(self.calendar.id)]
+        self.assertEqual(own["busy"], [{"start": "2026-01-16T09:00:00Z", "end": "2026-01-16T10:00:00Z"}])
+        self.assertEqual(
+            response.data["combined"]["busy"],
+            [{"start": "2026-01-16T09:00:00Z", "end": "2026-01-16T10:30:00Z"}],
+        )
+
+        self.assertEqual(response.data["slot_minutes"], 15)
+        self.assertEqual(response.data["slot_start"], "2026-01-16T00:00:00Z")
+        self.assertEqual(own["slots"], "0" * 36 + "1" * 4 + "0" * 56)
+        self.assertEqual(response.data["combined"]["slots"], "0" * 36 + "1" * 6 + "0" * 54)
+
+        # Writes to a calendar retire its cached bitmaps
+        Event.objects.create(
+            organization=self.organization,
+            calendar=second,
+            created_by=self.user,
+            title="Late",
+            start_datetime=datetime(2026, 1, 16, 23, 45, tzinfo=dt_timezone.utc),
+            end_datetime=datetime(2026, 1, 17, 0, 15, tzinfo=dt_timezone.utc),
+            timezone="UTC",
+        )
+        request = self.factory.post("/api/v1/freebusy/", payload, format="json")
+        force_authenticate(request, user=self.user)
+        response = FreeBusyView.as_view()(request)
+        self.assertEqual(response.data["calendars"][str(second.id)]["slots"][-1], "1")
+
     def test_day_view_with_many_events_is_responsive(self):
         # Create a larger number of events to simulate "realistic" volume
         for i in range(30):
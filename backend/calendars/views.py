@@ -1,7 +1,5 @@
 from __future__ import annotations
 
-from typing import Any
-from types import SimpleNamespace
 import uuid
 from datetime import datetime, timedelta, date
 
@@ -14,6 +12,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
 from .services import get_calendar_events
+from .freebusy import MAX_SLOT_DAYS, SLOT_MINUTES, busy_intervals, busy_slots, combined_busy
+from .occurrence_index import instances_in_window
+from .recurrence import expand_events
 
 from core.models import ProjectMember
 from .models import (
@@ -30,6 +31,7 @@ from .permissions import (
     CalendarAccessPermission,
     EventAccessPermission,
     SubscriptionOwnerPermission,
+    accessible_calendar_entries,
     get_user_organization,
 )
 from .serializers import (
@@ -367,7 +369,6 @@ class EventViewSet(viewsets.ModelViewSet):
         super().initial(request, *args, **kwargs)
 
     def get_queryset(self):
-        user = self.request.user
         project_id_param = self.request.query_params.get("project_id")
         project_id = None
         if project_id_param:
@@ -376,9 +377,9 @@ class EventViewSet(viewsets.ModelViewSet):
             except (TypeError, ValueError):
                 return Event.objects.none()
 
-        calendars = _get_accessible_calendars(user, project_id=project_id)
+        accessible_ids = _get_accessible_calendar_ids(self.request, project_id=project_id)
         queryset = Event.objects.select_related("calendar", "created_by").filter(
-            calendar__in=calendars,
+            calendar_id__in=accessible_ids,
             is_deleted=False,
         )
 
@@ -494,7 +495,6 @@ class EventSearchView(generics.ListAPIView):
     permission_classes = [IsAuthenticatedInOrganization, EventAccessPermission]
 
     def get_queryset(self):
-        user = self.request.user
         project_id_param = self.request.query_params.get("project_id")
         project_id = None
         if project_id_param:
@@ -503,9 +503,9 @@ class EventSearchView(generics.ListAPIView):
             except (TypeError, ValueError):
                 return Event.objects.none()
 
-        calendars = _get_accessible_calendars(user, project_id=project_id)
+        accessible_ids = _get_accessible_calendar_ids(self.request, project_id=project_id)
         queryset = Event.objects.select_related("calendar", "created_by").filter(
-            calendar__in=calendars,
+            calendar_id__in=accessible_ids,
             is_deleted=False,
         )
 
@@ -552,71 +552,42 @@ def _parse_date(value: str) -> date:
         raise ValueError("Invalid date format, expected YYYY-MM-DD")
 
 
-def _get_accessible_calendars(
-    user,
+def _get_accessible_calendar_ids(
+    request,
     calendar_ids: list[str] | None = None,
     project_id: int | None = None,
-):
-    organization = get_user_organization(user)
-    qs = Calendar.objects.none()
-
-    if organization:
-        owned = Calendar.objects.filter(
-            organization=organization,
-            owner=user,
-            is_deleted=False,
-        )
-        shared_ids = CalendarShare.objects.filter(
-            organization=organization,
-            shared_with=user,
-            is_deleted=False,
-        ).values_list("calendar_id", flat=True)
-        subscribed_ids = CalendarSubscription.objects.filter(
-            organization=organization,
-            user=user,
-            is_deleted=False,
-            calendar__isnull=False,
-            is_hidden=False,
-        ).values_list("calendar_id", flat=True)
-
-        legacy_qs = Calendar.objects.filter(
-            organization=organization,
-            is_deleted=False,
-        ).filter(
-            Q(pk__in=owned.values_list("pk", flat=True))
-            | Q(pk__in=shared_ids)
-            | Q(pk__in=subscribed_ids)
-        )
-        qs = qs | legacy_qs
-
-    project_ids = ProjectMember.objects.filter(
-        user=user,
-        is_active=True,
-    ).values_list("project_id", flat=True)
-    project_qs = Calendar.objects.filter(
-        project_id__in=project_ids,
-        is_deleted=False,
-    )
-    qs = qs | project_qs
+) -> list:
+    """
+    IDs of the calendars request.user can see, optionally narrowed to
+    calendar_ids and/or a project.
 
-    if calendar_ids:
-        qs = qs.filter(id__in=calendar_ids)
-    if project_id is not None:
-        qs = qs.filter(project_id=project_id)
+    The user's calendars are resolved once per request (and cached across
+    requests by accessible_calendar_entries).
+    """
+    entries = getattr(request, "_accessible_calendar_entries", None)
+    if entries is None:
+        entries = accessible_calendar_entries(request.user)
+        request._accessible_calendar_entries = entries
 
-    return qs.distinct()
+    wanted = {str(cid) for cid in calendar_ids} if calendar_ids else None
+    return [
+        cal_id
+        for cal_id, cal_project_id in entries
+        if (wanted is None or str(cal_id) in wanted)
+        and (project_id is None or cal_project_id == project_id)
+    ]
 
 
 def _build_calendar_view_payload(
-    user,
+    request,
     start_dt,
     end_dt,
     calendar_ids: list[str] | None,
     project_id: int | None,
     view_type: str,
 ):
-    calendars = _get_accessible_calendars(user, calendar_ids, project_id=project_id)
-    if not calendars.exists():
+    cal_ids = _get_accessible_calendar_ids(request, calendar_ids, project_id=project_id)
+    if not cal_ids:
         return {
             "view_type": view_type,
             "start_date": start_dt.isoformat().replace("+00:00", "Z"),
@@ -625,22 +596,7 @@ def _build_calendar_view_payload(
             "calendars": [],
         }
 
-    events_qs = (
-        Event.objects.select_related("calendar", "created_by", "recurrence_rule")
-        .filter(
-            calendar__in=calendars,
-            is_deleted=False,
-            start_datetime__lt=end_dt,
-            end_datetime__gt=start_dt,
-        )
-    )
-
-    instances: list[Any] = []
-    for ev in events_qs:
-        if ev.is_recurring and ev.recurrence_rule_id:
-            instances.extend(_expand_recurring_event(ev, start_dt, end_dt))
-        else:
-            instances.append(ev)
+    instances = instances_in_window(cal_ids, start_dt, end_dt)
 
     events_data = EventSerializer(instances, many=True).data
 
@@ -648,7 +604,7 @@ def _build_calendar_view_payload(
     from .models import CalendarEvent
     from .serializers import CalendarEventSerializer
 
-    organization = get_user_organization(user)
+    organization = get_user_organization(request.user)
     derived_qs = CalendarEvent.objects.filter(
         organization=organization,
         start_time__lt=end_dt,
@@ -659,7 +615,7 @@ def _build_calendar_view_payload(
 
     # Combine two types of events
     events_data = list(events_data) + list(derived_data)
-    calendars_data = CalendarSerializer(calendars, many=True).data
+    calendars_data = CalendarSerializer(Calendar.objects.filter(id__in=cal_ids), many=True).data
 
     return {
         "view_type": view_type,
@@ -670,79 +626,6 @@ def _build_calendar_view_payload(
     }
 
 
-def _expand_recurring_event(
-    event: Event,
-    time_min,
-    time_max,
-    max_results: int = 250,
-):
-    """
-    Expand a recurring event into concrete instances within [time_min, time_max).
-    Currently supports simple DAILY and WEEKLY patterns based on start_datetime.
-    """
-    if not event.is_recurring or not event.recurrence_rule_id:
-        return []
-
-    rule = event.recurrence_rule
-    frequency = rule.frequency
-    interval = max(int(rule.interval or 1), 1)
-
-    duration = event.end_datetime - event.start_datetime
-    instances: list[Any] = []
-
-    # Load exceptions for this event/rule within range
-    exceptions = RecurrenceException.objects.filter(
-        organization=event.organization,
-        recurrence_rule=rule,
-        original_event=event,
-        exception_date__gte=time_min,
-        exception_date__lt=time_max,
-    ).select_related("modified_event")
-    exceptions_by_date = {exc.exception_date: exc for exc in exceptions}
-
-    current = event.start_datetime
-
-    # Fast-forward to first occurrence that could intersect [time_min, time_max)
-    if frequency == "DAILY":
-        step = timezone.timedelta(days=interval)
-    elif frequency == "WEEKLY":
-        step = timezone.timedelta(weeks=interval)
-    else:
-        # For now only basic DAILY/WEEKLY patterns are supported in expansion.
-        return []
-
-    while current + duration <= time_max and len(instances) < max_results:
-        # Check intersection with requested window
-        if current < time_max and (current + duration) > time_min:
-            exc = exceptions_by_date.get(current)
-            if exc:
-                if exc.is_cancelled:
-                    # Skip cancelled instance
-                    pass
-                else:
-                    # Use modified event instance
-                    instances.append(exc.modified_event)
-            else:
-                # Create a lightweight instance based on the master event
-                attrs = {}
-                for field in Event._meta.fields:
-                    name = field.name
-                    attrs[name] = getattr(event, name)
-
-                # Override fields specific to this occurrence
-                attrs["id"] = event.id  # master id; original_start differentiates instances
-                attrs["start_datetime"] = current
-                attrs["end_datetime"] = current + duration
-                attrs["original_start"] = current
-
-                instance_obj = SimpleNamespace(**attrs)
-                instances.append(instance_obj)
-
-        current = current + step
-
-    return instances
-
-
 class EventInstancesView(generics.ListAPIView):
     """
     Return expanded instances for a recurring event.
@@ -800,7 +683,9 @@ class EventInstancesView(generics.ListAPIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-        instances = _expand_recurring_event(event, time_min, time_max, max_results)
+        instances = []
+        if event.is_recurring and event.recurrence_rule_id:
+            instances = expand_events([event], time_min, time_max, max_results)
         serializer = self.get_serializer(instances, many=True)
         return Response(serializer.data)
 
@@ -838,7 +723,7 @@ class DayView(generics.GenericAPIView):
         project_id = int(project_id_param) if project_id_param and project_id_param.isdigit() else None
 
         payload = _build_calendar_view_payload(
-            request.user,
+            request,
             start_dt,
             end_dt,
             calendar_ids,
@@ -883,7 +768,7 @@ class WeekView(generics.GenericAPIView):
         project_id = int(project_id_param) if project_id_param and project_id_param.isdigit() else None
 
         payload = _build_calendar_view_payload(
-            request.user,
+            request,
             start_dt,
             end_dt,
             calendar_ids,
@@ -936,7 +821,7 @@ class MonthView(generics.GenericAPIView):
         project_id = int(project_id_param) if project_id_param and project_id_param.isdigit() else None
 
         payload = _build_calendar_view_payload(
-            request.user,
+            request,
             start_dt,
             end_dt,
             calendar_ids,
@@ -983,7 +868,7 @@ class AgendaView(generics.GenericAPIView):
         project_id = int(project_id_param) if project_id_param and project_id_param.isdigit() else None
 
         payload = _build_calendar_view_payload(
-            request.user,
+            request,
             start_dt,
             end_dt,
             calendar_ids,
@@ -1408,68 +1293,59 @@ class FreeBusyView(generics.GenericAPIView):
         project_id_raw = body.get("project_id")
         project_id = int(project_id_raw) if str(project_id_raw).isdigit() else None
 
-        calendars = _get_accessible_calendars(request.user, calendar_ids or None, project_id=project_id)
+        combined = _as_bool(body.get("combined"))
+        include_slots = _as_bool(body.get("include_slots"))
+        if include_slots and time_max - time_min > timedelta(days=MAX_SLOT_DAYS):
+            return calendar_error_response(
+                "BAD_REQUEST",
+                f"include_slots supports ranges of at most {MAX_SLOT_DAYS} days.",
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cal_ids = _get_accessible_calendar_ids(request, calendar_ids or None, project_id=project_id)
 
         result = {
-            "time_min": time_min.isoformat().replace("+00:00", "Z"),
-            "time_max": time_max.isoformat().replace("+00:00", "Z"),
+            "time_min": _format_utc(time_min),
+            "time_max": _format_utc(time_max),
             "calendars": {},
         }
 
-        for cal in calendars:
-            events_qs = (
-                Event.objects.filter(
-                    calendar=cal,
-                    is_deleted=False,
-                    start_datetime__lt=time_max,
-                    end_datetime__gt=time_min,
-                )
-                .select_related("recurrence_rule")
-            )
-
-            intervals = []
-            for ev in events_qs:
-                if ev.is_recurring and ev.recurrence_rule_id:
-                    instances = _expand_recurring_event(ev, time_min, time_max)
-                    for inst in instances:
-                        intervals.append(
-                            [
-                                getattr(inst, "start_datetime"),
-                                getattr(inst, "end_datetime"),
-                            ]
-                        )
-                else:
-                    intervals.append([ev.start_datetime, ev.end_datetime])
-
-            # Merge overlapping intervals
-            intervals = sorted(intervals, key=lambda x: x[0])
-            merged = []
-            for start, end in intervals:
-                if not merged:
-                    merged.append([start, end])
-                else:
-                    last_start, last_end = merged[-1]
-                    if start <= last_end:
-                        merged[-1][1] = max(last_end, end)
-                    else:
-                        merged.append([start, end])
-
-            busy = [
-                {
-                    "start": s.isoformat().replace("+00:00", "Z"),
-                    "end": e.isoformat().replace("+00:00", "Z"),
-                }
-                for s, e in merged
-            ]
-
-            result["calendars"][str(cal.id)] = {
-                "busy": busy,
+        # One query for every calendar, merged per calendar in a single pass
+        per_calendar = busy_intervals(cal_ids, time_min, time_max)
+        for cal_id in cal_ids:
+            result["calendars"][str(cal_id)] = {
+                "busy": _busy_payload(per_calendar[cal_id]),
                 "errors": [],
             }
+        if combined:
+            result["combined"] = {"busy": _busy_payload(combined_busy(per_calendar))}
+
+        if include_slots and cal_ids:
+            slots = busy_slots(cal_ids, time_min, time_max, combined=combined)
+            result["slot_minutes"] = SLOT_MINUTES
+            result["slot_start"] = _format_utc(slots["slot_start"])
+            for cal_id, value in slots["calendars"].items():
+                result["calendars"][str(cal_id)]["slots"] = value
+            if combined:
+                result["combined"]["slots"] = slots["combined"]
 
         return Response(result, status=status.HTTP_200_OK)
 
 
+def _as_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def _format_utc(value: datetime) -> str:
+    return value.isoformat().replace("+00:00", "Z")
+
+
+def _busy_payload(intervals) -> list[dict[str, str]]:
+    return [{"start": _format_utc(s), "end": _format_utc(e)} for s, e in intervals]
+
+
 class EventReminderListCreateView(generics.ListCreateAPIView):
     """
     List and add reminders for a specific event.
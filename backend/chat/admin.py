@@ -45,18 +45,13 @@ class ChatParticipantAdmin(admin.ModelAdmin):
             'fields': ('chat', 'user')
         }),
         ('Status', {
-            'fields': ('is_active', 'joined_at', 'last_read_at')
+            'fields': ('is_active', 'joined_at', 'last_read_at', 'unread_count')
         }),
         ('Metadata', {
             'fields': ('is_deleted', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
-    
-    def unread_count(self, obj):
-        """Show unread message count"""
-        return obj.get_unread_count()
-    unread_count.short_description = 'Unread'
 
 
 @admin.register(Message)
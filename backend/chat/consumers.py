@@ -5,7 +5,7 @@ from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from .models import Chat, ChatParticipant, Message, MessageStatus
-from .services import OnlineStatusService, MessageService
+from .services import OnlineStatusService, MessageService, ReadReceiptService
 from .tasks import build_realtime_message_payload
 
 User = get_user_model()
@@ -23,16 +23,21 @@ class ChatConsumer(AsyncWebsocketConsumer):
     - chat_message: Send a message
     - typing_start: User started typing
     - typing_stop: User stopped typing
-    - mark_as_read: Mark message as read
+    - mark_as_read: Mark message (and everything before it) as read; optional chat_id
     - heartbeat: Keep connection alive
     
     Message Types (server -> client):
     - chat_message: New message received
+    - chat_message_batch: Queued messages delivered on connect
     - message_status_update: Message status changed
+    - message_status_batch: Status changed for several messages at once
     - typing_indicator: Someone is typing
     - error: Error occurred
     """
     
+    # Queued messages sent per frame (and acknowledged per UPDATE) on connect
+    QUEUED_BATCH_SIZE = 100
+    
     async def connect(self):
         """Handle WebSocket connection"""
         self.user_id = self.scope['url_route']['kwargs']['user_id']
@@ -57,8 +62,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        # Mark user as online
-        await database_sync_to_async(OnlineStatusService.set_online)(self.user.id)
+        # Mark user as online; project memberships are resolved once per connection
+        self.presence_project_ids = await database_sync_to_async(
+            OnlineStatusService.get_user_project_ids
+        )(self.user.id)
+        await database_sync_to_async(OnlineStatusService.set_online)(
+            self.user.id, self.presence_project_ids
+        )
         
         await self.accept()
         logger.info(f"[WebSocket] User {self.user_id} ({self.user.username}) connected and marked as ONLINE")
@@ -77,7 +87,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
             
             # Mark user as offline
             if hasattr(self, 'user') and self.user:
-                await database_sync_to_async(OnlineStatusService.set_offline)(self.user.id)
+                await database_sync_to_async(OnlineStatusService.set_offline)(
+                    self.user.id, getattr(self, 'presence_project_ids', None)
+                )
                 logger.info(f"[WebSocket] User {self.user_id} ({self.user.username}) disconnected and marked as OFFLINE (code: {close_code})")
             else:
                 logger.info(f"[WebSocket] User {self.user_id} disconnected (code: {close_code})")
@@ -218,7 +230,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             logger.error(f"Error handling typing stop: {e}")
     
     async def handle_mark_as_read(self, data):
-        """Handle mark as read request"""
+        """Handle mark as read request (buffered; see ReadReceiptService)"""
         message_id = data.get('message_id')
         
         if not message_id:
@@ -226,7 +238,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return
         
         try:
-            # Mark message as read
+            buffered = await database_sync_to_async(ReadReceiptService.record_read)(
+                self.user.id, message_id, data.get('chat_id')
+            )
+            if buffered:
+                return
+            
+            # No Redis: apply the read directly
             await database_sync_to_async(self.mark_message_read)(message_id)
             
             # Get message sender to notify
@@ -252,7 +270,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def handle_heartbeat(self, data):
         """Handle heartbeat to keep connection alive"""
         # Update online status
-        await database_sync_to_async(OnlineStatusService.set_online)(self.user.id)
+        await database_sync_to_async(OnlineStatusService.heartbeat)(
+            self.user.id, getattr(self, 'presence_project_ids', None)
+        )
         logger.debug(f"[WebSocket] Heartbeat from user {self.user_id}, refreshed online status")
         
         # Send pong response
@@ -262,21 +282,48 @@ class ChatConsumer(AsyncWebsocketConsumer):
         }))
     
     async def send_queued_messages(self):
-        """Send any queued messages for this user"""
+        """
+        Send every queued message for this user, one frame per batch.
+        
+        Each batch is acknowledged with a single UPDATE and senders get one
+        grouped delivery notice per batch.
+        """
         try:
-            queued_messages = await database_sync_to_async(self.get_queued_messages)()
-            
-            for msg in queued_messages:
+            total = 0
+            after_id = 0
+            while True:
+                batch, after_id = await database_sync_to_async(self.get_queued_messages)(after_id)
+                if not batch:
+                    break
+                
                 await self.send(text_data=json.dumps({
-                    'type': 'chat_message',
-                    'message': msg
+                    'type': 'chat_message_batch',
+                    'messages': batch
                 }))
                 
-                # Mark as delivered - wrap everything in database_sync_to_async
-                await database_sync_to_async(self._mark_message_delivered)(msg['id'])
+                message_ids = [msg['id'] for msg in batch]
+                await database_sync_to_async(MessageService.mark_messages_as_delivered)(self.user, message_ids)
+                
+                by_sender = {}
+                for msg in batch:
+                    by_sender.setdefault(msg['sender']['id'], []).append(msg['id'])
+                for sender_id, sender_message_ids in by_sender.items():
+                    await self.channel_layer.group_send(
+                        f'chat_user_{sender_id}',
+                        {
+                            'type': 'message_status_batch',
+                            'message_ids': sender_message_ids,
+                            'user_id': self.user.id,
+                            'status': 'delivered',
+                        }
+                    )
+                
+                total += len(batch)
+                if len(batch) < self.QUEUED_BATCH_SIZE:
+                    break
             
-            if queued_messages:
-                logger.info(f"Sent {len(queued_messages)} queued messages to user {self.user_id}")
+            if total:
+                logger.info(f"Sent {total} queued messages to user {self.user_id}")
         
         except Exception as e:
             logger.error(f"Error sending queued messages: {e}")
@@ -299,6 +346,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'status': event['status'],
         }))
     
+    async def message_status_batch(self, event):
+        """Send grouped message status update to WebSocket"""
+        await self.send(text_data=json.dumps({
+            'type': 'message_status_batch',
+            'message_ids': event['message_ids'],
+            'user_id': event['user_id'],
+            'status': event['status'],
+        }))
+    
     async def typing_indicator(self, event):
         """Send typing indicator to WebSocket"""
         await self.send(text_data=json.dumps({
@@ -346,26 +402,30 @@ class ChatConsumer(AsyncWebsocketConsumer):
         message = Message.objects.get(id=message_id)
         MessageService.mark_message_as_read(message, self.user)
     
-    def _mark_message_delivered(self, message_id):
-        """Mark a message as delivered (helper for async context)"""
-        message = Message.objects.get(id=message_id)
-        MessageService.mark_message_as_delivered(message, self.user)
-    
     def get_message_sender(self, message_id):
         """Get the sender ID of a message"""
         message = Message.objects.get(id=message_id)
         return message.sender.id
     
-    def get_queued_messages(self):
-        """Get queued messages for this user (messages with 'sent' status)"""
-        statuses = MessageStatus.objects.filter(
-            user=self.user,
-            status='sent'
-        ).select_related('message', 'message__sender', 'message__chat').prefetch_related('message__attachments')[:50]
+    def get_queued_messages(self, after_id=0):
+        """
+        Get the next batch of queued messages for this user (messages with 'sent' status).
         
-        messages = []
-        for status in statuses:
-            msg = status.message
-            messages.append(build_realtime_message_payload(msg))
+        Args:
+            after_id: MessageStatus ID returned by the previous batch
+        
+        Returns:
+            Tuple of (message payloads, MessageStatus ID to continue after)
+        """
+        statuses = list(
+            MessageStatus.objects.filter(
+                user=self.user,
+                status='sent',
+                id__gt=after_id
+            ).select_related(
+                'message', 'message__sender', 'message__chat'
+            ).prefetch_related('message__attachments').order_by('id')[:self.QUEUED_BATCH_SIZE]
+        )
         
-        return messages
+        messages = [build_realtime_message_payload(status.message) for status in statuses]
+        return messages, (statuses[-1].id if statuses else after_id)
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.23 on 2026-10-16 15:20
+
+from django.db import migrations, models
+
+
+def backfill_unread_counts(apps, schema_editor):
+    ChatParticipant = apps.get_model('chat', 'ChatParticipant')
+    Message = apps.get_model('chat', 'Message')
+
+    to_update = []
+    for participant in ChatParticipant.objects.filter(is_active=True).iterator(chunk_size=500):
+        messages = Message.objects.filter(chat_id=participant.chat_id, is_deleted=False).exclude(
+            sender_id=participant.user_id
+        )
+        if participant.last_read_at:
+            messages = messages.filter(created_at__gt=participant.last_read_at)
+        participant.unread_count = messages.count()
+        if participant.unread_count:
+            to_update.append(participant)
+    ChatParticipant.objects.bulk_update(to_update, ['unread_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_chatstar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatparticipant',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0, help_text='Denormalized unread message count, maintained by MessageService and reconciled periodically'),
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
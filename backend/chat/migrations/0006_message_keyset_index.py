@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-16 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_chatparticipant_unread_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat', 'is_deleted', 'created_at', 'id'], name='chat_messag_chat_id_da7110_idx'),
+        ),
+    ]
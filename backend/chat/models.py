@@ -176,6 +176,10 @@ class ChatParticipant(TimeStampedModel):
         default=True,
         help_text="Whether this user is still active in the chat"
     )
+    unread_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Denormalized unread message count, maintained by MessageService and reconciled periodically"
+    )
     
     class Meta:
         unique_together = ['chat', 'user']
@@ -190,11 +194,12 @@ class ChatParticipant(TimeStampedModel):
     
     def get_unread_count(self):
         """
-        Get count of unread messages for this participant.
+        Count unread messages for this participant from the messages table.
         Uses last_read_at for quick calculation.
         
         NOTE: This is the SINGLE SOURCE OF TRUTH for unread count calculation.
-        All serializers and services should delegate to this method.
+        Reads should use the denormalized unread_count field; this COUNT is
+        used to initialise and reconcile it.
         """
         if not self.last_read_at:
             # Never read, count all messages except own
@@ -283,6 +288,7 @@ class Message(TimeStampedModel):
             models.Index(fields=['sender', 'created_at']),
             models.Index(fields=['chat', '-created_at']),  # For latest messages
             models.Index(fields=['chat', 'is_deleted']),
+            models.Index(fields=['chat', 'is_deleted', 'created_at', 'id']),  # Keyset pagination
         ]
     
     def __str__(self):
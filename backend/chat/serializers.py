@@ -19,21 +19,24 @@ class ChatUnreadCountMixin:
     """Mixin providing get_unread_count for Chat serializers"""
     
     def get_unread_count(self, obj):
-        """Get unread message count for current user using model method"""
+        """Get the current user's denormalized unread counter for this chat"""
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return 0
         
-        try:
-            participant = ChatParticipant.objects.get(
-                chat=obj,
-                user=request.user,
-                is_active=True
-            )
-            # Delegate to model method (single source of truth)
-            return participant.get_unread_count()
-        except ChatParticipant.DoesNotExist:
+        # Served from prefetched active participants when the queryset provides them
+        if 'participants' in getattr(obj, '_prefetched_objects_cache', {}):
+            for participant in obj.participants.all():
+                if participant.user_id == request.user.id and participant.is_active:
+                    return participant.unread_count
             return 0
+        
+        unread_count = ChatParticipant.objects.filter(
+            chat=obj,
+            user=request.user,
+            is_active=True
+        ).values_list('unread_count', flat=True).first()
+        return unread_count or 0
 
 
 class MessageContentValidationMixin:
@@ -82,7 +85,7 @@ class UserSimpleSerializer(serializers.ModelSerializer):
 class ChatParticipantSerializer(serializers.ModelSerializer):
     """Serializer for chat participants"""
     user = UserSimpleSerializer(read_only=True)
-    unread_count = serializers.SerializerMethodField()
+    unread_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = ChatParticipant
@@ -91,10 +94,6 @@ class ChatParticipantSerializer(serializers.ModelSerializer):
             'last_read_at', 'is_active', 'unread_count'
         ]
         read_only_fields = ['id', 'joined_at']
-    
-    def get_unread_count(self, obj):
-        """Calculate unread message count for this participant using model method"""
-        return obj.get_unread_count()
 
 
 class MessageStatusSerializer(serializers.ModelSerializer):
@@ -137,7 +136,14 @@ class MessageSerializer(MessageContentValidationMixin, serializers.ModelSerializ
             return 'sent'
         
         # If sender, always show as 'sent'
-        if obj.sender == request.user:
+        if obj.sender_id == request.user.id:
+            return 'sent'
+        
+        # Served from prefetched statuses when the queryset provides them
+        if 'statuses' in getattr(obj, '_prefetched_objects_cache', {}):
+            for msg_status in obj.statuses.all():
+                if msg_status.user_id == request.user.id:
+                    return msg_status.status
             return 'sent'
         
         # Get status for current user
@@ -236,14 +242,33 @@ class ChatListSerializer(ChatUnreadCountMixin, serializers.ModelSerializer):
             'updated_at'
         ]
     
+    def _active_participants(self, obj):
+        """Active participants, served from the prefetch cache when available"""
+        if 'participants' in getattr(obj, '_prefetched_objects_cache', {}):
+            return [p for p in obj.participants.all() if p.is_active]
+        return list(ChatParticipant.objects.filter(
+            chat=obj,
+            is_active=True
+        ).select_related('user'))
+    
+    def _last_message(self, obj):
+        """Last visible message; batch-loaded into context by ChatService.get_chat_list_context"""
+        last_messages = self.context.get('last_messages')
+        if last_messages is not None:
+            return last_messages.get(obj.id)
+        return Message.objects.filter(
+            chat=obj,
+            is_deleted=False
+        ).select_related('sender').order_by('-created_at', '-id').first()
+    
     def get_participants(self, obj):
         """Get simplified participant info with online status"""
         from .services import OnlineStatusService
         
-        participants = ChatParticipant.objects.filter(
-            chat=obj,
-            is_active=True
-        ).select_related('user')
+        participants = self._active_participants(obj)
+        online_user_ids = self.context.get('online_user_ids')
+        if online_user_ids is None:
+            online_user_ids = set(OnlineStatusService.get_online_users([p.user_id for p in participants]))
         
         return [{
             'id': p.id,
@@ -251,27 +276,23 @@ class ChatListSerializer(ChatUnreadCountMixin, serializers.ModelSerializer):
                 'id': p.user.id,
                 'username': p.user.username,
                 'email': p.user.email,
-                'is_online': OnlineStatusService.is_online(p.user.id)
+                'is_online': p.user.id in online_user_ids
             },
             'joined_at': p.joined_at.isoformat() if p.joined_at else None,
         } for p in participants]
     
     def get_participant_count(self, obj):
         """Get number of active participants"""
-        return ChatParticipant.objects.filter(
-            chat=obj,
-            is_active=True
-        ).count()
+        return len(self._active_participants(obj))
     
     def get_last_message(self, obj):
         """Get the last message in the chat (full message object for consistency with WebSocket)"""
-        last_msg = Message.objects.filter(
-            chat=obj,
-            is_deleted=False
-        ).select_related('sender').order_by('-created_at').first()
+        last_msg = self._last_message(obj)
         
         if last_msg:
-            attachment_count = last_msg.attachments.count()
+            attachment_count = getattr(last_msg, 'attachment_total', None)
+            if attachment_count is None:
+                attachment_count = last_msg.attachments.count()
             has_attachments = bool(last_msg.has_attachments or attachment_count > 0)
             is_forwarded = bool(
                 last_msg.forwarded_from_message_id
@@ -306,10 +327,7 @@ class ChatListSerializer(ChatUnreadCountMixin, serializers.ModelSerializer):
     
     def get_last_message_time(self, obj):
         """Get timestamp of last message"""
-        last_msg = Message.objects.filter(
-            chat=obj,
-            is_deleted=False
-        ).order_by('-created_at').first()
+        last_msg = self._last_message(obj)
         
         return last_msg.created_at if last_msg else obj.updated_at
 
@@ -1,64 +1,338 @@
 import logging
 import os
+import time
 import uuid
+from datetime import datetime, timezone as dt_timezone
 from typing import Any, Dict, List, Optional, Tuple
 from django.contrib.auth import get_user_model
 from django.core.files import File
 from django.db import transaction
-from django.db.models import Q, Prefetch, Max
+from django.db.models import Q, Prefetch, Max, F, Sum, Count, OuterRef, Subquery, Value, DateTimeField
+from django.db.models.functions import Coalesce
 from django.core.cache import cache
 from django.utils import timezone
 from .models import Chat, ChatParticipant, ChatStar, Message, MessageAttachment, MessageStatus, ChatType
 from core.models import ProjectMember
+from core.utils.cursors import decode_cursor, encode_cursor
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+# Lower bound for created_at when a participant has never read a chat
+UNREAD_EPOCH = datetime.fromtimestamp(0, tz=dt_timezone.utc)
+
+
+def get_redis_client():
+    """Raw Redis client behind the default cache, or None if the cache is not Redis."""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except Exception:
+        return None
+
 
 class OnlineStatusService:
-    """Service for managing user online status"""
+    """
+    Service for managing user online status.
+    
+    Presence lives in Redis sorted sets scored by last heartbeat time: one set
+    of all users and one per project the user belongs to. Entries older than
+    ONLINE_TIMEOUT count as offline and are trimmed by score, so bulk lookups
+    are a single pipelined round trip. Falls back to per-user cache keys when
+    the default cache is not Redis.
+    """
     
     ONLINE_KEY_PREFIX = 'user_online'
+    PRESENCE_USERS_KEY = 'presence:users'
+    PRESENCE_PROJECT_KEY_PREFIX = 'presence:project'
     ONLINE_TIMEOUT = 60 * 5  # 5 minutes
     
     @classmethod
-    def set_online(cls, user_id: int) -> None:
-        """Mark user as online"""
-        key = f'{cls.ONLINE_KEY_PREFIX}:{user_id}'
-        cache.set(key, True, timeout=cls.ONLINE_TIMEOUT)
-        logger.info(f"[OnlineStatus] User {user_id} marked as ONLINE (timeout: {cls.ONLINE_TIMEOUT}s)")
+    def _users_key(cls) -> str:
+        return cache.make_key(cls.PRESENCE_USERS_KEY)
+    
+    @classmethod
+    def _project_key(cls, project_id: int) -> str:
+        return cache.make_key(f'{cls.PRESENCE_PROJECT_KEY_PREFIX}:{project_id}')
     
     @classmethod
-    def set_offline(cls, user_id: int) -> None:
+    def _cutoff(cls, now: Optional[float] = None) -> float:
+        return (now if now is not None else time.time()) - cls.ONLINE_TIMEOUT
+    
+    @staticmethod
+    def get_user_project_ids(user_id: int) -> List[int]:
+        """Projects whose presence set the user is tracked in"""
+        return list(
+            ProjectMember.objects.filter(
+                user_id=user_id,
+                is_active=True
+            ).values_list('project_id', flat=True)
+        )
+    
+    @classmethod
+    def set_online(cls, user_id: int, project_ids: Optional[List[int]] = None) -> None:
+        """
+        Mark user as online (also used as the heartbeat).
+        
+        Args:
+            user_id: User ID
+            project_ids: Projects to record presence in; looked up when omitted.
+                Long-lived callers (the websocket consumer) pass them to avoid a
+                query per heartbeat.
+        """
+        if project_ids is None:
+            project_ids = cls.get_user_project_ids(user_id)
+        client = get_redis_client()
+        if client is None:
+            cache.set(f'{cls.ONLINE_KEY_PREFIX}:{user_id}', True, timeout=cls.ONLINE_TIMEOUT)
+            logger.debug(f"[OnlineStatus] User {user_id} marked as ONLINE")
+            return
+        
+        now = time.time()
+        cutoff = cls._cutoff(now)
+        pipe = client.pipeline(transaction=False)
+        for key in [cls._users_key()] + [cls._project_key(pid) for pid in project_ids]:
+            pipe.zadd(key, {str(user_id): now})
+            pipe.zremrangebyscore(key, '-inf', cutoff)
+        pipe.execute()
+        logger.debug(f"[OnlineStatus] User {user_id} marked as ONLINE in {len(project_ids)} projects")
+    
+    @classmethod
+    def set_offline(cls, user_id: int, project_ids: Optional[List[int]] = None) -> None:
         """Mark user as offline"""
-        key = f'{cls.ONLINE_KEY_PREFIX}:{user_id}'
-        cache.delete(key)
+        if project_ids is None:
+            project_ids = cls.get_user_project_ids(user_id)
+        client = get_redis_client()
+        if client is None:
+            cache.delete(f'{cls.ONLINE_KEY_PREFIX}:{user_id}')
+        else:
+            pipe = client.pipeline(transaction=False)
+            for key in [cls._users_key()] + [cls._project_key(pid) for pid in project_ids]:
+                pipe.zrem(key, str(user_id))
+            pipe.execute()
         logger.info(f"[OnlineStatus] User {user_id} marked as OFFLINE")
     
     @classmethod
     def is_online(cls, user_id: int) -> bool:
         """Check if user is online"""
-        key = f'{cls.ONLINE_KEY_PREFIX}:{user_id}'
-        try:
-            result = cache.get(key, False)
-        except Exception:
-            result = False
-        logger.debug(f"[OnlineStatus] Checking user {user_id}: {result}")
-        return result
+        return bool(cls.get_online_users([user_id]))
     
     @classmethod
     def get_online_users(cls, user_ids: List[int]) -> List[int]:
-        """Get list of online users from given user IDs"""
-        online_users = []
-        for user_id in user_ids:
-            if cls.is_online(user_id):
-                online_users.append(user_id)
-        return online_users
+        """Get list of online users from given user IDs (one round trip)"""
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return []
+        try:
+            client = get_redis_client()
+            if client is None:
+                keys = {f'{cls.ONLINE_KEY_PREFIX}:{user_id}': user_id for user_id in user_ids}
+                found = cache.get_many(list(keys))
+                return [user_id for key, user_id in keys.items() if found.get(key)]
+            
+            users_key = cls._users_key()
+            pipe = client.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.zscore(users_key, str(user_id))
+            scores = pipe.execute()
+        except Exception as e:
+            logger.warning(f"[OnlineStatus] Presence lookup failed: {e}")
+            return []
+        
+        cutoff = cls._cutoff()
+        return [
+            user_id for user_id, score in zip(user_ids, scores)
+            if score is not None and score > cutoff
+        ]
     
     @classmethod
-    def heartbeat(cls, user_id: int) -> None:
+    def get_project_online_users(cls, project_id: int) -> List[int]:
+        """Get IDs of users currently online in a project (one round trip)"""
+        client = get_redis_client()
+        if client is None:
+            member_ids = ProjectMember.objects.filter(
+                project_id=project_id,
+                is_active=True
+            ).values_list('user_id', flat=True)
+            return cls.get_online_users(list(member_ids))
+        
+        key = cls._project_key(project_id)
+        pipe = client.pipeline(transaction=False)
+        pipe.zremrangebyscore(key, '-inf', cls._cutoff())
+        pipe.zrange(key, 0, -1)
+        try:
+            _, members = pipe.execute()
+        except Exception as e:
+            logger.warning(f"[OnlineStatus] Presence lookup for project {project_id} failed: {e}")
+            return []
+        return [int(member) for member in members]
+    
+    @classmethod
+    def trim_expired(cls) -> int:
+        """Drop entries past ONLINE_TIMEOUT from every presence set; returns how many"""
+        client = get_redis_client()
+        if client is None:
+            return 0
+        cutoff = cls._cutoff()
+        keys = [cls._users_key()] + list(
+            client.scan_iter(match=cls._project_key('*'), count=500)
+        )
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.zremrangebyscore(key, '-inf', cutoff)
+        return sum(pipe.execute())
+    
+    @classmethod
+    def heartbeat(cls, user_id: int, project_ids: Optional[List[int]] = None) -> None:
         """Update user's online status (extend timeout)"""
-        cls.set_online(user_id)
+        cls.set_online(user_id, project_ids)
+
+
+class ReadReceiptService:
+    """
+    Coalesces per-message read receipts.
+    
+    Reads are recorded as a high-water mark per (user, chat) in a Redis sorted
+    set, so a client reporting every message while scrolling costs one ZADD
+    each. flush() applies each mark as one bulk update and only then removes it.
+    """
+    
+    PENDING_KEY = 'chat:read_receipts'
+    
+    # Remove members whose score is still the one that was applied; a mark
+    # raised by a newer read in the meantime stays for the next flush
+    _REMOVE_APPLIED_SCRIPT = """
+    for i = 1, #ARGV, 2 do
+        if redis.call('ZSCORE', KEYS[1], ARGV[i]) == ARGV[i + 1] then
+            redis.call('ZREM', KEYS[1], ARGV[i])
+        end
+    end
+    return 0
+    """
+    
+    @classmethod
+    def _pending_key(cls) -> str:
+        return cache.make_key(cls.PENDING_KEY)
+    
+    @classmethod
+    def record_read(cls, user_id: int, message_id: int, chat_id: Optional[int] = None) -> bool:
+        """
+        Buffer a read receipt.
+        
+        Args:
+            user_id: Reader
+            message_id: Message read; everything up to it in the chat counts as read
+            chat_id: Chat of the message, looked up when omitted
+        
+        Returns:
+            bool: False if no Redis is available; the caller should apply the read directly
+        
+        Raises:
+            ValueError: If the message does not exist
+        """
+        client = get_redis_client()
+        if client is None:
+            return False
+        if chat_id is None:
+            chat_id = Message.objects.filter(
+                id=message_id,
+                is_deleted=False
+            ).values_list('chat_id', flat=True).first()
+            if chat_id is None:
+                raise ValueError("Message not found")
+        # GT keeps the highest message id seen for the pair (ids grow with created_at)
+        client.zadd(cls._pending_key(), {f'{user_id}:{chat_id}': message_id}, gt=True)
+        return True
+    
+    @classmethod
+    def flush(cls) -> List[Dict[str, Any]]:
+        """
+        Apply buffered receipts, then remove them from the buffer.
+        
+        If applying fails the receipts stay buffered for the next flush.
+        
+        Returns:
+            Status events to broadcast, one per (sender, reader) pair, each with
+            sender_id, user_id and message_ids
+        """
+        client = get_redis_client()
+        if client is None:
+            return []
+        key = cls._pending_key()
+        entries = client.zrange(key, 0, -1, withscores=True)
+        
+        marks = {}
+        applied = []
+        for member, score in entries:
+            if isinstance(member, bytes):
+                member = member.decode()
+            user_id, chat_id = member.split(':')
+            marks[(int(user_id), int(chat_id))] = int(score)
+            applied.extend([member, int(score)])
+        events = cls.apply_marks(marks)
+        if applied:
+            client.eval(cls._REMOVE_APPLIED_SCRIPT, 1, key, *applied)
+        return events
+    
+    @staticmethod
+    def apply_marks(marks: Dict[Tuple[int, int], int]) -> List[Dict[str, Any]]:
+        """
+        Apply read high-water marks {(user_id, chat_id): message_id}.
+        
+        Marks for messages outside the chat or for inactive participants are
+        dropped; last_read_at never moves backwards.
+        """
+        if not marks:
+            return []
+        messages = {
+            m.id: m for m in Message.objects.filter(
+                id__in=set(marks.values())
+            ).only('id', 'chat_id', 'created_at')
+        }
+        participants = {
+            (p.user_id, p.chat_id): p for p in ChatParticipant.objects.filter(
+                user_id__in={user_id for user_id, _ in marks},
+                chat_id__in={chat_id for _, chat_id in marks},
+                is_active=True
+            )
+        }
+        
+        events = {}
+        now = timezone.now()
+        for (user_id, chat_id), message_id in marks.items():
+            message = messages.get(message_id)
+            participant = participants.get((user_id, chat_id))
+            if message is None or participant is None or message.chat_id != chat_id:
+                continue
+            
+            with transaction.atomic():
+                if participant.last_read_at is None or participant.last_read_at < message.created_at:
+                    participant.last_read_at = message.created_at
+                    participant.unread_count = participant.get_unread_count()
+                    participant.save(update_fields=['last_read_at', 'unread_count', 'updated_at'])
+                
+                rows = list(MessageStatus.objects.filter(
+                    user_id=user_id,
+                    status__in=['sent', 'delivered'],
+                    message__chat_id=chat_id,
+                    message__created_at__lte=message.created_at
+                ).values_list('id', 'message_id', 'message__sender_id'))
+                if not rows:
+                    continue
+                MessageStatus.objects.filter(id__in=[row[0] for row in rows]).update(
+                    status='read',
+                    read_at=now,
+                    updated_at=now
+                )
+            
+            for _, read_message_id, sender_id in rows:
+                events.setdefault(
+                    (sender_id, user_id),
+                    {'sender_id': sender_id, 'user_id': user_id, 'message_ids': []}
+                )['message_ids'].append(read_message_id)
+        
+        logger.debug(f"[ReadReceipts] Applied {len(marks)} read marks")
+        return list(events.values())
 
 
 class ChatService:
@@ -177,6 +451,101 @@ class ChatService:
         ).select_related('project')
         
         return query
+
+    @staticmethod
+    def get_chat_list_page(
+        user: User,
+        project_id: Optional[int] = None,
+        chat_type: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 20
+    ) -> Tuple[List[Chat], Optional[str]]:
+        """
+        Get one page of a user's chats, newest first, with keyset pagination.
+
+        Active participants (with users) are prefetched; the page costs the same
+        number of queries however many participants each chat has.
+
+        Args:
+            user: User whose chats to list
+            project_id: Optional project filter
+            chat_type: Optional chat type filter
+            cursor: Opaque cursor returned as next_cursor by the previous page
+            limit: Page size
+
+        Returns:
+            (chats, next_cursor); next_cursor is None on the last page
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        query = Chat.objects.filter(
+            participants__user=user,
+            participants__is_active=True
+        )
+        if project_id:
+            query = query.filter(project_id=project_id)
+        if chat_type:
+            query = query.filter(type=chat_type)
+        if cursor:
+            updated_at, chat_id = decode_cursor(cursor)
+            query = query.filter(
+                Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, id__lt=chat_id)
+            )
+
+        chats = list(
+            query.select_related('project').prefetch_related(
+                Prefetch(
+                    'participants',
+                    queryset=ChatParticipant.objects.select_related('user').filter(is_active=True)
+                )
+            ).order_by('-updated_at', '-id')[:limit + 1]
+        )
+        next_cursor = None
+        if len(chats) > limit:
+            chats = chats[:limit]
+            next_cursor = encode_cursor(chats[-1].updated_at, chats[-1].id)
+        return chats, next_cursor
+
+    @staticmethod
+    def get_chat_list_context(chats: List[Chat]) -> Dict[str, Any]:
+        """
+        Batch-load what ChatListSerializer needs beyond the chats themselves.
+
+        Expects chats with prefetched active participants. Loads every chat's
+        last message (with sender and attachment count) in one query and the
+        participants' presence in one cache round trip.
+
+        Returns:
+            Serializer context entries: last_messages {chat_id: Message} and
+            online_user_ids (set)
+        """
+        if not chats:
+            return {'last_messages': {}, 'online_user_ids': set()}
+
+        latest = Message.objects.filter(
+            chat=OuterRef('pk'),
+            is_deleted=False
+        ).order_by('-created_at', '-id').values('id')[:1]
+        last_message_ids = [
+            message_id
+            for message_id in Chat.objects.filter(
+                id__in=[chat.id for chat in chats]
+            ).annotate(last_message_id=Subquery(latest)).values_list('last_message_id', flat=True)
+            if message_id is not None
+        ]
+        last_messages = {
+            message.chat_id: message
+            for message in Message.objects.filter(id__in=last_message_ids)
+            .select_related('sender')
+            .annotate(attachment_total=Count('attachments'))
+        }
+
+        user_ids = [p.user_id for chat in chats for p in chat.participants.all()]
+        return {
+            'last_messages': last_messages,
+            'online_user_ids': set(OnlineStatusService.get_online_users(user_ids)),
+        }
     
     @staticmethod
     @transaction.atomic
@@ -213,6 +582,7 @@ class ChatService:
                 # Reactivate
                 existing.is_active = True
                 existing.joined_at = timezone.now()
+                existing.unread_count = existing.get_unread_count()
                 existing.save()
                 logger.info(f"Reactivated participant {user.id} in chat {chat.id}")
                 return existing
@@ -223,6 +593,9 @@ class ChatService:
             user=user,
             is_active=True
         )
+        participant.unread_count = participant.get_unread_count()
+        if participant.unread_count:
+            participant.save(update_fields=['unread_count', 'updated_at'])
         
         logger.info(f"Added participant {user.id} to chat {chat.id} by user {added_by.id}")
         return participant
@@ -287,6 +660,12 @@ class ChatStarService:
         return (
             ChatStar.objects.filter(user=user, chat__project_id=project_id)
             .select_related('chat', 'chat__project')
+            .prefetch_related(
+                Prefetch(
+                    'chat__participants',
+                    queryset=ChatParticipant.objects.select_related('user').filter(is_active=True)
+                )
+            )
             .order_by('position', 'id')
         )
 
@@ -397,20 +776,7 @@ class MessageService:
             forwarded_from_created_at=forwarded_from_created_at,
         )
         
-        # Create message status for all recipients (excluding sender)
-        recipients = ChatParticipant.objects.filter(
-            chat=chat,
-            is_active=True
-        ).exclude(user=sender).select_related('user')
-        
-        MessageStatus.objects.bulk_create([
-            MessageStatus(
-                message=message,
-                user=recipient.user,
-                status='sent'
-            )
-            for recipient in recipients
-        ])
+        MessageService.deliver_to_recipients(message)
         
         logger.info(f"Created message {message.id} in chat {chat.id} by user {sender.id}")
 
@@ -432,16 +798,43 @@ class MessageService:
 
         return message
     
+    @staticmethod
+    def deliver_to_recipients(message: Message) -> None:
+        """
+        Create 'sent' statuses for a new message's recipients (active
+        participants other than the sender) and bump their unread counters.
+        
+        Every path that creates a message must call this once.
+        """
+        recipient_rows = list(
+            ChatParticipant.objects.filter(chat_id=message.chat_id, is_active=True)
+            .exclude(user_id=message.sender_id)
+            .values_list('id', 'user_id')
+        )
+        MessageStatus.objects.bulk_create([
+            MessageStatus(
+                message=message,
+                user_id=user_id,
+                status='sent'
+            )
+            for _, user_id in recipient_rows
+        ])
+        ChatParticipant.objects.filter(
+            id__in=[participant_id for participant_id, _ in recipient_rows]
+        ).update(unread_count=F('unread_count') + 1)
+    
     @staticmethod
     def get_chat_messages(
         chat: Chat,
         user: User,
         before: Optional[timezone.datetime] = None,
         after: Optional[timezone.datetime] = None,
-        limit: int = 20
+        limit: int = 20,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None
     ):
         """
-        Get messages for a chat with cursor-based pagination.
+        Get messages for a chat with (created_at, id) keyset pagination.
         
         Args:
             chat: Chat to get messages from
@@ -449,9 +842,13 @@ class MessageService:
             before: Get messages before this timestamp (for scrolling up)
             after: Get messages after this timestamp (for new messages)
             limit: Maximum number of messages to return
+            before_id: Tie-breaker for before; messages at exactly `before`
+                with a lower id are included
+            after_id: Tie-breaker for after; messages at exactly `after`
+                with a higher id are included
         
         Returns:
-            QuerySet: Messages
+            QuerySet: Messages, with attachments and statuses prefetched
         """
         # Validate user is a participant
         if not ChatParticipant.objects.filter(chat=chat, user=user, is_active=True).exists():
@@ -460,20 +857,29 @@ class MessageService:
         query = Message.objects.filter(
             chat=chat,
             is_deleted=False
-        ).select_related('sender')
+        ).select_related('sender').prefetch_related(
+            'attachments',
+            Prefetch('statuses', queryset=MessageStatus.objects.select_related('user'))
+        )
         
         if before:
-            query = query.filter(created_at__lt=before)
+            if before_id is None:
+                query = query.filter(created_at__lt=before)
+            else:
+                query = query.filter(Q(created_at__lt=before) | Q(created_at=before, id__lt=before_id))
         
         if after:
-            query = query.filter(created_at__gt=after)
+            if after_id is None:
+                query = query.filter(created_at__gt=after)
+            else:
+                query = query.filter(Q(created_at__gt=after) | Q(created_at=after, id__gt=after_id))
         
         # Order by created_at descending for "before" (scrolling up)
         # Order by created_at ascending for "after" (new messages)
         if after:
-            query = query.order_by('created_at')
+            query = query.order_by('created_at', 'id')
         else:
-            query = query.order_by('-created_at')
+            query = query.order_by('-created_at', '-id')
         
         return query[:limit]
     
@@ -489,6 +895,25 @@ class MessageService:
         except MessageStatus.DoesNotExist:
             logger.warning(f"MessageStatus not found for message {message.id} and user {user.id}")
     
+    @staticmethod
+    def mark_messages_as_delivered(user: User, message_ids: List[int]) -> int:
+        """
+        Mark many messages as delivered for a user in a single UPDATE.
+        
+        Only statuses still at 'sent' move; read receipts are never downgraded.
+        
+        Returns:
+            int: Number of statuses updated
+        """
+        if not message_ids:
+            return 0
+        now = timezone.now()
+        return MessageStatus.objects.filter(
+            user=user,
+            message_id__in=message_ids,
+            status='sent'
+        ).update(status='delivered', delivered_at=now, updated_at=now)
+    
     @staticmethod
     @transaction.atomic
     def mark_message_as_read(message: Message, user: User) -> None:
@@ -519,7 +944,8 @@ class MessageService:
         if up_to_message:
             # Mark up to specific message
             participant.last_read_at = up_to_message.created_at
-            participant.save()
+            participant.unread_count = participant.get_unread_count()
+            participant.save(update_fields=['last_read_at', 'unread_count', 'updated_at'])
             
             # Mark all message statuses as read up to this message
             MessageStatus.objects.filter(
@@ -537,15 +963,12 @@ class MessageService:
             # Mark all messages as read
             old_last_read_at = participant.last_read_at
             participant.last_read_at = timezone.now()
-            participant.save()
-            
-            # Verify the save worked by reloading from DB
-            participant.refresh_from_db()
+            participant.unread_count = 0
+            participant.save(update_fields=['last_read_at', 'unread_count', 'updated_at'])
             
             logger.info(
                 f"mark_chat_as_read: chat={chat.id}, user={user.id}, "
-                f"old_last_read_at={old_last_read_at}, new_last_read_at={participant.last_read_at}, "
-                f"unread_count_after={participant.get_unread_count()}"
+                f"old_last_read_at={old_last_read_at}, new_last_read_at={participant.last_read_at}"
             )
             
             MessageStatus.objects.filter(
@@ -563,7 +986,7 @@ class MessageService:
     def get_unread_count(user: User, chat: Optional[Chat] = None) -> int:
         """
         Get unread message count for a user.
-        Uses ChatParticipant.get_unread_count() as single source of truth.
+        Reads the denormalized ChatParticipant.unread_count counters.
         
         Args:
             user: User to check
@@ -572,29 +995,60 @@ class MessageService:
         Returns:
             int: Unread message count
         """
+        participants = ChatParticipant.objects.filter(user=user, is_active=True)
         if chat:
             # Get unread count for a specific chat
-            try:
-                participant = ChatParticipant.objects.get(
-                    chat=chat,
-                    user=user,
-                    is_active=True
-                )
-                return participant.get_unread_count()
-            except ChatParticipant.DoesNotExist:
-                return 0
-        else:
-            # Get total unread count across all chats
-            total = 0
-            participants = ChatParticipant.objects.filter(
-                user=user,
-                is_active=True
-            ).select_related('chat')
-            
-            for participant in participants:
-                total += participant.get_unread_count()
-            
-            return total
+            count = participants.filter(chat=chat).values_list('unread_count', flat=True).first()
+            return count or 0
+        # Get total unread count across all chats
+        return participants.aggregate(total=Sum('unread_count'))['total'] or 0
+
+    @staticmethod
+    def reconcile_unread_counts(batch_size: int = 500) -> int:
+        """
+        Repair drift between ChatParticipant.unread_count and the messages table.
+
+        Recounts active participants in id-ordered batches with one annotated
+        query per batch and rewrites only counters that differ. Each rewrite
+        is conditional on the counter still holding the value that was read,
+        so an increment or read reset committed in between is not overwritten
+        (that row is left for the next run).
+
+        Returns:
+            int: Number of participants whose counter was corrected
+        """
+        unread_messages = Message.objects.filter(
+            chat=OuterRef('chat'),
+            is_deleted=False,
+            created_at__gt=Coalesce(
+                OuterRef('last_read_at'), Value(UNREAD_EPOCH), output_field=DateTimeField()
+            ),
+        ).exclude(
+            sender=OuterRef('user')
+        ).order_by().values('chat').annotate(total=Count('id')).values('total')
+
+        repaired = 0
+        last_id = 0
+        while True:
+            batch = list(
+                ChatParticipant.objects.filter(is_active=True, id__gt=last_id)
+                .order_by('id')
+                .annotate(actual_unread=Coalesce(Subquery(unread_messages), 0))
+                .only('id', 'unread_count')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for participant in batch:
+                if participant.unread_count != participant.actual_unread:
+                    repaired += ChatParticipant.objects.filter(
+                        id=participant.id,
+                        unread_count=participant.unread_count,
+                    ).update(unread_count=participant.actual_unread)
+        if repaired:
+            logger.info(f"Reconciled unread counters for {repaired} chat participants")
+        return repaired
+
     @staticmethod
     def _copy_file_field_for_forward(*, source_field, target_field, fallback_filename: str) -> None:
         """
@@ -2,11 +2,10 @@ import logging
 from typing import Any, Dict, Optional
 from celery import shared_task
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from .models import Message, MessageStatus, ChatParticipant
-from .services import OnlineStatusService
+from .services import MessageService, OnlineStatusService, ReadReceiptService
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -93,12 +92,14 @@ def deliver_message_task(self, message_id: int):
         
         channel_layer = get_channel_layer()
         delivered_count = 0
+        pending_statuses = list(pending_statuses)
+        online_user_ids = set(OnlineStatusService.get_online_users([s.user_id for s in pending_statuses]))
         
         for msg_status in pending_statuses:
             user = msg_status.user
             
             # Check if user is online now
-            if OnlineStatusService.is_online(user.id):
+            if user.id in online_user_ids:
                 try:
                     # Send via WebSocket
                     async_to_sync(channel_layer.group_send)(
@@ -120,8 +121,8 @@ def deliver_message_task(self, message_id: int):
                 logger.debug(f"User {user.id} still offline for message {message_id}")
         
         # If there are still pending recipients, retry later
-        if delivered_count < pending_statuses.count():
-            logger.info(f"Message {message_id} has {pending_statuses.count() - delivered_count} pending recipients, will retry")
+        if delivered_count < len(pending_statuses):
+            logger.info(f"Message {message_id} has {len(pending_statuses) - delivered_count} pending recipients, will retry")
             raise self.retry(exc=Exception("Some recipients still offline"))
         
         logger.info(f"Message {message_id} delivered to all {delivered_count} recipients")
@@ -136,29 +137,68 @@ def deliver_message_task(self, message_id: int):
 @shared_task
 def cleanup_old_online_status():
     """
-    Celery periodic task to clean up stale online status entries.
+    Celery periodic task to trim stale presence entries.
     
-    This is a fallback to ensure Redis doesn't accumulate stale entries.
-    Should be run periodically (e.g., every hour).
+    Lookups already ignore heartbeats older than the online timeout; this
+    keeps presence sets of idle projects from accumulating expired members.
     """
     try:
-        # Get all keys matching the pattern
-        pattern = f'{OnlineStatusService.ONLINE_KEY_PREFIX}:*'
-        keys = cache.keys(pattern) if hasattr(cache, 'keys') else []
-        
-        cleaned = 0
-        for key in keys:
-            # Redis TTL will handle expiration, but we can force cleanup here if needed
-            if not cache.get(key):
-                cache.delete(key)
-                cleaned += 1
-        
+        cleaned = OnlineStatusService.trim_expired()
         logger.info(f"Cleaned up {cleaned} stale online status entries")
         
     except Exception as e:
         logger.error(f"Error cleaning up online status: {e}")
 
 
+@shared_task
+def flush_read_receipts():
+    """
+    Celery periodic task to apply buffered read receipts.
+    
+    Each (user, chat) high-water mark becomes one bulk status update, and each
+    sender gets a single message_status_batch event per reader per flush.
+    """
+    try:
+        events = ReadReceiptService.flush()
+        if not events:
+            return
+        
+        channel_layer = get_channel_layer()
+        for event in events:
+            try:
+                async_to_sync(channel_layer.group_send)(
+                    f'chat_user_{event["sender_id"]}',
+                    {
+                        'type': 'message_status_batch',
+                        'message_ids': event['message_ids'],
+                        'user_id': event['user_id'],
+                        'status': 'read',
+                    }
+                )
+            except Exception as e:
+                logger.error(f"Failed to send read receipts to user {event['sender_id']}: {e}")
+        
+        logger.debug(f"Flushed read receipts into {len(events)} status events")
+        
+    except Exception as e:
+        logger.error(f"Error flushing read receipts: {e}")
+
+
+@shared_task
+def reconcile_unread_counts():
+    """
+    Celery periodic task to repair drift in ChatParticipant.unread_count.
+
+    Counters are maintained incrementally by MessageService; this recounts
+    them from the messages table in batches.
+    """
+    try:
+        repaired = MessageService.reconcile_unread_counts()
+        logger.info(f"Unread counter reconciliation repaired {repaired} participants")
+    except Exception as e:
+        logger.error(f"Error reconciling unread counts: {e}")
+
+
 @shared_task
 def send_typing_indicator(chat_id: int, user_id: int, is_typing: bool):
     """
@@ -263,12 +303,14 @@ def notify_new_message(message_id: int):
         
         channel_layer = get_channel_layer()
         offline_users = []
+        participants = list(participants)
+        online_user_ids = set(OnlineStatusService.get_online_users([p.user_id for p in participants]))
         
         for participant in participants:
             user = participant.user
-            is_online = OnlineStatusService.is_online(user.id)
+            is_online = user.id in online_user_ids
             
-            logger.info(f"[notify_new_message] Checking user {user.id} ({user.username}) online status: {is_online}")
+            logger.debug(f"[notify_new_message] Checking user {user.id} ({user.username}) online status: {is_online}")
             
             if is_online:
                 # User is online, send via WebSocket immediately
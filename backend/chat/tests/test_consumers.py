@@ -11,6 +11,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from core.models import Project, Organization, Team, TeamMember, ProjectMember
 from chat.models import Chat, ChatParticipant, Message, MessageAttachment, MessageStatus, ChatType
 from chat.consumers import ChatConsumer
+from chat.services import MessageService
 from chat.routing import websocket_urlpatterns
 from asset.middleware import JWTAuthMiddleware
 from rest_framework_simplejwt.tokens import AccessToken
@@ -413,7 +414,7 @@ class ChatConsumerSyncTest(TestCase):
 
         consumer = ChatConsumer()
         consumer.user = self.user
-        queued_messages = consumer.get_queued_messages()
+        queued_messages, _ = consumer.get_queued_messages()
 
         self.assertEqual(len(queued_messages), 1)
         payload = queued_messages[0]
@@ -439,7 +440,7 @@ class ChatConsumerSyncTest(TestCase):
 
         consumer = ChatConsumer()
         consumer.user = self.user
-        queued_messages = consumer.get_queued_messages()
+        queued_messages, _ = consumer.get_queued_messages()
 
         self.assertEqual(len(queued_messages), 1)
         payload = queued_messages[0]
@@ -448,3 +449,49 @@ class ChatConsumerSyncTest(TestCase):
         self.assertEqual(payload['attachments'], [])
         self.assertFalse(payload['is_forwarded'])
         self.assertIsNone(payload['forwarded_from'])
+
+    def test_get_queued_messages_pages_by_status_id(self):
+        """Queued messages are read in batches that continue after the last status."""
+        sender = User.objects.create_user(
+            username='sender3',
+            email='sender3@example.com',
+            password='testpass123'
+        )
+        ChatParticipant.objects.create(chat=self.chat, user=sender, is_active=True)
+        messages = [
+            Message.objects.create(chat=self.chat, sender=sender, content=f'Queued {index}')
+            for index in range(3)
+        ]
+        for message in messages:
+            MessageStatus.objects.create(message=message, user=self.user, status='sent')
+
+        consumer = ChatConsumer()
+        consumer.user = self.user
+        consumer.QUEUED_BATCH_SIZE = 2
+        first, after_id = consumer.get_queued_messages()
+        second, after_id = consumer.get_queued_messages(after_id)
+        third, _ = consumer.get_queued_messages(after_id)
+
+        self.assertEqual([m['id'] for m in first + second], [m.id for m in messages])
+        self.assertEqual(third, [])
+
+    def test_mark_messages_as_delivered_updates_only_sent_statuses(self):
+        """Bulk delivery acknowledgement never downgrades read receipts."""
+        sender = User.objects.create_user(
+            username='sender4',
+            email='sender4@example.com',
+            password='testpass123'
+        )
+        ChatParticipant.objects.create(chat=self.chat, user=sender, is_active=True)
+        sent = Message.objects.create(chat=self.chat, sender=sender, content='Sent')
+        read = Message.objects.create(chat=self.chat, sender=sender, content='Read')
+        MessageStatus.objects.create(message=sent, user=self.user, status='sent')
+        MessageStatus.objects.create(message=read, user=self.user, status='read')
+
+        updated = MessageService.mark_messages_as_delivered(self.user, [sent.id, read.id])
+
+        self.assertEqual(updated, 1)
+        sent_status = MessageStatus.objects.get(message=sent, user=self.user)
+        self.assertEqual(sent_status.status, 'delivered')
+        self.assertIsNotNone(sent_status.delivered_at)
+        self.assertEqual(MessageStatus.objects.get(message=read, user=self.user).status, 'read')
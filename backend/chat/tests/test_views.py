@@ -1,13 +1,17 @@
 import logging
+import time
 from unittest.mock import patch
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
 from core.models import Project, Organization, Team, TeamMember, ProjectMember
 from chat.models import Chat, ChatParticipant, ChatStar, Message, MessageAttachment, MessageStatus, ChatType
-from chat.services import MessageService
+from chat.services import ChatService, MessageService, OnlineStatusService, ReadReceiptService, get_redis_client
 from chat.serializers import MessageSerializer
 from django.core.files.uploadedfile import SimpleUploadedFile
 
@@ -147,6 +151,74 @@ class ChatAPITest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertGreaterEqual(len(response.data['results']), 1)
     
+    def _list_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('chat-list'), {'project_id': self.project.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+    
+    def test_list_chats_query_count_is_fixed(self):
+        """Test the chat list does not issue per-chat or per-participant queries"""
+        ProjectMember.objects.create(user=self.user3, project=self.project, role='member', is_active=True)
+        chat = ChatService.create_group_chat(self.user1, self.project.id, 'Group', [self.user2.id])
+        MessageService.create_message(chat, self.user2, 'hello')
+        baseline = self._list_query_count()
+        
+        ChatService.add_participant(chat, self.user3, self.user1)
+        for index in range(3):
+            other = ChatService.create_group_chat(self.user1, self.project.id, f'Group {index}', [self.user2.id, self.user3.id])
+            MessageService.create_message(other, self.user3, f'message {index}')
+        self.assertEqual(self._list_query_count(), baseline)
+    
+    def test_list_chats_cursor_pagination(self):
+        """Test keyset pages cover every chat once, newest first"""
+        created = [
+            ChatService.create_group_chat(self.user1, self.project.id, f'Group {index}', [self.user2.id])
+            for index in range(5)
+        ]
+        url = reverse('chat-list')
+        
+        seen = []
+        params = {'project_id': self.project.id, 'limit': 2}
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(item['id'] for item in response.data['results'])
+            if not response.data['next_cursor']:
+                break
+            params['cursor'] = response.data['next_cursor']
+        
+        expected = [chat.id for chat in Chat.objects.filter(id__in=[c.id for c in created]).order_by('-updated_at', '-id')]
+        self.assertEqual(seen, expected)
+        
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_project_online_users(self):
+        """Test presence is tracked per project and expires by heartbeat age"""
+        OnlineStatusService.set_offline(self.user2.id)
+        url = reverse('online-users')
+        
+        OnlineStatusService.set_online(self.user2.id)
+        response = self.client.get(url, {'project_id': self.project.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(self.user2.id, response.data['online_user_ids'])
+        self.assertEqual(
+            OnlineStatusService.get_online_users([self.user2.id, self.user3.id]),
+            [self.user2.id]
+        )
+        
+        with patch('chat.services.time.time', return_value=time.time() + OnlineStatusService.ONLINE_TIMEOUT + 1):
+            self.assertFalse(OnlineStatusService.is_online(self.user2.id))
+        
+        OnlineStatusService.set_offline(self.user2.id)
+        response = self.client.get(url, {'project_id': self.project.id})
+        self.assertNotIn(self.user2.id, response.data['online_user_ids'])
+        
+        self.client.force_authenticate(user=self.user3)
+        response = self.client.get(url, {'project_id': self.project.id})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
     def test_retrieve_chat(self):
         """Test retrieving a specific chat"""
         # Create a chat
@@ -417,6 +489,30 @@ class MessageAPITest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 2)
     
+    def test_list_messages_cursor_splits_identical_timestamps(self):
+        """Test paging through messages sharing a created_at skips and repeats nothing"""
+        messages = [
+            Message.objects.create(chat=self.chat, sender=self.user2, content=f'Message {index}')
+            for index in range(5)
+        ]
+        Message.objects.filter(id__in=[m.id for m in messages]).update(created_at=timezone.now())
+        
+        url = reverse('message-list')
+        seen = []
+        params = {'chat_id': self.chat.id, 'page_size': 2}
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen = [item['id'] for item in response.data['results']] + seen
+            if not response.data['prev_cursor']:
+                break
+            params['before'] = response.data['prev_cursor']
+        
+        self.assertEqual(seen, [m.id for m in messages])
+        
+        response = self.client.get(url, {'chat_id': self.chat.id, 'before': 'bm90LWEtY3Vyc29y'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
     def test_retrieve_message(self):
         """Test retrieving a specific message"""
         message = Message.objects.create(chat=self.chat, sender=self.user1, content='Test message')
@@ -438,19 +534,75 @@ class MessageAPITest(TestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         
+        # Receipts are buffered until the periodic flush
+        ReadReceiptService.flush()
+        
         # Verify message status was updated
         msg_status = MessageStatus.objects.get(message=message, user=self.user1)
         self.assertEqual(msg_status.status, 'read')
         self.assertIsNotNone(msg_status.read_at)
     
+    def test_read_receipts_are_coalesced_per_chat(self):
+        """Test buffered reads are applied as one high-water mark with one event per sender"""
+        if get_redis_client() is None:
+            self.skipTest("Read receipts are only buffered with a Redis cache")
+        ReadReceiptService.flush()
+        first = MessageService.create_message(self.chat, self.user2, 'Message 1')
+        second = MessageService.create_message(self.chat, self.user2, 'Message 2')
+        
+        self.assertTrue(ReadReceiptService.record_read(self.user1.id, second.id))
+        self.assertTrue(ReadReceiptService.record_read(self.user1.id, first.id, self.chat.id))
+        self.assertEqual(MessageStatus.objects.get(message=second, user=self.user1).status, 'sent')
+        
+        events = ReadReceiptService.flush()
+        
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['sender_id'], self.user2.id)
+        self.assertEqual(sorted(events[0]['message_ids']), [first.id, second.id])
+        self.assertEqual(
+            set(MessageStatus.objects.filter(user=self.user1).values_list('status', flat=True)),
+            {'read'}
+        )
+        participant = ChatParticipant.objects.get(chat=self.chat, user=self.user1)
+        self.assertEqual(participant.last_read_at, second.created_at)
+        self.assertEqual(participant.unread_count, 0)
+        self.assertEqual(ReadReceiptService.flush(), [])
+    
+    def test_failed_flush_keeps_read_receipts(self):
+        """Test receipts stay buffered when applying them fails"""
+        if get_redis_client() is None:
+            self.skipTest("Read receipts are only buffered with a Redis cache")
+        ReadReceiptService.flush()
+        message = MessageService.create_message(self.chat, self.user2, 'Message 1')
+        self.assertTrue(ReadReceiptService.record_read(self.user1.id, message.id))
+        
+        with patch.object(ReadReceiptService, 'apply_marks', side_effect=RuntimeError('database down')):
+            with self.assertRaises(RuntimeError):
+                ReadReceiptService.flush()
+        self.assertEqual(MessageStatus.objects.get(message=message, user=self.user1).status, 'sent')
+        
+        events = ReadReceiptService.flush()
+        self.assertEqual(events[0]['message_ids'], [message.id])
+        self.assertEqual(MessageStatus.objects.get(message=message, user=self.user1).status, 'read')
+    
+    def test_send_message_via_api_bumps_recipient_unread(self):
+        """Test that messages sent over REST increment the recipients' counters"""
+        response = self.client.post(
+            reverse('message-list'),
+            {'chat': self.chat.id, 'content': 'Counted'},
+            format='json',
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(ChatParticipant.objects.get(chat=self.chat, user=self.user2).unread_count, 1)
+        self.assertEqual(ChatParticipant.objects.get(chat=self.chat, user=self.user1).unread_count, 0)
+        self.assertEqual(MessageStatus.objects.get(message_id=response.data['id']).user, self.user2)
+    
     def test_get_unread_count(self):
         """Test getting unread message count"""
-        # Create messages from user2
-        msg1 = Message.objects.create(chat=self.chat, sender=self.user2, content='Message 1')
-        msg2 = Message.objects.create(chat=self.chat, sender=self.user2, content='Message 2')
-        
-        MessageStatus.objects.create(message=msg1, user=self.user1, status='sent')
-        MessageStatus.objects.create(message=msg2, user=self.user1, status='sent')
+        # Create messages from user2 (counters are maintained by MessageService)
+        MessageService.create_message(self.chat, self.user2, 'Message 1')
+        MessageService.create_message(self.chat, self.user2, 'Message 2')
         
         url = reverse('message-unread-count')
         response = self.client.get(url, {'chat_id': self.chat.id})
@@ -458,6 +610,34 @@ class MessageAPITest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['unread_count'], 2)
 
+    def test_unread_counter_tracks_sends_and_reads(self):
+        """Test that the denormalized counter is incremented and reset without recounting"""
+        MessageService.create_message(self.chat, self.user2, 'Message 1')
+        MessageService.create_message(self.chat, self.user1, 'Own message')
+        
+        participant = ChatParticipant.objects.get(chat=self.chat, user=self.user1)
+        sender = ChatParticipant.objects.get(chat=self.chat, user=self.user2)
+        self.assertEqual(participant.unread_count, 1)
+        self.assertEqual(sender.unread_count, 1)
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(MessageService.get_unread_count(self.user1), 1)
+        
+        MessageService.mark_chat_as_read(self.chat, self.user1)
+        participant.refresh_from_db()
+        self.assertEqual(participant.unread_count, 0)
+
+    def test_reconcile_unread_counts_repairs_drift(self):
+        """Test that reconciliation rewrites counters that drifted from the messages table"""
+        Message.objects.create(chat=self.chat, sender=self.user2, content='Bypassed service')
+        ChatParticipant.objects.filter(chat=self.chat, user=self.user2).update(unread_count=7)
+        
+        repaired = MessageService.reconcile_unread_counts()
+        
+        self.assertEqual(repaired, 2)
+        self.assertEqual(ChatParticipant.objects.get(chat=self.chat, user=self.user1).unread_count, 1)
+        self.assertEqual(ChatParticipant.objects.get(chat=self.chat, user=self.user2).unread_count, 0)
+
     @patch('chat.tasks.notify_new_message.delay')
     def test_forward_batch_success_multi_messages_multi_targets(self, mock_notify):
         """Test forwarding multiple messages to existing chat + member target."""
@@ -14,6 +14,8 @@ from django.shortcuts import get_object_or_404
 from django.core.cache import cache
 from datetime import datetime
 from .models import Chat, ChatParticipant, Message, MessageStatus, ChatType, MessageAttachment
+from core.models import ProjectMember
+from core.utils.cursors import decode_cursor, encode_cursor
 from .serializers import (
     ChatSerializer,
     ChatListSerializer,
@@ -32,7 +34,13 @@ from .serializers import (
     AttachmentUploadSerializer,
     AttachmentFileListRowSerializer,
 )
-from .services import ChatService, ChatStarService, MessageService, OnlineStatusService
+from .services import (
+    ChatService,
+    ChatStarService,
+    MessageService,
+    OnlineStatusService,
+    ReadReceiptService,
+)
 from .tasks import notify_new_message
 
 logger = logging.getLogger(__name__)
@@ -73,8 +81,10 @@ class StarredChatViewSet(
                 {'error': 'Invalid project_id'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        stars = ChatStarService.list_starred_for_project(request.user, pid)
-        serializer = ChatStarSerializer(stars, many=True, context={'request': request})
+        stars = list(ChatStarService.list_starred_for_project(request.user, pid))
+        context = {'request': request}
+        context.update(ChatService.get_chat_list_context([star.chat for star in stars]))
+        serializer = ChatStarSerializer(stars, many=True, context=context)
         return Response(serializer.data)
 
     def create(self, request, *args, **kwargs):
@@ -159,40 +169,52 @@ class ChatViewSet(viewsets.ModelViewSet):
     
     def list(self, request, *args, **kwargs):
         """
-        List user's chats with pagination.
+        List user's chats, most recently active first, with cursor pagination.
         
         Query params:
         - project_id: Filter by project (optional)
         - type: Filter by chat type ('private' or 'group', optional)
-        - page: Page number (default: 1)
-        - page_size: Items per page (default: 20)
-        - limit: Alternative to page_size (for compatibility)
+        - limit: Items per page (default: 20, max: 100)
+        - page_size: Alternative to limit (for compatibility)
+        - cursor: next_cursor from the previous page (optional)
         """
-        logger.info(f"User {request.user.id} listing chats")
-        
-        queryset = self.get_queryset()
+        logger.debug(f"User {request.user.id} listing chats")
         
-        # Filter by chat type if provided
-        chat_type = request.query_params.get('type')
-        if chat_type:
-            queryset = queryset.filter(type=chat_type)
-        
-        # Pagination
-        page = int(request.query_params.get('page', 1))
-        # Support both 'page_size' and 'limit' parameters
-        page_size = int(request.query_params.get('page_size', request.query_params.get('limit', 20)))
+        project_id = (
+            request.query_params.get('project_id')
+            or request.query_params.get('pro_ct_id')
+        )
+        try:
+            limit = int(request.query_params.get('limit', request.query_params.get('page_size', 20)))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'Invalid limit'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, 100))
         
-        start = (page - 1) * page_size
-        end = start + page_size
+        try:
+            chats, next_cursor = ChatService.get_chat_list_page(
+                request.user,
+                project_id=project_id,
+                chat_type=request.query_params.get('type'),
+                cursor=request.query_params.get('cursor'),
+                limit=limit
+            )
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        chats = queryset[start:end]
-        serializer = self.get_serializer(chats, many=True)
+        context = self.get_serializer_context()
+        context.update(ChatService.get_chat_list_context(chats))
+        serializer = ChatListSerializer(chats, many=True, context=context)
         
         return Response({
             'results': serializer.data,
-            'page': page,
-            'page_size': page_size,
-            'total': queryset.count()
+            'page_size': limit,
+            'next_cursor': next_cursor
         })
     
     def create(self, request, *args, **kwargs):
@@ -451,8 +473,8 @@ class MessageViewSet(viewsets.ModelViewSet):
         
         Query params:
         - chat_id: Chat ID (required)
-        - before: Get messages before this timestamp (ISO format)
-        - after: Get messages after this timestamp (ISO format)
+        - before: prev_cursor from a previous page, or an ISO timestamp (legacy)
+        - after: next_cursor from a previous page, or an ISO timestamp (legacy)
         - page_size: Number of messages (default: 20, max: 100)
         """
         chat_id = request.query_params.get('chat_id')
@@ -472,62 +494,54 @@ class MessageViewSet(viewsets.ModelViewSet):
             )
         
         # Parse cursor parameters
-        before_str = request.query_params.get('before')
-        after_str = request.query_params.get('after')
         page_size = min(int(request.query_params.get('page_size', 20)), 100)
         
-        before = None
-        after = None
-        
-        if before_str:
-            try:
-                before = datetime.fromisoformat(before_str.replace('Z', '+00:00'))
-            except ValueError:
-                return Response(
-                    {'error': 'Invalid before timestamp format'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        try:
+            before, before_id = self._parse_message_cursor(request.query_params.get('before'))
+        except ValueError:
+            return Response(
+                {'error': 'Invalid before cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if after_str:
-            try:
-                after = datetime.fromisoformat(after_str.replace('Z', '+00:00'))
-            except ValueError:
-                return Response(
-                    {'error': 'Invalid after timestamp format'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        try:
+            after, after_id = self._parse_message_cursor(request.query_params.get('after'))
+        except ValueError:
+            return Response(
+                {'error': 'Invalid after cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         try:
-            messages = MessageService.get_chat_messages(
+            messages = list(MessageService.get_chat_messages(
                 chat,
                 request.user,
                 before=before,
                 after=after,
-                limit=page_size
-            )
+                limit=page_size,
+                before_id=before_id,
+                after_id=after_id
+            ))
+            
+            # For "before" queries (scrolling up), return oldest first
+            if not after:
+                messages.reverse()
             
             serializer = self.get_serializer(messages, many=True)
             
             # Generate cursors for pagination
-            data = serializer.data
             next_cursor = None
             prev_cursor = None
             
-            if data:
-                # For "before" queries (scrolling up), reverse the order
-                if not after:
-                    data = list(reversed(data))
-                
-                # Set cursors
-                if len(data) == page_size:
-                    # There might be more messages
-                    if after:
-                        next_cursor = data[-1]['created_at']
-                    else:
-                        prev_cursor = data[0]['created_at']
+            if len(messages) == page_size:
+                # There might be more messages
+                if after:
+                    next_cursor = encode_cursor(messages[-1].created_at, messages[-1].id)
+                else:
+                    prev_cursor = encode_cursor(messages[0].created_at, messages[0].id)
             
             return Response({
-                'results': data,
+                'results': serializer.data,
                 'next_cursor': next_cursor,
                 'prev_cursor': prev_cursor,
                 'page_size': page_size
@@ -536,6 +550,21 @@ class MessageViewSet(viewsets.ModelViewSet):
         except ValueError as e:
             return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
     
+    @staticmethod
+    def _parse_message_cursor(value):
+        """
+        Parse a before/after parameter into (created_at, id).
+        
+        Accepts the opaque cursors returned by list, and bare ISO timestamps from
+        older clients (id is None, so ties at that timestamp are not split).
+        """
+        if not value:
+            return None, None
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')), None
+        except ValueError:
+            return decode_cursor(value)
+    
     def create(self, request, *args, **kwargs):
         """
         Send a message to a chat.
@@ -554,21 +583,8 @@ class MessageViewSet(viewsets.ModelViewSet):
             # Create message using serializer (handles attachments)
             message = serializer.save()
             
-            # Create MessageStatus for all recipients (excluding sender)
-            from .models import MessageStatus
-            recipients = ChatParticipant.objects.filter(
-                chat=message.chat,
-                is_active=True
-            ).exclude(user=request.user).select_related('user')
-            
-            MessageStatus.objects.bulk_create([
-                MessageStatus(
-                    message=message,
-                    user=recipient.user,
-                    status='sent'
-                )
-                for recipient in recipients
-            ])
+            # Statuses and unread counters for all recipients (excluding sender)
+            MessageService.deliver_to_recipients(message)
             
             # Trigger async notification task
             notify_new_message.delay(message.id)
@@ -604,12 +620,16 @@ class MessageViewSet(viewsets.ModelViewSet):
     def mark_as_read(self, request, pk=None):
         """
         Mark a specific message as read.
+        
+        The receipt is buffered and applied with the next read-receipt flush,
+        together with everything earlier in the chat.
         """
         message = self.get_object()
         
         try:
-            MessageService.mark_message_as_read(message, request.user)
-            logger.info(f"User {request.user.id} marked message {message.id} as read")
+            if not ReadReceiptService.record_read(request.user.id, message.id, message.chat_id):
+                ReadReceiptService.apply_marks({(request.user.id, message.chat_id): message.id})
+            logger.debug(f"User {request.user.id} marked message {message.id} as read")
             return Response({'status': 'success'})
         except ValueError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -838,6 +858,43 @@ class AttachmentViewSet(viewsets.GenericViewSet):
         )
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def project_online_users(request):
+    """
+    List users currently online in a project.
+    
+    Query params:
+    - project_id: Project ID (required)
+    
+    Returns:
+    - project_id: The project ID
+    - online_user_ids: IDs of project members with a live heartbeat
+    """
+    try:
+        project_id = int(request.query_params.get('project_id'))
+    except (TypeError, ValueError):
+        return Response(
+            {'error': 'project_id is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if not ProjectMember.objects.filter(
+        project_id=project_id,
+        user=request.user,
+        is_active=True
+    ).exists():
+        return Response(
+            {'error': 'You are not a member of this project'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    return Response({
+        'project_id': project_id,
+        'online_user_ids': OnlineStatusService.get_project_online_users(project_id),
+    })
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def fetch_link_preview(request):
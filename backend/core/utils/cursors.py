@@ -0,0 +1,23 @@
+"""
+Opaque keyset pagination cursors shared by the chat and dashboard feeds.
+"""
+import base64
+import binascii
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(timestamp: datetime, pk: int) -> str:
+    """Encode a (timestamp, id) keyset position as an opaque URL-safe cursor."""
+    raw = f'{timestamp.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor from encode_cursor; raises ValueError if malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (TypeError, UnicodeDecodeError, binascii.Error, ValueError):
+        raise ValueError("Invalid cursor")
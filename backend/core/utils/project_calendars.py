@@ -50,12 +50,16 @@ def ensure_project_calendar(project):
 
 def soft_delete_project_calendars(project) -> None:
     from calendars.models import Calendar
+    from calendars.permissions import invalidate_calendar_audience
 
     now = timezone.now()
-    Calendar.objects.filter(project=project, is_deleted=False).update(
+    calendar_ids = list(Calendar.objects.filter(project=project, is_deleted=False).values_list("id", flat=True))
+    Calendar.objects.filter(id__in=calendar_ids).update(
         is_deleted=True,
         updated_at=now,
     )
+    # The queryset update sends no signals
+    invalidate_calendar_audience(calendar_ids=calendar_ids, project_ids=[project.id])
 
 
 def sync_project_member_calendar_access(project, user, role: str | None, include_subscription: bool = True):
@@ -66,6 +70,7 @@ def sync_project_member_calendar_access(project, user, role: str | None, include
         return calendar
 
     from calendars.models import CalendarShare, CalendarSubscription
+    from calendars.permissions import invalidate_accessible_calendars
 
     if project.owner_id and user.id == project.owner_id:
         CalendarShare.objects.filter(
@@ -74,6 +79,7 @@ def sync_project_member_calendar_access(project, user, role: str | None, include
             shared_with=user,
             is_deleted=False,
         ).update(is_deleted=True)
+        invalidate_accessible_calendars([user.id])
         return calendar
 
     permission = map_project_role_to_calendar_permission(role)
@@ -132,6 +138,7 @@ def sync_project_member_calendar_access(project, user, role: str | None, include
 
 def remove_project_member_calendar_access(project, user):
     from calendars.models import Calendar, CalendarShare, CalendarSubscription
+    from calendars.permissions import invalidate_accessible_calendars
 
     calendar: Optional[Calendar] = (
         Calendar.objects.filter(project=project, organization=project.organization, is_deleted=False).first()
@@ -155,3 +162,5 @@ def remove_project_member_calendar_access(project, user):
         calendar=calendar,
         is_deleted=False,
     ).update(is_deleted=True)
+    # The queryset updates send no signals
+    invalidate_accessible_calendars([user.id])
@@ -0,0 +1,281 @@
+"""
+Activity stream (ActivityEvent): one append-only row per thing that happened.
+
+dashboard.signals records task creations, approval decisions, task comments,
+asset creations and status transitions, and decision creations and status
+changes as they are saved. Feeds read the log newest first with keyset
+pagination on (created_at, id); filtered by project or actor that is a
+single scan of the matching composite index.
+
+With ACTIVITY_STREAM_BROADCAST on, each event is also sent to its project's
+websocket group (see dashboard.consumers) once its transaction commits.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.utils.cursors import decode_cursor, encode_cursor
+
+from .models import ActivityEvent
+
+logger = logging.getLogger(__name__)
+
+EventType = ActivityEvent.EventType
+
+# Events about a task, as shown in the dashboard's recent activity
+TASK_EVENT_TYPES = (
+    EventType.TASK_CREATED,
+    EventType.APPROVED,
+    EventType.REJECTED,
+    EventType.COMMENTED,
+)
+
+SOURCE_TASK = 'task'
+SOURCE_APPROVAL_RECORD = 'approval_record'
+SOURCE_TASK_COMMENT = 'task_comment'
+SOURCE_ASSET = 'asset'
+SOURCE_ASSET_TRANSITION = 'asset_state_transition'
+SOURCE_DECISION = 'decision'
+
+COMMENT_PREVIEW_LENGTH = 100
+
+
+def project_group_name(project_id):
+    return f'activity_project_{project_id}'
+
+
+# -----------------------------
+# Event fields per source
+# -----------------------------
+# Each builder takes plain column values (in the order the backfill selects
+# them) and returns ActivityEvent field values.
+def _fields(event_type, source_type, source_id, project_id, actor_id, created_at, task_id=None, **payload):
+    return {
+        'event_type': event_type,
+        'source_type': source_type,
+        'source_id': source_id,
+        'project_id': project_id,
+        'actor_id': actor_id,
+        'task_id': task_id,
+        'created_at': created_at,
+        'payload': payload,
+    }
+
+
+def task_created_fields(task_id, project_id, owner_id, created_at):
+    return _fields(EventType.TASK_CREATED, SOURCE_TASK, task_id, project_id, owner_id, created_at, task_id=task_id)
+
+
+def approval_fields(record_id, task_id, project_id, approved_by_id, is_approved, decided_time):
+    event_type = EventType.APPROVED if is_approved else EventType.REJECTED
+    return _fields(
+        event_type, SOURCE_APPROVAL_RECORD, record_id, project_id, approved_by_id, decided_time,
+        task_id=task_id, is_approved=is_approved,
+    )
+
+
+def comment_fields(comment_id, task_id, project_id, user_id, body, created_at):
+    return _fields(
+        EventType.COMMENTED, SOURCE_TASK_COMMENT, comment_id, project_id, user_id, created_at,
+        task_id=task_id, comment_body=body[:COMMENT_PREVIEW_LENGTH],
+    )
+
+
+def asset_created_fields(asset_id, task_id, project_id, owner_id, status, created_at):
+    return _fields(
+        EventType.ASSET_CREATED, SOURCE_ASSET, asset_id, project_id, owner_id, created_at,
+        task_id=task_id, status=status,
+    )
+
+
+def asset_transition_fields(transition_id, asset_id, task_id, project_id, triggered_by_id, from_state, to_state, timestamp):
+    return _fields(
+        EventType.ASSET_STATUS_CHANGED, SOURCE_ASSET_TRANSITION, transition_id, project_id, triggered_by_id, timestamp,
+        task_id=task_id, asset_id=asset_id, from_status=from_state, to_status=to_state,
+    )
+
+
+def decision_created_fields(decision_id, project_id, author_id, title, status, created_at):
+    return _fields(
+        EventType.DECISION_CREATED, SOURCE_DECISION, decision_id, project_id, author_id, created_at,
+        title=title, status=status,
+    )
+
+
+def decision_status_fields(decision_id, project_id, actor_id, title, from_status, to_status, changed_at):
+    return _fields(
+        EventType.DECISION_STATUS_CHANGED, SOURCE_DECISION, decision_id, project_id, actor_id, changed_at,
+        title=title, from_status=from_status, to_status=to_status,
+    )
+
+
+# (app label, model, columns, builder) for each source with history to backfill.
+# Decisions have no status history, so only their creation is backfilled.
+BACKFILL_SOURCES = (
+    ('task', 'Task', ('id', 'project_id', 'owner_id', 'created_at'), task_created_fields),
+    ('task', 'ApprovalRecord',
+     ('id', 'task_id', 'task__project_id', 'approved_by_id', 'is_approved', 'decided_time'), approval_fields),
+    ('task', 'TaskComment',
+     ('id', 'task_id', 'task__project_id', 'user_id', 'body', 'created_at'), comment_fields),
+    ('asset', 'Asset',
+     ('id', 'task_id', 'task__project_id', 'owner_id', 'status', 'created_at'), asset_created_fields),
+    ('asset', 'AssetStateTransition',
+     ('id', 'asset_id', 'asset__task_id', 'asset__task__project_id', 'triggered_by_id',
+      'from_state', 'to_state', 'timestamp'), asset_transition_fields),
+    ('decision', 'Decision',
+     ('id', 'project_id', 'author_id', 'title', 'status', 'created_at'), decision_created_fields),
+)
+
+
+def backfill_activity(apps, batch_size=1000):
+    """Record events for existing source rows. `apps` is an app registry (the migration's or django.apps.apps)."""
+    event_model = apps.get_model('dashboard', 'ActivityEvent')
+    created = 0
+    for app_label, model_name, columns, build in BACKFILL_SOURCES:
+        rows = (
+            apps.get_model(app_label, model_name).objects.order_by()
+            .values_list(*columns)
+            .iterator(chunk_size=batch_size)
+        )
+        batch = []
+        for row in rows:
+            batch.append(event_model(**build(*row)))
+            if len(batch) >= batch_size:
+                event_model.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            event_model.objects.bulk_create(batch)
+            created += len(batch)
+    return created
+
+
+# -----------------------------
+# Writes
+# -----------------------------
+def record_event(fields):
+    """Append an event; it is broadcast once the surrounding transaction commits."""
+    event = ActivityEvent.objects.create(**fields)
+    if settings.ACTIVITY_STREAM_BROADCAST and event.project_id:
+        transaction.on_commit(lambda: broadcast_event(event))
+    return event
+
+
+def move_task_events(task_id, project_id):
+    """Point a task's events at the project it moved to."""
+    return ActivityEvent.objects.filter(task_id=task_id).update(project_id=project_id)
+
+
+def broadcast_event(event):
+    """Send an event to its project's websocket group. Failures are logged, never raised."""
+    from .serializers import ActivityFeedEventSerializer
+
+    try:
+        data = ActivityFeedEventSerializer(event_data(event)).data
+        async_to_sync(get_channel_layer().group_send)(
+            project_group_name(event.project_id),
+            {'type': 'activity.event', 'event': data},
+        )
+    except Exception:
+        logger.warning(f"Failed to broadcast activity event {event.pk}", exc_info=True)
+
+
+# -----------------------------
+# Reads
+# -----------------------------
+def human_readable_time(timestamp, now=None):
+    """Convert timestamp to human-readable format (e.g., 'less than a minute ago')"""
+    now = now or timezone.now()
+    seconds = (now - timestamp).total_seconds()
+
+    if seconds < 60:
+        return 'less than a minute ago'
+    elif seconds < 3600:
+        minutes = int(seconds / 60)
+        return f'{minutes} minute{"s" if minutes > 1 else ""} ago'
+    elif seconds < 86400:
+        hours = int(seconds / 3600)
+        return f'{hours} hour{"s" if hours > 1 else ""} ago'
+    elif seconds < 604800:
+        days = int(seconds / 86400)
+        return f'{days} day{"s" if days > 1 else ""} ago'
+    elif seconds < 2592000:
+        weeks = int(seconds / 604800)
+        return f'{weeks} week{"s" if weeks > 1 else ""} ago'
+    else:
+        months = int(seconds / 2592000)
+        return f'{months} month{"s" if months > 1 else ""} ago'
+
+
+def event_data(event, now=None):
+    """
+    Feed item for an event. Approval and comment events also carry
+    is_approved / comment_body at the top level, as the dashboard expects.
+    """
+    data = {
+        'id': f'{event.event_type}_{event.source_id}',
+        'event_type': event.event_type,
+        'project_id': event.project_id,
+        'user': event.actor,
+        'task': event.task,
+        'timestamp': event.created_at,
+        'human_readable': human_readable_time(event.created_at, now),
+        'payload': event.payload,
+    }
+    for key in ('is_approved', 'comment_body'):
+        if key in event.payload:
+            data[key] = event.payload[key]
+    return data
+
+
+def _events():
+    return ActivityEvent.objects.select_related('actor', 'task__project').order_by('-created_at', '-id')
+
+
+def recent_task_activity(project_id=None, limit=20):
+    """Latest task events that have both a user and a task, newest first."""
+    events = _events().filter(event_type__in=TASK_EVENT_TYPES, actor__isnull=False, task__isnull=False)
+    if project_id:
+        events = events.filter(project_id=project_id)
+    now = timezone.now()
+    return [event_data(event, now) for event in events[:limit]]
+
+
+def activity_page(project_ids, actor_id=None, event_types=None, cursor=None, limit=20):
+    """
+    One page of events in the given projects, newest first.
+
+    Args:
+        project_ids: Projects whose events may be returned
+        actor_id: Only events by this user (per-user feed)
+        event_types: Only these event types
+        cursor: Opaque cursor returned as next_cursor by the previous page
+        limit: Page size
+
+    Returns:
+        (items, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    events = _events().filter(project_id__in=project_ids)
+    if actor_id:
+        events = events.filter(actor_id=actor_id)
+    if event_types:
+        events = events.filter(event_type__in=event_types)
+    if cursor:
+        created_at, event_id = decode_cursor(cursor)
+        events = events.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=event_id))
+
+    events = list(events[:limit + 1])
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_cursor = encode_cursor(events[-1].created_at, events[-1].id)
+    now = timezone.now()
+    return [event_data(event, now) for event in events], next_cursor
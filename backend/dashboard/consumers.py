@@ -0,0 +1,66 @@
+import json
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from django.contrib.auth.models import AnonymousUser
+
+from core.models import ProjectMember
+from .activity import project_group_name
+
+
+class ActivityConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket consumer for a project's live activity stream.
+    Active project members receive every ActivityEvent recorded for the
+    project while ACTIVITY_STREAM_BROADCAST is on.
+    """
+
+    async def connect(self):
+        """Handle WebSocket connection"""
+        self.project_id = int(self.scope['url_route']['kwargs']['project_id'])
+        self.room_group_name = project_group_name(self.project_id)
+
+        user = self.scope['user']
+        if isinstance(user, AnonymousUser) or not await self.is_member(user):
+            await self.close()
+            return
+
+        await self.channel_layer.group_add(
+            self.room_group_name,
+            self.channel_name
+        )
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        """Handle WebSocket disconnection"""
+        if hasattr(self, 'room_group_name'):
+            await self.channel_layer.group_discard(
+                self.room_group_name,
+                self.channel_name
+            )
+
+    async def receive(self, text_data):
+        """Answer keep-alive pings; the stream is server to client only"""
+        try:
+            message = json.loads(text_data)
+        except json.JSONDecodeError:
+            return
+        if message.get('type') == 'ping':
+            await self.send(text_data=json.dumps({
+                'type': 'pong',
+                'timestamp': message.get('timestamp')
+            }))
+
+    @database_sync_to_async
+    def is_member(self, user):
+        return ProjectMember.objects.filter(
+            user=user,
+            project_id=self.project_id,
+            is_active=True
+        ).exists()
+
+    async def activity_event(self, event):
+        """Forward a recorded activity event"""
+        await self.send(text_data=json.dumps({
+            'type': 'activity_event',
+            'event': event['event']
+        }))
@@ -0,0 +1,100 @@
+# Generated by Django 4.2.23 on 2026-10-16 14:00
+
+from collections import Counter
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+# Frozen copy of dashboard.summary's aggregation as of this migration, so
+# later changes to the live module cannot change what the backfill writes.
+TASK_FIELDS = ('status', 'priority', 'type', 'created_at', 'updated_at', 'due_date')
+DONE_STATUSES = ('APPROVED', 'LOCKED')
+CLOSED_STATUSES = ('APPROVED', 'LOCKED', 'CANCELLED')
+WINDOW = timedelta(days=7)
+
+
+def _hour_key(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H')
+
+
+def _contributions(task):
+    pairs = [
+        ('status_counts', task['status']),
+        ('priority_counts', task['priority']),
+        ('type_counts', task['type']),
+        ('created_buckets', _hour_key(task['created_at'])),
+        ('updated_buckets', _hour_key(task['updated_at'])),
+    ]
+    if task['status'] in DONE_STATUSES:
+        pairs.append(('completed_buckets', _hour_key(task['updated_at'])))
+    if task['due_date'] and task['status'] not in CLOSED_STATUSES:
+        pairs.append(('due_buckets', task['due_date'].isoformat()))
+    return pairs
+
+
+def _summary_fields(tasks, now):
+    counters = {
+        field: Counter() for field in (
+            'status_counts', 'priority_counts', 'type_counts',
+            'created_buckets', 'updated_buckets', 'completed_buckets', 'due_buckets',
+        )
+    }
+    total = 0
+    for task in tasks:
+        total += 1
+        for field, key in _contributions(task):
+            counters[field][key] += 1
+
+    hour_floor = _hour_key(now - WINDOW - timedelta(hours=1))
+    date_floor = now.date().isoformat()
+    fields = {'total': total, 'rebuilt_at': now}
+    for field, counter in counters.items():
+        if field.endswith('_buckets'):
+            floor = date_floor if field == 'due_buckets' else hour_floor
+            counter = {key: count for key, count in counter.items() if key >= floor}
+        fields[field] = dict(counter)
+    return fields
+
+
+def backfill_summaries(apps, schema_editor):
+    Task = apps.get_model('task', 'Task')
+    DashboardSummary = apps.get_model('dashboard', 'DashboardSummary')
+    now = timezone.now()
+    project_ids = Task.objects.order_by().values_list('project_id', flat=True).distinct()
+    for project_id in project_ids:
+        tasks = Task.objects.filter(project_id=project_id).values(*TASK_FIELDS).iterator()
+        DashboardSummary.objects.create(project_id=project_id, **_summary_fields(tasks, now))
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('task', '0005_alter_approvalrecord_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(default=0)),
+                ('status_counts', models.JSONField(blank=True, default=dict)),
+                ('priority_counts', models.JSONField(blank=True, default=dict)),
+                ('type_counts', models.JSONField(blank=True, default=dict)),
+                ('created_buckets', models.JSONField(blank=True, default=dict, help_text='Tasks created per UTC hour')),
+                ('updated_buckets', models.JSONField(blank=True, default=dict, help_text='Tasks last updated per UTC hour')),
+                ('completed_buckets', models.JSONField(blank=True, default=dict, help_text='Approved/locked tasks per UTC hour of last update')),
+                ('due_buckets', models.JSONField(blank=True, default=dict, help_text='Open tasks per due date')),
+                ('rebuilt_at', models.DateTimeField(blank=True, help_text='Last full recompute from Task', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_summary', to='core.project')),
+            ],
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
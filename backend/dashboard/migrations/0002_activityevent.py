@@ -0,0 +1,136 @@
+# Generated by Django 4.2.23 on 2026-10-16 16:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+# Frozen copy of dashboard.activity's event builders as of this migration;
+# importing the live module would also pull in chat and channels.
+COMMENT_PREVIEW_LENGTH = 100
+BATCH_SIZE = 1000
+
+
+def _fields(event_type, source_type, source_id, project_id, actor_id, created_at, task_id=None, **payload):
+    return {
+        'event_type': event_type,
+        'source_type': source_type,
+        'source_id': source_id,
+        'project_id': project_id,
+        'actor_id': actor_id,
+        'task_id': task_id,
+        'created_at': created_at,
+        'payload': payload,
+    }
+
+
+def _task_created(task_id, project_id, owner_id, created_at):
+    return _fields('task_created', 'task', task_id, project_id, owner_id, created_at, task_id=task_id)
+
+
+def _approval(record_id, task_id, project_id, approved_by_id, is_approved, decided_time):
+    return _fields(
+        'approved' if is_approved else 'rejected', 'approval_record', record_id, project_id, approved_by_id,
+        decided_time, task_id=task_id, is_approved=is_approved,
+    )
+
+
+def _comment(comment_id, task_id, project_id, user_id, body, created_at):
+    return _fields(
+        'commented', 'task_comment', comment_id, project_id, user_id, created_at,
+        task_id=task_id, comment_body=body[:COMMENT_PREVIEW_LENGTH],
+    )
+
+
+def _asset_created(asset_id, task_id, project_id, owner_id, status, created_at):
+    return _fields(
+        'asset_created', 'asset', asset_id, project_id, owner_id, created_at,
+        task_id=task_id, status=status,
+    )
+
+
+def _asset_transition(transition_id, asset_id, task_id, project_id, triggered_by_id, from_state, to_state, timestamp):
+    return _fields(
+        'asset_status_changed', 'asset_state_transition', transition_id, project_id, triggered_by_id, timestamp,
+        task_id=task_id, asset_id=asset_id, from_status=from_state, to_status=to_state,
+    )
+
+
+def _decision_created(decision_id, project_id, author_id, title, status, created_at):
+    return _fields(
+        'decision_created', 'decision', decision_id, project_id, author_id, created_at,
+        title=title, status=status,
+    )
+
+
+BACKFILL_SOURCES = (
+    ('task', 'Task', ('id', 'project_id', 'owner_id', 'created_at'), _task_created),
+    ('task', 'ApprovalRecord',
+     ('id', 'task_id', 'task__project_id', 'approved_by_id', 'is_approved', 'decided_time'), _approval),
+    ('task', 'TaskComment',
+     ('id', 'task_id', 'task__project_id', 'user_id', 'body', 'created_at'), _comment),
+    ('asset', 'Asset',
+     ('id', 'task_id', 'task__project_id', 'owner_id', 'status', 'created_at'), _asset_created),
+    ('asset', 'AssetStateTransition',
+     ('id', 'asset_id', 'asset__task_id', 'asset__task__project_id', 'triggered_by_id',
+      'from_state', 'to_state', 'timestamp'), _asset_transition),
+    ('decision', 'Decision',
+     ('id', 'project_id', 'author_id', 'title', 'status', 'created_at'), _decision_created),
+)
+
+
+def backfill_activity(apps, schema_editor):
+    ActivityEvent = apps.get_model('dashboard', 'ActivityEvent')
+    for app_label, model_name, columns, build in BACKFILL_SOURCES:
+        rows = (
+            apps.get_model(app_label, model_name).objects.order_by()
+            .values_list(*columns)
+            .iterator(chunk_size=BATCH_SIZE)
+        )
+        batch = []
+        for row in rows:
+            batch.append(ActivityEvent(**build(*row)))
+            if len(batch) >= BATCH_SIZE:
+                ActivityEvent.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            ActivityEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('asset', '0003_initial'),
+        ('core', '0001_initial'),
+        ('decision', '0004_merge_predraft_migrations'),
+        ('task', '0005_alter_approvalrecord_options_and_more'),
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('task_created', 'Task created'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('commented', 'Commented'), ('asset_created', 'Asset created'), ('asset_status_changed', 'Asset status changed'), ('decision_created', 'Decision created'), ('decision_status_changed', 'Decision status changed')], max_length=32)),
+                ('source_type', models.CharField(help_text="Model the event was recorded from, e.g. 'task_comment'", max_length=32)),
+                ('source_id', models.PositiveBigIntegerField()),
+                ('payload', models.JSONField(blank=True, default=dict, help_text='Event specific fields, e.g. comment_body')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activity_events', to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to='core.project')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to='task.task')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [
+                    models.Index(fields=['project', '-created_at', '-id'], name='activity_project_created_idx'),
+                    models.Index(fields=['actor', '-created_at', '-id'], name='activity_actor_created_idx'),
+                    models.Index(fields=['-created_at', '-id'], name='activity_created_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_activity, migrations.RunPython.noop),
+    ]
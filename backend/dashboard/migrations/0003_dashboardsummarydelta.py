@@ -0,0 +1,24 @@
+# Generated by Django 4.2.23 on 2026-10-16 18:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_activityevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSummaryDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(default=0)),
+                ('changes', models.JSONField(default=dict, help_text='Count change per summary field and key')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('summary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_deltas', to='dashboard.dashboardsummary')),
+            ],
+        ),
+    ]
@@ -1,2 +1,119 @@
-# Dashboard app doesn't need its own models
-# It will use existing Task, ApprovalRecord, and TaskComment models
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from core.models import Project
+
+
+class DashboardSummary(models.Model):
+    """
+    Materialized task aggregates for one project's dashboard.
+
+    Kept current by Task signals (see dashboard.summary) and rebuilt nightly.
+    Bucket fields map a UTC hour ('YYYY-MM-DDTHH') or due date to a task count
+    and only hold keys inside the rolling window.
+    """
+    project = models.OneToOneField(
+        Project,
+        on_delete=models.CASCADE,
+        related_name='dashboard_summary',
+    )
+    total = models.IntegerField(default=0)
+    status_counts = models.JSONField(default=dict, blank=True)
+    priority_counts = models.JSONField(default=dict, blank=True)
+    type_counts = models.JSONField(default=dict, blank=True)
+    created_buckets = models.JSONField(default=dict, blank=True, help_text="Tasks created per UTC hour")
+    updated_buckets = models.JSONField(default=dict, blank=True, help_text="Tasks last updated per UTC hour")
+    completed_buckets = models.JSONField(default=dict, blank=True, help_text="Approved/locked tasks per UTC hour of last update")
+    due_buckets = models.JSONField(default=dict, blank=True, help_text="Open tasks per due date")
+    rebuilt_at = models.DateTimeField(null=True, blank=True, help_text="Last full recompute from Task")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Dashboard summary for project {self.project_id}"
+
+
+class DashboardSummaryDelta(models.Model):
+    """
+    One task write's change to a DashboardSummary, not yet folded into it.
+
+    Task writes only insert these, so concurrent saves in a project do not
+    queue on its summary row. The foreign key check takes a key-share lock
+    on the row, which conflicts with the row lock held by a fold or rebuild
+    (see dashboard.summary): those never see a delta without the task
+    change it describes, or the other way round.
+    """
+    summary = models.ForeignKey(
+        DashboardSummary,
+        on_delete=models.CASCADE,
+        related_name='pending_deltas',
+    )
+    total = models.IntegerField(default=0)
+    changes = models.JSONField(default=dict, help_text="Count change per summary field and key")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Pending delta for dashboard summary {self.summary_id}"
+
+
+class ActivityEvent(models.Model):
+    """
+    Append-only log of user-visible activity, written by model signals
+    (see dashboard.activity) and read newest first by the dashboard and
+    activity feeds.
+
+    created_at is the source's own timestamp (task creation, approval
+    decision, comment time...). Events go away only with their project or
+    task, as the source rows they describe do; when a task moves to another
+    project its events move with it.
+    """
+    class EventType(models.TextChoices):
+        TASK_CREATED = 'task_created', 'Task created'
+        APPROVED = 'approved', 'Approved'
+        REJECTED = 'rejected', 'Rejected'
+        COMMENTED = 'commented', 'Commented'
+        ASSET_CREATED = 'asset_created', 'Asset created'
+        ASSET_STATUS_CHANGED = 'asset_status_changed', 'Asset status changed'
+        DECISION_CREATED = 'decision_created', 'Decision created'
+        DECISION_STATUS_CHANGED = 'decision_status_changed', 'Decision status changed'
+
+    # project and actor lookups are served by the composite indexes below
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name='activity_events',
+        null=True,
+        blank=True,
+        db_index=False,
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='activity_events',
+        null=True,
+        blank=True,
+        db_index=False,
+    )
+    event_type = models.CharField(max_length=32, choices=EventType.choices)
+    task = models.ForeignKey(
+        'task.Task',
+        on_delete=models.CASCADE,
+        related_name='activity_events',
+        null=True,
+        blank=True,
+    )
+    source_type = models.CharField(max_length=32, help_text="Model the event was recorded from, e.g. 'task_comment'")
+    source_id = models.PositiveBigIntegerField()
+    payload = models.JSONField(default=dict, blank=True, help_text="Event specific fields, e.g. comment_body")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['project', '-created_at', '-id'], name='activity_project_created_idx'),
+            models.Index(fields=['actor', '-created_at', '-id'], name='activity_actor_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='activity_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.source_type}:{self.source_id}"
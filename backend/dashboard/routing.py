@@ -0,0 +1,6 @@
+from django.urls import re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    re_path(r'ws/activity/projects/(?P<project_id>\d+)/$', consumers.ActivityConsumer.as_asgi()),
+]
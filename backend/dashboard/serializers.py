@@ -45,6 +45,14 @@ class ActivityEventSerializer(serializers.Serializer):
     comment_body = serializers.CharField(required=False, allow_null=True)
 
 
+class ActivityFeedEventSerializer(ActivityEventSerializer):
+    """Serializer for activity stream events, which may have no user or task"""
+    project_id = serializers.IntegerField(allow_null=True)
+    user = DashboardUserSerializer(allow_null=True)
+    task = DashboardTaskSerializer(allow_null=True)
+    payload = serializers.JSONField()
+
+
 class StatusBreakdownSerializer(serializers.Serializer):
     """Serializer for status breakdown data"""
     status = serializers.CharField()
@@ -0,0 +1,156 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from asset.models import Asset, AssetStateTransition
+from decision.models import Decision
+from task.models import ApprovalRecord, Task, TaskComment
+
+from . import activity
+from .summary import TASK_FIELDS, apply_task_change
+
+# update_fields names for the snapshot attributes
+_FIELD_NAMES = {'project_id': 'project'}
+
+
+def _snapshot(task):
+    return {field: getattr(task, field) for field in TASK_FIELDS}
+
+
+@receiver(pre_save, sender=Task)
+def capture_dashboard_snapshot(sender, instance, raw=False, **kwargs):
+    """
+    Remember the stored row so post_save can move its counts. Task.save runs
+    in a transaction, so the row stays locked until the delta is applied and
+    concurrent saves of the same task cannot both start from one snapshot.
+    """
+    if raw or instance._state.adding or instance.pk is None:
+        instance._dashboard_snapshot = None
+        return
+    instance._dashboard_snapshot = (
+        Task.objects.select_for_update().filter(pk=instance.pk).values(*TASK_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=Task)
+def update_dashboard_summary(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    Apply a task write (including FSM status transitions, which persist
+    through save) to its project's DashboardSummary.
+    """
+    if raw:
+        return
+    old = None if created else getattr(instance, '_dashboard_snapshot', None)
+    new = _snapshot(instance)
+    if old is not None and update_fields is not None:
+        # Fields left out of update_fields were not written
+        for field in TASK_FIELDS:
+            if _FIELD_NAMES.get(field, field) not in update_fields:
+                new[field] = old[field]
+    instance._dashboard_snapshot = None
+    apply_task_change(old, new)
+    if old is not None and old['project_id'] != new['project_id']:
+        # The task's events follow it, so project feeds stay in step with its tasks
+        activity.move_task_events(instance.pk, new['project_id'])
+
+
+@receiver(post_delete, sender=Task)
+def remove_from_dashboard_summary(sender, instance, **kwargs):
+    apply_task_change(_snapshot(instance), None)
+
+
+# -----------------------------
+# Activity stream
+# -----------------------------
+def _task_project_id(task):
+    return task.project_id if task is not None else None
+
+
+@receiver(post_save, sender=Task)
+def record_task_created(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    activity.record_event(activity.task_created_fields(
+        instance.id, instance.project_id, instance.owner_id, instance.created_at,
+    ))
+
+
+@receiver(post_save, sender=ApprovalRecord)
+def record_approval(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    activity.record_event(activity.approval_fields(
+        instance.id, instance.task_id, _task_project_id(instance.task),
+        instance.approved_by_id, instance.is_approved, instance.decided_time,
+    ))
+
+
+@receiver(post_save, sender=TaskComment)
+def record_comment(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    activity.record_event(activity.comment_fields(
+        instance.id, instance.task_id, _task_project_id(instance.task),
+        instance.user_id, instance.body, instance.created_at,
+    ))
+
+
+@receiver(post_save, sender=Asset)
+def record_asset_created(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    activity.record_event(activity.asset_created_fields(
+        instance.id, instance.task_id, _task_project_id(instance.task),
+        instance.owner_id, instance.status, instance.created_at,
+    ))
+
+
+@receiver(post_save, sender=AssetStateTransition)
+def record_asset_transition(sender, instance, created, raw=False, **kwargs):
+    """Asset status changes are recorded from their audit rows, which know who triggered them."""
+    if raw or not created:
+        return
+    asset = instance.asset
+    activity.record_event(activity.asset_transition_fields(
+        instance.id, asset.id, asset.task_id, _task_project_id(asset.task), instance.triggered_by_id,
+        instance.from_state, instance.to_state, instance.timestamp,
+    ))
+
+
+def _decision_actor_id(decision):
+    """The user behind a decision's latest status change, falling back to its author."""
+    by_status = {
+        Decision.Status.AWAITING_APPROVAL: decision.committed_by_id,
+        Decision.Status.COMMITTED: decision.approved_by_id or decision.committed_by_id,
+    }
+    return by_status.get(decision.status) or decision.last_edited_by_id or decision.author_id
+
+
+@receiver(pre_save, sender=Decision)
+def capture_decision_status(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance.pk is None:
+        instance._activity_old_status = None
+        return
+    instance._activity_old_status = (
+        Decision.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Decision)
+def record_decision(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if created:
+        activity.record_event(activity.decision_created_fields(
+            instance.id, instance.project_id, instance.author_id,
+            instance.title, instance.status, instance.created_at,
+        ))
+        return
+    old_status = getattr(instance, '_activity_old_status', None)
+    instance._activity_old_status = None
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    if old_status is not None and old_status != instance.status:
+        activity.record_event(activity.decision_status_fields(
+            instance.id, instance.project_id, _decision_actor_id(instance),
+            instance.title, old_status, instance.status, instance.updated_at,
+        ))
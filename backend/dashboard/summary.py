@@ -0,0 +1,296 @@
+"""
+Materialized dashboard aggregates (DashboardSummary), one row per project.
+
+A row holds task counts by status, priority and type, plus buckets for the
+rolling time metrics: created, updated and completed tasks per UTC hour,
+and open tasks per due date. Task saves record their change as a pending
+DashboardSummaryDelta instead of rewriting the project's row, so busy
+projects do not serialize on it; reads add pending deltas to the row and
+fold_summary_deltas (periodic) moves them into it. Deletes adjust the row
+directly. rebuild_dashboard_summaries recomputes every row from Task
+nightly and repairs anything written around the ORM (queryset.update).
+
+Rolling windows are summed from whole hour buckets, so a window boundary
+is accurate to the hour.
+"""
+from collections import Counter
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from task.models import Task
+
+from .models import DashboardSummary, DashboardSummaryDelta
+
+# Fields a task's contribution is derived from
+TASK_FIELDS = ('project_id', 'status', 'priority', 'type', 'created_at', 'updated_at', 'due_date')
+
+COUNT_FIELDS = ('status_counts', 'priority_counts', 'type_counts')
+BUCKET_FIELDS = ('created_buckets', 'updated_buckets', 'completed_buckets', 'due_buckets')
+
+DONE_STATUSES = (Task.Status.APPROVED, Task.Status.LOCKED)
+CLOSED_STATUSES = (Task.Status.APPROVED, Task.Status.LOCKED, Task.Status.CANCELLED)
+
+WINDOW = timedelta(days=7)
+
+_HOUR_FORMAT = '%Y-%m-%dT%H'
+
+
+def _hour_key(value):
+    return value.astimezone(dt_timezone.utc).strftime(_HOUR_FORMAT)
+
+
+def contributions(task):
+    """(field, key) pairs a task snapshot (dict of TASK_FIELDS) counts towards."""
+    pairs = [
+        ('status_counts', task['status']),
+        ('priority_counts', task['priority']),
+        ('type_counts', task['type']),
+        ('created_buckets', _hour_key(task['created_at'])),
+        ('updated_buckets', _hour_key(task['updated_at'])),
+    ]
+    if task['status'] in DONE_STATUSES:
+        pairs.append(('completed_buckets', _hour_key(task['updated_at'])))
+    if task['due_date'] and task['status'] not in CLOSED_STATUSES:
+        pairs.append(('due_buckets', task['due_date'].isoformat()))
+    return pairs
+
+
+def _bucket_floor(now):
+    """Oldest hour and due date keys still worth keeping."""
+    return _hour_key(now - WINDOW - timedelta(hours=1)), now.date().isoformat()
+
+
+def _prune(summary, now):
+    hour_floor, date_floor = _bucket_floor(now)
+    for field in BUCKET_FIELDS:
+        floor = date_floor if field == 'due_buckets' else hour_floor
+        buckets = getattr(summary, field)
+        setattr(summary, field, {key: count for key, count in buckets.items() if key >= floor and count > 0})
+
+
+def summary_fields(tasks, now=None):
+    """DashboardSummary field values for an iterable of task snapshots."""
+    now = now or timezone.now()
+    counters = {field: Counter() for field in COUNT_FIELDS + BUCKET_FIELDS}
+    total = 0
+    for task in tasks:
+        total += 1
+        for field, key in contributions(task):
+            counters[field][key] += 1
+
+    hour_floor, date_floor = _bucket_floor(now)
+    fields = {'total': total, 'rebuilt_at': now}
+    for field, counter in counters.items():
+        if field in BUCKET_FIELDS:
+            floor = date_floor if field == 'due_buckets' else hour_floor
+            counter = {key: count for key, count in counter.items() if key >= floor}
+        fields[field] = dict(counter)
+    return fields
+
+
+def _apply_changes(summary, total, changes, now):
+    """Add a delta ({field: {key: change}}) to a summary row in memory."""
+    summary.total += total
+    for field, keys in changes.items():
+        counts = getattr(summary, field)
+        for key, change in keys.items():
+            counts[key] = counts.get(key, 0) + change
+    for field in COUNT_FIELDS:
+        setattr(summary, field, {key: count for key, count in getattr(summary, field).items() if count > 0})
+    _prune(summary, now)
+
+
+def rebuild_project_summary(project_id, now=None):
+    """
+    Recompute one project's row from its tasks and drop its pending deltas.
+
+    Call inside a transaction: the row is locked, so no delta can be added
+    between the Task read and the drop.
+    """
+    # get_or_create retries the lookup when a concurrent first write wins the insert
+    summary, _ = DashboardSummary.objects.get_or_create(project_id=project_id)
+    summary = DashboardSummary.objects.select_for_update().get(pk=summary.pk)
+    tasks = Task.objects.filter(project_id=project_id).values(*TASK_FIELDS).iterator()
+    for field, value in summary_fields(tasks, now=now).items():
+        setattr(summary, field, value)
+    summary.save()
+    summary.pending_deltas.all().delete()
+    return summary
+
+
+def rebuild_dashboard_summaries(now=None):
+    """
+    Recompute the rows of every project with tasks. Rows of projects
+    without any are emptied rather than dropped: a task write that is not
+    committed yet may be adding a delta to them.
+    """
+    project_ids = set(Task.objects.order_by().values_list('project_id', flat=True).distinct())
+    project_ids.update(DashboardSummary.objects.values_list('project_id', flat=True))
+    for project_id in sorted(project_ids):
+        with transaction.atomic():
+            rebuild_project_summary(project_id, now=now)
+    invalidate_cached_summaries(project_ids)
+    return {'projects': len(project_ids)}
+
+
+def fold_summary_deltas(now=None):
+    """Move pending deltas into their rows, one locked row at a time."""
+    now = now or timezone.now()
+    summary_ids = set(DashboardSummaryDelta.objects.order_by().values_list('summary_id', flat=True).distinct())
+    for summary_id in sorted(summary_ids):
+        with transaction.atomic():
+            summary = DashboardSummary.objects.select_for_update().filter(pk=summary_id).first()
+            if summary is None:
+                continue
+            deltas = list(summary.pending_deltas.values_list('id', 'total', 'changes'))
+            for _, total, changes in deltas:
+                _apply_changes(summary, total, changes, now)
+            summary.save()
+            DashboardSummaryDelta.objects.filter(id__in=[delta_id for delta_id, _, _ in deltas]).delete()
+    return {'summaries': len(summary_ids)}
+
+
+def apply_task_change(old, new):
+    """
+    Move a task's counts from its old snapshot to its new one (either may be None).
+
+    Runs inside the transaction that wrote the task (Task.save and deletes
+    are atomic). Saves add a pending delta per project; a project without a
+    row yet is rebuilt from Task instead. Deletes adjust the locked row
+    directly, since a delta added during a project's cascade would outlive
+    its row; a project without a row is left alone there (the row may be
+    going away with its project).
+    """
+    now = timezone.now()
+    pairs = {}
+    for snapshot, sign in ((old, -1), (new, 1)):
+        if snapshot is None:
+            continue
+        project_pairs = pairs.setdefault(snapshot['project_id'], Counter())
+        project_pairs['total'] += sign
+        for pair in contributions(snapshot):
+            project_pairs[pair] += sign
+
+    # project_id -> (total change, {field: {key: change}})
+    deltas = {}
+    for project_id, project_pairs in pairs.items():
+        total = project_pairs.pop('total')
+        changes = {}
+        for (field, key), change in project_pairs.items():
+            if change:
+                changes.setdefault(field, {})[key] = change
+        if total or changes:
+            deltas[project_id] = (total, changes)
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        summary_ids = dict(
+            DashboardSummary.objects.filter(project_id__in=deltas).values_list('project_id', 'id')
+        )
+        pending = []
+        for project_id, (total, changes) in sorted(deltas.items()):
+            if project_id not in summary_ids:
+                if new is not None and new['project_id'] == project_id:
+                    rebuild_project_summary(project_id, now=now)
+            elif new is not None:
+                pending.append(DashboardSummaryDelta(summary_id=summary_ids[project_id], total=total, changes=changes))
+            else:
+                summary = DashboardSummary.objects.select_for_update().get(pk=summary_ids[project_id])
+                _apply_changes(summary, total, changes, now)
+                summary.save()
+        DashboardSummaryDelta.objects.bulk_create(pending)
+    invalidate_cached_summaries(deltas)
+
+
+# -----------------------------
+# Reads
+# -----------------------------
+def _cache_key(project_id):
+    return f"dashboard:summary:{project_id or 'all'}"
+
+
+def invalidate_cached_summaries(project_ids):
+    timeout = settings.DASHBOARD_SUMMARY_CACHE_TIMEOUT
+    if not timeout:
+        return
+    keys = [_cache_key(project_id) for project_id in project_ids] + [_cache_key(None)]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _sum_window(buckets, start, end=None):
+    return sum(count for key, count in buckets.items() if key >= start and (end is None or key <= end))
+
+
+def read_summary(project_id=None, now=None):
+    """
+    Merged aggregates for one project (or all projects) with the rolling
+    windows evaluated at `now`.
+
+    Returns {'total', 'status_counts', 'priority_counts', 'type_counts',
+    'time_metrics'}. One query (rows joined to their pending deltas, so a
+    concurrent fold is seen either fully or not at all), or none when served
+    from the cache (DASHBOARD_SUMMARY_CACHE_TIMEOUT seconds; 0 disables it).
+    """
+    timeout = settings.DASHBOARD_SUMMARY_CACHE_TIMEOUT
+    if timeout:
+        cached = cache.get(_cache_key(project_id))
+        if cached is not None:
+            return cached
+
+    rows = DashboardSummary.objects.all()
+    if project_id is not None:
+        rows = rows.filter(project_id=project_id)
+    rows = list(rows.values(
+        'id', 'total', *COUNT_FIELDS, *BUCKET_FIELDS, 'pending_deltas__total', 'pending_deltas__changes',
+    ))
+    if project_id is not None and not rows and Task.objects.filter(project_id=project_id).exists():
+        # Tasks written before the row existed; normally built by the migration
+        with transaction.atomic():
+            summary = rebuild_project_summary(project_id)
+        rows = [{
+            'id': summary.pk,
+            **{field: getattr(summary, field) for field in ('total',) + COUNT_FIELDS + BUCKET_FIELDS},
+            'pending_deltas__total': None,
+            'pending_deltas__changes': None,
+        }]
+
+    merged = {field: Counter() for field in COUNT_FIELDS + BUCKET_FIELDS}
+    total = 0
+    seen = set()
+    for row in rows:
+        # A row repeats once per pending delta
+        if row['id'] not in seen:
+            seen.add(row['id'])
+            total += row['total']
+            for field in merged:
+                merged[field].update(row[field])
+        if row['pending_deltas__changes'] is not None:
+            total += row['pending_deltas__total']
+            for field, changes in row['pending_deltas__changes'].items():
+                merged[field].update(changes)
+
+    now = now or timezone.now()
+    since = _hour_key(now - WINDOW)
+    today = now.date()
+    result = {
+        'total': total,
+        'status_counts': {key: count for key, count in merged['status_counts'].items() if count > 0},
+        'priority_counts': {key: count for key, count in merged['priority_counts'].items() if count > 0},
+        'type_counts': {key: count for key, count in merged['type_counts'].items() if count > 0},
+        'time_metrics': {
+            'completed_last_7_days': _sum_window(merged['completed_buckets'], since),
+            'updated_last_7_days': _sum_window(merged['updated_buckets'], since),
+            'created_last_7_days': _sum_window(merged['created_buckets'], since),
+            'due_soon': _sum_window(
+                merged['due_buckets'], today.isoformat(), (today + WINDOW).isoformat(),
+            ),
+        },
+    }
+    if timeout:
+        cache.set(_cache_key(project_id), result, timeout)
+    return result
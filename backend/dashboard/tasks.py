@@ -0,0 +1,38 @@
+import logging
+
+from celery import shared_task
+
+from .summary import fold_summary_deltas as _fold_summary_deltas
+from .summary import rebuild_dashboard_summaries as _rebuild_dashboard_summaries
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def rebuild_dashboard_summaries():
+    """
+    Celery periodic task to recompute every project's DashboardSummary.
+
+    Task writes keep the rows current through signals; this drops buckets
+    that left the rolling window and repairs writes made around the ORM.
+    """
+    try:
+        stats = _rebuild_dashboard_summaries()
+        logger.info(f"Rebuilt dashboard summaries for {stats['projects']} projects")
+        return stats
+    except Exception as e:
+        logger.error(f"Error rebuilding dashboard summaries: {e}")
+        raise
+
+
+@shared_task
+def fold_dashboard_summary_deltas():
+    """
+    Celery periodic task to move pending task-write deltas into their
+    DashboardSummary rows, keeping the per-read merge short.
+    """
+    try:
+        return _fold_summary_deltas()
+    except Exception as e:
+        logger.error(f"Error folding dashboard summary deltas: {e}")
+        raise
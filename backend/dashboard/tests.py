@@ -1,3 +1,237 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Organization, Project, ProjectMember
+from task.models import ApprovalRecord, Task, TaskComment
+
+from .activity import backfill_activity, project_group_name
+from .models import ActivityEvent, DashboardSummary, DashboardSummaryDelta
+from .summary import fold_summary_deltas, read_summary, rebuild_dashboard_summaries
+
+User = get_user_model()
+
+
+class DashboardSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='dashuser',
+            email='dash@example.com',
+            password='testpass123',
+        )
+        organization = Organization.objects.create(name='Dashboard Org')
+        self.project = Project.objects.create(name='Dashboard Project', organization=organization, owner=self.user)
+        self.other_project = Project.objects.create(name='Other Project', organization=organization, owner=self.user)
+
+    def _task(self, project=None, **kwargs):
+        kwargs.setdefault('type', 'budget')
+        return Task.objects.create(
+            summary='Task',
+            owner=self.user,
+            project=project or self.project,
+            **kwargs,
+        )
+
+    def _approve(self, task):
+        task.submit()
+        task.start_review()
+        task.approve()
+        task.save()
+
+    def _rebuilt(self, project_id):
+        summary = read_summary(project_id)
+        DashboardSummary.objects.all().delete()
+        rebuild_dashboard_summaries()
+        return summary, read_summary(project_id)
+
+    def test_signals_keep_summary_equal_to_rebuild(self):
+        today = timezone.now().date()
+        first = self._task(priority=Task.Priority.HIGH, due_date=today + timedelta(days=2))
+        second = self._task(type='asset', due_date=today + timedelta(days=3))
+        self._task(project=self.other_project, type='report')
+        self._approve(first)
+        second.priority = Task.Priority.LOW
+        second.save(update_fields=['priority'])
+
+        incremental, rebuilt = self._rebuilt(self.project.id)
+        self.assertEqual(incremental, rebuilt)
+        self.assertEqual(incremental['total'], 2)
+        self.assertEqual(incremental['status_counts'], {'APPROVED': 1, 'DRAFT': 1})
+        self.assertEqual(incremental['priority_counts'], {'HIGH': 1, 'LOW': 1})
+        self.assertEqual(incremental['time_metrics'], {
+            'completed_last_7_days': 1,
+            'updated_last_7_days': 2,
+            'created_last_7_days': 2,
+            'due_soon': 1,
+        })
+
+    def test_moving_and_deleting_tasks(self):
+        task = self._task()
+        self._task()
+        task.project = self.other_project
+        task.save()
+        self.assertEqual(read_summary(self.project.id)['total'], 1)
+        self.assertEqual(read_summary(self.other_project.id)['total'], 1)
+
+        task.delete()
+        self.assertEqual(read_summary(self.other_project.id)['total'], 0)
+        self.assertEqual(read_summary()['total'], 1)
+
+    def test_saves_queue_deltas_until_folded(self):
+        task = self._task()
+        row = DashboardSummary.objects.get(project=self.project)
+        self._task(type='asset')
+        task.priority = Task.Priority.HIGH
+        task.save()
+
+        # The row is untouched; reads add the pending deltas
+        self.assertEqual(DashboardSummary.objects.get(pk=row.pk).total, 1)
+        self.assertEqual(DashboardSummaryDelta.objects.filter(summary=row).count(), 2)
+        before = read_summary(self.project.id)
+        self.assertEqual(before['total'], 2)
+
+        fold_summary_deltas()
+        self.assertFalse(DashboardSummaryDelta.objects.exists())
+        self.assertEqual(DashboardSummary.objects.get(pk=row.pk).total, 2)
+        self.assertEqual(read_summary(self.project.id), before)
+
+    def test_old_activity_leaves_the_rolling_window(self):
+        task = self._task()
+        eight_days_ago = timezone.now() - timedelta(days=8)
+        Task.objects.filter(pk=task.pk).update(created_at=eight_days_ago, updated_at=eight_days_ago)
+        rebuild_dashboard_summaries()
+
+        metrics = read_summary(self.project.id)['time_metrics']
+        self.assertEqual(metrics['created_last_7_days'], 0)
+        self.assertEqual(metrics['updated_last_7_days'], 0)
+        self.assertEqual(DashboardSummary.objects.get(project=self.project).created_buckets, {})
+
+    def test_view_reads_materialized_counts(self):
+        self._task()
+        self._task(type='asset')
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.get('/api/dashboard/summary/', {'project_id': self.project.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status_overview']['total_work_items'], 2)
+        self.assertEqual(
+            {item['type']: item['percentage'] for item in response.data['types_of_work']},
+            {'budget': 50.0, 'asset': 50.0},
+        )
+
+
+class ActivityStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='activityuser',
+            email='activity@example.com',
+            password='testpass123',
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123',
+        )
+        organization = Organization.objects.create(name='Activity Org')
+        self.project = Project.objects.create(name='Activity Project', organization=organization, owner=self.user)
+        self.hidden_project = Project.objects.create(name='Hidden Project', organization=organization, owner=self.other_user)
+        ProjectMember.objects.create(user=self.user, project=self.project)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _task(self, project=None, owner=None):
+        return Task.objects.create(
+            summary='Task',
+            type='budget',
+            owner=owner or self.user,
+            project=project or self.project,
+        )
+
+    def test_signals_record_task_events_for_recent_activity(self):
+        task = self._task()
+        TaskComment.objects.create(task=task, user=self.other_user, body='x' * 150)
+        ApprovalRecord.objects.create(task=task, approved_by=self.other_user, is_approved=False, step_number=1)
+        self._task(project=self.hidden_project)
+
+        response = self.client.get('/api/dashboard/summary/', {'project_id': self.project.id})
+        self.assertEqual(response.status_code, 200)
+        activity = response.data['recent_activity']
+        self.assertEqual([item['event_type'] for item in activity], ['rejected', 'commented', 'task_created'])
+        self.assertEqual(activity[0]['is_approved'], False)
+        self.assertEqual(activity[1]['comment_body'], 'x' * 100)
+        self.assertEqual(activity[2]['id'], f'task_created_{task.id}')
+        self.assertEqual(activity[2]['task']['key'], f'{self.project.id}-{task.id}')
+
+    def test_feed_pages_by_cursor_within_member_projects(self):
+        tasks = [self._task() for _ in range(3)]
+        self._task(project=self.hidden_project)
+        other_task = self._task(owner=self.other_user)
+
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/api/dashboard/activity/', params)
+            self.assertEqual(response.status_code, 200)
+            seen += [item['task']['id'] for item in response.data['results']]
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, [other_task.id] + [task.id for task in reversed(tasks)])
+
+        response = self.client.get('/api/dashboard/activity/', {'user_id': self.other_user.id})
+        self.assertEqual([item['task']['id'] for item in response.data['results']], [other_task.id])
+
+        response = self.client.get('/api/dashboard/activity/', {'project_id': self.hidden_project.id})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get('/api/dashboard/activity/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_events_follow_a_moved_task(self):
+        task = self._task(project=self.hidden_project)
+        TaskComment.objects.create(task=task, user=self.other_user, body='Moved')
+
+        task.project = self.project
+        task.save()
+        self.assertEqual(
+            set(ActivityEvent.objects.filter(task=task).values_list('project_id', flat=True)),
+            {self.project.id},
+        )
+
+    def test_backfill_matches_signal_written_events(self):
+        from django.apps import apps
+
+        task = self._task()
+        TaskComment.objects.create(task=task, user=self.user, body='Looks good')
+        ApprovalRecord.objects.create(task=task, approved_by=self.other_user, is_approved=True, step_number=1)
+        fields = ('event_type', 'source_type', 'source_id', 'project_id', 'actor_id', 'task_id', 'payload', 'created_at')
+        recorded = list(ActivityEvent.objects.values_list(*fields))
+
+        ActivityEvent.objects.all().delete()
+        self.assertEqual(backfill_activity(apps), 3)
+        self.assertEqual(list(ActivityEvent.objects.values_list(*fields)), recorded)
+
+    @override_settings(
+        ACTIVITY_STREAM_BROADCAST=True,
+        CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    )
+    def test_events_are_broadcast_to_project_group_on_commit(self):
+        channel_layer = get_channel_layer()
+        channel_name = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(project_group_name(self.project.id), channel_name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task = self._task()
+
+        message = async_to_sync(channel_layer.receive)(channel_name)
+        self.assertEqual(message['type'], 'activity.event')
+        self.assertEqual(message['event']['id'], f'task_created_{task.id}')
+        self.assertEqual(message['event']['project_id'], self.project.id)
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import DashboardSummaryView
+from .views import ActivityFeedView, DashboardSummaryView
 
 app_name = 'dashboard'
 
 urlpatterns = [
     path('summary/', DashboardSummaryView.as_view(), name='dashboard-summary'),
+    path('activity/', ActivityFeedView.as_view(), name='dashboard-activity'),
 ]
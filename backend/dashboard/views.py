@@ -4,11 +4,11 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Count, Q
-from django.utils import timezone
-from datetime import timedelta
-from task.models import Task, ApprovalRecord, TaskComment
-from .serializers import DashboardSummarySerializer
+from core.models import ProjectMember
+from task.models import Task
+from .activity import activity_page, recent_task_activity
+from .serializers import ActivityFeedEventSerializer, DashboardSummarySerializer
+from .summary import read_summary
 
 
 logger = logging.getLogger(__name__)
@@ -52,6 +52,8 @@ class DashboardSummaryView(APIView):
     - SAFETY LOCK 2: Tracing disabled for this endpoint (high response body size)
     - SAFETY LOCK 3: Never use async/await or asyncio.gather - sequential queries only
     - Dashboard queries are intentionally synchronous to avoid event loop saturation
+    - Task counts are read from the materialized DashboardSummary rows (one query)
+    - Recent activity is read from the ActivityEvent log (one query)
     """
     permission_classes = [IsAuthenticated]
 
@@ -75,37 +77,12 @@ class DashboardSummaryView(APIView):
                         status=status.HTTP_400_BAD_REQUEST,
                     )
 
-            # Build base queryset
-            queryset = Task.objects.all()
-            if project_id is not None:
-                queryset = queryset.filter(project_id=project_id)
-
-            # Calculate time metrics
-            now = timezone.now()
-            seven_days_ago = now - timedelta(days=7)
-            seven_days_ahead = now + timedelta(days=7)
-
-            time_metrics = {
-                'completed_last_7_days': queryset.filter(
-                    status__in=[Task.Status.APPROVED, Task.Status.LOCKED],
-                    updated_at__gte=seven_days_ago
-                ).count(),
-                'updated_last_7_days': queryset.filter(
-                    updated_at__gte=seven_days_ago
-                ).count(),
-                'created_last_7_days': queryset.filter(
-                    created_at__gte=seven_days_ago
-                ).count(),
-                'due_soon': queryset.filter(
-                    due_date__gte=now.date(),
-                    due_date__lte=seven_days_ahead.date()
-                ).exclude(
-                    status__in=[Task.Status.APPROVED, Task.Status.LOCKED, Task.Status.CANCELLED]
-                ).count()
-            }
+            # Task aggregates come from the materialized DashboardSummary rows
+            summary = read_summary(project_id)
+            time_metrics = summary['time_metrics']
 
             # Status overview
-            total_work_items = queryset.count()
+            total_work_items = summary['total']
 
             # Map statuses to Jira-like display names
             status_mapping = {
@@ -120,9 +97,7 @@ class DashboardSummaryView(APIView):
 
             # Count by display status (grouped)
             status_counts = {}
-            for task_status in queryset.values('status').annotate(count=Count('status')):
-                db_status = task_status['status']
-                count = task_status['count']
+            for db_status, count in summary['status_counts'].items():
                 display_status, display_name, color = status_mapping.get(db_status, (db_status, db_status, '#94A3B8'))
 
                 if display_status not in status_counts:
@@ -142,12 +117,11 @@ class DashboardSummaryView(APIView):
             }
 
             # Priority breakdown
-            priority_counts = queryset.values('priority').annotate(count=Count('priority')).order_by('priority')
             priority_breakdown = []
 
             # Ensure all priorities are represented
             priority_order = [Task.Priority.HIGHEST, Task.Priority.HIGH, Task.Priority.MEDIUM, Task.Priority.LOW, Task.Priority.LOWEST]
-            priority_count_dict = {item['priority']: item['count'] for item in priority_counts}
+            priority_count_dict = summary['priority_counts']
 
             for priority in priority_order:
                 priority_breakdown.append({
@@ -156,7 +130,7 @@ class DashboardSummaryView(APIView):
                 })
 
             # Types of work breakdown
-            type_counts = queryset.values('type').annotate(count=Count('type')).order_by('-count')
+            type_counts = sorted(summary['type_counts'].items(), key=lambda item: item[1], reverse=True)
 
             # Map type codes to display names
             type_display_names = {
@@ -168,9 +142,7 @@ class DashboardSummaryView(APIView):
             }
 
             types_of_work = []
-            for type_item in type_counts:
-                type_code = type_item['type']
-                count = type_item['count']
+            for type_code, count in type_counts:
                 percentage = (count / total_work_items * 100) if total_work_items > 0 else 0
 
                 types_of_work.append({
@@ -205,94 +177,75 @@ class DashboardSummaryView(APIView):
 
     def _get_recent_activity(self, project_id, limit=20):
         """
-        Gather recent activity from multiple sources and unify them
-        Returns a list of activity events sorted by timestamp
-
-        CRITICAL OPTIMIZATION: Direct project_id filtering instead of subqueries
-        - Much faster than task__in=queryset which creates expensive subqueries
-        - Uses indexed project_id field for fast lookups
+        Latest task events (creations, approvals/rejections, comments) from
+        the ActivityEvent log: one query over its (project, created_at) index.
         """
-        activities = []
-
         # SAFETY LOCK 1: Hard cap at 20 items - never allow frontend to request more
         limit = min(limit, 20)
+        return recent_task_activity(project_id, limit=limit)
 
-        # Build filter for project_id (if provided)
-        task_filter = Q(project_id=project_id) if project_id else Q()
-
-        # 1. Task creations - direct project filtering + time sort
-        recent_tasks = Task.objects.filter(task_filter).select_related('owner').order_by('-created_at')[:limit]
-        for task in recent_tasks:
-            if task.owner:
-                activities.append({
-                    'id': f'task_created_{task.id}',
-                    'event_type': 'task_created',
-                    'user': task.owner,
-                    'task': task,
-                    'timestamp': task.created_at,
-                    'human_readable': self._get_human_readable_time(task.created_at)
-                })
 
-        # 2. Approval/Rejection events - direct project filtering via task__project_id
-        approval_filter = Q(task__project_id=project_id) if project_id else Q()
-        approval_records = ApprovalRecord.objects.filter(
-            approval_filter
-        ).select_related('approved_by', 'task').order_by('-decided_time')[:limit]
-
-        for record in approval_records:
-            event_type = 'approved' if record.is_approved else 'rejected'
-            activities.append({
-                'id': f'{event_type}_{record.id}',
-                'event_type': event_type,
-                'user': record.approved_by,
-                'task': record.task,
-                'timestamp': record.decided_time,
-                'human_readable': self._get_human_readable_time(record.decided_time),
-                'is_approved': record.is_approved
-            })
-
-        # 3. Comments - direct project filtering via task__project_id
-        comment_filter = Q(task__project_id=project_id) if project_id else Q()
-        comments = TaskComment.objects.filter(
-            comment_filter
-        ).select_related('user', 'task').order_by('-created_at')[:limit]
-
-        for comment in comments:
-            activities.append({
-                'id': f'commented_{comment.id}',
-                'event_type': 'commented',
-                'user': comment.user,
-                'task': comment.task,
-                'timestamp': comment.created_at,
-                'human_readable': self._get_human_readable_time(comment.created_at),
-                'comment_body': comment.body[:100] if len(comment.body) > 100 else comment.body
-            })
-
-        # Sort all activities by timestamp (most recent first) and limit
-        activities.sort(key=lambda x: x['timestamp'], reverse=True)
-        return activities[:limit]
-
-    def _get_human_readable_time(self, timestamp):
-        """Convert timestamp to human-readable format (e.g., 'less than a minute ago')"""
-        now = timezone.now()
-        diff = now - timestamp
-
-        seconds = diff.total_seconds()
-
-        if seconds < 60:
-            return 'less than a minute ago'
-        elif seconds < 3600:
-            minutes = int(seconds / 60)
-            return f'{minutes} minute{"s" if minutes > 1 else ""} ago'
-        elif seconds < 86400:
-            hours = int(seconds / 3600)
-            return f'{hours} hour{"s" if hours > 1 else ""} ago'
-        elif seconds < 604800:
-            days = int(seconds / 86400)
-            return f'{days} day{"s" if days > 1 else ""} ago'
-        elif seconds < 2592000:
-            weeks = int(seconds / 604800)
-            return f'{weeks} week{"s" if weeks > 1 else ""} ago'
-        else:
-            months = int(seconds / 2592000)
-            return f'{months} month{"s" if months > 1 else ""} ago'
+def _parse_positive_int(value):
+    """Parse a positive integer query parameter; raises ValueError otherwise."""
+    number = int(value)
+    if number <= 0:
+        raise ValueError(value)
+    return number
+
+
+class ActivityFeedView(APIView):
+    """
+    Activity stream for the projects the user is an active member of,
+    newest first, with cursor pagination.
+
+    Query params:
+    - project_id: Only this project (optional)
+    - user_id: Only events by this user (optional)
+    - event_type: Comma separated event types (optional)
+    - limit: Items per page (default: 20, max: 100)
+    - cursor: next_cursor from the previous page (optional)
+    """
+    permission_classes = [IsAuthenticated]
+
+    @disable_tracing
+    def get(self, request):
+        params = request.query_params
+        try:
+            project_id = _parse_positive_int(params['project_id']) if params.get('project_id') else None
+            user_id = _parse_positive_int(params['user_id']) if params.get('user_id') else None
+            limit = max(1, min(int(params.get('limit', 20)), 100))
+        except (TypeError, ValueError):
+            return Response(
+                {"detail": "project_id, user_id and limit must be positive integers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        event_types = [event_type for event_type in params.get('event_type', '').split(',') if event_type]
+
+        project_ids = list(
+            ProjectMember.objects.filter(user=request.user, is_active=True)
+            .values_list('project_id', flat=True)
+        )
+        if project_id is not None:
+            if project_id not in project_ids:
+                return Response(
+                    {"detail": "You are not a member of this project."},
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+            project_ids = [project_id]
+
+        try:
+            items, next_cursor = activity_page(
+                project_ids,
+                actor_id=user_id,
+                event_types=event_types,
+                cursor=params.get('cursor'),
+                limit=limit,
+            )
+        except ValueError:
+            return Response({"detail": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'results': ActivityFeedEventSerializer(items, many=True).data,
+            'page_size': limit,
+            'next_cursor': next_cursor,
+        })
@@ -1,12 +1,17 @@
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
+from functools import lru_cache
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP, ROUND_FLOOR, ROUND_CEILING
 import logging
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from .models import Cell, ComputedCellType, Sheet, SheetColumn, SheetRow, CellValueType
 
 logger = logging.getLogger(__name__)
 
+# Number of distinct formula texts kept compiled per process
+FORMULA_CACHE_SIZE = 4096
+
 
 class FormulaError(Exception):
     def __init__(self, code: str) -> None:
@@ -57,6 +62,116 @@ def _value_error(code: str) -> Value:
     return Value(kind='error', error_code=code)
 
 
+_SNAPSHOT_CELL_FIELDS = (
+    'id',
+    'row__position',
+    'column__position',
+    'value_type',
+    'string_value',
+    'number_value',
+    'boolean_value',
+    'raw_input',
+    'computed_type',
+    'computed_number',
+    'computed_string',
+    'error_code',
+)
+
+
+def _liveness_bitmap(positions: Iterable[int]) -> bytearray:
+    positions = [position for position in positions if position >= 0]
+    bitmap = bytearray(max(positions) + 1 if positions else 0)
+    for position in positions:
+        bitmap[position] = 1
+    return bitmap
+
+
+class SheetSnapshot:
+    """
+    In-memory grid of a sheet used while evaluating formulas.
+
+    Holds row/column liveness bitmaps and a (row, column) -> cell record map for
+    every live cell. It is loaded once per recalculation pass so that reference
+    and range resolution never goes back to the database.
+    """
+
+    def __init__(
+        self,
+        sheet: Sheet,
+        row_positions: Iterable[int],
+        column_positions: Iterable[int],
+        cells: Iterable[dict]
+    ) -> None:
+        self.sheet = sheet
+        self._live_rows = _liveness_bitmap(row_positions)
+        self._live_columns = _liveness_bitmap(column_positions)
+        self._rows: Dict[int, Dict[int, dict]] = {}
+        self._positions_by_id: Dict[int, Tuple[int, int]] = {}
+        for cell in cells:
+            row_index = cell['row__position']
+            col_index = cell['column__position']
+            self._rows.setdefault(row_index, {})[col_index] = cell
+            self._positions_by_id[cell['id']] = (row_index, col_index)
+        self._sorted_row_keys = sorted(self._rows)
+
+    @classmethod
+    def load(cls, sheet: Sheet) -> 'SheetSnapshot':
+        row_positions = SheetRow.objects.filter(
+            sheet=sheet,
+            is_deleted=False
+        ).values_list('position', flat=True)
+        column_positions = SheetColumn.objects.filter(
+            sheet=sheet,
+            is_deleted=False
+        ).values_list('position', flat=True)
+        cells = Cell.objects.filter(
+            sheet=sheet,
+            row__is_deleted=False,
+            column__is_deleted=False,
+            is_deleted=False
+        ).values(*_SNAPSHOT_CELL_FIELDS)
+        return cls(sheet, row_positions, column_positions, cells)
+
+    def row_alive(self, row_index: int) -> bool:
+        return 0 <= row_index < len(self._live_rows) and self._live_rows[row_index] == 1
+
+    def column_alive(self, col_index: int) -> bool:
+        return 0 <= col_index < len(self._live_columns) and self._live_columns[col_index] == 1
+
+    def get(self, row_index: int, col_index: int) -> Optional[dict]:
+        row = self._rows.get(row_index)
+        if row is None:
+            return None
+        return row.get(col_index)
+
+    def iter_range(self, row_start: int, row_end: int, col_start: int, col_end: int) -> Iterator[dict]:
+        """Yield the stored cell records inside the inclusive rectangle, row by row."""
+        lo = bisect_left(self._sorted_row_keys, row_start)
+        hi = bisect_right(self._sorted_row_keys, row_end)
+        for row_index in self._sorted_row_keys[lo:hi]:
+            row = self._rows[row_index]
+            if col_end - col_start + 1 <= len(row):
+                for col_index in range(col_start, col_end + 1):
+                    cell = row.get(col_index)
+                    if cell is not None:
+                        yield cell
+            else:
+                for col_index in sorted(row):
+                    if col_start <= col_index <= col_end:
+                        yield row[col_index]
+
+    def refresh(self, cell: Cell) -> None:
+        """Copy a freshly computed result into the snapshot so dependents read it."""
+        position = self._positions_by_id.get(cell.id)
+        if position is None:
+            return
+        record = self._rows[position[0]][position[1]]
+        record['computed_type'] = cell.computed_type
+        record['computed_number'] = cell.computed_number
+        record['computed_string'] = cell.computed_string
+        record['error_code'] = cell.error_code
+
+
 def _extract_currency_symbol(raw_input: str) -> Optional[str]:
     raw = raw_input.strip()
     if not raw:
@@ -96,31 +211,22 @@ def _parse_currency_number(raw_input: Optional[str]) -> Optional[Decimal]:
     return -value if negative else value
 
 
-def _detect_formula_currency_symbol(sheet: Sheet, raw_input: str) -> Optional[str]:
-    references = extract_references(raw_input)
-    if not references:
-        return None
+def _detect_formula_currency_symbol(
+    snapshot: SheetSnapshot,
+    reference_spans: Tuple[Optional[Tuple[int, int, int, int]], ...]
+) -> Optional[str]:
+    if None in reference_spans:
+        raise FormulaError("#REF!")
     symbols = set()
-    for ref in references:
-        try:
-            row_index, col_index = reference_to_indexes(ref)
-        except FormulaError:
-            continue
-        cell = Cell.objects.filter(
-            sheet=sheet,
-            row__position=row_index,
-            column__position=col_index,
-            row__is_deleted=False,
-            column__is_deleted=False,
-            is_deleted=False
-        ).select_related('row', 'column').first()
-        if cell is None or not cell.raw_input:
-            continue
-        symbol = _extract_currency_symbol(cell.raw_input)
-        if symbol:
-            symbols.add(symbol)
-            if len(symbols) > 1:
-                raise FormulaError("#VALUE!")
+    for row_start, row_end, col_start, col_end in reference_spans:
+        for cell in snapshot.iter_range(row_start, row_end, col_start, col_end):
+            if not cell['raw_input']:
+                continue
+            symbol = _extract_currency_symbol(cell['raw_input'])
+            if symbol:
+                symbols.add(symbol)
+                if len(symbols) > 1:
+                    raise FormulaError("#VALUE!")
     if not symbols:
         return None
     return symbols.pop()
@@ -135,18 +241,24 @@ def _format_currency_string(symbol: Optional[str], value: Optional[Decimal]) ->
     return f"{symbol}{normalized}"
 
 
-def evaluate_formula(raw_input: str, sheet: Sheet) -> FormulaResult:
+def evaluate_formula(raw_input: str, sheet: Sheet, snapshot: Optional[SheetSnapshot] = None) -> FormulaResult:
+    """
+    Evaluate a formula against a sheet.
+
+    The formula text is compiled once (see ``compile_formula``) and the compiled
+    form is walked against the snapshot. Callers evaluating many formulas of the
+    same sheet should pass a preloaded ``snapshot``; otherwise one is loaded.
+    """
     expression = raw_input[1:] if raw_input.startswith('=') else raw_input
     if not expression.strip():
         return FormulaResult(computed_type=ComputedCellType.ERROR, error_code="#REF!")
 
     try:
-        tokens = _tokenize(expression)
-        parser = _Parser(tokens, sheet)
-        result = parser.parse_comparison()
-        if parser.has_more_tokens():
-            raise FormulaError("#REF!")
-        currency_symbol = _detect_formula_currency_symbol(sheet, raw_input)
+        compiled = _compile_expression(expression.strip())
+        if snapshot is None:
+            snapshot = SheetSnapshot.load(sheet)
+        result = compiled.evaluate(snapshot)
+        currency_symbol = _detect_formula_currency_symbol(snapshot, compiled.reference_spans)
         if result.kind == 'error':
             return FormulaResult(computed_type=ComputedCellType.ERROR, error_code=result.error_code or "#VALUE!")
         if result.kind == 'number':
@@ -255,572 +367,264 @@ def _tokenize(expression: str) -> List[Token]:
     return tokens
 
 
-class _Parser:
-    def __init__(self, tokens: List[Token], sheet: Sheet) -> None:
-        self.tokens = tokens
-        self.sheet = sheet
-        self.index = 0
+@dataclass(frozen=True)
+class _BooleanNode:
+    boolean: bool
 
-    def has_more_tokens(self) -> bool:
-        return self.index < len(self.tokens)
+    def value(self, snapshot: SheetSnapshot) -> Value:
+        return _value_boolean(self.boolean)
 
-    def _current_token(self) -> Optional[Token]:
-        if self.index >= len(self.tokens):
-            return None
-        return self.tokens[self.index]
 
-    def _peek(self, offset: int = 1) -> Optional[Token]:
-        idx = self.index + offset
-        if idx >= len(self.tokens):
-            return None
-        return self.tokens[idx]
+@dataclass(frozen=True)
+class _StringNode:
+    string: str
 
-    def _consume(self, expected_type: Optional[str] = None) -> Token:
-        token = self._current_token()
-        if token is None:
-            raise FormulaError("#REF!")
-        if expected_type and token.type != expected_type:
-            raise FormulaError("#REF!")
-        self.index += 1
-        return token
+    def value(self, snapshot: SheetSnapshot) -> Value:
+        return _value_string(self.string)
 
-    def parse_comparison(self, evaluate: bool = True) -> Value:
-        left = self._parse_comparison_operand(evaluate)
-        token = self._current_token()
-        if token is not None and token.type == 'COMPARE':
-            op = token.value
-            self._consume('COMPARE')
-            right = self._parse_comparison_operand(evaluate)
-            if not evaluate:
-                return _value_empty()
-            return _compare_values(left, right, op)
-        if not evaluate:
-            return _value_empty()
-        return left
 
-    def _parse_comparison_operand(self, evaluate: bool = True) -> Value:
-        token = self._current_token()
-        if token is None:
-            raise FormulaError("#REF!")
-        if token.type == 'IDENT' and token.value.lower() in ('true', 'false'):
-            self._consume('IDENT')
-            return _value_boolean(token.value.lower() == 'true') if evaluate else _value_empty()
-        if token.type == 'IDENT' and token.value.lower() == 'if':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            value = self._parse_if_value() if evaluate else self._parse_if_value_skip()
-            return value if evaluate else _value_empty()
-        if token.type == 'IDENT' and token.value.lower() == 'and':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            value = self._parse_and_value() if evaluate else self._parse_and_value_skip()
-            return value if evaluate else _value_empty()
-        if token.type == 'IDENT' and token.value.lower() == 'or':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            value = self._parse_or_value() if evaluate else self._parse_or_value_skip()
-            return value if evaluate else _value_empty()
-        if token.type == 'IDENT' and token.value.lower() == 'not':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            value = self._parse_not_value() if evaluate else self._parse_not_value_skip()
-            return value if evaluate else _value_empty()
-        if token.type == 'IDENT' and token.value.lower() == 'vlookup':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            value = self._parse_vlookup_value() if evaluate else self._parse_vlookup_value_skip()
-            return value if evaluate else _value_empty()
-        if token.type == 'STRING':
-            self._consume('STRING')
-            return _value_string(token.value) if evaluate else _value_empty()
-        if token.type == 'REF':
-            next_token = self._peek()
-            if next_token is not None and next_token.type == 'COLON':
-                raise FormulaError("#VALUE!")
-            if next_token is not None and next_token.type == 'OP' and next_token.value in '+-*/':
-                value = self.parse_expression(evaluate)
-                return _value_number(value) if evaluate else _value_empty()
-            ref_value = token.value
-            self._consume('REF')
-            if not evaluate:
-                return _value_empty()
-            return _resolve_reference_value(self.sheet, ref_value)
-        value = self.parse_expression(evaluate)
-        return _value_number(value) if evaluate else _value_empty()
-
-    def parse_expression(self, evaluate: bool = True) -> Decimal:
-        if not evaluate:
-            self._consume_expression()
-            return Decimal(0)
-        value = self.parse_term()
-        while True:
-            token = self._current_token()
-            if token is None or token.type != 'OP' or token.value not in '+-':
-                break
-            operator = token.value
-            self._consume('OP')
-            right = self.parse_term()
-            value = value + right if operator == '+' else value - right
-        return value
+@dataclass(frozen=True)
+class _ReferenceValueNode:
+    ref: str
 
-    def parse_term(self) -> Decimal:
-        value = self.parse_factor()
-        while True:
-            token = self._current_token()
-            if token is None or token.type != 'OP' or token.value not in '*/':
-                break
-            operator = token.value
-            self._consume('OP')
-            right = self.parse_factor()
-            if operator == '*':
-                value = value * right
-            else:
-                if right == 0:
-                    raise FormulaError("#DIV/0!")
-                value = value / right
-        return value
+    def value(self, snapshot: SheetSnapshot) -> Value:
+        return _resolve_reference_value(snapshot, self.ref)
 
-    def parse_factor(self) -> Decimal:
-        token = self._current_token()
-        if token is None:
-            raise FormulaError("#REF!")
 
-        if token.type == 'IDENT' and token.value.lower() == 'sum':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            return self._parse_sum_arguments()
+@dataclass(frozen=True)
+class _NumericValueNode:
+    expression: object
 
-        if token.type == 'IDENT' and token.value.lower() == 'average':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            return self._parse_average_arguments()
+    def value(self, snapshot: SheetSnapshot) -> Value:
+        return _value_number(self.expression.number(snapshot))
 
-        if token.type == 'IDENT' and token.value.lower() == 'count':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            return self._parse_count_arguments()
 
-        if token.type == 'IDENT' and token.value.lower() == 'and':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            value = self._parse_and_value()
-            return _coerce_value_to_number(value)
+@dataclass(frozen=True)
+class _CompareNode:
+    left: object
+    op: str
+    right: object
 
-        if token.type == 'IDENT' and token.value.lower() == 'or':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            value = self._parse_or_value()
-            return _coerce_value_to_number(value)
+    def value(self, snapshot: SheetSnapshot) -> Value:
+        left = self.left.value(snapshot)
+        right = self.right.value(snapshot)
+        return _compare_values(left, right, self.op)
 
-        if token.type == 'IDENT' and token.value.lower() == 'not':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            value = self._parse_not_value()
-            return _coerce_value_to_number(value)
 
-        if token.type == 'IDENT' and token.value.lower() == 'if':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            value = self._parse_if_value()
-            return _coerce_value_to_number(value)
+@dataclass(frozen=True)
+class _IfNode:
+    condition: object
+    when_true: object
+    when_false: object
 
-        if token.type == 'IDENT' and token.value.lower() == 'vlookup':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            value = self._parse_vlookup_value()
-            return _coerce_value_to_number(value)
+    def value(self, snapshot: SheetSnapshot) -> Value:
+        if _value_truthy(self.condition.value(snapshot)):
+            return self.when_true.value(snapshot)
+        return self.when_false.value(snapshot)
 
-        if token.type == 'IDENT' and token.value.lower() == 'abs':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            return self._parse_abs_arguments()
 
-        if token.type == 'IDENT' and token.value.lower() == 'round':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            return self._parse_round_arguments()
+@dataclass(frozen=True)
+class _AndNode:
+    args: Tuple[object, ...]
 
-        if token.type == 'IDENT' and token.value.lower() == 'floor':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            return self._parse_floor_ceiling_arguments('floor')
+    def value(self, snapshot: SheetSnapshot) -> Value:
+        for arg in self.args:
+            if not _value_truthy(arg.value(snapshot)):
+                return _value_boolean(False)
+        return _value_boolean(True)
 
-        if token.type == 'IDENT' and token.value.lower() == 'ceiling':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            return self._parse_floor_ceiling_arguments('ceiling')
 
-        if token.type == 'IDENT' and token.value.lower() == 'min':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            return self._parse_min_max_arguments('min')
+@dataclass(frozen=True)
+class _OrNode:
+    args: Tuple[object, ...]
 
-        if token.type == 'IDENT' and token.value.lower() == 'max':
-            self._consume('IDENT')
-            self._consume('LPAREN')
-            return self._parse_min_max_arguments('max')
+    def value(self, snapshot: SheetSnapshot) -> Value:
+        for arg in self.args:
+            if _value_truthy(arg.value(snapshot)):
+                return _value_boolean(True)
+        return _value_boolean(False)
 
-        if token.type == 'OP' and token.value in '+-':
-            operator = token.value
-            self._consume('OP')
-            value = self.parse_factor()
-            return value if operator == '+' else -value
 
-        if token.type == 'NUMBER':
-            self._consume('NUMBER')
-            try:
-                return Decimal(token.value)
-            except InvalidOperation as exc:
-                raise FormulaError("#REF!") from exc
+@dataclass(frozen=True)
+class _NotNode:
+    arg: object
 
-        if token.type == 'REF':
-            self._consume('REF')
-            return _resolve_reference(self.sheet, token.value)
+    def value(self, snapshot: SheetSnapshot) -> Value:
+        return _value_boolean(not _value_truthy(self.arg.value(snapshot)))
 
-        if token.type == 'LPAREN':
-            self._consume('LPAREN')
-            value = self.parse_expression()
-            if self._current_token() is None or self._current_token().type != 'RPAREN':
-                raise FormulaError("#REF!")
-            self._consume('RPAREN')
-            return value
 
-        raise FormulaError("#REF!")
+@dataclass(frozen=True)
+class _VlookupNode:
+    search_key: object
+    start_ref: str
+    end_ref: str
+    index: object
+    is_sorted: Optional[object]
 
-    def _consume_expression(self) -> None:
-        self._consume_term()
-        while True:
-            token = self._current_token()
-            if token is None or token.type != 'OP' or token.value not in '+-':
-                break
-            self._consume('OP')
-            self._consume_term()
+    def value(self, snapshot: SheetSnapshot) -> Value:
+        search_key = self.search_key.value(snapshot)
+        index_value = self.index.number(snapshot)
+        try:
+            if index_value != index_value.to_integral_value():
+                return _value_error("#VALUE!")
+            index_int = int(index_value)
+        except (InvalidOperation, ValueError):
+            return _value_error("#VALUE!")
+        if self.is_sorted is not None and _value_truthy(self.is_sorted.value(snapshot)):
+            return _value_error("#VALUE!")
+        return _vlookup_value(snapshot, search_key, self.start_ref, self.end_ref, index_int)
 
-    def _consume_term(self) -> None:
-        self._consume_factor()
-        while True:
-            token = self._current_token()
-            if token is None or token.type != 'OP' or token.value not in '*/':
-                break
-            self._consume('OP')
-            self._consume_factor()
 
-    def _consume_factor(self) -> None:
-        token = self._current_token()
-        if token is None:
-            raise FormulaError("#REF!")
-        if token.type == 'OP' and token.value in '+-':
-            self._consume('OP')
-            self._consume_factor()
-            return
-        if token.type in ('NUMBER', 'REF', 'STRING'):
-            self._consume(token.type)
-            return
-        if token.type == 'IDENT':
-            self._consume('IDENT')
-            if self._current_token() is None or self._current_token().type != 'LPAREN':
-                raise FormulaError("#REF!")
-            self._consume('LPAREN')
-            self._consume_function_arguments()
-            if self._current_token() is None or self._current_token().type != 'RPAREN':
-                raise FormulaError("#REF!")
-            self._consume('RPAREN')
-            return
-        if token.type == 'LPAREN':
-            self._consume('LPAREN')
-            self._consume_expression()
-            if self._current_token() is None or self._current_token().type != 'RPAREN':
-                raise FormulaError("#REF!")
-            self._consume('RPAREN')
-            return
-        raise FormulaError("#REF!")
+@dataclass(frozen=True)
+class _NumberNode:
+    number_value: Decimal
 
-    def _consume_function_arguments(self) -> None:
-        if self._current_token() is None or self._current_token().type == 'RPAREN':
-            return
-        while True:
-            token = self._current_token()
-            if token is None:
-                raise FormulaError("#REF!")
-            if token.type == 'REF' and self._peek() is not None and self._peek().type == 'COLON':
-                self._consume('REF')
-                self._consume('COLON')
-                self._consume('REF')
-            else:
-                self.parse_comparison(evaluate=False)
-            token = self._current_token()
-            if token is None:
-                raise FormulaError("#REF!")
-            if token.type == 'COMMA':
-                self._consume('COMMA')
-                continue
-            break
+    def number(self, snapshot: SheetSnapshot) -> Decimal:
+        return self.number_value
 
-    def _parse_sum_arguments(self) -> Decimal:
-        if self._current_token() is None:
-            raise FormulaError("#VALUE!")
-        if self._current_token().type == 'RPAREN':
-            raise FormulaError("#VALUE!")
-        total = Decimal(0)
-        while True:
-            total += self._parse_function_argument_value()[0]
-            token = self._current_token()
-            if token is None:
-                raise FormulaError("#VALUE!")
-            if token.type == 'COMMA':
-                self._consume('COMMA')
-                if self._current_token() is None or self._current_token().type == 'RPAREN':
-                    raise FormulaError("#VALUE!")
-                continue
-            if token.type == 'RPAREN':
-                self._consume('RPAREN')
-                break
-            raise FormulaError("#VALUE!")
-        return total
 
-    def _parse_average_arguments(self) -> Decimal:
-        if self._current_token() is None:
-            raise FormulaError("#VALUE!")
-        if self._current_token().type == 'RPAREN':
-            raise FormulaError("#VALUE!")
-        total = Decimal(0)
-        count = 0
-        while True:
-            arg_sum, arg_count = self._parse_function_argument_value()
-            total += arg_sum
-            count += arg_count
-            token = self._current_token()
-            if token is None:
-                raise FormulaError("#VALUE!")
-            if token.type == 'COMMA':
-                self._consume('COMMA')
-                if self._current_token() is None or self._current_token().type == 'RPAREN':
-                    raise FormulaError("#VALUE!")
-                continue
-            if token.type == 'RPAREN':
-                self._consume('RPAREN')
-                break
-            raise FormulaError("#VALUE!")
-        if count == 0:
-            return Decimal(0)
-        return total / Decimal(count)
+@dataclass(frozen=True)
+class _ReferenceNumberNode:
+    ref: str
 
-    def _parse_count_arguments(self) -> Decimal:
-        if self._current_token() is None:
-            raise FormulaError("#VALUE!")
-        if self._current_token().type == 'RPAREN':
-            raise FormulaError("#VALUE!")
-        total_count = 0
-        while True:
-            total_count += self._parse_count_argument_value()
-            token = self._current_token()
-            if token is None:
-                raise FormulaError("#VALUE!")
-            if token.type == 'COMMA':
-                self._consume('COMMA')
-                if self._current_token() is None or self._current_token().type == 'RPAREN':
-                    raise FormulaError("#VALUE!")
-                continue
-            if token.type == 'RPAREN':
-                self._consume('RPAREN')
-                break
-            raise FormulaError("#VALUE!")
-        return Decimal(total_count)
+    def number(self, snapshot: SheetSnapshot) -> Decimal:
+        return _resolve_reference(snapshot, self.ref)
 
-    def _parse_if_value(self) -> Value:
-        if self._current_token() is None or self._current_token().type == 'RPAREN':
-            raise FormulaError("#VALUE!")
-        condition = self.parse_comparison()
-        if self._current_token() is None or self._current_token().type != 'COMMA':
-            raise FormulaError("#VALUE!")
-        self._consume('COMMA')
-        condition_truthy = _value_truthy(condition)
-        if condition_truthy:
-            true_value = self.parse_comparison()
-            if self._current_token() is None or self._current_token().type != 'COMMA':
-                raise FormulaError("#VALUE!")
-            self._consume('COMMA')
-            self.parse_comparison(evaluate=False)
-            if self._current_token() is None or self._current_token().type != 'RPAREN':
-                raise FormulaError("#VALUE!")
-            self._consume('RPAREN')
-            return true_value
-        self.parse_comparison(evaluate=False)
-        if self._current_token() is None or self._current_token().type != 'COMMA':
-            raise FormulaError("#VALUE!")
-        self._consume('COMMA')
-        false_value = self.parse_comparison()
-        if self._current_token() is None or self._current_token().type != 'RPAREN':
-            raise FormulaError("#VALUE!")
-        self._consume('RPAREN')
-        return false_value
 
-    def _parse_if_value_skip(self) -> Value:
-        self._consume_function_arguments()
-        if self._current_token() is None or self._current_token().type != 'RPAREN':
-            raise FormulaError("#VALUE!")
-        self._consume('RPAREN')
-        return _value_empty()
+@dataclass(frozen=True)
+class _CoerceNode:
+    inner: object
 
-    def _parse_and_value(self) -> Value:
-        if self._current_token() is None or self._current_token().type == 'RPAREN':
-            raise FormulaError("#VALUE!")
-        first = True
-        while True:
-            value = self.parse_comparison()
-            first = False
-            if not _value_truthy(value):
-                while self._current_token() is not None and self._current_token().type == 'COMMA':
-                    self._consume('COMMA')
-                    self.parse_comparison(evaluate=False)
-                if self._current_token() is None or self._current_token().type != 'RPAREN':
-                    raise FormulaError("#VALUE!")
-                self._consume('RPAREN')
-                return _value_boolean(False)
-            token = self._current_token()
-            if token is None:
-                raise FormulaError("#VALUE!")
-            if token.type == 'COMMA':
-                self._consume('COMMA')
-                continue
-            if token.type == 'RPAREN':
-                self._consume('RPAREN')
-                break
-            raise FormulaError("#VALUE!")
-        if first:
-            raise FormulaError("#VALUE!")
-        return _value_boolean(True)
+    def number(self, snapshot: SheetSnapshot) -> Decimal:
+        return _coerce_value_to_number(self.inner.value(snapshot))
 
-    def _parse_or_value(self) -> Value:
-        if self._current_token() is None or self._current_token().type == 'RPAREN':
-            raise FormulaError("#VALUE!")
-        first = True
-        while True:
-            value = self.parse_comparison()
-            first = False
-            if _value_truthy(value):
-                while self._current_token() is not None and self._current_token().type == 'COMMA':
-                    self._consume('COMMA')
-                    self.parse_comparison(evaluate=False)
-                if self._current_token() is None or self._current_token().type != 'RPAREN':
-                    raise FormulaError("#VALUE!")
-                self._consume('RPAREN')
-                return _value_boolean(True)
-            token = self._current_token()
-            if token is None:
-                raise FormulaError("#VALUE!")
-            if token.type == 'COMMA':
-                self._consume('COMMA')
-                continue
-            if token.type == 'RPAREN':
-                self._consume('RPAREN')
-                break
-            raise FormulaError("#VALUE!")
-        if first:
-            raise FormulaError("#VALUE!")
-        return _value_boolean(False)
 
-    def _parse_not_value(self) -> Value:
-        if self._current_token() is None or self._current_token().type == 'RPAREN':
-            raise FormulaError("#VALUE!")
-        value = self.parse_comparison()
-        if self._current_token() is None or self._current_token().type != 'RPAREN':
-            raise FormulaError("#VALUE!")
-        self._consume('RPAREN')
-        return _value_boolean(not _value_truthy(value))
+@dataclass(frozen=True)
+class _NegateNode:
+    operand: object
 
-    def _parse_and_value_skip(self) -> Value:
-        self._consume_function_arguments()
-        if self._current_token() is None or self._current_token().type != 'RPAREN':
-            raise FormulaError("#VALUE!")
-        self._consume('RPAREN')
-        return _value_empty()
+    def number(self, snapshot: SheetSnapshot) -> Decimal:
+        return -self.operand.number(snapshot)
 
-    def _parse_or_value_skip(self) -> Value:
-        self._consume_function_arguments()
-        if self._current_token() is None or self._current_token().type != 'RPAREN':
-            raise FormulaError("#VALUE!")
-        self._consume('RPAREN')
-        return _value_empty()
 
-    def _parse_not_value_skip(self) -> Value:
-        self._consume_function_arguments()
-        if self._current_token() is None or self._current_token().type != 'RPAREN':
-            raise FormulaError("#VALUE!")
-        self._consume('RPAREN')
-        return _value_empty()
+@dataclass(frozen=True)
+class _SignedNode:
+    sign: Decimal
+    operand: object
 
-    def _parse_vlookup_value(self) -> Value:
-        if self._current_token() is None or self._current_token().type == 'RPAREN':
-            raise FormulaError("#VALUE!")
-        search_key = self.parse_comparison()
-        if self._current_token() is None or self._current_token().type != 'COMMA':
-            raise FormulaError("#VALUE!")
-        self._consume('COMMA')
-        range_start_token = self._current_token()
-        if range_start_token is None or range_start_token.type != 'REF':
-            raise FormulaError("#VALUE!")
-        start_ref = self._consume('REF').value
-        if self._current_token() is None or self._current_token().type != 'COLON':
-            raise FormulaError("#VALUE!")
-        self._consume('COLON')
-        if self._current_token() is None or self._current_token().type != 'REF':
-            raise FormulaError("#VALUE!")
-        end_ref = self._consume('REF').value
-        if self._current_token() is None or self._current_token().type != 'COMMA':
-            raise FormulaError("#VALUE!")
-        self._consume('COMMA')
-        index_value = self._parse_numeric_argument()
-        logger.info("VLOOKUP index raw value=%s", index_value)
-        try:
-            if index_value != index_value.to_integral_value():
-                return _value_error("#VALUE!")
-            index_int = int(index_value)
-        except (InvalidOperation, ValueError):
-            return _value_error("#VALUE!")
-        logger.info("VLOOKUP index_int=%s", index_int)
-        is_sorted = False
-        token = self._current_token()
-        if token is not None and token.type == 'COMMA':
-            self._consume('COMMA')
-            is_sorted = _value_truthy(self.parse_comparison())
-        if self._current_token() is None or self._current_token().type != 'RPAREN':
-            raise FormulaError("#VALUE!")
-        self._consume('RPAREN')
-        if is_sorted:
-            return _value_error("#VALUE!")
-        return _vlookup_value(self.sheet, search_key, start_ref, end_ref, index_int)
+    def number(self, snapshot: SheetSnapshot) -> Decimal:
+        return self.sign * self.operand.number(snapshot)
 
-    def _parse_vlookup_value_skip(self) -> Value:
-        self._consume_function_arguments()
-        if self._current_token() is None or self._current_token().type != 'RPAREN':
-            raise FormulaError("#VALUE!")
-        self._consume('RPAREN')
-        return _value_empty()
 
-    def _parse_abs_arguments(self) -> Decimal:
-        if self._current_token() is None or self._current_token().type == 'RPAREN':
-            raise FormulaError("#VALUE!")
-        value = self._parse_numeric_argument()
-        token = self._current_token()
-        if token is None or token.type != 'RPAREN':
-            raise FormulaError("#VALUE!")
-        self._consume('RPAREN')
-        return abs(value)
+@dataclass(frozen=True)
+class _BinaryNode:
+    op: str
+    left: object
+    right: object
 
-    def _parse_round_arguments(self) -> Decimal:
-        if self._current_token() is None or self._current_token().type == 'RPAREN':
-            raise FormulaError("#VALUE!")
-        value = self._parse_numeric_argument()
-        digits = Decimal(0)
-        token = self._current_token()
-        if token is not None and token.type == 'COMMA':
-            self._consume('COMMA')
-            digits = self._parse_numeric_argument()
-        token = self._current_token()
-        if token is None or token.type != 'RPAREN':
+    def number(self, snapshot: SheetSnapshot) -> Decimal:
+        left = self.left.number(snapshot)
+        right = self.right.number(snapshot)
+        if self.op == '+':
+            return left + right
+        if self.op == '-':
+            return left - right
+        if self.op == '*':
+            return left * right
+        if right == 0:
+            raise FormulaError("#DIV/0!")
+        return left / right
+
+
+@dataclass(frozen=True)
+class _RangeArg:
+    start_ref: str
+    end_ref: str
+
+
+@dataclass(frozen=True)
+class _SumNode:
+    args: Tuple[object, ...]
+
+    def sum_and_count(self, snapshot: SheetSnapshot) -> Tuple[Decimal, int]:
+        total = Decimal(0)
+        count = 0
+        for arg in self.args:
+            if isinstance(arg, _RangeArg):
+                arg_sum, arg_count = _sum_and_count_range(snapshot, arg.start_ref, arg.end_ref)
+            else:
+                arg_sum, arg_count = _resolve_reference(snapshot, arg), 1
+            total += arg_sum
+            count += arg_count
+        return total, count
+
+    def number(self, snapshot: SheetSnapshot) -> Decimal:
+        return self.sum_and_count(snapshot)[0]
+
+
+@dataclass(frozen=True)
+class _AverageNode(_SumNode):
+    def number(self, snapshot: SheetSnapshot) -> Decimal:
+        total, count = self.sum_and_count(snapshot)
+        if count == 0:
+            return Decimal(0)
+        return total / Decimal(count)
+
+
+@dataclass(frozen=True)
+class _CountNode:
+    args: Tuple[object, ...]
+
+    def number(self, snapshot: SheetSnapshot) -> Decimal:
+        total_count = 0
+        for arg in self.args:
+            if arg is None:
+                total_count += 1
+            elif isinstance(arg, _RangeArg):
+                total_count += _count_range(snapshot, arg.start_ref, arg.end_ref)
+            else:
+                total_count += _count_single_ref(snapshot, arg)
+        return Decimal(total_count)
+
+
+@dataclass(frozen=True)
+class _MinMaxNode:
+    mode: str
+    args: Tuple[object, ...]
+
+    def number(self, snapshot: SheetSnapshot) -> Decimal:
+        min_value: Optional[Decimal] = None
+        max_value: Optional[Decimal] = None
+        for arg in self.args:
+            if isinstance(arg, _RangeArg):
+                arg_min, arg_max = _min_max_range(snapshot, arg.start_ref, arg.end_ref)
+            else:
+                arg_min = arg_max = _resolve_reference(snapshot, arg)
+            if min_value is None or arg_min < min_value:
+                min_value = arg_min
+            if max_value is None or arg_max > max_value:
+                max_value = arg_max
+        if min_value is None or max_value is None:
             raise FormulaError("#VALUE!")
-        self._consume('RPAREN')
+        return min_value if self.mode == 'min' else max_value
+
+
+@dataclass(frozen=True)
+class _AbsNode:
+    arg: object
+
+    def number(self, snapshot: SheetSnapshot) -> Decimal:
+        return abs(self.arg.number(snapshot))
+
+
+@dataclass(frozen=True)
+class _RoundNode:
+    arg: object
+    digits: Optional[object]
+
+    def number(self, snapshot: SheetSnapshot) -> Decimal:
+        value = self.arg.number(snapshot)
+        digits = self.digits.number(snapshot) if self.digits is not None else Decimal(0)
         try:
             if digits != digits.to_integral_value():
                 raise FormulaError("#VALUE!")
@@ -830,41 +634,98 @@ class _Parser:
         except (InvalidOperation, ValueError):
             raise FormulaError("#VALUE!")
 
-    def _parse_floor_ceiling_arguments(self, mode: str) -> Decimal:
-        if self._current_token() is None or self._current_token().type == 'RPAREN':
-            raise FormulaError("#VALUE!")
-        value = self._parse_numeric_argument()
-        significance = Decimal(1)
-        token = self._current_token()
-        if token is not None and token.type == 'COMMA':
-            self._consume('COMMA')
-            significance = self._parse_numeric_argument()
-        token = self._current_token()
-        if token is None or token.type != 'RPAREN':
-            raise FormulaError("#VALUE!")
-        self._consume('RPAREN')
+
+@dataclass(frozen=True)
+class _FloorCeilingNode:
+    mode: str
+    arg: object
+    significance: Optional[object]
+
+    def number(self, snapshot: SheetSnapshot) -> Decimal:
+        value = self.arg.number(snapshot)
+        significance = self.significance.number(snapshot) if self.significance is not None else Decimal(1)
         if significance == 0:
             raise FormulaError("#VALUE!")
         try:
-            rounding = ROUND_FLOOR if mode == 'floor' else ROUND_CEILING
+            rounding = ROUND_FLOOR if self.mode == 'floor' else ROUND_CEILING
             quotient = (value / significance).to_integral_value(rounding=rounding)
             return quotient * significance
         except (InvalidOperation, ZeroDivisionError):
             raise FormulaError("#VALUE!")
 
-    def _parse_min_max_arguments(self, mode: str) -> Decimal:
-        if self._current_token() is None:
-            raise FormulaError("#VALUE!")
-        if self._current_token().type == 'RPAREN':
+
+@dataclass(frozen=True)
+class _ErrorNode:
+    """A construct that does not compile; its error is raised only if it is evaluated."""
+    code: str
+
+    def value(self, snapshot: SheetSnapshot) -> Value:
+        raise FormulaError(self.code)
+
+    def number(self, snapshot: SheetSnapshot) -> Decimal:
+        raise FormulaError(self.code)
+
+
+class _Compiler:
+    """
+    Builds an immutable expression tree from tokens; the only formula parser.
+
+    Raises FormulaError for constructs that can never evaluate. Arguments that
+    are only evaluated when their branch is taken (IF branches, AND/OR
+    arguments after the first) are checked against a lenient grammar instead:
+    if they do not compile, their error is deferred to an ``_ErrorNode`` so a
+    formula such as ``IF(1=1,2,FOO(B1))`` still evaluates to 2.
+    """
+
+    _VALUE_FUNCTIONS = ('if', 'and', 'or', 'not', 'vlookup')
+
+    def __init__(self, tokens: Tuple[Token, ...]) -> None:
+        self.tokens = tokens
+        self.index = 0
+
+    def compile(self) -> object:
+        root = self.compile_comparison()
+        if self.index < len(self.tokens):
+            raise FormulaError("#REF!")
+        return root
+
+    def _current_token(self) -> Optional[Token]:
+        if self.index >= len(self.tokens):
+            return None
+        return self.tokens[self.index]
+
+    def _peek(self, offset: int = 1) -> Optional[Token]:
+        idx = self.index + offset
+        if idx >= len(self.tokens):
+            return None
+        return self.tokens[idx]
+
+    def _consume(self, expected_type: Optional[str] = None) -> Token:
+        token = self._current_token()
+        if token is None:
+            raise FormulaError("#REF!")
+        if expected_type and token.type != expected_type:
+            raise FormulaError("#REF!")
+        self.index += 1
+        return token
+
+    def _expect(self, token_type: str, code: str = "#VALUE!") -> Token:
+        token = self._current_token()
+        if token is None or token.type != token_type:
+            raise FormulaError(code)
+        self.index += 1
+        return token
+
+    def _open_arguments(self) -> None:
+        self._consume('IDENT')
+        self._consume('LPAREN')
+        if self._current_token() is None or self._current_token().type == 'RPAREN':
             raise FormulaError("#VALUE!")
-        min_value: Optional[Decimal] = None
-        max_value: Optional[Decimal] = None
+
+    def _compile_argument_list(self, compile_argument) -> Tuple[object, ...]:
+        args = []
         while True:
-            arg_min, arg_max = self._parse_min_max_argument_value()
-            if min_value is None or arg_min < min_value:
-                min_value = arg_min
-            if max_value is None or arg_max > max_value:
-                max_value = arg_max
+            args.append(compile_argument())
             token = self._current_token()
             if token is None:
                 raise FormulaError("#VALUE!")
@@ -875,42 +736,285 @@ class _Parser:
                 continue
             if token.type == 'RPAREN':
                 self._consume('RPAREN')
-                break
-            raise FormulaError("#VALUE!")
-        if min_value is None or max_value is None:
+                return tuple(args)
             raise FormulaError("#VALUE!")
-        return min_value if mode == 'min' else max_value
 
-    def _parse_function_argument_value(self) -> Tuple[Decimal, int]:
+    def compile_comparison(self) -> object:
+        left = self._compile_comparison_operand()
+        token = self._current_token()
+        if token is not None and token.type == 'COMPARE':
+            self._consume('COMPARE')
+            right = self._compile_comparison_operand()
+            return _CompareNode(left, token.value, right)
+        return left
+
+    def _compile_comparison_operand(self) -> object:
         token = self._current_token()
-        if token is None or token.type != 'REF':
+        if token is None:
+            raise FormulaError("#REF!")
+        name = token.value.lower() if token.type == 'IDENT' else None
+        if name in ('true', 'false'):
+            self._consume('IDENT')
+            return _BooleanNode(name == 'true')
+        if name in self._VALUE_FUNCTIONS:
+            return self._compile_value_function(name)
+        if token.type == 'STRING':
+            self._consume('STRING')
+            return _StringNode(token.value)
+        if token.type == 'REF':
+            next_token = self._peek()
+            if next_token is not None and next_token.type == 'COLON':
+                raise FormulaError("#VALUE!")
+            if next_token is not None and next_token.type == 'OP' and next_token.value in '+-*/':
+                return _NumericValueNode(self.compile_expression())
+            self._consume('REF')
+            return _ReferenceValueNode(token.value)
+        return _NumericValueNode(self.compile_expression())
+
+    def _compile_value_function(self, name: str) -> object:
+        self._consume('IDENT')
+        self._consume('LPAREN')
+        if self._current_token() is None or self._current_token().type == 'RPAREN':
             raise FormulaError("#VALUE!")
-        start_ref = self._consume('REF').value
+        if name == 'if':
+            condition = self.compile_comparison()
+            self._expect('COMMA')
+            when_true = self._compile_skippable()
+            self._expect('COMMA')
+            when_false = self._compile_skippable()
+            self._expect('RPAREN')
+            return _IfNode(condition, when_true, when_false)
+        if name in ('and', 'or'):
+            args = []
+            while True:
+                args.append(self._compile_skippable() if args else self.compile_comparison())
+                token = self._current_token()
+                if token is None:
+                    raise FormulaError("#VALUE!")
+                if token.type == 'COMMA':
+                    self._consume('COMMA')
+                    continue
+                if token.type == 'RPAREN':
+                    self._consume('RPAREN')
+                    break
+                raise FormulaError("#VALUE!")
+            return _AndNode(tuple(args)) if name == 'and' else _OrNode(tuple(args))
+        if name == 'not':
+            arg = self.compile_comparison()
+            self._expect('RPAREN')
+            return _NotNode(arg)
+        search_key = self.compile_comparison()
+        self._expect('COMMA')
+        start_ref = self._expect('REF').value
+        self._expect('COLON')
+        end_ref = self._expect('REF').value
+        self._expect('COMMA')
+        index = self._compile_numeric_argument()
+        is_sorted = None
         token = self._current_token()
-        if token is not None and token.type == 'COLON':
-            self._consume('COLON')
-            end_ref = self._consume('REF').value
-            return _sum_and_count_range(self.sheet, start_ref, end_ref)
-        return _resolve_reference(self.sheet, start_ref), 1
+        if token is not None and token.type == 'COMMA':
+            self._consume('COMMA')
+            is_sorted = self.compile_comparison()
+        self._expect('RPAREN')
+        return _VlookupNode(search_key, start_ref, end_ref, index, is_sorted)
+
+    def compile_expression(self) -> object:
+        node = self._compile_term()
+        while True:
+            token = self._current_token()
+            if token is None or token.type != 'OP' or token.value not in '+-':
+                return node
+            self._consume('OP')
+            node = _BinaryNode(token.value, node, self._compile_term())
+
+    def _compile_term(self) -> object:
+        node = self._compile_factor()
+        while True:
+            token = self._current_token()
+            if token is None or token.type != 'OP' or token.value not in '*/':
+                return node
+            self._consume('OP')
+            node = _BinaryNode(token.value, node, self._compile_factor())
 
-    def _parse_count_argument_value(self) -> int:
+    def _compile_factor(self) -> object:
         token = self._current_token()
         if token is None:
-            raise FormulaError("#VALUE!")
+            raise FormulaError("#REF!")
+
+        name = token.value.lower() if token.type == 'IDENT' else None
+        if name in ('sum', 'average'):
+            self._open_arguments()
+            args = self._compile_argument_list(self._compile_range_or_ref_argument)
+            return _SumNode(args) if name == 'sum' else _AverageNode(args)
+        if name == 'count':
+            self._open_arguments()
+            return _CountNode(self._compile_argument_list(self._compile_count_argument))
+        if name in self._VALUE_FUNCTIONS:
+            return _CoerceNode(self._compile_value_function(name))
+        if name == 'abs':
+            self._open_arguments()
+            arg = self._compile_numeric_argument()
+            self._expect('RPAREN')
+            return _AbsNode(arg)
+        if name in ('round', 'floor', 'ceiling'):
+            self._open_arguments()
+            arg = self._compile_numeric_argument()
+            second = None
+            token = self._current_token()
+            if token is not None and token.type == 'COMMA':
+                self._consume('COMMA')
+                second = self._compile_numeric_argument()
+            self._expect('RPAREN')
+            if name == 'round':
+                return _RoundNode(arg, second)
+            return _FloorCeilingNode(name, arg, second)
+        if name in ('min', 'max'):
+            self._open_arguments()
+            return _MinMaxNode(name, self._compile_argument_list(self._compile_range_or_ref_argument))
+
+        if token.type == 'OP' and token.value in '+-':
+            self._consume('OP')
+            operand = self._compile_factor()
+            return operand if token.value == '+' else _NegateNode(operand)
+
         if token.type == 'NUMBER':
             self._consume('NUMBER')
-            return 1
+            try:
+                return _NumberNode(Decimal(token.value))
+            except InvalidOperation as exc:
+                raise FormulaError("#REF!") from exc
+
+        if token.type == 'REF':
+            self._consume('REF')
+            return _ReferenceNumberNode(token.value)
+
+        if token.type == 'LPAREN':
+            self._consume('LPAREN')
+            node = self.compile_expression()
+            self._expect('RPAREN', "#REF!")
+            return node
+
+        raise FormulaError("#REF!")
+
+    def _compile_range_or_ref_argument(self) -> object:
+        start_ref = self._expect('REF').value
+        token = self._current_token()
+        if token is not None and token.type == 'COLON':
+            self._consume('COLON')
+            return _RangeArg(start_ref, self._consume('REF').value)
+        return start_ref
+
+    def _compile_count_argument(self) -> object:
+        token = self._current_token()
+        if token is not None and token.type == 'NUMBER':
+            self._consume('NUMBER')
+            return None
+        return self._compile_range_or_ref_argument()
+
+    def _compile_skippable(self) -> object:
+        start = self.index
+        try:
+            return self.compile_comparison()
+        except FormulaError as exc:
+            self.index = start
+            self._skip_comparison()
+            return _ErrorNode(exc.code)
+
+    # Lenient grammar for arguments that may never be evaluated: any function
+    # name with any arguments, strings anywhere in an expression.
+    def _skip_comparison(self) -> None:
+        self._skip_comparison_operand()
+        token = self._current_token()
+        if token is not None and token.type == 'COMPARE':
+            self._consume('COMPARE')
+            self._skip_comparison_operand()
+
+    def _skip_comparison_operand(self) -> None:
+        token = self._current_token()
+        if token is None:
+            raise FormulaError("#REF!")
+        name = token.value.lower() if token.type == 'IDENT' else None
+        if name in ('true', 'false'):
+            self._consume('IDENT')
+            return
+        if name in self._VALUE_FUNCTIONS:
+            self._consume('IDENT')
+            self._consume('LPAREN')
+            self._skip_arguments()
+            self._expect('RPAREN')
+            return
+        if token.type == 'STRING':
+            self._consume('STRING')
+            return
         if token.type == 'REF':
-            start_ref = self._consume('REF').value
+            next_token = self._peek()
+            if next_token is not None and next_token.type == 'COLON':
+                raise FormulaError("#VALUE!")
+        self._skip_expression()
+
+    def _skip_expression(self) -> None:
+        self._skip_term()
+        while True:
+            token = self._current_token()
+            if token is None or token.type != 'OP' or token.value not in '+-':
+                return
+            self._consume('OP')
+            self._skip_term()
+
+    def _skip_term(self) -> None:
+        self._skip_factor()
+        while True:
+            token = self._current_token()
+            if token is None or token.type != 'OP' or token.value not in '*/':
+                return
+            self._consume('OP')
+            self._skip_factor()
+
+    def _skip_factor(self) -> None:
+        token = self._current_token()
+        if token is None:
+            raise FormulaError("#REF!")
+        if token.type == 'OP' and token.value in '+-':
+            self._consume('OP')
+            self._skip_factor()
+            return
+        if token.type in ('NUMBER', 'REF', 'STRING'):
+            self._consume(token.type)
+            return
+        if token.type == 'IDENT':
+            self._consume('IDENT')
+            self._consume('LPAREN')
+            self._skip_arguments()
+            self._expect('RPAREN', "#REF!")
+            return
+        if token.type == 'LPAREN':
+            self._consume('LPAREN')
+            self._skip_expression()
+            self._expect('RPAREN', "#REF!")
+            return
+        raise FormulaError("#REF!")
+
+    def _skip_arguments(self) -> None:
+        if self._current_token() is None or self._current_token().type == 'RPAREN':
+            return
+        while True:
             token = self._current_token()
-            if token is not None and token.type == 'COLON':
+            if token is None:
+                raise FormulaError("#REF!")
+            if token.type == 'REF' and self._peek() is not None and self._peek().type == 'COLON':
+                self._consume('REF')
                 self._consume('COLON')
-                end_ref = self._consume('REF').value
-                return _count_range(self.sheet, start_ref, end_ref)
-            return _count_single_ref(self.sheet, start_ref)
-        raise FormulaError("#VALUE!")
+                self._consume('REF')
+            else:
+                self._skip_comparison()
+            token = self._current_token()
+            if token is None:
+                raise FormulaError("#REF!")
+            if token.type != 'COMMA':
+                return
+            self._consume('COMMA')
 
-    def _parse_numeric_argument(self) -> Decimal:
+    def _compile_numeric_argument(self) -> object:
         token = self._current_token()
         if token is None:
             raise FormulaError("#VALUE!")
@@ -924,28 +1028,84 @@ class _Parser:
         if token.type == 'NUMBER':
             self._consume('NUMBER')
             try:
-                return sign * Decimal(token.value)
+                return _SignedNode(sign, _NumberNode(Decimal(token.value)))
             except InvalidOperation:
                 raise FormulaError("#VALUE!")
         if token.type == 'REF':
-            ref = self._consume('REF').value
-            return sign * _resolve_reference(self.sheet, ref)
+            self._consume('REF')
+            return _SignedNode(sign, _ReferenceNumberNode(token.value))
         raise FormulaError("#VALUE!")
-    def _parse_min_max_argument_value(self) -> Tuple[Decimal, Decimal]:
-        token = self._current_token()
-        if token is None or token.type != 'REF':
-            raise FormulaError("#VALUE!")
-        start_ref = self._consume('REF').value
-        token = self._current_token()
-        if token is not None and token.type == 'COLON':
-            self._consume('COLON')
-            end_ref = self._consume('REF').value
-            return _min_max_range(self.sheet, start_ref, end_ref)
-        value = _resolve_reference(self.sheet, start_ref)
-        return value, value
 
 
-def _resolve_reference(sheet: Sheet, ref: str) -> Decimal:
+def _reference_spans(tokens: Tuple[Token, ...]) -> Tuple[Optional[Tuple[int, int, int, int]], ...]:
+    """
+    Rectangles referenced by a formula, in the order ``extract_references`` sees them.
+
+    ``None`` marks a range whose bounds are invalid; malformed single references
+    are dropped, matching the currency symbol detection rules.
+    """
+    spans = []
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token.type == 'REF':
+            if (
+                index + 2 < len(tokens)
+                and tokens[index + 1].type == 'COLON'
+                and tokens[index + 2].type == 'REF'
+            ):
+                try:
+                    spans.append(_normalized_range(token.value, tokens[index + 2].value))
+                except FormulaError:
+                    spans.append(None)
+                index += 3
+                continue
+            try:
+                row_index, col_index = reference_to_indexes(token.value)
+                spans.append((row_index, row_index, col_index, col_index))
+            except FormulaError:
+                pass
+        index += 1
+    return tuple(spans)
+
+
+@dataclass(frozen=True)
+class CompiledFormula:
+    """
+    Formula text compiled once and evaluated many times.
+
+    ``root`` is the expression tree. A formula that cannot be tokenized or
+    compiled gets an ``_ErrorNode`` root carrying its error code.
+    """
+    root: object
+    tokens: Tuple[Token, ...] = ()
+    reference_spans: Tuple[Optional[Tuple[int, int, int, int]], ...] = ()
+
+    def evaluate(self, snapshot: SheetSnapshot) -> Value:
+        return self.root.value(snapshot)
+
+
+@lru_cache(maxsize=FORMULA_CACHE_SIZE)
+def _compile_expression(expression: str) -> CompiledFormula:
+    try:
+        tokens = tuple(_tokenize(expression))
+    except FormulaError as exc:
+        return CompiledFormula(root=_ErrorNode(exc.code))
+    spans = _reference_spans(tokens)
+    try:
+        root = _Compiler(tokens).compile()
+    except FormulaError as exc:
+        root = _ErrorNode(exc.code)
+    return CompiledFormula(root=root, tokens=tokens, reference_spans=spans)
+
+
+def compile_formula(raw_input: str) -> CompiledFormula:
+    """Return the cached compiled form of a formula, keyed by its normalized text."""
+    expression = raw_input[1:] if raw_input.startswith('=') else raw_input
+    return _compile_expression(expression.strip())
+
+
+def _resolve_reference(snapshot: SheetSnapshot, ref: str) -> Decimal:
     column_label, row_number = _split_reference(ref)
     column_index = _column_label_to_index(column_label)
     row_index = row_number - 1
@@ -953,44 +1113,37 @@ def _resolve_reference(sheet: Sheet, ref: str) -> Decimal:
     if row_index < 0 or column_index < 0:
         raise FormulaError("#REF!")
 
-    if not SheetRow.objects.filter(sheet=sheet, position=row_index, is_deleted=False).exists():
+    if not snapshot.row_alive(row_index):
         raise FormulaError("#REF!")
 
-    if not SheetColumn.objects.filter(sheet=sheet, position=column_index, is_deleted=False).exists():
+    if not snapshot.column_alive(column_index):
         raise FormulaError("#REF!")
 
-    cell = Cell.objects.filter(
-        sheet=sheet,
-        row__position=row_index,
-        column__position=column_index,
-        row__is_deleted=False,
-        column__is_deleted=False,
-        is_deleted=False
-    ).select_related('row', 'column').first()
+    cell = snapshot.get(row_index, column_index)
 
     if cell is None:
         return Decimal(0)
 
-    if cell.computed_type == ComputedCellType.NUMBER and cell.computed_number is not None:
-        return cell.computed_number
+    if cell['computed_type'] == ComputedCellType.NUMBER and cell['computed_number'] is not None:
+        return cell['computed_number']
 
-    if cell.number_value is not None:
-        return cell.number_value
+    if cell['number_value'] is not None:
+        return cell['number_value']
 
-    if cell.value_type == CellValueType.EMPTY or cell.computed_type == ComputedCellType.EMPTY:
+    if cell['value_type'] == CellValueType.EMPTY or cell['computed_type'] == ComputedCellType.EMPTY:
         return Decimal(0)
 
     if (
-        cell.value_type == CellValueType.FORMULA
-        and cell.computed_type == ComputedCellType.EMPTY
-        and cell.computed_number is None
+        cell['value_type'] == CellValueType.FORMULA
+        and cell['computed_type'] == ComputedCellType.EMPTY
+        and cell['computed_number'] is None
     ):
         return Decimal(0)
 
     currency_number = (
-        _parse_currency_number(cell.raw_input)
-        or _parse_currency_number(cell.computed_string)
-        or _parse_currency_number(cell.string_value)
+        _parse_currency_number(cell['raw_input'])
+        or _parse_currency_number(cell['computed_string'])
+        or _parse_currency_number(cell['string_value'])
     )
     if currency_number is not None:
         return currency_number
@@ -998,7 +1151,7 @@ def _resolve_reference(sheet: Sheet, ref: str) -> Decimal:
     raise FormulaError("#VALUE!")
 
 
-def _resolve_reference_value(sheet: Sheet, ref: str) -> Value:
+def _resolve_reference_value(snapshot: SheetSnapshot, ref: str) -> Value:
     column_label, row_number = _split_reference(ref)
     column_index = _column_label_to_index(column_label)
     row_index = row_number - 1
@@ -1006,46 +1159,39 @@ def _resolve_reference_value(sheet: Sheet, ref: str) -> Value:
     if row_index < 0 or column_index < 0:
         return _value_error("#REF!")
 
-    if not SheetRow.objects.filter(sheet=sheet, position=row_index, is_deleted=False).exists():
+    if not snapshot.row_alive(row_index):
         return _value_error("#REF!")
 
-    if not SheetColumn.objects.filter(sheet=sheet, position=column_index, is_deleted=False).exists():
+    if not snapshot.column_alive(column_index):
         return _value_error("#REF!")
 
-    cell = Cell.objects.filter(
-        sheet=sheet,
-        row__position=row_index,
-        column__position=column_index,
-        row__is_deleted=False,
-        column__is_deleted=False,
-        is_deleted=False
-    ).select_related('row', 'column').first()
+    cell = snapshot.get(row_index, column_index)
 
     if cell is None:
         return _value_empty()
 
-    if cell.computed_type == ComputedCellType.ERROR:
-        return _value_error(cell.error_code or "#VALUE!")
+    if cell['computed_type'] == ComputedCellType.ERROR:
+        return _value_error(cell['error_code'] or "#VALUE!")
 
-    if cell.value_type == CellValueType.BOOLEAN:
-        return _value_boolean(bool(cell.boolean_value))
+    if cell['value_type'] == CellValueType.BOOLEAN:
+        return _value_boolean(bool(cell['boolean_value']))
 
-    if cell.computed_type == ComputedCellType.BOOLEAN:
-        return _value_boolean((cell.computed_string or '').upper() == 'TRUE')
+    if cell['computed_type'] == ComputedCellType.BOOLEAN:
+        return _value_boolean((cell['computed_string'] or '').upper() == 'TRUE')
 
-    if cell.computed_type == ComputedCellType.NUMBER and cell.computed_number is not None:
-        return _value_number(cell.computed_number)
+    if cell['computed_type'] == ComputedCellType.NUMBER and cell['computed_number'] is not None:
+        return _value_number(cell['computed_number'])
 
-    if cell.number_value is not None:
-        return _value_number(cell.number_value)
+    if cell['number_value'] is not None:
+        return _value_number(cell['number_value'])
 
-    if cell.computed_type == ComputedCellType.STRING:
-        return _value_string(cell.computed_string or '')
+    if cell['computed_type'] == ComputedCellType.STRING:
+        return _value_string(cell['computed_string'] or '')
 
-    if cell.value_type == CellValueType.STRING:
-        return _value_string(cell.string_value or '')
+    if cell['value_type'] == CellValueType.STRING:
+        return _value_string(cell['string_value'] or '')
 
-    if cell.value_type == CellValueType.EMPTY or cell.computed_type == ComputedCellType.EMPTY:
+    if cell['value_type'] == CellValueType.EMPTY or cell['computed_type'] == ComputedCellType.EMPTY:
         return _value_empty()
 
     return _value_error("#VALUE!")
@@ -1143,29 +1289,11 @@ def _value_from_cell_record(cell: dict) -> Value:
     return _value_error("#VALUE!")
 
 
-def _values_for_range(sheet: Sheet, row_start: int, row_end: int, col_start: int, col_end: int) -> dict:
-    cells = Cell.objects.filter(
-        sheet=sheet,
-        row__position__gte=row_start,
-        row__position__lte=row_end,
-        column__position__gte=col_start,
-        column__position__lte=col_end,
-        row__is_deleted=False,
-        column__is_deleted=False,
-        is_deleted=False
-    ).values(
-        'row__position',
-        'column__position',
-        'value_type',
-        'string_value',
-        'number_value',
-        'boolean_value',
-        'computed_type',
-        'computed_number',
-        'computed_string',
-        'error_code'
-    )
-    return {(cell['row__position'], cell['column__position']): cell for cell in cells}
+def _values_for_range(snapshot: SheetSnapshot, row_start: int, row_end: int, col_start: int, col_end: int) -> dict:
+    return {
+        (cell['row__position'], cell['column__position']): cell
+        for cell in snapshot.iter_range(row_start, row_end, col_start, col_end)
+    }
 
 
 def _values_match(search_key: Value, candidate: Value) -> bool:
@@ -1181,7 +1309,7 @@ def _values_match(search_key: Value, candidate: Value) -> bool:
 
 
 def _vlookup_value(
-    sheet: Sheet,
+    snapshot: SheetSnapshot,
     search_key: Value,
     start_ref: str,
     end_ref: str,
@@ -1201,7 +1329,7 @@ def _vlookup_value(
     if index < 1 or index > column_count:
         return _value_error("#REF!")
 
-    values = _values_for_range(sheet, row_start, row_end, col_start, col_end)
+    values = _values_for_range(snapshot, row_start, row_end, col_start, col_end)
     for row in range(row_start, row_end + 1):
         key_cell = values.get((row, col_start))
         candidate = _value_empty() if key_cell is None else _value_from_cell_record(key_cell)
@@ -1241,79 +1369,54 @@ def _coerce_numeric_value(
     raise FormulaError("#VALUE!")
 
 
-def _sum_range(sheet: Sheet, start_ref: str, end_ref: str) -> Decimal:
-    total, _count = _sum_and_count_range(sheet, start_ref, end_ref)
+def _sum_range(snapshot: SheetSnapshot, start_ref: str, end_ref: str) -> Decimal:
+    total, _count = _sum_and_count_range(snapshot, start_ref, end_ref)
     return total
 
 
-def _sum_and_count_range(sheet: Sheet, start_ref: str, end_ref: str) -> Tuple[Decimal, int]:
+def _normalized_range(start_ref: str, end_ref: str) -> Tuple[int, int, int, int]:
     start_row, start_col = reference_to_indexes(start_ref)
     end_row, end_col = reference_to_indexes(end_ref)
-    row_start = min(start_row, end_row)
-    row_end = max(start_row, end_row)
-    col_start = min(start_col, end_col)
-    col_end = max(start_col, end_col)
+    return (
+        min(start_row, end_row),
+        max(start_row, end_row),
+        min(start_col, end_col),
+        max(start_col, end_col),
+    )
+
+
+def _coerce_cell_record(cell: dict) -> Decimal:
+    return _coerce_numeric_value(
+        cell['value_type'],
+        cell['number_value'],
+        cell['computed_type'],
+        cell['computed_number'],
+        cell['raw_input'],
+        cell['string_value'],
+        cell['computed_string']
+    )
+
+
+def _sum_and_count_range(snapshot: SheetSnapshot, start_ref: str, end_ref: str) -> Tuple[Decimal, int]:
+    row_start, row_end, col_start, col_end = _normalized_range(start_ref, end_ref)
 
     total = Decimal(0)
-    cells = Cell.objects.filter(
-        sheet=sheet,
-        row__position__gte=row_start,
-        row__position__lte=row_end,
-        column__position__gte=col_start,
-        column__position__lte=col_end,
-        row__is_deleted=False,
-        column__is_deleted=False,
-        is_deleted=False
-    ).values('value_type', 'number_value', 'computed_type', 'computed_number', 'raw_input', 'string_value', 'computed_string')
-
-    for cell in cells:
-        total += _coerce_numeric_value(
-            cell['value_type'],
-            cell['number_value'],
-            cell['computed_type'],
-            cell['computed_number'],
-            cell['raw_input'],
-            cell['string_value'],
-            cell['computed_string']
-        )
+    for cell in snapshot.iter_range(row_start, row_end, col_start, col_end):
+        total += _coerce_cell_record(cell)
 
     count = (row_end - row_start + 1) * (col_end - col_start + 1)
     return total, count
 
 
-def _min_max_range(sheet: Sheet, start_ref: str, end_ref: str) -> Tuple[Decimal, Decimal]:
-    start_row, start_col = reference_to_indexes(start_ref)
-    end_row, end_col = reference_to_indexes(end_ref)
-    row_start = min(start_row, end_row)
-    row_end = max(start_row, end_row)
-    col_start = min(start_col, end_col)
-    col_end = max(start_col, end_col)
+def _min_max_range(snapshot: SheetSnapshot, start_ref: str, end_ref: str) -> Tuple[Decimal, Decimal]:
+    row_start, row_end, col_start, col_end = _normalized_range(start_ref, end_ref)
 
     min_value: Optional[Decimal] = None
     max_value: Optional[Decimal] = None
     seen_cells = 0
 
-    cells = Cell.objects.filter(
-        sheet=sheet,
-        row__position__gte=row_start,
-        row__position__lte=row_end,
-        column__position__gte=col_start,
-        column__position__lte=col_end,
-        row__is_deleted=False,
-        column__is_deleted=False,
-        is_deleted=False
-    ).values('value_type', 'number_value', 'computed_type', 'computed_number', 'raw_input', 'string_value', 'computed_string')
-
-    for cell in cells:
-        value = _coerce_numeric_value(
-            cell['value_type'],
-            cell['number_value'],
-            cell['computed_type'],
-            cell['computed_number'],
-            cell['raw_input'],
-            cell['string_value'],
-            cell['computed_string']
-        )
+    for cell in snapshot.iter_range(row_start, row_end, col_start, col_end):
+        value = _coerce_cell_record(cell)
         seen_cells += 1
         if min_value is None or value < min_value:
             min_value = value
@@ -1340,41 +1443,23 @@ def _min_max_range(sheet: Sheet, start_ref: str, end_ref: str) -> Tuple[Decimal,
     return min_value, max_value
 
 
-def _count_single_ref(sheet: Sheet, ref: str) -> int:
+def _count_single_ref(snapshot: SheetSnapshot, ref: str) -> int:
     row_index, col_index = reference_to_indexes(ref)
     if row_index < 0 or col_index < 0:
         raise FormulaError("#REF!")
-    cell = Cell.objects.filter(
-        sheet=sheet,
-        row__position=row_index,
-        column__position=col_index,
-        row__is_deleted=False,
-        column__is_deleted=False,
-        is_deleted=False
-    ).values('computed_type').first()
+    cell = snapshot.get(row_index, col_index)
     if cell is None:
         return 0
     return 1 if cell['computed_type'] == ComputedCellType.NUMBER else 0
 
 
-def _count_range(sheet: Sheet, start_ref: str, end_ref: str) -> int:
-    start_row, start_col = reference_to_indexes(start_ref)
-    end_row, end_col = reference_to_indexes(end_ref)
-    row_start = min(start_row, end_row)
-    row_end = max(start_row, end_row)
-    col_start = min(start_col, end_col)
-    col_end = max(start_col, end_col)
-    return Cell.objects.filter(
-        sheet=sheet,
-        row__position__gte=row_start,
-        row__position__lte=row_end,
-        column__position__gte=col_start,
-        column__position__lte=col_end,
-        row__is_deleted=False,
-        column__is_deleted=False,
-        computed_type=ComputedCellType.NUMBER,
-        is_deleted=False
-    ).count()
+def _count_range(snapshot: SheetSnapshot, start_ref: str, end_ref: str) -> int:
+    row_start, row_end, col_start, col_end = _normalized_range(start_ref, end_ref)
+    return sum(
+        1
+        for cell in snapshot.iter_range(row_start, row_end, col_start, col_end)
+        if cell['computed_type'] == ComputedCellType.NUMBER
+    )
 
 
 def _split_reference(ref: str) -> Tuple[str, int]:
@@ -1413,11 +1498,7 @@ def _column_index_to_label(index: int) -> str:
 
 
 def extract_references(raw_input: str) -> List[str]:
-    expression = raw_input[1:] if raw_input.startswith('=') else raw_input
-    try:
-        tokens = _tokenize(expression)
-    except FormulaError:
-        return []
+    tokens = compile_formula(raw_input).tokens
     references: List[str] = []
     index = 0
     while index < len(tokens):
@@ -1436,6 +1517,29 @@ def extract_references(raw_input: str) -> List[str]:
     return references
 
 
+def extract_dependencies(
+    raw_input: str
+) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int, int, int]]]:
+    """
+    Split the references of a formula into single cells and unexpanded ranges.
+
+    Returns ``(cells, ranges)``: 0-based ``(row, column)`` positions and
+    ``(row_start, row_end, column_start, column_end)`` rectangles. A range that
+    covers a single cell is reported as a cell; invalid references are skipped.
+    """
+    cells: List[Tuple[int, int]] = []
+    ranges: List[Tuple[int, int, int, int]] = []
+    for span in compile_formula(raw_input).reference_spans:
+        if span is None:
+            continue
+        row_start, row_end, col_start, col_end = span
+        if row_start == row_end and col_start == col_end:
+            cells.append((row_start, col_start))
+        else:
+            ranges.append(span)
+    return cells, ranges
+
+
 def reference_to_indexes(ref: str) -> Tuple[int, int]:
     column_label, row_number = _split_reference(ref)
     column_index = _column_label_to_index(column_label)
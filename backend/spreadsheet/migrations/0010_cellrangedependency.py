@@ -0,0 +1,35 @@
+# Generated by Django 4.2.23 on 2026-10-16 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spreadsheet', '0009_alter_pivotconfig_is_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CellRangeDependency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('row_start', models.PositiveIntegerField(help_text='First row position of the range (0-based)')),
+                ('row_end', models.PositiveIntegerField(help_text='Last row position of the range (0-based, inclusive)')),
+                ('column_start', models.PositiveIntegerField(help_text='First column position of the range (0-based)')),
+                ('column_end', models.PositiveIntegerField(help_text='Last column position of the range (0-based, inclusive)')),
+                ('from_cell', models.ForeignKey(help_text='Formula cell that reads the range', on_delete=django.db.models.deletion.CASCADE, related_name='formula_range_dependencies', to='spreadsheet.cell')),
+                ('sheet', models.ForeignKey(help_text='Sheet the referenced range belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='range_dependencies', to='spreadsheet.sheet')),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['sheet', 'is_deleted', 'column_start', 'column_end'], name='cellrangedep_sheet_col_idx'),
+                    models.Index(fields=['from_cell', 'is_deleted'], name='cellrangedep_from_cell_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.23 on 2026-10-16 10:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('spreadsheet', '0010_cellrangedependency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cell',
+            name='is_stale',
+            field=models.BooleanField(default=False, help_text='Computed value is pending an asynchronous formula recalculation'),
+        ),
+        migrations.CreateModel(
+            name='FormulaRecalcJob',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('stale_cell_count', models.PositiveIntegerField(default=0)),
+                ('error_code', models.CharField(blank=True, max_length=50, null=True)),
+                ('error_message', models.TextField(blank=True, default='')),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='formula_recalc_jobs', to=settings.AUTH_USER_MODEL)),
+                ('sheet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recalc_jobs', to='spreadsheet.sheet')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['sheet', 'status'], name='formularecalcjob_sheet_idx')],
+            },
+        ),
+    ]
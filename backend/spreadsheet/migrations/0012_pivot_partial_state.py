@@ -0,0 +1,49 @@
+# Generated by Django 4.2.23 on 2026-10-16 11:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spreadsheet', '0011_cell_is_stale_formularecalcjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PivotPartialState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('fingerprint', models.CharField(help_text='Hash of the config and resolved source columns the state is valid for', max_length=64)),
+                ('header_row_id', models.BigIntegerField(blank=True, help_text='Source row used as the header row when the state was built', null=True)),
+                ('buckets', models.JSONField(default=dict)),
+                ('output', models.JSONField(default=list)),
+                ('pivot_config', models.OneToOneField(help_text='Pivot config this state was built for', on_delete=django.db.models.deletion.CASCADE, related_name='partial_state', to='spreadsheet.pivotconfig')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PivotSourceRowState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('row_key', models.TextField()),
+                ('col_key', models.TextField()),
+                ('values', models.JSONField(default=list, help_text='One number per pivot value field')),
+                ('pivot_config', models.ForeignKey(help_text='Pivot config the contribution belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='source_row_states', to='spreadsheet.pivotconfig')),
+                ('source_row', models.ForeignKey(help_text='Source sheet row the contribution was read from', on_delete=django.db.models.deletion.CASCADE, related_name='pivot_row_states', to='spreadsheet.sheetrow')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['pivot_config', 'row_key', 'col_key'], name='pivotrowstate_bucket_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pivotsourcerowstate',
+            constraint=models.UniqueConstraint(fields=('pivot_config', 'source_row'), name='unique_pivot_source_row_state'),
+        ),
+    ]
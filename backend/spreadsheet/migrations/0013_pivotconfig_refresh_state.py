@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-16 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spreadsheet', '0012_pivot_partial_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pivotconfig',
+            name='refresh_pending',
+            field=models.BooleanField(default=False, help_text='Source data changed since the last recompute; a background refresh is queued'),
+        ),
+        migrations.AddField(
+            model_name='pivotconfig',
+            name='refresh_running',
+            field=models.BooleanField(default=False, help_text='A background refresh is in progress'),
+        ),
+        migrations.AddField(
+            model_name='pivotconfig',
+            name='refresh_full',
+            field=models.BooleanField(default=False, help_text='The pending refresh must rebuild the pivot from scratch'),
+        ),
+        migrations.AddField(
+            model_name='pivotconfig',
+            name='pending_row_ids',
+            field=models.JSONField(blank=True, default=list, help_text='Source row ids edited since the last recompute'),
+        ),
+        migrations.AddField(
+            model_name='pivotconfig',
+            name='last_computed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
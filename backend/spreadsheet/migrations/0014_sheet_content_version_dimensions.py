@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-16 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spreadsheet', '0013_pivotconfig_refresh_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sheet',
+            name='content_version',
+            field=models.PositiveBigIntegerField(default=0, help_text='Bumped on every cell or structure change; used as the viewport ETag'),
+        ),
+        migrations.AddField(
+            model_name='sheet',
+            name='cached_row_count',
+            field=models.PositiveIntegerField(blank=True, help_text='Cached max active row position + 1; null when it must be recomputed', null=True),
+        ),
+        migrations.AddField(
+            model_name='sheet',
+            name='cached_column_count',
+            field=models.PositiveIntegerField(blank=True, help_text='Cached max active column position + 1; null when it must be recomputed', null=True),
+        ),
+    ]
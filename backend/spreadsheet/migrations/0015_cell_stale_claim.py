@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-16 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spreadsheet', '0014_sheet_content_version_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cell',
+            name='stale_claim',
+            field=models.UUIDField(blank=True, help_text='Recalculation that claimed this stale cell; cleared when the cell is marked stale again', null=True),
+        ),
+    ]
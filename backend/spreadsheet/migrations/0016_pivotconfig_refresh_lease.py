@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-16 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spreadsheet', '0015_cell_stale_claim'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pivotconfig',
+            name='refresh_started_at',
+            field=models.DateTimeField(blank=True, help_text='When the running refresh started; it is treated as lost once its lease expires', null=True),
+        ),
+        migrations.AddField(
+            model_name='pivotconfig',
+            name='refresh_scheduled_at',
+            field=models.DateTimeField(blank=True, help_text='When the pending refresh was last enqueued; it is re-enqueued once its lease expires', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-16 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spreadsheet', '0016_pivotconfig_refresh_lease'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sheet',
+            name='content_version',
+            field=models.PositiveBigIntegerField(default=0, help_text='Bumped when rows or columns are added or removed; guards the cached dimensions'),
+        ),
+    ]
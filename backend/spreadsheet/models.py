@@ -68,6 +68,20 @@ class Sheet(TimeStampedModel):
         default=0,
         help_text="Number of columns to freeze (0 = none)"
     )
+    content_version = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Bumped when rows or columns are added or removed; guards the cached dimensions"
+    )
+    cached_row_count = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Cached max active row position + 1; null when it must be recomputed"
+    )
+    cached_column_count = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Cached max active column position + 1; null when it must be recomputed"
+    )
 
     class Meta:
         ordering = ['position', 'created_at']
@@ -117,6 +131,31 @@ class PivotConfig(TimeStampedModel):
     filters_config = models.JSONField(default=dict, blank=True, help_text="Optional filters")
     show_grand_total_row = models.BooleanField(default=True)
     show_grand_total_column = models.BooleanField(default=True)
+    refresh_pending = models.BooleanField(
+        default=False,
+        help_text="Source data changed since the last recompute; a background refresh is queued"
+    )
+    refresh_running = models.BooleanField(default=False, help_text="A background refresh is in progress")
+    refresh_started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the running refresh started; it is treated as lost once its lease expires"
+    )
+    refresh_scheduled_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the pending refresh was last enqueued; it is re-enqueued once its lease expires"
+    )
+    refresh_full = models.BooleanField(
+        default=False,
+        help_text="The pending refresh must rebuild the pivot from scratch"
+    )
+    pending_row_ids = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Source row ids edited since the last recompute"
+    )
+    last_computed_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         indexes = [
@@ -127,6 +166,71 @@ class PivotConfig(TimeStampedModel):
         return f"PivotConfig pivot_sheet={self.pivot_sheet_id} source_sheet={self.source_sheet_id}"
 
 
+class PivotPartialState(TimeStampedModel):
+    """
+    Mergeable aggregate state of a pivot, used to apply source edits as deltas.
+
+    ``buckets`` maps row_key -> col_key -> one [sum, count, min, max] partial per
+    value field; ``output`` is the last grid written to the pivot sheet so only
+    changed cells are rewritten.
+    """
+
+    pivot_config = models.OneToOneField(
+        PivotConfig,
+        on_delete=models.CASCADE,
+        related_name='partial_state',
+        help_text="Pivot config this state was built for"
+    )
+    fingerprint = models.CharField(
+        max_length=64,
+        help_text="Hash of the config and resolved source columns the state is valid for"
+    )
+    header_row_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text="Source row used as the header row when the state was built"
+    )
+    buckets = models.JSONField(default=dict)
+    output = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"PivotPartialState pivot_config={self.pivot_config_id}"
+
+
+class PivotSourceRowState(TimeStampedModel):
+    """Contribution of one source row to a pivot, so edits can subtract it again."""
+
+    pivot_config = models.ForeignKey(
+        PivotConfig,
+        on_delete=models.CASCADE,
+        related_name='source_row_states',
+        help_text="Pivot config the contribution belongs to"
+    )
+    source_row = models.ForeignKey(
+        'SheetRow',
+        on_delete=models.CASCADE,
+        related_name='pivot_row_states',
+        help_text="Source sheet row the contribution was read from"
+    )
+    row_key = models.TextField()
+    col_key = models.TextField()
+    values = models.JSONField(default=list, help_text="One number per pivot value field")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['pivot_config', 'source_row'],
+                name='unique_pivot_source_row_state'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['pivot_config', 'row_key', 'col_key'], name='pivotrowstate_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"PivotSourceRowState pivot_config={self.pivot_config_id} row={self.source_row_id}"
+
+
 class SheetRow(TimeStampedModel):
     sheet = models.ForeignKey(
         Sheet,
@@ -342,6 +446,15 @@ class Cell(TimeStampedModel):
         blank=True,
         help_text="Formula error code (e.g. #DIV/0!, #REF!)"
     )
+    is_stale = models.BooleanField(
+        default=False,
+        help_text="Computed value is pending an asynchronous formula recalculation"
+    )
+    stale_claim = models.UUIDField(
+        null=True,
+        blank=True,
+        help_text="Recalculation that claimed this stale cell; cleared when the cell is marked stale again"
+    )
 
     class Meta:
         constraints = [
@@ -417,6 +530,46 @@ class CellDependency(TimeStampedModel):
         return f"{self.from_cell} depends on {self.to_cell}"
 
 
+class CellRangeDependency(TimeStampedModel):
+    """
+    Rectangular range read by a formula cell, e.g. A1:A10000 in =SUM(A1:A10000).
+
+    Stored by 0-based row/column position so a range costs one row here instead
+    of one CellDependency and placeholder Cell per member.
+    """
+    sheet = models.ForeignKey(
+        Sheet,
+        on_delete=models.CASCADE,
+        related_name='range_dependencies',
+        help_text="Sheet the referenced range belongs to"
+    )
+    from_cell = models.ForeignKey(
+        Cell,
+        on_delete=models.CASCADE,
+        related_name='formula_range_dependencies',
+        help_text="Formula cell that reads the range"
+    )
+    row_start = models.PositiveIntegerField(help_text="First row position of the range (0-based)")
+    row_end = models.PositiveIntegerField(help_text="Last row position of the range (0-based, inclusive)")
+    column_start = models.PositiveIntegerField(help_text="First column position of the range (0-based)")
+    column_end = models.PositiveIntegerField(help_text="Last column position of the range (0-based, inclusive)")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['sheet', 'is_deleted', 'column_start', 'column_end'],
+                name='cellrangedep_sheet_col_idx'
+            ),
+            models.Index(fields=['from_cell', 'is_deleted'], name='cellrangedep_from_cell_idx'),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.from_cell_id} depends on rows {self.row_start}-{self.row_end}, "
+            f"columns {self.column_start}-{self.column_end}"
+        )
+
+
 class SpreadsheetHighlightScope(models.TextChoices):
     CELL = 'CELL', 'Cell'
     ROW = 'ROW', 'Row'
@@ -593,3 +746,40 @@ class PatternJob(TimeStampedModel):
     def __str__(self):
         return f"PatternJob {self.id} ({self.status})"
 
+
+class FormulaRecalcJob(TimeStampedModel):
+    """Asynchronous recalculation of the stale formula cells of a sheet."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    sheet = models.ForeignKey(
+        Sheet,
+        on_delete=models.CASCADE,
+        related_name='recalc_jobs'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=PatternJobStatus.choices,
+        default=PatternJobStatus.QUEUED
+    )
+    progress = models.PositiveSmallIntegerField(default=0)
+    stale_cell_count = models.PositiveIntegerField(default=0)
+    error_code = models.CharField(max_length=50, null=True, blank=True)
+    error_message = models.TextField(blank=True, default='')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='formula_recalc_jobs'
+    )
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['sheet', 'status'], name='formularecalcjob_sheet_idx'),
+        ]
+
+    def __str__(self):
+        return f"FormulaRecalcJob {self.id} ({self.status})"
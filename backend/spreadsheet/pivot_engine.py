@@ -5,6 +5,9 @@ Builds pivot table from source data and produces cell operations.
 from typing import Any
 from decimal import Decimal
 
+# Aggregations that can be rebuilt from [sum, count, min, max] partial states
+MERGEABLE_AGGREGATIONS = ('SUM', 'COUNT', 'AVG', 'MIN', 'MAX')
+
 
 def _round_precision(value: float, decimals: int = 10) -> float:
     if not (isinstance(value, (int, float)) and abs(value) != float('inf')):
@@ -71,29 +74,21 @@ def _format_number_for_cell(value: float) -> str:
         return str(v)
 
 
-def build_pivot_and_cell_operations(
-    source_rows: list[dict],
+def resolve_pivot_fields(
     columns: list[dict],
     rows_config: list,
     columns_config: list,
     values_config: list,
-    show_grand_total_row: bool = True,
-) -> tuple[list[list], list[list], list[dict]]:
+) -> dict | None:
     """
-    Build pivot headers, body, and cell operations.
-    source_rows: list of {col_index: value} or {header_name: value} - we use header names from columns
-    columns: list of {index, header}
-    Returns: (headers, body, operations) where operations are [{operation, row, column, raw_input}, ...]
+    Resolve configured field names to source column indices.
+    Returns None when the config has no usable row or value fields.
     """
-    headers_out: list[list] = []
-    body_out: list[list] = []
-    operations: list[dict] = []
-
     row_fields = list(rows_config) if rows_config else []
     col_configs = _normalize_column_config(columns_config or [])
     value_configs = list(values_config or [])
     if not row_fields or not value_configs:
-        return headers_out, body_out, operations
+        return None
 
     header_names = [c['header'] for c in columns]
     col_field_names = [c['field'] for c in col_configs]
@@ -115,42 +110,157 @@ def build_pivot_and_cell_operations(
             value_fields.append({'index': idx, 'field': field, 'aggregation': agg, 'display': disp})
 
     if not row_indices or not value_fields:
-        return headers_out, body_out, operations
+        return None
+
+    return {
+        'row_fields': row_fields,
+        'row_indices': row_indices,
+        'col_indices': col_indices,
+        'col_sort': col_sort,
+        'value_fields': value_fields,
+    }
+
+
+def pivot_row_contribution(row: dict, fields: dict) -> tuple[str, str, list[float]] | None:
+    """
+    (row_key, col_key, numbers) a source row adds to the pivot, or None when the
+    row is skipped because one of its row fields is empty.
+    """
+    row_indices = fields['row_indices']
+    col_indices = fields['col_indices']
+    row_key = _build_composite_key(row, row_indices)
+    if any(not (str(row.get(i, '') or '').strip()) for i in row_indices):
+        return None
+
+    col_key = '__TOTAL__'
+    if col_indices:
+        col_key = _build_composite_key(row, col_indices)
+        if not all(k for k in col_key.split('|||')):
+            col_key = '__TOTAL__'
+
+    numbers = []
+    for vf in fields['value_fields']:
+        raw = row.get(vf['index'], '') or ''
+        raw = str(raw).strip() if raw is not None else ''
+        try:
+            num = float(raw) if raw else 0.0
+        except (TypeError, ValueError):
+            num = 0.0
+        numbers.append(num)
+    return row_key, col_key, numbers
+
+
+def is_mergeable(fields: dict) -> bool:
+    """True when every aggregation can be kept as a sum/count/min/max partial state."""
+    return all(vf['aggregation'] in MERGEABLE_AGGREGATIONS for vf in fields['value_fields'])
+
+
+def merge_partial(partial: list | None, num: float) -> list:
+    """Fold one number into a [sum, count, min, max] partial state."""
+    if partial is None:
+        return [num, 1, num, num]
+    return [partial[0] + num, partial[1] + 1, min(partial[2], num), max(partial[3], num)]
+
+
+def _aggregate_partial(partial: list | None, agg: str) -> float:
+    if not partial or not partial[1]:
+        return 0.0
+    total, count, minimum, maximum = partial
+    if agg == 'SUM':
+        return _round_precision(total)
+    if agg == 'COUNT':
+        return float(count)
+    if agg == 'AVG':
+        return _round_precision(total / count)
+    if agg == 'MIN':
+        return _round_precision(minimum)
+    if agg == 'MAX':
+        return _round_precision(maximum)
+    return 0.0
+
+
+def build_pivot_and_cell_operations(
+    source_rows: list[dict],
+    columns: list[dict],
+    rows_config: list,
+    columns_config: list,
+    values_config: list,
+    show_grand_total_row: bool = True,
+) -> tuple[list[list], list[list], list[dict]]:
+    """
+    Build pivot headers, body, and cell operations.
+    source_rows: list of {col_index: value} or {header_name: value} - we use header names from columns
+    columns: list of {index, header}
+    Returns: (headers, body, operations) where operations are [{operation, row, column, raw_input}, ...]
+    """
+    fields = resolve_pivot_fields(columns, rows_config, columns_config, values_config)
+    if fields is None:
+        return [], [], []
 
-    unique_row_keys = set()
-    unique_col_keys = set()
     data_map = {}  # rowKey -> colKey -> valueIndex -> list of numbers
 
     for row in source_rows:
-        row_key = _build_composite_key(row, row_indices)
-        if any(not (str(row.get(i, '') or '').strip()) for i in row_indices):
+        contribution = pivot_row_contribution(row, fields)
+        if contribution is None:
             continue
-        unique_row_keys.add(row_key)
-
-        col_key = '__TOTAL__'
-        if col_indices:
-            col_key = _build_composite_key(row, col_indices)
-            if all(k for k in col_key.split('|||')):
-                unique_col_keys.add(col_key)
-            else:
-                col_key = '__TOTAL__'
-
-        map_key = f'{row_key}:::${col_key}'
-        if map_key not in data_map:
-            data_map[map_key] = {}
-        vmap = data_map[map_key]
-
-        for vi, vf in enumerate(value_fields):
-            raw = row.get(vf['index'], '') or ''
-            raw = str(raw).strip() if raw is not None else ''
-            try:
-                num = float(raw) if raw else 0.0
-            except (TypeError, ValueError):
-                num = 0.0
+        row_key, col_key, numbers = contribution
+        vmap = data_map.setdefault(row_key, {}).setdefault(col_key, {})
+        for vi, num in enumerate(numbers):
             if vi not in vmap:
                 vmap[vi] = []
             vmap[vi].append(num)
 
+    value_fields = fields['value_fields']
+
+    def aggregate(row_key, col_key, vi):
+        vals = data_map.get(row_key, {}).get(col_key, {}).get(vi, [])
+        return _aggregate(vals, value_fields[vi]['aggregation'])
+
+    return _render_pivot(fields, data_map, aggregate, show_grand_total_row)
+
+
+def build_pivot_from_partials(
+    fields: dict,
+    buckets: dict,
+    show_grand_total_row: bool = True,
+) -> tuple[list[list], list[list], list[dict]]:
+    """
+    Same output as build_pivot_and_cell_operations, rendered from partial states.
+    buckets: {row_key: {col_key: [[sum, count, min, max] per value field]}}
+    """
+    value_fields = fields['value_fields']
+
+    def aggregate(row_key, col_key, vi):
+        partials = buckets.get(row_key, {}).get(col_key)
+        return _aggregate_partial(partials[vi] if partials else None, value_fields[vi]['aggregation'])
+
+    return _render_pivot(fields, buckets, aggregate, show_grand_total_row)
+
+
+def _render_pivot(
+    fields: dict,
+    keyed_rows: dict,
+    aggregate,
+    show_grand_total_row: bool,
+) -> tuple[list[list], list[list], list[dict]]:
+    """keyed_rows maps row_key -> {col_key: ...}; aggregate(row_key, col_key, vi) -> float."""
+    headers_out: list[list] = []
+    body_out: list[list] = []
+    operations: list[dict] = []
+
+    row_fields = fields['row_fields']
+    col_indices = fields['col_indices']
+    col_sort = fields['col_sort']
+    value_fields = fields['value_fields']
+
+    unique_row_keys = set(keyed_rows)
+    unique_col_keys = {
+        col_key
+        for col_map in keyed_rows.values()
+        for col_key in col_map
+        if col_key != '__TOTAL__'
+    }
+
     sorted_row_keys = sorted(unique_row_keys)
     sorted_col_keys = (
         sorted(unique_col_keys, reverse=(col_sort == 'desc'))
@@ -171,11 +281,8 @@ def build_pivot_and_cell_operations(
         base_values.append([[] for _ in sorted_col_keys])
         row_totals.append([0.0] * len(value_fields))
         for ci, col_key in enumerate(sorted_col_keys):
-            map_key = f'{row_key}:::${col_key}'
-            vmap = data_map.get(map_key, {})
             for vi in range(len(value_fields)):
-                vals = vmap.get(vi, [])
-                agg_val = _aggregate(vals, value_fields[vi]['aggregation'])
+                agg_val = aggregate(row_key, col_key, vi)
                 base_values[ri][ci].append(agg_val)
                 row_totals[ri][vi] += agg_val
                 col_totals[ci][vi] = col_totals[ci].get(vi, 0) + agg_val
@@ -1,39 +1,76 @@
 """
 Pivot table service - recompute pivot sheets from persisted config and source data.
+
+Mergeable pivots (SUM/COUNT/AVG/MIN/MAX) also keep a PivotPartialState plus one
+PivotSourceRowState per contributing source row, so edits to a few source rows
+are applied as deltas and only the pivot cells that changed are rewritten.
+
+Source edits only mark pivots dirty; refresh_pivot_job applies them in the
+background after SPREADSHEET_PIVOT_REFRESH_DELAY seconds, one run per pivot.
 """
+import hashlib
+import json
 import logging
+from typing import Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
 from django.db import transaction
+from django.utils import timezone
 
-from .models import Sheet, PivotConfig
-from .pivot_engine import build_pivot_and_cell_operations
+from .models import Sheet, PivotConfig, PivotPartialState, PivotSourceRowState
+from .pivot_engine import (
+    build_pivot_and_cell_operations,
+    build_pivot_from_partials,
+    is_mergeable,
+    merge_partial,
+    pivot_row_contribution,
+    resolve_pivot_fields,
+)
 from .services import SheetService, CellService
 
 logger = logging.getLogger(__name__)
 
+# Beyond this many edited rows a pending refresh is cheaper as a full rebuild.
+MAX_PENDING_ROW_IDS = 5000
+# Runs the inline fallback (broker down) makes before leaving a refresh pending.
+PIVOT_INLINE_REFRESH_RUNS = 3
+
 
 def _get_source_columns(source_sheet: Sheet) -> list:
     """Build columns list [{index, header}, ...] from source sheet. Row 0 = headers."""
-    from .models import SheetRow, SheetColumn, Cell
+    from .models import Cell
 
     cols = list(
         source_sheet.columns.filter(is_deleted=False).order_by('position')
     )
-    headers = []
-    for c in cols:
-        cell = Cell.objects.filter(
+    header_cells = {
+        column_id: (raw_input, computed_string)
+        for column_id, raw_input, computed_string in Cell.objects.filter(
             sheet=source_sheet,
             row__position=0,
-            column=c,
+            row__is_deleted=False,
+            column__in=cols,
             is_deleted=False,
-        ).select_related('row', 'column').first()
-        raw = (cell.raw_input or cell.computed_string or '') if cell else ''
+        ).values_list('column_id', 'raw_input', 'computed_string')
+    }
+    headers = []
+    for c in cols:
+        raw_input, computed_string = header_cells.get(c.id, (None, None))
+        raw = raw_input or computed_string or ''
         header = str(raw).strip() if raw else SheetService._generate_column_name(c.position)
         headers.append({'index': c.position, 'header': header or f'Col{c.position}'})
     return headers
 
 
-def _get_source_rows(source_sheet: Sheet, columns: list) -> list:
-    """Build source rows as list of {col_index: value}. Row 0 excluded (header)."""
+def _get_source_rows(
+    source_sheet: Sheet,
+    columns: list,
+    row_ids: Optional[Iterable[int]] = None
+) -> List[Tuple[int, dict]]:
+    """
+    Build source rows as [(row_id, {col_index: value}), ...] in position order.
+    Row 0 excluded (header); rows without any value are skipped.
+    """
     from .models import Cell
 
     if not columns:
@@ -47,31 +84,212 @@ def _get_source_rows(source_sheet: Sheet, columns: list) -> list:
         row__is_deleted=False,
         column__is_deleted=False,
         is_deleted=False,
-    ).select_related('row', 'column')
+    )
+    if row_ids is not None:
+        cells = cells.filter(row_id__in=row_ids)
 
     row_map = {}
-    for cell in cells:
-        r = cell.row.position
-        c = cell.column.position
-        val = cell.computed_string or cell.raw_input or ''
+    row_ids_by_position = {}
+    for row_id, r, c, computed_string, raw_input in cells.values_list(
+        'row_id', 'row__position', 'column__position', 'computed_string', 'raw_input'
+    ):
+        val = computed_string or raw_input or ''
         val = str(val).strip() if val else ''
         if r not in row_map:
             row_map[r] = {}
+            row_ids_by_position[r] = row_id
         row_map[r][c] = val
 
-    max_row = max(row_map.keys()) if row_map else 0
     rows = []
-    for r in range(1, max_row + 1):
-        row_data = row_map.get(r, {})
+    for r in sorted(row_map):
+        row_data = row_map[r]
         has_data = any(
             (row_data.get(c) or '').strip()
             for c in col_positions
         )
         if has_data:
-            rows.append(row_data)
+            rows.append((row_ids_by_position[r], row_data))
     return rows
 
 
+def _header_row_id(source_sheet: Sheet) -> Optional[int]:
+    from .models import SheetRow
+
+    return SheetRow.objects.filter(
+        sheet=source_sheet,
+        position=0,
+        is_deleted=False,
+    ).values_list('id', flat=True).first()
+
+
+def _state_fingerprint(pivot_config: PivotConfig, fields: dict) -> str:
+    payload = json.dumps(
+        [fields, pivot_config.show_grand_total_row],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _operations_grid(operations: list) -> list:
+    """Pivot output as a list of rows of raw_input strings."""
+    grid = []
+    for op in operations:
+        r, c = op['row'], op['column']
+        while len(grid) <= r:
+            grid.append([])
+        row = grid[r]
+        while len(row) <= c:
+            row.append('')
+        row[c] = op.get('raw_input') or ''
+    return grid
+
+
+def _diff_grid(old: list, new: list) -> list:
+    """Set/clear operations turning the ``old`` pivot grid into ``new``."""
+    operations = []
+    for r in range(max(len(old), len(new))):
+        old_row = old[r] if r < len(old) else []
+        new_row = new[r] if r < len(new) else []
+        for c in range(max(len(old_row), len(new_row))):
+            before = old_row[c] if c < len(old_row) else ''
+            after = new_row[c] if c < len(new_row) else ''
+            if before == after:
+                continue
+            if after:
+                operations.append({'operation': 'set', 'row': r, 'column': c, 'raw_input': after})
+            else:
+                operations.append({'operation': 'clear', 'row': r, 'column': c})
+    return operations
+
+
+def _add_to_bucket(buckets: dict, row_key: str, col_key: str, numbers: list) -> None:
+    col_map = buckets.setdefault(row_key, {})
+    partials = col_map.get(col_key)
+    col_map[col_key] = [
+        merge_partial(partials[vi] if partials else None, num)
+        for vi, num in enumerate(numbers)
+    ]
+
+
+def _extreme_value_fields(fields: dict) -> List[bool]:
+    """Per value field, whether its aggregation reads the partial's min/max."""
+    return [vf['aggregation'] in ('MIN', 'MAX') for vf in fields['value_fields']]
+
+
+def _remove_from_bucket(
+    buckets: dict,
+    row_key: str,
+    col_key: str,
+    numbers: list,
+    extremes: List[bool]
+) -> bool:
+    """
+    Subtract a row contribution. Returns True when a MIN/MAX value field
+    (``extremes``) may no longer be exact and the bucket has to be rebuilt from
+    the stored row states; SUM/COUNT/AVG never need the min/max to be exact.
+    """
+    col_map = buckets.get(row_key, {})
+    partials = col_map.get(col_key)
+    if not partials:
+        return False
+    if partials[0][1] <= 1:
+        del col_map[col_key]
+        if not col_map:
+            del buckets[row_key]
+        return False
+    needs_rebuild = False
+    for partial, num, extreme in zip(partials, numbers, extremes):
+        partial[0] -= num
+        partial[1] -= 1
+        if extreme and (num <= partial[2] or num >= partial[3]):
+            needs_rebuild = True
+    return needs_rebuild
+
+
+def _rebuild_buckets(pivot_config: PivotConfig, buckets: dict, keys: Set[Tuple[str, str]]) -> None:
+    """Recompute the given buckets from their stored PivotSourceRowState rows."""
+    for row_key, col_key in keys:
+        col_map = buckets.get(row_key)
+        if col_map is not None:
+            col_map.pop(col_key, None)
+            if not col_map:
+                del buckets[row_key]
+    states = PivotSourceRowState.objects.filter(
+        pivot_config=pivot_config,
+        row_key__in={row_key for row_key, _ in keys},
+        col_key__in={col_key for _, col_key in keys},
+    ).values_list('row_key', 'col_key', 'values')
+    for row_key, col_key, numbers in states:
+        if (row_key, col_key) in keys:
+            _add_to_bucket(buckets, row_key, col_key, numbers)
+
+
+def _ensure_pivot_sheet_size(
+    pivot_sheet: Sheet,
+    row_count: int,
+    col_count: int,
+    always: bool = False
+) -> Tuple[int, int]:
+    """Grow the pivot sheet to fit the output; returns the previous (rows, columns)."""
+    from .models import SheetRow, SheetColumn
+
+    prev_row_count = SheetRow.objects.filter(sheet=pivot_sheet, is_deleted=False).count() or 0
+    prev_col_count = SheetColumn.objects.filter(sheet=pivot_sheet, is_deleted=False).count() or 0
+    if always or row_count > prev_row_count or col_count > prev_col_count:
+        SheetService.resize_sheet(
+            sheet=pivot_sheet,
+            row_count=max(row_count + 10, prev_row_count, 100),
+            column_count=max(col_count + 5, prev_col_count, 26),
+        )
+    return prev_row_count, prev_col_count
+
+
+def _lock_partial_state(pivot_config: PivotConfig) -> Optional[PivotPartialState]:
+    """Row-lock the pivot's partial state for the rest of the transaction."""
+    return PivotPartialState.objects.select_for_update().filter(pivot_config=pivot_config).first()
+
+
+def _save_partial_state(
+    pivot_config: PivotConfig,
+    fields: Optional[dict],
+    header_row_id: Optional[int],
+    source_rows: List[Tuple[int, dict]],
+    operations: list
+) -> None:
+    """Persist bucket and per-row state after a full rebuild (or drop it if not mergeable)."""
+    PivotSourceRowState.objects.filter(pivot_config=pivot_config).delete()
+    if fields is None or not is_mergeable(fields):
+        PivotPartialState.objects.filter(pivot_config=pivot_config).delete()
+        return
+
+    buckets = {}
+    row_states = []
+    for row_id, row_data in source_rows:
+        contribution = pivot_row_contribution(row_data, fields)
+        if contribution is None:
+            continue
+        row_key, col_key, numbers = contribution
+        _add_to_bucket(buckets, row_key, col_key, numbers)
+        row_states.append(PivotSourceRowState(
+            pivot_config=pivot_config,
+            source_row_id=row_id,
+            row_key=row_key,
+            col_key=col_key,
+            values=numbers,
+        ))
+    PivotSourceRowState.objects.bulk_create(row_states, batch_size=1000)
+    PivotPartialState.objects.update_or_create(
+        pivot_config=pivot_config,
+        defaults={
+            'fingerprint': _state_fingerprint(pivot_config, fields),
+            'header_row_id': header_row_id,
+            'buckets': buckets,
+            'output': _operations_grid(operations),
+        },
+    )
+
+
 @transaction.atomic
 def recompute_pivot(pivot_config: PivotConfig) -> None:
     """
@@ -81,6 +299,8 @@ def recompute_pivot(pivot_config: PivotConfig) -> None:
     source_sheet = pivot_config.source_sheet
     pivot_sheet = pivot_config.pivot_sheet
 
+    # Serialize with incremental applies, which read-modify-write the same state
+    _lock_partial_state(pivot_config)
     columns = _get_source_columns(source_sheet)
     if not columns:
         logger.warning("PivotConfig %s: source sheet has no columns", pivot_config.id)
@@ -89,7 +309,7 @@ def recompute_pivot(pivot_config: PivotConfig) -> None:
     source_rows = _get_source_rows(source_sheet, columns)
 
     headers, body, operations = build_pivot_and_cell_operations(
-        source_rows=source_rows,
+        source_rows=[row_data for _, row_data in source_rows],
         columns=columns,
         rows_config=pivot_config.rows_config or [],
         columns_config=pivot_config.columns_config or [],
@@ -97,6 +317,14 @@ def recompute_pivot(pivot_config: PivotConfig) -> None:
         show_grand_total_row=pivot_config.show_grand_total_row,
     )
 
+    fields = resolve_pivot_fields(
+        columns,
+        pivot_config.rows_config or [],
+        pivot_config.columns_config or [],
+        pivot_config.values_config or [],
+    )
+    _save_partial_state(pivot_config, fields, _header_row_id(source_sheet), source_rows, operations)
+
     if not operations:
         return
 
@@ -105,15 +333,8 @@ def recompute_pivot(pivot_config: PivotConfig) -> None:
     for brow in body:
         new_col_count = max(new_col_count, len(brow))
 
-    from .models import SheetRow
-    prev_row_count = (
-        SheetRow.objects.filter(sheet=pivot_sheet, is_deleted=False).count()
-        or 0
-    )
-    from .models import SheetColumn
-    prev_col_count = (
-        SheetColumn.objects.filter(sheet=pivot_sheet, is_deleted=False).count()
-        or 0
+    prev_row_count, prev_col_count = _ensure_pivot_sheet_size(
+        pivot_sheet, new_row_count, new_col_count, always=True
     )
 
     set_ops = [op for op in operations if op.get('operation') == 'set']
@@ -129,14 +350,6 @@ def recompute_pivot(pivot_config: PivotConfig) -> None:
     if not all_ops:
         return
 
-    target_rows = max(new_row_count + 10, prev_row_count, 100)
-    target_cols = max(new_col_count + 5, prev_col_count, 26)
-    SheetService.resize_sheet(
-        sheet=pivot_sheet,
-        row_count=target_rows,
-        column_count=target_cols,
-    )
-
     CellService.batch_update_cells(
         sheet=pivot_sheet,
         operations=all_ops,
@@ -144,18 +357,259 @@ def recompute_pivot(pivot_config: PivotConfig) -> None:
     )
 
 
-def recompute_pivots_for_source_sheet(source_sheet: Sheet) -> None:
-    """Find all pivot configs whose source_sheet is this sheet and recompute them."""
+@transaction.atomic
+def apply_pivot_source_changes(pivot_config: PivotConfig, row_ids: Iterable[int]) -> None:
+    """
+    Update a pivot after edits to the given source rows (ids of SheetRow, live or
+    deleted), applying their old and new contributions as deltas and writing only
+    the pivot cells whose output changed.
+
+    Falls back to recompute_pivot when there is no usable partial state: first
+    run, config or header changes, field columns moved, or a non-mergeable
+    aggregation such as MEDIAN.
+    """
+    source_sheet = pivot_config.source_sheet
+    pivot_sheet = pivot_config.pivot_sheet
+
+    state = _lock_partial_state(pivot_config)
+    columns = _get_source_columns(source_sheet) if state is not None else []
+    fields = resolve_pivot_fields(
+        columns,
+        pivot_config.rows_config or [],
+        pivot_config.columns_config or [],
+        pivot_config.values_config or [],
+    ) if columns else None
+    if (
+        fields is None
+        or not is_mergeable(fields)
+        or state.fingerprint != _state_fingerprint(pivot_config, fields)
+        or state.header_row_id != _header_row_id(source_sheet)
+    ):
+        recompute_pivot(pivot_config)
+        return
+
+    row_ids = set(row_ids)
+    row_ids.discard(state.header_row_id)
+    if not row_ids:
+        return
+
+    buckets = state.buckets
+    old_states = list(
+        PivotSourceRowState.objects.filter(pivot_config=pivot_config, source_row_id__in=row_ids)
+    )
+    extremes = _extreme_value_fields(fields)
+    rebuild_keys = set()
+    for old in old_states:
+        if _remove_from_bucket(buckets, old.row_key, old.col_key, old.values, extremes):
+            rebuild_keys.add((old.row_key, old.col_key))
+
+    new_states = []
+    for row_id, row_data in _get_source_rows(source_sheet, columns, row_ids=row_ids):
+        contribution = pivot_row_contribution(row_data, fields)
+        if contribution is None:
+            continue
+        row_key, col_key, numbers = contribution
+        _add_to_bucket(buckets, row_key, col_key, numbers)
+        new_states.append(PivotSourceRowState(
+            pivot_config=pivot_config,
+            source_row_id=row_id,
+            row_key=row_key,
+            col_key=col_key,
+            values=numbers,
+        ))
+
+    if old_states:
+        PivotSourceRowState.objects.filter(id__in=[old.id for old in old_states]).delete()
+    if new_states:
+        PivotSourceRowState.objects.bulk_create(new_states, batch_size=1000)
+    if rebuild_keys:
+        _rebuild_buckets(pivot_config, buckets, rebuild_keys)
+
+    _headers, _body, operations = build_pivot_from_partials(
+        fields,
+        buckets,
+        show_grand_total_row=pivot_config.show_grand_total_row,
+    )
+    grid = _operations_grid(operations)
+    changed_ops = _diff_grid(state.output or [], grid)
+    if changed_ops:
+        _ensure_pivot_sheet_size(
+            pivot_sheet,
+            len(grid),
+            max((len(row) for row in grid), default=0),
+        )
+        CellService.batch_update_cells(
+            sheet=pivot_sheet,
+            operations=changed_ops,
+            auto_expand=False,
+        )
+
+    state.buckets = buckets
+    state.output = grid
+    state.save(update_fields=['buckets', 'output', 'updated_at'])
+
+
+def pivot_refresh_delay() -> float:
+    """Coalescing window, in seconds, between a source edit and the pivot refresh."""
+    return float(getattr(settings, 'SPREADSHEET_PIVOT_REFRESH_DELAY', 2.0))
+
+
+def pivot_refresh_lease() -> float:
+    """Seconds after which a running or queued refresh is assumed lost."""
+    return float(getattr(settings, 'SPREADSHEET_PIVOT_REFRESH_LEASE', 300.0))
+
+
+def _lease_expired(since, lease: float, now) -> bool:
+    return since is None or (now - since).total_seconds() > lease
+
+
+def _refresh_is_running(pc: PivotConfig, now) -> bool:
+    return pc.refresh_running and not _lease_expired(pc.refresh_started_at, pivot_refresh_lease(), now)
+
+
+def _refresh_is_scheduled(pc: PivotConfig, now) -> bool:
+    return pc.refresh_pending and not _lease_expired(
+        pc.refresh_scheduled_at, pivot_refresh_delay() + pivot_refresh_lease(), now
+    )
+
+
+def _schedule_pivot_refresh(config_ids: List[int]) -> None:
+    """Enqueue refresh jobs after the write commits; refresh inline if the broker is down."""
+    from .tasks import refresh_pivot_job
+
+    for config_id in config_ids:
+        try:
+            refresh_pivot_job.apply_async(args=[config_id], countdown=pivot_refresh_delay())
+        except Exception:
+            logger.exception(
+                "Failed to enqueue pivot refresh for PivotConfig %s via broker %s",
+                config_id,
+                settings.CELERY_BROKER_URL,
+            )
+            # Edits made during the inline run are picked up right away; a
+            # recompute that keeps failing stays pending for the next edit
+            for _ in range(PIVOT_INLINE_REFRESH_RUNS):
+                if not run_pivot_refresh(config_id):
+                    break
+
+
+def _mark_dirty(configs, changed_row_ids: Optional[Set[int]], force: bool = False) -> None:
+    to_schedule = []
+    now = timezone.now()
+    with transaction.atomic():
+        for pc in configs.select_for_update(of=('self',)):
+            if force or not (_refresh_is_running(pc, now) or _refresh_is_scheduled(pc, now)):
+                to_schedule.append(pc.id)
+                pc.refresh_scheduled_at = now
+            pc.refresh_pending = True
+            if changed_row_ids is None:
+                pc.refresh_full = True
+            if pc.refresh_full:
+                pc.pending_row_ids = []
+            else:
+                pending = set(pc.pending_row_ids or []) | changed_row_ids
+                if len(pending) > MAX_PENDING_ROW_IDS:
+                    pc.refresh_full = True
+                    pending = set()
+                pc.pending_row_ids = sorted(pending)
+            pc.save(update_fields=[
+                'refresh_pending', 'refresh_full', 'pending_row_ids', 'refresh_scheduled_at', 'updated_at'
+            ])
+        if to_schedule:
+            transaction.on_commit(lambda: _schedule_pivot_refresh(to_schedule))
+
+
+def mark_pivots_dirty(
+    source_sheet: Sheet,
+    changed_row_ids: Optional[Iterable[int]] = None
+) -> None:
+    """
+    Flag every pivot sourced from this sheet for a background refresh.
+
+    Edits are coalesced on the PivotConfig: row ids accumulate until the queued
+    refresh job runs, and only a pivot that is neither pending nor running
+    schedules a new job. A running or queued refresh whose lease expired
+    (SPREADSHEET_PIVOT_REFRESH_LEASE) counts as lost, so the next edit
+    schedules again. changed_row_ids=None requests a full rebuild.
+    """
     configs = PivotConfig.objects.filter(
         source_sheet=source_sheet,
         pivot_sheet__is_deleted=False,
-    ).select_related('pivot_sheet', 'source_sheet')
-    for pc in configs:
-        try:
+    )
+    _mark_dirty(configs, set(changed_row_ids) if changed_row_ids is not None else None)
+
+
+def request_pivot_refresh(pivot_config: PivotConfig) -> None:
+    """Queue a full rebuild of one pivot; always enqueues a job, so it also recovers a stuck refresh."""
+    _mark_dirty(PivotConfig.objects.filter(id=pivot_config.id), None, force=True)
+    pivot_config.refresh_from_db()
+
+
+def run_pivot_refresh(config_id: int) -> bool:
+    """
+    Run the pending refresh of a pivot, if any and none is already running.
+
+    The pending row ids are claimed under a row lock so edits arriving during
+    the recompute queue up for the next run. A run holds a lease of
+    SPREADSHEET_PIVOT_REFRESH_LEASE seconds; once it expires the pivot is
+    free again. A failed run leaves a full refresh pending. Returns True when
+    another refresh became pending meanwhile (or the run failed) and should
+    be scheduled.
+    """
+    started_at = timezone.now()
+    with transaction.atomic():
+        pc = (
+            PivotConfig.objects.select_for_update(of=('self',))
+            .select_related('pivot_sheet', 'source_sheet')
+            .filter(id=config_id)
+            .first()
+        )
+        if pc is None or _refresh_is_running(pc, started_at) or not pc.refresh_pending:
+            return False
+        full = pc.refresh_full
+        row_ids = pc.pending_row_ids or []
+        pc.refresh_pending = False
+        pc.refresh_full = False
+        pc.pending_row_ids = []
+        pc.refresh_running = True
+        pc.refresh_started_at = started_at
+        pc.save(update_fields=[
+            'refresh_pending', 'refresh_full', 'pending_row_ids', 'refresh_running', 'refresh_started_at',
+            'updated_at'
+        ])
+
+    succeeded = False
+    try:
+        if full:
             recompute_pivot(pc)
-        except Exception as e:
-            logger.exception(
-                "Pivot recompute failed for PivotConfig %s: %s",
-                pc.id,
-                e,
-            )
+        else:
+            apply_pivot_source_changes(pc, row_ids)
+        succeeded = True
+    except Exception as e:
+        logger.exception(
+            "Pivot recompute failed for PivotConfig %s: %s",
+            pc.id,
+            e,
+        )
+    finally:
+        with transaction.atomic():
+            pc = PivotConfig.objects.select_for_update().get(id=config_id)
+            update_fields = ['updated_at']
+            # A run whose lease expired may have been superseded; leave the newer run's flag alone
+            if pc.refresh_started_at == started_at:
+                pc.refresh_running = False
+                update_fields.append('refresh_running')
+            if succeeded:
+                pc.last_computed_at = timezone.now()
+                update_fields.append('last_computed_at')
+            else:
+                # The claimed row ids are gone; only a full recompute is sure to catch up
+                pc.refresh_pending = True
+                pc.refresh_full = True
+                pc.pending_row_ids = []
+                update_fields += ['refresh_pending', 'refresh_full', 'pending_row_ids']
+            if pc.refresh_pending:
+                pc.refresh_scheduled_at = timezone.now()
+                update_fields.append('refresh_scheduled_at')
+            pc.save(update_fields=update_fields)
+    return pc.refresh_pending
@@ -17,6 +17,7 @@ from .models import (
     WorkflowPattern,
     WorkflowPatternStep,
     PatternJob,
+    FormulaRecalcJob,
     SpreadsheetHighlight,
     SpreadsheetHighlightScope,
     SpreadsheetCellFormat,
@@ -88,6 +89,17 @@ class PivotConfigSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class PivotRefreshStatusSerializer(serializers.ModelSerializer):
+    """Freshness of a pivot sheet relative to its source data."""
+    pending = serializers.BooleanField(source='refresh_pending', read_only=True)
+    running = serializers.BooleanField(source='refresh_running', read_only=True)
+
+    class Meta:
+        model = PivotConfig
+        fields = ['last_computed_at', 'pending', 'running']
+        read_only_fields = fields
+
+
 class SheetSerializer(serializers.ModelSerializer):
     """Serializer for Sheet model (read operations)"""
     spreadsheet = serializers.IntegerField(source='spreadsheet.id', read_only=True)
@@ -225,11 +237,11 @@ class CellSerializer(serializers.ModelSerializer):
             'id', 'sheet', 'row', 'column', 'row_position', 'column_position',
             'value_type', 'string_value', 'number_value', 'boolean_value', 'formula_value',
             'raw_input', 'computed_type', 'computed_number', 'computed_string', 'error_code',
-            'created_at', 'updated_at', 'is_deleted'
+            'is_stale', 'created_at', 'updated_at', 'is_deleted'
         ]
         read_only_fields = [
             'id', 'sheet', 'row', 'column', 'row_position', 'column_position',
-            'created_at', 'updated_at', 'is_deleted'
+            'is_stale', 'created_at', 'updated_at', 'is_deleted'
         ]
 
 
@@ -374,6 +386,7 @@ class CellBatchUpdateSerializer(serializers.Serializer):
     import_id = serializers.UUIDField(required=False, allow_null=True)
     chunk_index = serializers.IntegerField(required=False, allow_null=True, min_value=0)
     import_mode = serializers.BooleanField(default=False)
+    async_recalc = serializers.BooleanField(default=False)
 
     def validate_operations(self, value):
         """Validate operations array"""
@@ -391,6 +404,8 @@ class CellBatchUpdateResponseSerializer(serializers.Serializer):
     rows_expanded = serializers.IntegerField(default=0)
     columns_expanded = serializers.IntegerField(default=0)
     cells = CellSerializer(many=True, required=False)
+    stale_cell_count = serializers.IntegerField(required=False)
+    recalc_job_id = serializers.UUIDField(required=False, allow_null=True)
 
 
 class SheetSortSerializer(serializers.Serializer):
@@ -641,3 +656,23 @@ class PatternJobStatusSerializer(serializers.ModelSerializer):
             'finishedAt',
         ]
 
+
+class FormulaRecalcJobStatusSerializer(serializers.ModelSerializer):
+    createdAt = serializers.DateTimeField(source='created_at', read_only=True)
+    startedAt = serializers.DateTimeField(source='started_at', read_only=True)
+    finishedAt = serializers.DateTimeField(source='finished_at', read_only=True)
+
+    class Meta:
+        model = FormulaRecalcJob
+        fields = [
+            'id',
+            'sheet',
+            'status',
+            'progress',
+            'stale_cell_count',
+            'error_code',
+            'error_message',
+            'createdAt',
+            'startedAt',
+            'finishedAt',
+        ]
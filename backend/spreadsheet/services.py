@@ -2,21 +2,24 @@
 Business logic services for spreadsheet operations
 Handles spreadsheet, sheet, row, column, and cell management
 """
-from typing import Dict, List, Any, Optional, Tuple, Union
+from typing import Dict, List, Any, Optional, Set, Tuple, Union
 from decimal import Decimal, InvalidOperation
+import bisect
 import logging
 import re
-from functools import cmp_to_key
-from django.db import transaction
+import uuid
+from django.core.cache import cache
+from django.db import connection, transaction
 from django.core.exceptions import ValidationError
 from django.db.models import Q, Max, F
 
 from .models import (
     Spreadsheet, Sheet, SheetRow, SheetColumn, Cell, CellValueType, ComputedCellType, CellDependency,
+    CellRangeDependency,
     SheetStructureOperation, WorkflowPattern, WorkflowPatternStep,
     SpreadsheetHighlight, SpreadsheetHighlightScope,
 )
-from .formula_engine import evaluate_formula, extract_references, reference_to_indexes, FormulaError
+from .formula_engine import evaluate_formula, extract_dependencies, SheetSnapshot
 from .formula_rewrite import rewrite_cells_for_operation
 from core.models import Project
 
@@ -216,7 +219,7 @@ class SheetService:
             sheet.frozen_row_count = max(0, min(1000, frozen_row_count))
         if frozen_column_count is not None:
             sheet.frozen_column_count = max(0, min(100, frozen_column_count))
-        sheet.save()
+        sheet.save(update_fields=['name', 'frozen_row_count', 'frozen_column_count', 'updated_at'])
         
         return sheet
     
@@ -230,7 +233,7 @@ class SheetService:
             sheet: Sheet instance to delete
         """
         sheet.is_deleted = True
-        sheet.save()
+        sheet.save(update_fields=['is_deleted', 'updated_at'])
     
     @staticmethod
     def _generate_column_name(position: int) -> str:
@@ -251,6 +254,87 @@ class SheetService:
             position //= 26
         return result
     
+    @staticmethod
+    def _content_version_key(sheet_id: int) -> str:
+        return f"spreadsheet:sheet_content_version:{sheet_id}"
+
+    @staticmethod
+    def get_content_version(sheet_id: int) -> str:
+        """Opaque token that changes on every write to the sheet; used as the viewport ETag."""
+        key = SheetService._content_version_key(sheet_id)
+        try:
+            version = cache.get(key)
+            if version is None:
+                # Never fall back to a fixed default: an ETag issued before an
+                # eviction could match again
+                cache.add(key, uuid.uuid4().hex, None)
+                version = cache.get(key)
+        except Exception:
+            logger.warning("Failed to read content version of sheet %s", sheet_id, exc_info=True)
+            version = None
+        # Without the cache a one-off token never matches, so reads are just not cached
+        return version or uuid.uuid4().hex
+
+    @staticmethod
+    def touch_sheet(sheet_id: int, dimensions_changed: bool = False) -> None:
+        """
+        Record a change to a sheet's cells or structure.
+
+        Moves the content version kept in the cache, so concurrent cell writes
+        do not queue on the Sheet row lock. The Sheet row is only updated when
+        rows or columns were added or removed: that bumps content_version and
+        drops the cached dimensions.
+        """
+        key = SheetService._content_version_key(sheet_id)
+
+        def bump():
+            # The version only drives ETags; a cache outage must never fail the write
+            try:
+                cache.set(key, uuid.uuid4().hex, None)
+            except Exception:
+                logger.warning("Failed to move content version of sheet %s", sheet_id, exc_info=True)
+                try:
+                    cache.delete(key)
+                except Exception:
+                    logger.warning("Failed to drop content version of sheet %s", sheet_id, exc_info=True)
+
+        bump()
+        # A read racing the write could see pre-commit cells under the new
+        # version; moving again after commit retires that ETag as well
+        transaction.on_commit(bump)
+        if dimensions_changed:
+            Sheet.objects.filter(id=sheet_id).update(
+                content_version=F('content_version') + 1,
+                cached_row_count=None,
+                cached_column_count=None
+            )
+
+    @staticmethod
+    def get_dimensions(sheet: Sheet) -> Tuple[int, int, int]:
+        """
+        Full sheet dimensions, read from the cached counts on Sheet.
+
+        Returns:
+            (row_count, column_count, content_version); counts are max active
+            position + 1, aggregated and cached only when the cache was dropped.
+            content_version here is the Sheet row's structure counter, not the
+            viewport ETag (see get_content_version)
+        """
+        row_count, column_count, version = Sheet.objects.filter(id=sheet.id).values_list(
+            'cached_row_count', 'cached_column_count', 'content_version'
+        ).get()
+        if row_count is None or column_count is None:
+            row_agg = SheetRow.objects.filter(sheet=sheet, is_deleted=False).aggregate(Max('position'))
+            col_agg = SheetColumn.objects.filter(sheet=sheet, is_deleted=False).aggregate(Max('position'))
+            row_count = (row_agg['position__max'] + 1) if row_agg['position__max'] is not None else 0
+            column_count = (col_agg['position__max'] + 1) if col_agg['position__max'] is not None else 0
+            # Only cache if no write landed since content_version was read
+            Sheet.objects.filter(id=sheet.id, content_version=version).update(
+                cached_row_count=row_count,
+                cached_column_count=column_count
+            )
+        return row_count, column_count, version
+
     @staticmethod
     @transaction.atomic
     def resize_sheet(
@@ -357,6 +441,9 @@ class SheetService:
             )
             columns_created += 1
         
+        if rows_created or columns_created:
+            SheetService.touch_sheet(sheet.id, dimensions_changed=True)
+
         # Get total counts
         total_rows = SheetRow.objects.filter(
             sheet=sheet,
@@ -430,21 +517,24 @@ class SheetService:
             created_by=created_by
         )
         rewritten_cells = rewrite_cells_for_operation(sheet.id, 'ROW_INSERT', position, count)
-        for cell in rewritten_cells:
-            CellService._update_dependencies(cell)
-        CellService._recalculate_formula_cells(rewritten_cells)
+        CellService._update_dependencies_bulk(rewritten_cells)
+        SheetService.touch_sheet(sheet.id, dimensions_changed=True)
+        recalculated_cells = CellService._recalculate_formula_cells(rewritten_cells)
 
         result = {
             'rows_created': count,
             'total_rows': current_count + count,
             'operation_id': operation.id
         }
-        # Recompute any pivot sheets that depend on this sheet as a source.
+        # Queue a background refresh of pivot sheets that use this sheet as a source.
         try:
-            from .pivot_service import recompute_pivots_for_source_sheet
-            recompute_pivots_for_source_sheet(sheet)
+            from .pivot_service import mark_pivots_dirty
+            mark_pivots_dirty(
+                sheet,
+                changed_row_ids={cell.row_id for cell in rewritten_cells + recalculated_cells}
+            )
         except Exception:
-            logger.exception("Pivot recompute after insert_rows failed for sheet_id=%s", sheet.id)
+            logger.exception("Marking pivots dirty after insert_rows failed for sheet_id=%s", sheet.id)
 
         return result
 
@@ -506,8 +596,8 @@ class SheetService:
             created_by=created_by
         )
         rewritten_cells = rewrite_cells_for_operation(sheet.id, 'COL_INSERT', position, count)
-        for cell in rewritten_cells:
-            CellService._update_dependencies(cell)
+        CellService._update_dependencies_bulk(rewritten_cells)
+        SheetService.touch_sheet(sheet.id, dimensions_changed=True)
         CellService._recalculate_formula_cells(rewritten_cells)
 
         result = {
@@ -516,10 +606,10 @@ class SheetService:
             'operation_id': operation.id
         }
         try:
-            from .pivot_service import recompute_pivots_for_source_sheet
-            recompute_pivots_for_source_sheet(sheet)
+            from .pivot_service import mark_pivots_dirty
+            mark_pivots_dirty(sheet)
         except Exception:
-            logger.exception("Pivot recompute after insert_columns failed for sheet_id=%s", sheet.id)
+            logger.exception("Marking pivots dirty after insert_columns failed for sheet_id=%s", sheet.id)
 
         return result
 
@@ -583,9 +673,9 @@ class SheetService:
             created_by=created_by
         )
         rewritten_cells = rewrite_cells_for_operation(sheet.id, 'ROW_DELETE', position, count)
-        for cell in rewritten_cells:
-            CellService._update_dependencies(cell)
-        CellService._recalculate_formula_cells(rewritten_cells)
+        CellService._update_dependencies_bulk(rewritten_cells)
+        SheetService.touch_sheet(sheet.id, dimensions_changed=True)
+        recalculated_cells = CellService._recalculate_formula_cells(rewritten_cells)
 
         result = {
             'rows_deleted': count,
@@ -593,10 +683,13 @@ class SheetService:
             'operation_id': operation.id
         }
         try:
-            from .pivot_service import recompute_pivots_for_source_sheet
-            recompute_pivots_for_source_sheet(sheet)
+            from .pivot_service import mark_pivots_dirty
+            mark_pivots_dirty(
+                sheet,
+                changed_row_ids=set(affected_ids) | {cell.row_id for cell in rewritten_cells + recalculated_cells}
+            )
         except Exception:
-            logger.exception("Pivot recompute after delete_rows failed for sheet_id=%s", sheet.id)
+            logger.exception("Marking pivots dirty after delete_rows failed for sheet_id=%s", sheet.id)
 
         return result
 
@@ -660,8 +753,8 @@ class SheetService:
             created_by=created_by
         )
         rewritten_cells = rewrite_cells_for_operation(sheet.id, 'COL_DELETE', position, count)
-        for cell in rewritten_cells:
-            CellService._update_dependencies(cell)
+        CellService._update_dependencies_bulk(rewritten_cells)
+        SheetService.touch_sheet(sheet.id, dimensions_changed=True)
         CellService._recalculate_formula_cells(rewritten_cells)
 
         result = {
@@ -670,10 +763,10 @@ class SheetService:
             'operation_id': operation.id
         }
         try:
-            from .pivot_service import recompute_pivots_for_source_sheet
-            recompute_pivots_for_source_sheet(sheet)
+            from .pivot_service import mark_pivots_dirty
+            mark_pivots_dirty(sheet)
         except Exception:
-            logger.exception("Pivot recompute after delete_columns failed for sheet_id=%s", sheet.id)
+            logger.exception("Marking pivots dirty after delete_columns failed for sheet_id=%s", sheet.id)
 
         return result
 
@@ -698,33 +791,60 @@ class SheetService:
         return (1, 0.0, s or '')
 
     @staticmethod
-    def _compare_cells_for_sort(cell_a, cell_b, direction: str) -> int:
-        """Compare two cells using spreadsheet ordering semantics and direction."""
-        direction = (direction or 'asc').lower()
-        if direction not in ('asc', 'desc'):
-            direction = 'asc'
-
-        type_a, num_a, str_a = SheetService._cell_sort_tuple(cell_a)
-        type_b, num_b, str_b = SheetService._cell_sort_tuple(cell_b)
-
-        if type_a != type_b:
-            return -1 if type_a < type_b else 1
-
-        if type_a == 0:
-            if num_a == num_b:
-                return 0
-            if direction == 'asc':
-                return -1 if (num_a or 0.0) < (num_b or 0.0) else 1
-            return -1 if (num_a or 0.0) > (num_b or 0.0) else 1
+    def _bulk_set_positions(
+        model,
+        sheet: Sheet,
+        positions: List[Tuple[int, int]],
+        revive: bool = False
+    ) -> None:
+        """
+        Move SheetRow or SheetColumn objects of a sheet to new positions.
 
-        if type_a == 1:
-            if str_a == str_b:
-                return 0
-            if direction == 'asc':
-                return -1 if str_a < str_b else 1
-            return -1 if str_a > str_b else 1
+        Targets are first parked at position + offset, then shifted back in one
+        statement, so the per-sheet unique position constraint never sees a
+        transient duplicate. On PostgreSQL the first phase is a single
+        UPDATE ... FROM (VALUES ...) per chunk; other backends use bulk_update.
 
-        return 0
+        Args:
+            model: SheetRow or SheetColumn
+            sheet: Sheet owning the objects
+            positions: [(id, new_position), ...]
+            revive: Also clear is_deleted (restoring soft-deleted objects)
+        """
+        if not positions:
+            return
+        offset = 1_000_000
+        ids = [obj_id for obj_id, _ in positions]
+        if connection.vendor == 'postgresql':
+            table = connection.ops.quote_name(model._meta.db_table)
+            set_clause = 'position = v.position' + (', is_deleted = false' if revive else '')
+            where_clause = '' if revive else ' AND t.is_deleted = false'
+            chunk_size = 5000
+            with connection.cursor() as cursor:
+                for start in range(0, len(positions), chunk_size):
+                    chunk = positions[start:start + chunk_size]
+                    values = ', '.join(['(%s, %s)'] * len(chunk))
+                    params = []
+                    for obj_id, position in chunk:
+                        params.extend([obj_id, position + offset])
+                    params.append(sheet.id)
+                    cursor.execute(
+                        f'UPDATE {table} AS t SET {set_clause} '
+                        f'FROM (VALUES {values}) AS v(id, position) '
+                        f'WHERE t.id = v.id AND t.sheet_id = %s{where_clause}',
+                        params
+                    )
+        else:
+            new_positions = dict(positions)
+            objs = list(model.objects.filter(sheet=sheet, id__in=ids) if revive
+                        else model.objects.filter(sheet=sheet, id__in=ids, is_deleted=False))
+            for obj in objs:
+                obj.position = new_positions[obj.id] + offset
+                obj.is_deleted = False
+            model.objects.bulk_update(objs, ['position', 'is_deleted'], batch_size=1000)
+        model.objects.filter(sheet=sheet, id__in=ids, is_deleted=False).update(
+            position=F('position') - offset
+        )
 
     @staticmethod
     @transaction.atomic
@@ -798,21 +918,19 @@ class SheetService:
             if c.column and c.row_id in row_cells:
                 row_cells[c.row_id][c.column.position] = c
 
-        def compare_rows(row_a: SheetRow, row_b: SheetRow) -> int:
-            cells_a = row_cells.get(row_a.id, {})
-            cells_b = row_cells.get(row_b.id, {})
-            for col, tie_direction in sort_history:
-                cmp_result = SheetService._compare_cells_for_sort(
-                    cells_a.get(col),
-                    cells_b.get(col),
-                    tie_direction,
-                )
-                if cmp_result != 0:
-                    return cmp_result
-            return 0
-
+        # Precompute one typed key per sort column, then stable-sort from the least
+        # significant column: value order in that column's direction, then type
+        # order (numbers, text, empty) which never flips with direction.
+        row_keys = {
+            r_id: [SheetService._cell_sort_tuple(cells_by_col.get(col)) for col, _ in sort_history]
+            for r_id, cells_by_col in row_cells.items()
+        }
         # Python's sort is stable, so complete ties preserve existing row order.
-        sorted_rows = sorted(data_rows, key=cmp_to_key(compare_rows))
+        sorted_rows = list(data_rows)
+        for index in range(len(sort_history) - 1, -1, -1):
+            tie_direction = sort_history[index][1]
+            sorted_rows.sort(key=lambda r: row_keys[r.id][index], reverse=tie_direction == 'desc')
+            sorted_rows.sort(key=lambda r: row_keys[r.id][index][0])
 
         previous_order = [{'row_id': r.id, 'position': r.position} for r in rows]
         new_positions = []
@@ -824,11 +942,13 @@ class SheetService:
             new_positions.append((r.id, pos))
             pos += 1
 
-        offset = 1_000_000
-        for row_id, new_pos in new_positions:
-            SheetRow.objects.filter(sheet=sheet, id=row_id, is_deleted=False).update(position=F('position') + offset)
-        for row_id, new_pos in new_positions:
-            SheetRow.objects.filter(sheet=sheet, id=row_id, is_deleted=False).update(position=new_pos)
+        current_positions = {r.id: r.position for r in rows}
+        SheetService._bulk_set_positions(
+            SheetRow,
+            sheet,
+            [(row_id, new_pos) for row_id, new_pos in new_positions if current_positions[row_id] != new_pos]
+        )
+        SheetService.touch_sheet(sheet.id)
 
         new_order = [{'row_id': rid, 'position': p} for rid, p in new_positions]
 
@@ -843,17 +963,16 @@ class SheetService:
         """
         if not order:
             return
-        offset = 1_000_000
-        for item in order:
-            rid = item.get('row_id')
-            pos = item.get('position')
-            if rid is not None and pos is not None:
-                SheetRow.objects.filter(sheet=sheet, id=rid, is_deleted=False).update(position=F('position') + offset)
-        for item in order:
-            rid = item.get('row_id')
-            pos = item.get('position')
-            if rid is not None and pos is not None:
-                SheetRow.objects.filter(sheet=sheet, id=rid, is_deleted=False).update(position=pos)
+        SheetService._bulk_set_positions(
+            SheetRow,
+            sheet,
+            [
+                (item['row_id'], item['position'])
+                for item in order
+                if item.get('row_id') is not None and item.get('position') is not None
+            ]
+        )
+        SheetService.touch_sheet(sheet.id)
 
     @staticmethod
     @transaction.atomic
@@ -887,8 +1006,7 @@ class SheetService:
                     position__gte=operation.anchor_position + operation.count + offset
                 ).update(position=F('position') - offset - operation.count)
             rewritten_cells = rewrite_cells_for_operation(sheet.id, 'ROW_DELETE', operation.anchor_position, operation.count)
-            for cell in rewritten_cells:
-                CellService._update_dependencies(cell)
+            CellService._update_dependencies_bulk(rewritten_cells)
             CellService._recalculate_formula_cells(rewritten_cells)
 
         elif operation.op_type == SheetStructureOperation.OperationType.COL_INSERT:
@@ -906,8 +1024,7 @@ class SheetService:
                     position__gte=operation.anchor_position + operation.count + offset
                 ).update(position=F('position') - offset - operation.count)
             rewritten_cells = rewrite_cells_for_operation(sheet.id, 'COL_DELETE', operation.anchor_position, operation.count)
-            for cell in rewritten_cells:
-                CellService._update_dependencies(cell)
+            CellService._update_dependencies_bulk(rewritten_cells)
             CellService._recalculate_formula_cells(rewritten_cells)
 
         elif operation.op_type == SheetStructureOperation.OperationType.ROW_DELETE:
@@ -925,14 +1042,14 @@ class SheetService:
                     position__gte=operation.anchor_position + offset
                 ).update(position=F('position') - offset + operation.count)
 
-            for row_id, position in operation.affected_positions.items():
-                SheetRow.objects.filter(id=int(row_id)).update(
-                    is_deleted=False,
-                    position=position
-                )
+            SheetService._bulk_set_positions(
+                SheetRow,
+                sheet,
+                [(int(row_id), position) for row_id, position in operation.affected_positions.items()],
+                revive=True
+            )
             rewritten_cells = rewrite_cells_for_operation(sheet.id, 'ROW_INSERT', operation.anchor_position, operation.count)
-            for cell in rewritten_cells:
-                CellService._update_dependencies(cell)
+            CellService._update_dependencies_bulk(rewritten_cells)
             CellService._recalculate_formula_cells(rewritten_cells)
 
         elif operation.op_type == SheetStructureOperation.OperationType.COL_DELETE:
@@ -949,25 +1066,99 @@ class SheetService:
                     position__gte=operation.anchor_position + offset
                 ).update(position=F('position') - offset + operation.count)
 
-            for column_id, position in operation.affected_positions.items():
-                SheetColumn.objects.filter(id=int(column_id)).update(
-                    is_deleted=False,
-                    position=position
-                )
+            SheetService._bulk_set_positions(
+                SheetColumn,
+                sheet,
+                [(int(column_id), position) for column_id, position in operation.affected_positions.items()],
+                revive=True
+            )
             rewritten_cells = rewrite_cells_for_operation(sheet.id, 'COL_INSERT', operation.anchor_position, operation.count)
-            for cell in rewritten_cells:
-                CellService._update_dependencies(cell)
+            CellService._update_dependencies_bulk(rewritten_cells)
             CellService._recalculate_formula_cells(rewritten_cells)
 
         else:
             raise ValidationError("unsupported operation type")
 
+        SheetService.touch_sheet(sheet.id, dimensions_changed=True)
         operation.is_reverted = True
         operation.save(update_fields=['is_reverted'])
 
         return {'operation_id': operation.id, 'is_reverted': True}
 
 
+class _CellPositionIndex:
+    """
+    Row/column positions of a set of cells, grouped by sheet and column.
+
+    Used to test which cells fall inside CellRangeDependency rectangles without
+    a query per range.
+    """
+
+    def __init__(self, positions: List[Tuple[int, int, int, int]]):
+        # sheet_id -> column position -> sorted [(row position, cell id)]
+        self._columns: Dict[int, Dict[int, List[Tuple[int, int]]]] = {}
+        for cell_id, sheet_id, row_position, column_position in positions:
+            self._columns.setdefault(sheet_id, {}).setdefault(column_position, []).append(
+                (row_position, cell_id)
+            )
+        for columns in self._columns.values():
+            for entries in columns.values():
+                entries.sort()
+
+    @classmethod
+    def load(cls, cell_ids) -> '_CellPositionIndex':
+        return cls(list(
+            Cell.objects.filter(id__in=cell_ids).values_list(
+                'id', 'sheet_id', 'row__position', 'column__position'
+            )
+        ))
+
+    def bounds(self) -> Dict[int, Tuple[int, int, int, int]]:
+        """Bounding box (row_min, row_max, column_min, column_max) per sheet."""
+        result = {}
+        for sheet_id, columns in self._columns.items():
+            rows = [row for entries in columns.values() for row, _ in (entries[0], entries[-1])]
+            result[sheet_id] = (min(rows), max(rows), min(columns), max(columns))
+        return result
+
+    def cells_in(
+        self,
+        sheet_id: int,
+        row_start: int,
+        row_end: int,
+        column_start: int,
+        column_end: int
+    ):
+        columns = self._columns.get(sheet_id)
+        if not columns:
+            return
+        if column_end - column_start + 1 < len(columns):
+            column_positions = [
+                position for position in range(column_start, column_end + 1) if position in columns
+            ]
+        else:
+            column_positions = [
+                position for position in columns if column_start <= position <= column_end
+            ]
+        for column_position in column_positions:
+            entries = columns[column_position]
+            start = bisect.bisect_left(entries, (row_start, -1))
+            for row_position, cell_id in entries[start:]:
+                if row_position > row_end:
+                    break
+                yield cell_id
+
+    def contains_any(
+        self,
+        sheet_id: int,
+        row_start: int,
+        row_end: int,
+        column_start: int,
+        column_end: int
+    ) -> bool:
+        return next(self.cells_in(sheet_id, row_start, row_end, column_start, column_end), None) is not None
+
+
 class CellService:
     """Service class for handling cell business logic"""
 
@@ -991,73 +1182,271 @@ class CellService:
                 matches
             )
 
+    @staticmethod
+    def _formula_source(cell: Cell) -> Optional[str]:
+        raw_input = cell.raw_input or ''
+        if raw_input.startswith('='):
+            return raw_input
+        formula_value = cell.formula_value or ''
+        if cell.value_type == CellValueType.FORMULA and formula_value.startswith('='):
+            return formula_value
+        return None
+
     @staticmethod
     def _update_dependencies(cell: Cell) -> None:
-        CellDependency.objects.filter(from_cell=cell).update(is_deleted=True)
+        CellService._update_dependencies_bulk([cell])
 
-        raw_input = cell.raw_input or ''
-        if not raw_input.startswith('='):
-            formula_value = cell.formula_value or ''
-            if cell.value_type == CellValueType.FORMULA and formula_value.startswith('='):
-                raw_input = formula_value
-            else:
-                return
+    @staticmethod
+    def _update_dependencies_bulk(cells: List[Cell]) -> None:
+        """
+        Rebuild the outgoing dependency edges of many cells at once.
 
-        references = extract_references(raw_input)
-        dependencies = []
-        for ref in references:
-            try:
-                row_index, col_index = reference_to_indexes(ref)
-            except FormulaError:
-                continue
+        Single-cell references are resolved to rows, columns and placeholder cells
+        per sheet with a few bulk statements. Ranges are recorded as
+        CellRangeDependency rectangles and are never expanded into cells.
 
-            row = CellService._get_or_create_row(cell.sheet, row_index)
-            column = CellService._get_or_create_column(cell.sheet, col_index)
-            to_cell, _ = Cell.objects.get_or_create(
-                sheet=cell.sheet,
-                row=row,
-                column=column,
-                defaults={
-                    'is_deleted': False,
-                    'value_type': CellValueType.EMPTY,
-                    'raw_input': '',
-                    'computed_type': ComputedCellType.EMPTY
-                }
+        Args:
+            cells: Cells whose formulas were written or rewritten
+        """
+        cell_ids = [cell.id for cell in cells if cell.id is not None]
+        if not cell_ids:
+            return
+        CellDependency.objects.filter(from_cell_id__in=cell_ids, is_deleted=False).update(is_deleted=True)
+        CellRangeDependency.objects.filter(from_cell_id__in=cell_ids, is_deleted=False).update(is_deleted=True)
+
+        references_by_sheet: Dict[int, List[Tuple[Cell, List[Tuple[int, int]]]]] = {}
+        range_dependencies = []
+        for cell in cells:
+            formula_source = CellService._formula_source(cell)
+            if cell.id is None or formula_source is None:
+                continue
+            coordinates, ranges = extract_dependencies(formula_source)
+            if coordinates:
+                references_by_sheet.setdefault(cell.sheet_id, []).append(
+                    (cell, list(dict.fromkeys(coordinates)))
+                )
+            range_dependencies.extend(
+                CellRangeDependency(
+                    sheet_id=cell.sheet_id,
+                    from_cell_id=cell.id,
+                    row_start=row_start,
+                    row_end=row_end,
+                    column_start=column_start,
+                    column_end=column_end
+                )
+                for row_start, row_end, column_start, column_end in dict.fromkeys(ranges)
             )
-            if to_cell.is_deleted:
-                to_cell.is_deleted = False
-                to_cell.save()
 
-            dependencies.append(CellDependency(from_cell=cell, to_cell=to_cell))
+        dependencies = []
+        for sheet_id, entries in references_by_sheet.items():
+            positions = {coordinate for _, coordinates in entries for coordinate in coordinates}
+            cell_ids_by_position = CellService._resolve_reference_cells(sheet_id, positions)
+            for cell, coordinates in entries:
+                dependencies.extend(
+                    CellDependency(from_cell_id=cell.id, to_cell_id=cell_ids_by_position[coordinate])
+                    for coordinate in coordinates
+                )
 
         if dependencies:
-            CellDependency.objects.bulk_create(dependencies, ignore_conflicts=True)
+            CellDependency.objects.bulk_create(dependencies, batch_size=1000, ignore_conflicts=True)
+        if range_dependencies:
+            CellRangeDependency.objects.bulk_create(range_dependencies, batch_size=1000)
 
     @staticmethod
-    def _collect_dependent_formula_cells(changed_cells: List[Cell]) -> List[Cell]:
-        from collections import deque
+    def _resolve_reference_cells(
+        sheet_id: int,
+        positions: Set[Tuple[int, int]]
+    ) -> Dict[Tuple[int, int], int]:
+        """
+        Map (row, column) positions to live cell ids, creating whatever is missing.
+
+        Args:
+            sheet_id: Sheet the positions belong to
+            positions: Set of 0-based (row_position, column_position) tuples
+
+        Returns:
+            Dict of (row_position, column_position) -> cell id
+        """
+        row_positions = {row for row, _ in positions}
+        column_positions = {column for _, column in positions}
+
+        row_ids = dict(
+            SheetRow.objects.filter(
+                sheet_id=sheet_id, is_deleted=False, position__in=row_positions
+            ).values_list('position', 'id')
+        )
+        missing_rows = [
+            SheetRow(sheet_id=sheet_id, position=position, is_deleted=False)
+            for position in sorted(row_positions - row_ids.keys())
+        ]
+        if missing_rows:
+            for row in SheetRow.objects.bulk_create(missing_rows, batch_size=1000):
+                row_ids[row.position] = row.id
+
+        column_ids = dict(
+            SheetColumn.objects.filter(
+                sheet_id=sheet_id, is_deleted=False, position__in=column_positions
+            ).values_list('position', 'id')
+        )
+        missing_columns = [
+            SheetColumn(
+                sheet_id=sheet_id,
+                position=position,
+                name=SheetService._generate_column_name(position),
+                is_deleted=False
+            )
+            for position in sorted(column_positions - column_ids.keys())
+        ]
+        if missing_columns:
+            for column in SheetColumn.objects.bulk_create(missing_columns, batch_size=1000):
+                column_ids[column.position] = column.id
+        if missing_rows or missing_columns:
+            SheetService.touch_sheet(sheet_id, dimensions_changed=True)
+
+        # Prefer a live cell; otherwise revive the most recent soft-deleted one
+        existing: Dict[Tuple[int, int], Tuple[int, bool]] = {}
+        for cell_id, row_id, column_id, is_deleted in Cell.objects.filter(
+            sheet_id=sheet_id,
+            row_id__in=set(row_ids.values()),
+            column_id__in=set(column_ids.values())
+        ).order_by('is_deleted', '-id').values_list('id', 'row_id', 'column_id', 'is_deleted'):
+            existing.setdefault((row_id, column_id), (cell_id, is_deleted))
+
+        cell_ids_by_position: Dict[Tuple[int, int], int] = {}
+        revive_ids = []
+        missing_cells = []
+        for row_position, column_position in positions:
+            key = (row_ids[row_position], column_ids[column_position])
+            match = existing.get(key)
+            if match is None:
+                missing_cells.append(Cell(
+                    sheet_id=sheet_id,
+                    row_id=key[0],
+                    column_id=key[1],
+                    is_deleted=False,
+                    value_type=CellValueType.EMPTY,
+                    raw_input='',
+                    computed_type=ComputedCellType.EMPTY
+                ))
+                continue
+            cell_id, is_deleted = match
+            if is_deleted:
+                revive_ids.append(cell_id)
+            cell_ids_by_position[(row_position, column_position)] = cell_id
+
+        if revive_ids:
+            from django.utils import timezone
+            Cell.objects.filter(id__in=revive_ids).update(is_deleted=False, updated_at=timezone.now())
 
+        if missing_cells:
+            position_by_key = {
+                (row_ids[row], column_ids[column]): (row, column) for row, column in positions
+            }
+            for cell in Cell.objects.bulk_create(missing_cells, batch_size=1000):
+                cell_ids_by_position[position_by_key[(cell.row_id, cell.column_id)]] = cell.id
+
+        return cell_ids_by_position
+
+    @staticmethod
+    def _collect_dependent_formula_cells(changed_cells: List[Cell]) -> List[Cell]:
         affected = {}
-        queue = deque(changed_cells)
+        # Breadth-first over the dependency graph, one adjacency fetch per frontier level
+        frontier = {cell.id for cell in changed_cells if cell.id is not None}
 
-        while queue:
-            current = queue.popleft()
+        while frontier:
             deps = CellDependency.objects.filter(
-                to_cell=current,
-                is_deleted=False
+                to_cell_id__in=frontier,
+                is_deleted=False,
+                from_cell__is_deleted=False
             ).select_related('from_cell')
-            for dependency in deps:
-                from_cell = dependency.from_cell
-                if from_cell.is_deleted:
-                    continue
+            dependents = [dependency.from_cell for dependency in deps]
+            dependents.extend(CellService._collect_range_dependents(frontier))
+            next_frontier = set()
+            for from_cell in dependents:
                 if from_cell.id not in affected:
                     affected[from_cell.id] = from_cell
-                    queue.append(from_cell)
+                    next_frontier.add(from_cell.id)
+            frontier = next_frontier
 
         return list(affected.values())
 
     @staticmethod
-    def _recalculate_formula_cells(changed_cells: List[Cell]) -> List[Cell]:
+    def _collect_range_dependents(cell_ids: Set[int]) -> List[Cell]:
+        """
+        Find formula cells whose referenced ranges contain any of the given cells.
+
+        Args:
+            cell_ids: Ids of cells whose values changed
+
+        Returns:
+            Dependent formula cells (not deduplicated against point dependencies)
+        """
+        index = _CellPositionIndex.load(cell_ids)
+        dependents = {}
+        for sheet_id, (row_min, row_max, column_min, column_max) in index.bounds().items():
+            candidates = CellRangeDependency.objects.filter(
+                sheet_id=sheet_id,
+                is_deleted=False,
+                from_cell__is_deleted=False,
+                column_start__lte=column_max,
+                column_end__gte=column_min,
+                row_start__lte=row_max,
+                row_end__gte=row_min
+            ).select_related('from_cell')
+            for dependency in candidates:
+                if dependency.from_cell_id in dependents:
+                    continue
+                if index.contains_any(
+                    sheet_id,
+                    dependency.row_start,
+                    dependency.row_end,
+                    dependency.column_start,
+                    dependency.column_end
+                ):
+                    dependents[dependency.from_cell_id] = dependency.from_cell
+        return list(dependents.values())
+
+    @staticmethod
+    def _assign_computed(
+        cell: Cell,
+        computed_type: str,
+        computed_number: Optional[Decimal],
+        computed_string: Optional[str],
+        error_code: Optional[str]
+    ) -> bool:
+        """Set computed fields on ``cell``; return True if any of them changed."""
+        if (
+            cell.computed_type == computed_type
+            and cell.computed_number == computed_number
+            and cell.computed_string == computed_string
+            and cell.error_code == error_code
+        ):
+            return False
+        cell.computed_type = computed_type
+        cell.computed_number = computed_number
+        cell.computed_string = computed_string
+        cell.error_code = error_code
+        return True
+
+    @staticmethod
+    def _recalculate_formula_cells(
+        changed_cells: List[Cell],
+        progress_callback: Optional[Any] = None
+    ) -> List[Cell]:
+        """
+        Recalculate formulas affected by ``changed_cells`` in dependency order.
+
+        A formula is only re-evaluated when it was itself changed or one of its
+        inputs produced a different value, so unchanged results stop propagation.
+        Changed results are written back with chunked bulk updates.
+
+        Args:
+            changed_cells: Cells that were written (values or formulas)
+            progress_callback: Optional callable(completed, total) over formula cells
+
+        Returns:
+            Formula cells whose computed value changed
+        """
         affected_cells = CellService._collect_dependent_formula_cells(changed_cells)
         changed_formula_cells = [
             cell for cell in changed_cells
@@ -1069,21 +1458,42 @@ class CellService:
         if not all_cells:
             return []
 
-        affected_ids = set(all_cells.keys())
+        affected_ids = {
+            cell_id for cell_id, cell in all_cells.items()
+            if CellService._formula_source(cell) is not None
+        }
+        changed_formula_ids = {cell.id for cell in changed_formula_cells}
+        # Written cells join the graph as sources so their direct dependents see them
+        changed_ids = {cell.id for cell in changed_cells if cell.id is not None}
+        graph_ids = affected_ids | changed_ids
         dependencies = CellDependency.objects.filter(
             from_cell_id__in=affected_ids,
-            to_cell_id__in=affected_ids,
+            to_cell_id__in=graph_ids,
             is_deleted=False
         )
 
-        in_degree = {cell_id: 0 for cell_id in affected_ids}
-        adjacency = {cell_id: [] for cell_id in affected_ids}
+        edges = set(dependencies.values_list('from_cell_id', 'to_cell_id'))
+
+        range_dependencies = list(
+            CellRangeDependency.objects.filter(
+                from_cell_id__in=affected_ids,
+                is_deleted=False
+            ).values_list('from_cell_id', 'sheet_id', 'row_start', 'row_end', 'column_start', 'column_end')
+        )
+        if range_dependencies:
+            index = _CellPositionIndex.load(graph_ids)
+            for from_id, sheet_id, row_start, row_end, column_start, column_end in range_dependencies:
+                for to_id in index.cells_in(sheet_id, row_start, row_end, column_start, column_end):
+                    edges.add((from_id, to_id))
 
-        for dependency in dependencies:
-            from_id = dependency.from_cell_id
-            to_id = dependency.to_cell_id
+        in_degree = {cell_id: 0 for cell_id in graph_ids}
+        adjacency = {cell_id: [] for cell_id in graph_ids}
+        inputs = {cell_id: [] for cell_id in graph_ids}
+
+        for from_id, to_id in edges:
             in_degree[from_id] += 1
             adjacency[to_id].append(from_id)
+            inputs[from_id].append(to_id)
 
         from collections import deque
         queue = deque([cell_id for cell_id, degree in in_degree.items() if degree == 0])
@@ -1100,57 +1510,117 @@ class CellService:
         ordered_set = set(ordered)
         cycle_ids = affected_ids - ordered_set
         updated_cells = []
+        dirty_ids = changed_ids - changed_formula_ids
+        # One snapshot per sheet for the whole pass; refreshed as results are computed
+        snapshots: Dict[int, SheetSnapshot] = {}
 
+        total = len(affected_ids)
+        completed = 0
         for cell_id in ordered:
+            if cell_id not in affected_ids:
+                continue
+            completed += 1
+            if progress_callback and completed % 500 == 0:
+                progress_callback(completed, total)
             cell = all_cells[cell_id]
-            raw_input = cell.raw_input or ''
-            formula_source = raw_input
-            if not raw_input.startswith('='):
-                formula_value = cell.formula_value or ''
-                if cell.value_type == CellValueType.FORMULA and formula_value.startswith('='):
-                    formula_source = formula_value
-                else:
-                    continue
-            result = evaluate_formula(formula_source, cell.sheet)
-            cell.computed_type = result.computed_type
+            formula_source = CellService._formula_source(cell)
+            if cell_id not in changed_formula_ids and dirty_ids.isdisjoint(inputs[cell_id]):
+                continue
+            snapshot = snapshots.get(cell.sheet_id)
+            if snapshot is None:
+                snapshot = SheetSnapshot.load(cell.sheet)
+                snapshots[cell.sheet_id] = snapshot
+            result = evaluate_formula(formula_source, snapshot.sheet, snapshot=snapshot)
             if result.computed_type == ComputedCellType.NUMBER and result.computed_number is not None:
-                cell.computed_number = Decimal(str(result.computed_number))
+                computed_number = Decimal(str(result.computed_number))
             else:
-                cell.computed_number = None
-            cell.computed_string = result.computed_string
-            cell.error_code = result.error_code
-            cell.save()
-            updated_cells.append(cell)
+                computed_number = None
+            if CellService._assign_computed(
+                cell, result.computed_type, computed_number, result.computed_string, result.error_code
+            ):
+                dirty_ids.add(cell_id)
+                snapshot.refresh(cell)
+                updated_cells.append(cell)
 
         for cell_id in cycle_ids:
             cell = all_cells[cell_id]
-            cell.computed_type = ComputedCellType.ERROR
-            cell.computed_number = None
-            cell.computed_string = None
-            cell.error_code = "#CYCLE!"
-            cell.save()
-            updated_cells.append(cell)
+            if CellService._assign_computed(cell, ComputedCellType.ERROR, None, None, "#CYCLE!"):
+                updated_cells.append(cell)
+
+        if updated_cells:
+            from django.utils import timezone
+            now = timezone.now()
+            for cell in updated_cells:
+                cell.updated_at = now
+            Cell.objects.bulk_update(
+                updated_cells,
+                ['computed_type', 'computed_number', 'computed_string', 'error_code', 'updated_at'],
+                batch_size=1000
+            )
+        if progress_callback:
+            progress_callback(total, total)
 
         return updated_cells
 
     @staticmethod
-    def recalculate_sheet_formulas(sheet: Sheet) -> None:
+    def _mark_formulas_stale(changed_cells: List[Cell]) -> int:
+        """
+        Flag written formulas and everything depending on ``changed_cells`` as stale.
+
+        Args:
+            changed_cells: Cells that were written (values or formulas)
+
+        Returns:
+            Number of formula cells marked stale
+        """
+        stale_cells = CellService._collect_dependent_formula_cells(changed_cells) + [
+            cell for cell in changed_cells
+            if not cell.is_deleted and CellService._formula_source(cell) is not None
+        ]
+        stale_ids = {cell.id for cell in stale_cells}
+        if not stale_ids:
+            return 0
+        # Dropping the claim keeps a recalculation already in flight from clearing the new flag
+        Cell.objects.filter(id__in=stale_ids).update(is_stale=True, stale_claim=None)
+        for cell in changed_cells:
+            if cell.id in stale_ids:
+                cell.is_stale = True
+        return len(stale_ids)
+
+    @staticmethod
+    def recalculate_sheet_formulas(
+        sheet: Sheet,
+        stale_only: bool = False,
+        progress_callback: Optional[Any] = None
+    ) -> None:
         """
         Recalculate all formula cells in a sheet. Used after import finalize when
-        import_mode deferred formula computation.
+        import_mode deferred formula computation, and by the async recalc worker
+        (stale_only=True) after batch updates made with async_recalc.
         """
-        formula_cells = list(
-            Cell.objects.filter(
-                sheet=sheet,
-                is_deleted=False,
-                row__is_deleted=False,
-                column__is_deleted=False
-            ).filter(
-                Q(raw_input__startswith='=') | Q(value_type=CellValueType.FORMULA)
-            ).select_related('sheet', 'row', 'column')
+        formula_cells = Cell.objects.filter(
+            sheet=sheet,
+            is_deleted=False,
+            row__is_deleted=False,
+            column__is_deleted=False
+        ).filter(
+            Q(raw_input__startswith='=') | Q(value_type=CellValueType.FORMULA)
         )
+        claim = None
+        if stale_only:
+            # Claim the stale flags before computing. A write that marks a cell stale
+            # again meanwhile drops the claim, so that flag survives for the next job.
+            claim = uuid.uuid4()
+            formula_cells.filter(is_stale=True).update(stale_claim=claim)
+            formula_cells = formula_cells.filter(stale_claim=claim)
+        formula_cells = list(formula_cells.select_related('sheet', 'row', 'column'))
         if formula_cells:
-            CellService._recalculate_formula_cells(formula_cells)
+            CellService._recalculate_formula_cells(formula_cells, progress_callback=progress_callback)
+            if claim is not None:
+                Cell.objects.filter(stale_claim=claim).update(is_stale=False, stale_claim=None)
+            SheetService.touch_sheet(sheet.id)
+        elif progress_callback:
+            progress_callback(0, 0)
 
     @staticmethod
     def _clear_cell(cell: Cell) -> None:
@@ -1167,6 +1637,7 @@ class CellService:
         cell.error_code = None
         cell.save()
         CellDependency.objects.filter(from_cell=cell).update(is_deleted=True)
+        CellRangeDependency.objects.filter(from_cell=cell, is_deleted=False).update(is_deleted=True)
 
     @staticmethod
     def _apply_raw_input(cell: Cell, raw_input: Optional[str]) -> None:
@@ -1296,61 +1767,6 @@ class CellService:
         cell.boolean_value = None
         cell.formula_value = None
     
-    @staticmethod
-    def _get_or_create_row(sheet: Sheet, position: int) -> SheetRow:
-        """
-        Get existing row or create a new one
-        
-        Args:
-            sheet: Sheet instance
-            position: Row position
-            
-        Returns:
-            SheetRow instance
-        """
-        CellService._log_position_duplicates(SheetRow, sheet, position, 'row')
-        row = SheetRow.objects.filter(
-            sheet=sheet,
-            position=position,
-            is_deleted=False
-        ).first()
-        if row:
-            return row
-
-        return SheetRow.objects.create(
-            sheet=sheet,
-            position=position,
-            is_deleted=False
-        )
-    
-    @staticmethod
-    def _get_or_create_column(sheet: Sheet, position: int) -> SheetColumn:
-        """
-        Get existing column or create a new one
-        
-        Args:
-            sheet: Sheet instance
-            position: Column position
-            
-        Returns:
-            SheetColumn instance
-        """
-        CellService._log_position_duplicates(SheetColumn, sheet, position, 'column')
-        column = SheetColumn.objects.filter(
-            sheet=sheet,
-            position=position,
-            is_deleted=False
-        ).first()
-        if column:
-            return column
-
-        return SheetColumn.objects.create(
-            sheet=sheet,
-            position=position,
-            name=SheetService._generate_column_name(position),
-            is_deleted=False
-        )
-    
     @staticmethod
     def read_cell_range(
         sheet: Sheet,
@@ -1409,10 +1825,7 @@ class CellService:
         ).select_related('sheet', 'row', 'column')
         
         # Full sheet dimensions (so the client can size the grid to the whole sheet, not just the requested range)
-        row_agg = SheetRow.objects.filter(sheet=sheet, is_deleted=False).aggregate(Max('position'))
-        col_agg = SheetColumn.objects.filter(sheet=sheet, is_deleted=False).aggregate(Max('position'))
-        sheet_row_count = (row_agg['position__max'] + 1) if row_agg['position__max'] is not None else 0
-        sheet_column_count = (col_agg['position__max'] + 1) if col_agg['position__max'] is not None else 0
+        sheet_row_count, sheet_column_count, _version = SheetService.get_dimensions(sheet)
         
         return {
             'cells': list(cells),
@@ -1421,6 +1834,89 @@ class CellService:
             'sheet_row_count': sheet_row_count,
             'sheet_column_count': sheet_column_count,
         }
+
+    @staticmethod
+    def _display_value(computed_type, computed_number, computed_string, error_code) -> Optional[str]:
+        if computed_type == ComputedCellType.ERROR:
+            return error_code
+        if computed_type == ComputedCellType.NUMBER and computed_number is not None:
+            return format(computed_number.normalize(), 'f')
+        return computed_string
+
+    @staticmethod
+    def read_cell_viewport(
+        sheet: Sheet,
+        start_row: int,
+        end_row: int,
+        start_column: int,
+        end_column: int
+    ) -> Dict[str, Any]:
+        """
+        Read a grid viewport as a compact columnar payload.
+
+        Uses a single values_list projection instead of model instances, and the
+        cached sheet dimensions instead of aggregates.
+
+        Args:
+            sheet: Sheet instance
+            start_row: Starting row position (inclusive)
+            end_row: Ending row position (inclusive)
+            start_column: Starting column position (inclusive)
+            end_column: Ending column position (inclusive)
+
+        Returns:
+            Dict with content version, sheet dimensions and parallel arrays
+            rows, columns, raw_inputs, types, values and stale (one entry per
+            non-empty cell, row-major)
+        """
+        if start_row > end_row:
+            raise ValidationError("start_row must be less than or equal to end_row")
+        if start_column > end_column:
+            raise ValidationError("start_column must be less than or equal to end_column")
+
+        version = SheetService.get_content_version(sheet.id)
+        sheet_row_count, sheet_column_count, _version = SheetService.get_dimensions(sheet)
+
+        rows, columns, raw_inputs, types, values, stale = [], [], [], [], [], []
+        cells = Cell.objects.filter(
+            sheet=sheet,
+            row__position__gte=start_row,
+            row__position__lte=end_row,
+            column__position__gte=start_column,
+            column__position__lte=end_column,
+            row__is_deleted=False,
+            column__is_deleted=False,
+            is_deleted=False
+        ).exclude(
+            value_type=CellValueType.EMPTY
+        ).order_by('row__position', 'column__position').values_list(
+            'row__position', 'column__position', 'raw_input', 'computed_type',
+            'computed_number', 'computed_string', 'error_code', 'is_stale'
+        )
+        for (row_position, column_position, raw_input, computed_type,
+             computed_number, computed_string, error_code, is_stale) in cells:
+            rows.append(row_position)
+            columns.append(column_position)
+            raw_inputs.append(raw_input)
+            types.append(computed_type)
+            values.append(CellService._display_value(computed_type, computed_number, computed_string, error_code))
+            stale.append(is_stale)
+
+        return {
+            'version': version,
+            'start_row': start_row,
+            'end_row': end_row,
+            'start_column': start_column,
+            'end_column': end_column,
+            'sheet_row_count': sheet_row_count,
+            'sheet_column_count': sheet_column_count,
+            'rows': rows,
+            'columns': columns,
+            'raw_inputs': raw_inputs,
+            'types': types,
+            'values': values,
+            'stale': stale,
+        }
     
     @staticmethod
     @transaction.atomic
@@ -1428,7 +1924,8 @@ class CellService:
         sheet: Sheet,
         operations: List[Dict[str, Any]],
         auto_expand: bool = True,
-        import_mode: bool = False
+        import_mode: bool = False,
+        async_recalc: bool = False
     ) -> Dict[str, Any]:
         """
         Perform multiple cell operations (set or clear) in a single atomic transaction.
@@ -1454,9 +1951,13 @@ class CellService:
                 - value_type: Required for 'set' operation (EMPTY is treated as clear)
                 - string_value, number_value, boolean_value, formula_value: Value-specific fields
             auto_expand: Whether to automatically create missing rows/columns (only for 'set' operations with non-EMPTY value_type)
+            import_mode: Skip formula recalculation (finalized later by recalculate_sheet_formulas)
+            async_recalc: Mark affected formula cells stale instead of recalculating them;
+                the caller enqueues a FormulaRecalcJob when stale_cell_count > 0
             
         Returns:
             Dict with updated, cleared, rows_expanded, columns_expanded
+            (plus stale_cell_count when async_recalc is set)
             
         Raises:
             ValidationError: If any operation is invalid. The error detail contains:
@@ -1891,6 +2392,9 @@ class CellService:
             Cell.objects.bulk_update(to_clear, CELL_CLEAR_FIELDS, batch_size=1000)
             if cleared_ids:
                 CellDependency.objects.filter(from_cell_id__in=cleared_ids).update(is_deleted=True)
+                CellRangeDependency.objects.filter(
+                    from_cell_id__in=cleared_ids, is_deleted=False
+                ).update(is_deleted=True)
 
         to_update = list(pending_update.values())
         to_create = list(pending_create.values())
@@ -1912,13 +2416,16 @@ class CellService:
                 c.value_type == CellValueType.FORMULA and (c.formula_value or '').startswith('=')
             )
         ]
-        for cell in formula_cells:
-            CellService._update_dependencies(cell)
+        CellService._update_dependencies_bulk(formula_cells)
 
         updated = len(to_update) + len(to_create)
         cleared = len(to_clear)
+        SheetService.touch_sheet(sheet.id, dimensions_changed=bool(rows_expanded or columns_expanded))
         
-        if not import_mode:
+        stale_cell_count = None
+        if async_recalc and not import_mode:
+            stale_cell_count = CellService._mark_formulas_stale(list(updated_cells.values()))
+        elif not import_mode:
             recalculated_cells = CellService._recalculate_formula_cells(list(updated_cells.values()))
             for cell in recalculated_cells:
                 updated_cells[cell.id] = cell
@@ -1929,17 +2436,22 @@ class CellService:
             'rows_expanded': rows_expanded,
             'columns_expanded': columns_expanded,
         }
+        if stale_cell_count is not None:
+            result['stale_cell_count'] = stale_cell_count
         if not import_mode:
             result['cells'] = list(updated_cells.values())
         else:
             result['cells'] = []
 
-        # After successful batch update, recompute any pivot sheets depending on this sheet.
+        # Queue a background refresh of pivot sheets that use this sheet as a source.
         try:
-            from .pivot_service import recompute_pivots_for_source_sheet
-            recompute_pivots_for_source_sheet(sheet)
+            from .pivot_service import mark_pivots_dirty
+            mark_pivots_dirty(
+                sheet,
+                changed_row_ids={cell.row_id for cell in updated_cells.values()}
+            )
         except Exception:
-            logger.exception("Pivot recompute after batch_update_cells failed for sheet_id=%s", sheet.id)
+            logger.exception("Marking pivots dirty after batch_update_cells failed for sheet_id=%s", sheet.id)
 
         return result
 
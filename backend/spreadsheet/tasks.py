@@ -1,14 +1,47 @@
 import logging
+import time
+import uuid
+from contextlib import contextmanager
 from celery import shared_task
+from django.core.cache import cache
 from django.db import transaction
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
-from .models import PatternJob, PatternJobStatus
-from .services import WorkflowPatternService
+from .models import FormulaRecalcJob, PatternJob, PatternJobStatus
+from .pivot_service import mark_pivots_dirty, pivot_refresh_delay, run_pivot_refresh
+from .services import CellService, WorkflowPatternService
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on one recalculation; a lock left by a dead worker expires after it
+RECALC_LOCK_TIMEOUT = 600
+# Delay before a job that found its sheet locked tries again
+RECALC_LOCK_RETRY_DELAY = 5
+# How long the inline fallback (broker down) waits for a running recalc to finish
+RECALC_INLINE_LOCK_WAIT = 30
+
+
+@contextmanager
+def sheet_recalc_lock(sheet_id, wait: float = 0):
+    """
+    Per-sheet lock held while stale formulas are recalculated, so two jobs never
+    compute the same cells at once. Yields whether the lock was acquired, polling
+    for up to ``wait`` seconds.
+    """
+    key = f'spreadsheet:recalc_lock:{sheet_id}'
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    acquired = cache.add(key, token, RECALC_LOCK_TIMEOUT)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.1)
+        acquired = cache.add(key, token, RECALC_LOCK_TIMEOUT)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
+
 
 @shared_task(bind=True)
 def apply_pattern_job(self, job_id: str) -> None:
@@ -73,3 +106,79 @@ def apply_pattern_job(self, job_id: str) -> None:
         )
         raise
 
+
+@shared_task(bind=True)
+def recalculate_sheet_job(self, job_id: str) -> None:
+    sheet_id = FormulaRecalcJob.objects.filter(id=job_id).values_list('sheet_id', flat=True).first()
+    if sheet_id is None:
+        logger.warning("FormulaRecalcJob %s not found", job_id)
+        return
+    with sheet_recalc_lock(sheet_id) as acquired:
+        if not acquired:
+            # Another job is recalculating this sheet; stay queued and try again
+            recalculate_sheet_job.apply_async(args=[job_id], countdown=RECALC_LOCK_RETRY_DELAY)
+            return
+        _run_recalculate_sheet_job(job_id)
+
+
+def _run_recalculate_sheet_job(job_id: str) -> None:
+    try:
+        with transaction.atomic():
+            job = FormulaRecalcJob.objects.select_for_update().get(id=job_id)
+            if job.status != PatternJobStatus.QUEUED:
+                return
+            job.status = PatternJobStatus.RUNNING
+            job.started_at = timezone.now()
+            job.error_code = None
+            job.error_message = ''
+            job.save(update_fields=['status', 'started_at', 'error_code', 'error_message', 'updated_at'])
+        job = FormulaRecalcJob.objects.select_related('sheet').get(id=job_id)
+    except FormulaRecalcJob.DoesNotExist:
+        logger.warning("FormulaRecalcJob %s not found", job_id)
+        return
+
+    def update_progress(completed: int, total: int) -> None:
+        if total <= 0:
+            progress = 0
+        else:
+            progress = int(round((completed / total) * 100))
+        FormulaRecalcJob.objects.filter(id=job_id).update(
+            progress=progress,
+            updated_at=timezone.now()
+        )
+
+    try:
+        # Picks up every stale cell of the sheet, so jobs queued by later writes coalesce
+        CellService.recalculate_sheet_formulas(
+            job.sheet,
+            stale_only=True,
+            progress_callback=update_progress
+        )
+        FormulaRecalcJob.objects.filter(id=job_id).update(
+            status=PatternJobStatus.SUCCEEDED,
+            progress=100,
+            finished_at=timezone.now(),
+            updated_at=timezone.now()
+        )
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("FormulaRecalcJob %s failed", job_id)
+        FormulaRecalcJob.objects.filter(id=job_id).update(
+            status=PatternJobStatus.FAILED,
+            error_code='EXECUTION_ERROR',
+            error_message=str(exc),
+            finished_at=timezone.now(),
+            updated_at=timezone.now()
+        )
+        raise
+
+    try:
+        mark_pivots_dirty(job.sheet)
+    except Exception:
+        logger.exception("Marking pivots dirty after FormulaRecalcJob %s failed", job_id)
+
+
+@shared_task(bind=True)
+def refresh_pivot_job(self, config_id: int) -> None:
+    """Apply the coalesced pending refresh of one pivot; reschedule if more edits arrived."""
+    if run_pivot_refresh(config_id):
+        refresh_pivot_job.apply_async(args=[config_id], countdown=pivot_refresh_delay())
@@ -4,6 +4,7 @@ from django.contrib.auth import get_user_model
 from django.test import TestCase
 
 from core.models import Organization, Project
+from spreadsheet.formula_engine import SheetSnapshot, compile_formula, evaluate_formula
 from spreadsheet.models import Cell, ComputedCellType, Sheet, SheetColumn, SheetRow, Spreadsheet
 from spreadsheet.services import CellService, SheetService
 
@@ -323,3 +324,60 @@ class FormulaEngineTest(TestCase):
         self.assertEqual(cell_c5.computed_type, ComputedCellType.ERROR)
         self.assertEqual(cell_c5.error_code, '#N/A')
 
+    def test_snapshot_evaluation_runs_no_queries(self):
+        operations = [
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '1'},
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '2'},
+            {'operation': 'set', 'row': 1, 'column': 0, 'raw_input': '3'},
+            {'operation': 'set', 'row': 1, 'column': 1, 'raw_input': 'x'},
+        ]
+        CellService.batch_update_cells(self.sheet, operations, auto_expand=True)
+
+        snapshot = SheetSnapshot.load(self.sheet)
+        with self.assertNumQueries(0):
+            total = evaluate_formula('=A1+B1+A2+SUM(A1:A2)+MAX(A1:B1)+COUNT(A1:B2)', self.sheet, snapshot=snapshot)
+            lookup = evaluate_formula('=VLOOKUP(3, A1:B2, 2, FALSE)', self.sheet, snapshot=snapshot)
+            missing = evaluate_formula('=A1+Z99', self.sheet, snapshot=snapshot)
+
+        self.assertEqual(total.computed_type, ComputedCellType.NUMBER)
+        self.assertEqual(total.computed_number, Decimal('15'))
+        self.assertEqual(lookup.computed_type, ComputedCellType.STRING)
+        self.assertEqual(lookup.computed_string, 'x')
+        self.assertEqual(missing.computed_type, ComputedCellType.ERROR)
+        self.assertEqual(missing.error_code, '#REF!')
+
+    def test_recalculation_sees_results_of_earlier_formulas(self):
+        operations = [
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '2'},
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '=A1*2'},
+            {'operation': 'set', 'row': 0, 'column': 2, 'raw_input': '=B1+1'},
+            {'operation': 'set', 'row': 0, 'column': 3, 'raw_input': '=SUM(A1:C1)'},
+        ]
+        CellService.batch_update_cells(self.sheet, operations, auto_expand=True)
+
+        cell_d1 = Cell.objects.get(sheet=self.sheet, row=self.row1, column=self.col_d)
+        self.assertEqual(cell_d1.computed_type, ComputedCellType.NUMBER)
+        self.assertEqual(cell_d1.computed_number, Decimal('11'))
+
+    def test_compiled_formula_is_cached_by_normalized_text(self):
+        compiled = compile_formula('=SUM(A1:B2)+1')
+        self.assertIs(compiled, compile_formula('= SUM(A1:B2)+1 '))
+        self.assertIsNotNone(compiled.root)
+
+    def test_compiled_formula_keeps_skipped_branch_semantics(self):
+        operations = [
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '=IF(1=1,2,FOO(B1))'},
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '=IF(1=2,2,FOO(B1))'},
+        ]
+        CellService.batch_update_cells(self.sheet, operations, auto_expand=True)
+
+        # The untaken branch compiles to a deferred error instead of failing the formula
+        self.assertIsNotNone(compile_formula('=IF(1=1,2,FOO(B1))').root)
+
+        cell_a1 = Cell.objects.get(sheet=self.sheet, row=self.row1, column=self.col_a)
+        self.assertEqual(cell_a1.computed_type, ComputedCellType.NUMBER)
+        self.assertEqual(cell_a1.computed_number, Decimal('2'))
+
+        cell_b1 = Cell.objects.get(sheet=self.sheet, row=self.row1, column=self.col_b)
+        self.assertEqual(cell_b1.computed_type, ComputedCellType.ERROR)
+        self.assertEqual(cell_b1.error_code, '#REF!')
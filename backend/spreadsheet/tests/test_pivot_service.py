@@ -0,0 +1,210 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from core.models import Project, Organization
+from spreadsheet.models import (
+    Spreadsheet,
+    Sheet,
+    Cell,
+    PivotConfig,
+    PivotPartialState,
+    PivotSourceRowState,
+)
+from spreadsheet import pivot_service
+from spreadsheet.pivot_service import recompute_pivot, request_pivot_refresh, run_pivot_refresh
+from spreadsheet.services import CellService, SheetService
+
+User = get_user_model()
+
+
+class IncrementalPivotTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='pivotuser', email='pivot@example.com', password='testpass123')
+        organization = Organization.objects.create(name='Test Org')
+        project = Project.objects.create(name='Test Project', organization=organization, owner=user)
+        self.spreadsheet = Spreadsheet.objects.create(project=project, name='Sheetbook')
+        self.source = Sheet.objects.create(spreadsheet=self.spreadsheet, name='Data', position=0)
+        self.pivot_sheet = Sheet.objects.create(spreadsheet=self.spreadsheet, name='Pivot', position=1)
+
+        self._set_rows([
+            ['Region', 'Sales'],
+            ['East', '10'],
+            ['West', '5'],
+            ['East', '7'],
+        ])
+        self.config = PivotConfig.objects.create(
+            pivot_sheet=self.pivot_sheet,
+            source_sheet=self.source,
+            rows_config=['Region'],
+            columns_config=[],
+            values_config=[{'field': 'Sales', 'aggregation': 'SUM'}],
+        )
+        recompute_pivot(self.config)
+
+    def _set_rows(self, rows, start_row=0):
+        operations = []
+        for r, values in enumerate(rows, start=start_row):
+            for c, value in enumerate(values):
+                operations.append({'operation': 'set', 'row': r, 'column': c, 'raw_input': value})
+        CellService.batch_update_cells(self.source, operations)
+
+    def _refresh(self):
+        run_pivot_refresh(self.config.id)
+        self.config.refresh_from_db()
+
+    def _pivot_grid(self):
+        grid = {}
+        for cell in Cell.objects.filter(sheet=self.pivot_sheet, is_deleted=False).select_related('row', 'column'):
+            if cell.raw_input:
+                grid[(cell.row.position, cell.column.position)] = cell.raw_input
+        return grid
+
+    def test_full_recompute_stores_partial_state(self):
+        state = PivotPartialState.objects.get(pivot_config=self.config)
+        self.assertEqual(set(state.buckets), {'East', 'West'})
+        self.assertEqual(PivotSourceRowState.objects.filter(pivot_config=self.config).count(), 3)
+
+    def test_source_edit_matches_full_rebuild(self):
+        self._set_rows([['West', '20']], start_row=1)
+        self._set_rows([['North', '3']], start_row=4)
+        self._refresh()
+        incremental = self._pivot_grid()
+
+        recompute_pivot(self.config)
+        self.assertEqual(incremental, self._pivot_grid())
+        self.assertEqual(PivotSourceRowState.objects.filter(pivot_config=self.config).count(), 4)
+
+    def test_unrelated_pivot_cells_are_not_rewritten(self):
+        self._set_rows([['East', '8']], start_row=3)
+        self._refresh()
+        untouched = {
+            cell.id: cell.updated_at
+            for cell in Cell.objects.filter(sheet=self.pivot_sheet, is_deleted=False)
+        }
+
+        self._set_rows([['West', '6']], start_row=2)
+        self._refresh()
+        rewritten = [
+            cell.id
+            for cell in Cell.objects.filter(sheet=self.pivot_sheet, is_deleted=False)
+            if untouched.get(cell.id) != cell.updated_at
+        ]
+        # West subtotal and the grand total change; East stays as it was.
+        self.assertEqual(len(rewritten), 2)
+
+    def test_source_edits_are_coalesced_until_refresh(self):
+        before = self._pivot_grid()
+        self._set_rows([['East', '1']], start_row=1)
+        self._set_rows([['West', '2']], start_row=2)
+        self.config.refresh_from_db()
+        self.assertTrue(self.config.refresh_pending)
+        self.assertFalse(self.config.refresh_full)
+        self.assertEqual(len(self.config.pending_row_ids), 2)
+        self.assertEqual(self._pivot_grid(), before)
+
+        self._refresh()
+        self.assertFalse(self.config.refresh_pending)
+        self.assertEqual(self.config.pending_row_ids, [])
+        self.assertIsNotNone(self.config.last_computed_at)
+        self.assertNotEqual(self._pivot_grid(), before)
+        self.assertFalse(run_pivot_refresh(self.config.id))
+
+    def test_sum_pivot_skips_bucket_rebuild(self):
+        # Row 1 holds East's maximum; removing it only matters to MIN/MAX
+        self._set_rows([['East', '1']], start_row=1)
+        with patch.object(pivot_service, '_rebuild_buckets', wraps=pivot_service._rebuild_buckets) as rebuild:
+            self._refresh()
+        rebuild.assert_not_called()
+        incremental = self._pivot_grid()
+        recompute_pivot(self.config)
+        self.assertEqual(incremental, self._pivot_grid())
+
+    def test_max_pivot_rebuilds_bucket_when_extreme_is_removed(self):
+        self.config.values_config = [{'field': 'Sales', 'aggregation': 'MAX'}]
+        self.config.save()
+        recompute_pivot(self.config)
+
+        self._set_rows([['East', '1']], start_row=1)
+        with patch.object(pivot_service, '_rebuild_buckets', wraps=pivot_service._rebuild_buckets) as rebuild:
+            self._refresh()
+        rebuild.assert_called_once()
+        incremental = self._pivot_grid()
+        recompute_pivot(self.config)
+        self.assertEqual(incremental, self._pivot_grid())
+
+    def test_structure_change_requests_full_refresh(self):
+        SheetService.insert_columns(self.source, 0, 1)
+        self.config.refresh_from_db()
+        self.assertTrue(self.config.refresh_pending)
+        self.assertTrue(self.config.refresh_full)
+
+    def test_running_refresh_is_not_started_twice(self):
+        self._set_rows([['East', '1']], start_row=1)
+        PivotConfig.objects.filter(id=self.config.id).update(refresh_running=True, refresh_started_at=timezone.now())
+        self.assertFalse(run_pivot_refresh(self.config.id))
+        self.config.refresh_from_db()
+        self.assertTrue(self.config.refresh_pending)
+
+    def test_refresh_with_expired_lease_is_taken_over(self):
+        self._set_rows([['East', '1']], start_row=1)
+        PivotConfig.objects.filter(id=self.config.id).update(
+            refresh_running=True,
+            refresh_started_at=timezone.now() - timedelta(hours=1),
+        )
+        self._refresh()
+        self.assertFalse(self.config.refresh_running)
+        self.assertFalse(self.config.refresh_pending)
+        self.assertIsNotNone(self.config.last_computed_at)
+
+    @patch('spreadsheet.tasks.refresh_pivot_job.apply_async')
+    def test_edit_reschedules_lost_refresh(self, mock_apply_async):
+        PivotConfig.objects.filter(id=self.config.id).update(
+            refresh_pending=True,
+            refresh_scheduled_at=timezone.now() - timedelta(hours=1),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self._set_rows([['East', '1']], start_row=1)
+        mock_apply_async.assert_called_once()
+
+    @patch('spreadsheet.tasks.refresh_pivot_job.apply_async')
+    def test_manual_refresh_always_enqueues(self, mock_apply_async):
+        PivotConfig.objects.filter(id=self.config.id).update(
+            refresh_pending=True,
+            refresh_scheduled_at=timezone.now(),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            request_pivot_refresh(self.config)
+        mock_apply_async.assert_called_once()
+        self.assertTrue(self.config.refresh_full)
+
+    @patch('spreadsheet.tasks.refresh_pivot_job.apply_async', side_effect=ConnectionError('broker down'))
+    def test_inline_fallback_runs_until_nothing_is_pending(self, mock_apply_async):
+        with patch.object(pivot_service, 'run_pivot_refresh', side_effect=[True, False]) as run:
+            pivot_service._schedule_pivot_refresh([self.config.id])
+        self.assertEqual(run.call_count, 2)
+
+    def test_failed_refresh_stays_pending_as_full(self):
+        before = self._pivot_grid()
+        self._set_rows([['East', '1']], start_row=1)
+        with patch.object(pivot_service, 'apply_pivot_source_changes', side_effect=RuntimeError('boom')):
+            self.assertTrue(run_pivot_refresh(self.config.id))
+        self.config.refresh_from_db()
+        self.assertFalse(self.config.refresh_running)
+        self.assertTrue(self.config.refresh_pending)
+        self.assertTrue(self.config.refresh_full)
+        self.assertIsNotNone(self.config.refresh_scheduled_at)
+        self.assertEqual(self._pivot_grid(), before)
+
+        self._refresh()
+        self.assertFalse(self.config.refresh_pending)
+        self.assertNotEqual(self._pivot_grid(), before)
+
+    @patch('spreadsheet.tasks.refresh_pivot_job.apply_async', side_effect=ConnectionError('broker down'))
+    def test_inline_fallback_gives_up_on_a_failing_refresh(self, mock_apply_async):
+        with patch.object(pivot_service, 'run_pivot_refresh', return_value=True) as run:
+            pivot_service._schedule_pivot_refresh([self.config.id])
+        self.assertEqual(run.call_count, pivot_service.PIVOT_INLINE_REFRESH_RUNS)
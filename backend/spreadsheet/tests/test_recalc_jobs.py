@@ -0,0 +1,215 @@
+from decimal import Decimal
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+from unittest.mock import patch
+
+from core.models import Project, Organization
+from spreadsheet.models import (
+    Spreadsheet,
+    Sheet,
+    Cell,
+    FormulaRecalcJob,
+    PatternJobStatus,
+)
+from spreadsheet.services import CellService
+from spreadsheet.tasks import recalculate_sheet_job, sheet_recalc_lock
+
+User = get_user_model()
+
+
+def create_user(username='testuser', email='test@example.com'):
+    return User.objects.create_user(username=username, email=email, password='testpass123')
+
+
+def create_project(owner):
+    organization = Organization.objects.create(name='Test Org')
+    return Project.objects.create(name='Test Project', organization=organization, owner=owner)
+
+
+class FormulaRecalcJobTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.project = create_project(self.user)
+        self.spreadsheet = Spreadsheet.objects.create(project=self.project, name='Sheetbook')
+        self.sheet = Sheet.objects.create(spreadsheet=self.spreadsheet, name='Sheet1', position=0)
+        self.base_url = f'/api/spreadsheet/spreadsheets/{self.spreadsheet.id}/sheets/{self.sheet.id}'
+
+    def _batch(self, operations, async_recalc=False):
+        return self.client.post(
+            f'{self.base_url}/cells/batch/',
+            {'operations': operations, 'auto_expand': True, 'async_recalc': async_recalc},
+            format='json'
+        )
+
+    def _cell(self, row, column):
+        return Cell.objects.get(sheet=self.sheet, row__position=row, column__position=column, is_deleted=False)
+
+    @patch('spreadsheet.views.recalculate_sheet_job.delay')
+    def test_async_batch_marks_dependents_stale_and_enqueues_job(self, mock_delay):
+        self._batch([
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '1'},
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '=A1*2'},
+        ])
+
+        response = self._batch([
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '5'},
+        ], async_recalc=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stale_cell_count'], 1)
+        job = FormulaRecalcJob.objects.get(id=response.data['recalc_job_id'])
+        self.assertEqual(job.status, PatternJobStatus.QUEUED)
+        mock_delay.assert_called_once_with(str(job.id))
+
+        b1 = self._cell(0, 1)
+        self.assertTrue(b1.is_stale)
+        self.assertEqual(b1.computed_number, 2)
+
+        range_response = self.client.post(
+            f'{self.base_url}/cells/range/',
+            {'start_row': 0, 'end_row': 0, 'start_column': 0, 'end_column': 1},
+            format='json'
+        )
+        stale = {cell['column_position']: cell['is_stale'] for cell in range_response.data['cells']}
+        self.assertEqual(stale, {0: False, 1: True})
+
+    @patch('spreadsheet.views.recalculate_sheet_job.delay')
+    def test_job_recalculates_stale_cells_and_is_idempotent(self, mock_delay):
+        self._batch([
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '1'},
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '=A1*2'},
+            {'operation': 'set', 'row': 0, 'column': 2, 'raw_input': '=B1+1'},
+        ])
+        response = self._batch([
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '5'},
+        ], async_recalc=True)
+        job_id = response.data['recalc_job_id']
+
+        recalculate_sheet_job(str(job_id))
+        job = FormulaRecalcJob.objects.get(id=job_id)
+        self.assertEqual(job.status, PatternJobStatus.SUCCEEDED)
+        self.assertEqual(job.progress, 100)
+        self.assertIsNotNone(job.finished_at)
+
+        b1 = self._cell(0, 1)
+        c1 = self._cell(0, 2)
+        self.assertFalse(b1.is_stale)
+        self.assertFalse(c1.is_stale)
+        self.assertEqual(b1.computed_number, Decimal('10'))
+        self.assertEqual(c1.computed_number, Decimal('11'))
+
+        recalculate_sheet_job(str(job_id))
+        job.refresh_from_db()
+        self.assertEqual(job.status, PatternJobStatus.SUCCEEDED)
+
+    def test_recalc_job_status_endpoint(self):
+        job = FormulaRecalcJob.objects.create(
+            sheet=self.sheet,
+            status=PatternJobStatus.QUEUED,
+            stale_cell_count=3,
+            created_by=self.user
+        )
+        response = self.client.get(f'/api/spreadsheet/recalc-jobs/{job.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], PatternJobStatus.QUEUED)
+        self.assertEqual(response.data['stale_cell_count'], 3)
+
+    @patch('spreadsheet.views.recalculate_sheet_job.delay')
+    def test_cell_marked_stale_during_recalc_stays_stale(self, mock_delay):
+        self._batch([
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '1'},
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '=A1*2'},
+        ])
+        response = self._batch([
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '5'},
+        ], async_recalc=True)
+        b1 = self._cell(0, 1)
+        recalculate = CellService._recalculate_formula_cells
+
+        def write_during_recalc(cells, progress_callback=None):
+            result = recalculate(cells, progress_callback=progress_callback)
+            CellService._mark_formulas_stale([b1])
+            return result
+
+        with patch.object(CellService, '_recalculate_formula_cells', side_effect=write_during_recalc):
+            recalculate_sheet_job(str(response.data['recalc_job_id']))
+
+        b1.refresh_from_db()
+        self.assertTrue(b1.is_stale)
+        self.assertIsNone(b1.stale_claim)
+
+    @patch('spreadsheet.tasks.recalculate_sheet_job.apply_async')
+    @patch('spreadsheet.views.recalculate_sheet_job.delay')
+    def test_job_is_rescheduled_while_sheet_is_locked(self, mock_delay, mock_apply_async):
+        self._batch([
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '1'},
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '=A1*2'},
+        ])
+        response = self._batch([
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '5'},
+        ], async_recalc=True)
+        job_id = str(response.data['recalc_job_id'])
+
+        with sheet_recalc_lock(self.sheet.id) as acquired:
+            self.assertTrue(acquired)
+            recalculate_sheet_job(job_id)
+
+        self.assertEqual(FormulaRecalcJob.objects.get(id=job_id).status, PatternJobStatus.QUEUED)
+        self.assertTrue(self._cell(0, 1).is_stale)
+        mock_apply_async.assert_called_once()
+
+    @patch('spreadsheet.views.mark_pivots_dirty')
+    @patch('spreadsheet.views.recalculate_sheet_job.delay', side_effect=ConnectionError('broker down'))
+    def test_inline_fallback_recalculates_and_marks_pivots_dirty(self, mock_delay, mock_mark_dirty):
+        self._batch([
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '1'},
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '=A1*2'},
+        ])
+        response = self._batch([
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '5'},
+        ], async_recalc=True)
+
+        job = FormulaRecalcJob.objects.get(id=response.data['recalc_job_id'])
+        self.assertEqual(job.status, PatternJobStatus.SUCCEEDED)
+        b1 = self._cell(0, 1)
+        self.assertFalse(b1.is_stale)
+        self.assertEqual(b1.computed_number, Decimal('10'))
+        mock_mark_dirty.assert_called_once_with(self.sheet)
+
+    @patch('spreadsheet.views.recalculate_sheet_job.delay', side_effect=ConnectionError('broker down'))
+    def test_inline_fallback_fails_job_when_sheet_is_locked(self, mock_delay):
+        self._batch([
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '1'},
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '=A1*2'},
+        ])
+        with patch('spreadsheet.views.RECALC_INLINE_LOCK_WAIT', 0), sheet_recalc_lock(self.sheet.id):
+            response = self._batch([
+                {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '5'},
+            ], async_recalc=True)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        job = FormulaRecalcJob.objects.get(id=response.data['recalc_job_id'])
+        self.assertEqual(job.status, PatternJobStatus.FAILED)
+        self.assertEqual(job.error_code, 'SHEET_LOCKED')
+        self.assertTrue(self._cell(0, 1).is_stale)
+
+    @patch('spreadsheet.views.recalculate_sheet_job.delay', side_effect=ConnectionError('broker down'))
+    def test_inline_fallback_failure_keeps_the_write(self, mock_delay):
+        self._batch([
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '1'},
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '=A1*2'},
+        ])
+        with patch.object(CellService, 'recalculate_sheet_formulas', side_effect=RuntimeError('boom')):
+            response = self._batch([
+                {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '5'},
+            ], async_recalc=True)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        job = FormulaRecalcJob.objects.get(id=response.data['recalc_job_id'])
+        self.assertEqual(job.status, PatternJobStatus.FAILED)
+        self.assertEqual(job.error_code, 'EXECUTION_ERROR')
+        self.assertEqual(self._cell(0, 0).raw_input, '5')
@@ -11,6 +11,8 @@ from spreadsheet.models import (
     Cell,
     CellValueType,
     ComputedCellType,
+    CellDependency,
+    CellRangeDependency,
     WorkflowPattern,
     WorkflowPatternStep,
 )
@@ -677,7 +679,7 @@ class SheetServiceTest(TestCase):
 
 
 class SheetRowServiceTest(TestCase):
-    """Test cases for SheetRow service methods (CellService._get_or_create_row)"""
+    """Test cases for SheetRow service methods"""
     
     def setUp(self):
         """Set up test data"""
@@ -687,83 +689,58 @@ class SheetRowServiceTest(TestCase):
         self.spreadsheet = create_test_spreadsheet(self.project)
         self.sheet = create_test_sheet(self.spreadsheet)
     
-    def test_get_or_create_row_creates_new_row(self):
-        """Test that _get_or_create_row creates a new row when it doesn't exist"""
-        row = CellService._get_or_create_row(self.sheet, position=0)
-        
-        self.assertIsNotNone(row.id)
-        self.assertEqual(row.sheet, self.sheet)
-        self.assertEqual(row.position, 0)
-        self.assertFalse(row.is_deleted)
-    
-    def test_get_or_create_row_returns_existing_row(self):
-        """Test that _get_or_create_row returns existing row"""
-        row1 = CellService._get_or_create_row(self.sheet, position=0)
-        row1_id = row1.id
-        
-        row2 = CellService._get_or_create_row(self.sheet, position=0)
-        
-        self.assertEqual(row1_id, row2.id)
-        self.assertEqual(row1.position, row2.position)
-        self.assertEqual(row1.sheet, row2.sheet)
-    
-    def test_get_or_create_row_does_not_reactivate_deleted_row(self):
-        """Test that _get_or_create_row does not reactivate a deleted row"""
-        # Create and delete a row
-        row = SheetRow.objects.create(sheet=self.sheet, position=0)
-        row.is_deleted = True
-        row.save()
-        row_id = row.id
-        
-        # Get or create should create a new active row, not reuse deleted
-        reactivated_row = CellService._get_or_create_row(self.sheet, position=0)
-        
-        self.assertNotEqual(reactivated_row.id, row_id)
-        self.assertFalse(reactivated_row.is_deleted)
-        row.refresh_from_db()
-        self.assertTrue(row.is_deleted)
-    
-    def test_get_or_create_row_different_positions(self):
-        """Test that _get_or_create_row works with different positions"""
-        row1 = CellService._get_or_create_row(self.sheet, position=0)
-        row2 = CellService._get_or_create_row(self.sheet, position=1)
-        row3 = CellService._get_or_create_row(self.sheet, position=5)
-        
-        self.assertNotEqual(row1.id, row2.id)
-        self.assertNotEqual(row2.id, row3.id)
-        self.assertEqual(row1.position, 0)
-        self.assertEqual(row2.position, 1)
-        self.assertEqual(row3.position, 5)
-    
-    def test_get_or_create_row_same_position_different_sheets(self):
-        """Test that same position works for different sheets"""
-        sheet2 = create_test_sheet(self.spreadsheet, name='Sheet 2', position=1)
-        
-        row1 = CellService._get_or_create_row(self.sheet, position=0)
-        row2 = CellService._get_or_create_row(sheet2, position=0)
-        
-        self.assertNotEqual(row1.id, row2.id)
-        self.assertEqual(row1.position, row2.position)
-        self.assertNotEqual(row1.sheet, row2.sheet)
-    
-    def test_get_or_create_row_large_position(self):
-        """Test that _get_or_create_row works with large position values"""
-        row = CellService._get_or_create_row(self.sheet, position=1000)
-        
-        self.assertEqual(row.position, 1000)
-        self.assertEqual(row.sheet, self.sheet)
-        self.assertFalse(row.is_deleted)
-    
-    def test_get_or_create_row_zero_position(self):
-        """Test that _get_or_create_row works with position 0"""
-        row = CellService._get_or_create_row(self.sheet, position=0)
-        
-        self.assertEqual(row.position, 0)
-        self.assertFalse(row.is_deleted)
+    def _set_column(self, values, column=0):
+        CellService.batch_update_cells(self.sheet, [
+            {'operation': 'set', 'row': row, 'column': column, 'raw_input': value}
+            for row, value in enumerate(values)
+        ])
+
+    def _column_values(self, column=0):
+        return list(
+            Cell.objects.filter(sheet=self.sheet, column__position=column, is_deleted=False)
+            .order_by('row__position')
+            .values_list('raw_input', flat=True)
+        )
+
+    def test_sort_rows_orders_numbers_before_text(self):
+        """Test that sort_rows keeps the header and orders by type, then value"""
+        self._set_column(['Header', 'b', '10', 'a', '2'])
+
+        SheetService.sort_rows(self.sheet, column_position=0, direction='desc')
+
+        self.assertEqual(self._column_values(), ['Header', '10', '2', 'b', 'a'])
+
+    def test_sort_rows_uses_previous_columns_as_tie_breakers(self):
+        """Test that ties on the sort column fall back to previous sort columns"""
+        self._set_column(['Key', 'x', 'y', 'x', 'y'], column=0)
+        self._set_column(['Value', '1', '2', '3', '4'], column=1)
+
+        SheetService.sort_rows(
+            self.sheet,
+            column_position=0,
+            direction='asc',
+            previous_sort_columns=[{'column_position': 1, 'direction': 'desc'}],
+        )
+
+        self.assertEqual(self._column_values(1), ['Value', '3', '1', '4', '2'])
+
+    def test_reorder_rows_restores_previous_order(self):
+        """Test that reorder_rows undoes a sort"""
+        self._set_column(['Header', '3', '1', '2'])
+        result = SheetService.sort_rows(self.sheet, column_position=0, direction='asc')
+        self.assertEqual(self._column_values(), ['Header', '1', '2', '3'])
+
+        SheetService.reorder_rows(self.sheet, result['previous_order'])
+
+        self.assertEqual(self._column_values(), ['Header', '3', '1', '2'])
+        positions = list(
+            SheetRow.objects.filter(sheet=self.sheet, is_deleted=False).values_list('position', flat=True)
+        )
+        self.assertEqual(sorted(positions), [0, 1, 2, 3])
 
 
 class SheetColumnServiceTest(TestCase):
-    """Test cases for SheetColumn service methods (CellService._get_or_create_column, SheetService._generate_column_name)"""
+    """Test cases for SheetColumn service methods (SheetService._generate_column_name)"""
     
     def setUp(self):
         """Set up test data"""
@@ -811,87 +788,6 @@ class SheetColumnServiceTest(TestCase):
         self.assertEqual(SheetService._generate_column_name(26), 'AA')
         self.assertEqual(SheetService._generate_column_name(701), 'ZZ')
         self.assertEqual(SheetService._generate_column_name(702), 'AAA')
-    
-    def test_get_or_create_column_creates_new_column(self):
-        """Test that _get_or_create_column creates a new column when it doesn't exist"""
-        column = CellService._get_or_create_column(self.sheet, position=0)
-        
-        self.assertIsNotNone(column.id)
-        self.assertEqual(column.sheet, self.sheet)
-        self.assertEqual(column.position, 0)
-        self.assertEqual(column.name, 'A')  # Position 0 = 'A'
-        self.assertFalse(column.is_deleted)
-    
-    def test_get_or_create_column_returns_existing_column(self):
-        """Test that _get_or_create_column returns existing column"""
-        column1 = CellService._get_or_create_column(self.sheet, position=0)
-        column1_id = column1.id
-        
-        column2 = CellService._get_or_create_column(self.sheet, position=0)
-        
-        self.assertEqual(column1_id, column2.id)
-        self.assertEqual(column1.position, column2.position)
-        self.assertEqual(column1.sheet, column2.sheet)
-        self.assertEqual(column1.name, column2.name)
-    
-    def test_get_or_create_column_does_not_reactivate_deleted_column(self):
-        """Test that _get_or_create_column does not reactivate a deleted column"""
-        # Create and delete a column
-        column = SheetColumn.objects.create(
-            sheet=self.sheet,
-            position=0,
-            name='A'
-        )
-        column.is_deleted = True
-        column.save()
-        column_id = column.id
-        
-        # Get or create should create a new active column, not reuse deleted
-        reactivated_column = CellService._get_or_create_column(self.sheet, position=0)
-        
-        self.assertNotEqual(reactivated_column.id, column_id)
-        self.assertFalse(reactivated_column.is_deleted)
-        column.refresh_from_db()
-        self.assertTrue(column.is_deleted)
-    
-    def test_get_or_create_column_different_positions(self):
-        """Test that _get_or_create_column works with different positions"""
-        column1 = CellService._get_or_create_column(self.sheet, position=0)
-        column2 = CellService._get_or_create_column(self.sheet, position=1)
-        column3 = CellService._get_or_create_column(self.sheet, position=26)
-        column4 = CellService._get_or_create_column(self.sheet, position=702)
-        
-        self.assertNotEqual(column1.id, column2.id)
-        self.assertNotEqual(column2.id, column3.id)
-        self.assertNotEqual(column3.id, column4.id)
-        self.assertEqual(column1.position, 0)
-        self.assertEqual(column2.position, 1)
-        self.assertEqual(column3.position, 26)
-        self.assertEqual(column4.position, 702)
-        self.assertEqual(column1.name, 'A')
-        self.assertEqual(column2.name, 'B')
-        self.assertEqual(column3.name, 'AA')
-        self.assertEqual(column4.name, 'AAA')
-    
-    def test_get_or_create_column_same_position_different_sheets(self):
-        """Test that same position works for different sheets"""
-        sheet2 = create_test_sheet(self.spreadsheet, name='Sheet 2', position=1)
-        
-        column1 = CellService._get_or_create_column(self.sheet, position=0)
-        column2 = CellService._get_or_create_column(sheet2, position=0)
-        
-        self.assertNotEqual(column1.id, column2.id)
-        self.assertEqual(column1.position, column2.position)
-        self.assertEqual(column1.name, column2.name)  # Both should be 'A'
-        self.assertNotEqual(column1.sheet, column2.sheet)
-    
-    def test_get_or_create_column_large_position(self):
-        """Test that _get_or_create_column works with large position values"""
-        column = CellService._get_or_create_column(self.sheet, position=1000)
-        
-        self.assertEqual(column.position, 1000)
-        self.assertEqual(column.sheet, self.sheet)
-        self.assertFalse(column.is_deleted)
 
 
 class FormulaRewriteTest(TestCase):
@@ -1123,36 +1019,222 @@ class FormulaRewriteTest(TestCase):
         self.assertEqual(formula_cell.formula_value, '=#REF!')
         self.assertEqual(formula_cell.computed_type, ComputedCellType.ERROR)
         self.assertEqual(formula_cell.error_code, "#REF!")
-    
-    def test_get_or_create_column_zero_position(self):
-        """Test that _get_or_create_column works with position 0"""
-        column = CellService._get_or_create_column(self.sheet, position=0)
-        
-        self.assertEqual(column.position, 0)
-        self.assertEqual(column.name, 'A')
-        self.assertFalse(column.is_deleted)
-    
-    def test_get_or_create_column_all_single_letters(self):
-        """Test that _get_or_create_column generates correct names for A-Z"""
+
+
+class CellDependencyServiceTest(TestCase):
+    """Test cases for bulk dependency maintenance"""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.organization = create_test_organization()
+        self.project = create_test_project(self.organization, owner=self.user)
+        self.spreadsheet = create_test_spreadsheet(self.project)
+        self.sheet = create_test_sheet(self.spreadsheet)
+
+    def _formula_ops(self, count, column):
+        return [
+            {'operation': 'set', 'row': i, 'column': column, 'raw_input': f'=A{i + 1}+A{i + 2}'}
+            for i in range(count)
+        ]
+
+    def test_bulk_update_creates_referenced_placeholders_and_edges(self):
+        CellService.batch_update_cells(self.sheet, self._formula_ops(3, 1))
+
+        formula_cells = Cell.objects.filter(sheet=self.sheet, column__position=1, is_deleted=False)
+        self.assertEqual(formula_cells.count(), 3)
+        placeholders = Cell.objects.filter(sheet=self.sheet, column__position=0, is_deleted=False)
+        self.assertEqual(
+            sorted(placeholders.values_list('row__position', flat=True)),
+            [0, 1, 2, 3]
+        )
+        self.assertEqual(
+            CellDependency.objects.filter(from_cell__in=formula_cells, is_deleted=False).count(),
+            6
+        )
+
+    def test_bulk_update_query_count_does_not_grow_with_formulas(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        CellService.batch_update_cells(self.sheet, self._formula_ops(2, 1))
+        CellService.batch_update_cells(self.sheet, self._formula_ops(40, 2))
+
+        small = list(Cell.objects.filter(sheet=self.sheet, column__position=1, is_deleted=False))
+        large = list(Cell.objects.filter(sheet=self.sheet, column__position=2, is_deleted=False))
+
+        with CaptureQueriesContext(connection) as small_queries:
+            CellService._update_dependencies_bulk(small)
+        with CaptureQueriesContext(connection) as large_queries:
+            CellService._update_dependencies_bulk(large)
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_dependents_are_collected_across_levels(self):
+        CellService.batch_update_cells(self.sheet, [
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '1'},
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '=A1*2'},
+            {'operation': 'set', 'row': 0, 'column': 2, 'raw_input': '=B1*2'},
+            {'operation': 'set', 'row': 0, 'column': 3, 'raw_input': '=C1+A1'},
+        ])
+        source = Cell.objects.get(sheet=self.sheet, row__position=0, column__position=0, is_deleted=False)
+
+        dependents = CellService._collect_dependent_formula_cells([source])
+        self.assertEqual(
+            sorted(cell.column.position for cell in dependents),
+            [1, 2, 3]
+        )
+
+        result = CellService.batch_update_cells(self.sheet, [
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '3'},
+        ])
+        d1 = next(cell for cell in result['cells'] if cell.column.position == 3)
+        self.assertEqual(d1.computed_number, 15)
+
+    def test_range_reference_is_stored_as_interval(self):
+        CellService.batch_update_cells(self.sheet, [
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '=SUM(A1:A10000)'},
+        ])
+        formula_cell = Cell.objects.get(sheet=self.sheet, row__position=0, column__position=1, is_deleted=False)
+
+        self.assertFalse(Cell.objects.filter(sheet=self.sheet, column__position=0).exists())
+        self.assertFalse(CellDependency.objects.filter(from_cell=formula_cell, is_deleted=False).exists())
+        ranges = CellRangeDependency.objects.filter(from_cell=formula_cell, is_deleted=False)
+        self.assertEqual(
+            list(ranges.values_list('row_start', 'row_end', 'column_start', 'column_end')),
+            [(0, 9999, 0, 0)]
+        )
+
+    def test_edit_inside_range_recalculates_dependents_in_order(self):
+        CellService.batch_update_cells(self.sheet, [
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '=SUM(A1:A500)'},
+            {'operation': 'set', 'row': 0, 'column': 2, 'raw_input': '=SUM(B1:B2)*2'},
+        ])
+
+        result = CellService.batch_update_cells(self.sheet, [
+            {'operation': 'set', 'row': 249, 'column': 0, 'raw_input': '4'},
+        ])
+        cells = {cell.column.position: cell for cell in result['cells']}
+        self.assertEqual(cells[1].computed_number, 4)
+        self.assertEqual(cells[2].computed_number, 8)
+
+    def test_range_including_itself_is_a_cycle(self):
+        CellService.batch_update_cells(self.sheet, [
+            {'operation': 'set', 'row': 2, 'column': 0, 'raw_input': '=SUM(A1:A5)'},
+        ])
+        cell = Cell.objects.get(sheet=self.sheet, row__position=2, column__position=0, is_deleted=False)
+        self.assertEqual(cell.error_code, '#CYCLE!')
+
+    def test_unchanged_result_stops_propagation(self):
+        CellService.batch_update_cells(self.sheet, [
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '1'},
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '=A1*0'},
+            {'operation': 'set', 'row': 0, 'column': 2, 'raw_input': '=B1+1'},
+        ])
+        c1 = Cell.objects.get(sheet=self.sheet, row__position=0, column__position=2, is_deleted=False)
+
+        result = CellService.batch_update_cells(self.sheet, [
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '2'},
+        ])
+
+        self.assertEqual([cell.column.position for cell in result['cells']], [0])
+        refreshed = Cell.objects.get(id=c1.id)
+        self.assertEqual(refreshed.updated_at, c1.updated_at)
+        self.assertEqual(refreshed.computed_number, 1)
+
+    def test_recalculation_writes_results_in_bulk(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        CellService.batch_update_cells(self.sheet, [
+            {'operation': 'set', 'row': i, 'column': 1, 'raw_input': f'=A{i + 1}*2'}
+            for i in range(30)
+        ])
+        values = [
+            {'operation': 'set', 'row': i, 'column': 0, 'raw_input': str(i)}
+            for i in range(30)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            CellService.batch_update_cells(self.sheet, values)
+
+        updates = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE') and '"computed_type"' in query['sql']
+        ]
+        self.assertLessEqual(len(updates), 2)
+        b30 = Cell.objects.get(sheet=self.sheet, row__position=29, column__position=1, is_deleted=False)
+        self.assertEqual(b30.computed_number, 58)
+
+    def test_resolve_reference_cells_creates_rows_columns_and_cells(self):
+        cell_ids = CellService._resolve_reference_cells(self.sheet.id, {(0, 0), (5, 1), (1000, 0)})
+
+        self.assertEqual(set(cell_ids), {(0, 0), (5, 1), (1000, 0)})
+        for (row, column), cell_id in cell_ids.items():
+            cell = Cell.objects.get(id=cell_id)
+            self.assertEqual(cell.sheet, self.sheet)
+            self.assertEqual(cell.row.position, row)
+            self.assertEqual(cell.column.position, column)
+            self.assertFalse(cell.is_deleted)
+        self.assertEqual(SheetRow.objects.filter(sheet=self.sheet).count(), 3)
+        self.assertEqual(SheetColumn.objects.filter(sheet=self.sheet).count(), 2)
+
+    def test_resolve_reference_cells_reuses_existing_rows_and_columns(self):
+        first = CellService._resolve_reference_cells(self.sheet.id, {(0, 0)})
+        second = CellService._resolve_reference_cells(self.sheet.id, {(0, 0), (0, 1)})
+
+        self.assertEqual(first[(0, 0)], second[(0, 0)])
+        self.assertEqual(SheetRow.objects.filter(sheet=self.sheet).count(), 1)
+        self.assertEqual(SheetColumn.objects.filter(sheet=self.sheet).count(), 2)
+
+    def test_resolve_reference_cells_does_not_reuse_deleted_row(self):
+        row = SheetRow.objects.create(sheet=self.sheet, position=0, is_deleted=True)
+
+        cell_id = CellService._resolve_reference_cells(self.sheet.id, {(0, 0)})[(0, 0)]
+
+        new_row = Cell.objects.get(id=cell_id).row
+        self.assertNotEqual(new_row.id, row.id)
+        self.assertFalse(new_row.is_deleted)
+        row.refresh_from_db()
+        self.assertTrue(row.is_deleted)
+
+    def test_resolve_reference_cells_does_not_reuse_deleted_column(self):
+        column = SheetColumn.objects.create(sheet=self.sheet, position=0, name='A', is_deleted=True)
+
+        cell_id = CellService._resolve_reference_cells(self.sheet.id, {(0, 0)})[(0, 0)]
+
+        new_column = Cell.objects.get(id=cell_id).column
+        self.assertNotEqual(new_column.id, column.id)
+        self.assertFalse(new_column.is_deleted)
+        column.refresh_from_db()
+        self.assertTrue(column.is_deleted)
+
+    def test_resolve_reference_cells_names_new_columns(self):
+        positions = [0, 1, 25, 26, 27, 52, 701, 702]
+        CellService._resolve_reference_cells(self.sheet.id, {(0, column) for column in positions})
+
+        names = dict(SheetColumn.objects.filter(sheet=self.sheet).values_list('position', 'name'))
+        self.assertEqual(names, {
+            0: 'A', 1: 'B', 25: 'Z', 26: 'AA', 27: 'AB', 52: 'BA', 701: 'ZZ', 702: 'AAA',
+        })
+
+    def test_resolve_reference_cells_names_all_single_letter_columns(self):
+        CellService._resolve_reference_cells(self.sheet.id, {(0, column) for column in range(26)})
+
+        names = dict(SheetColumn.objects.filter(sheet=self.sheet).values_list('position', 'name'))
         for i in range(26):
-            column = CellService._get_or_create_column(self.sheet, position=i)
-            expected_name = chr(ord('A') + i)
-            self.assertEqual(column.name, expected_name, f"Position {i} should be {expected_name}")
-    
-    def test_get_or_create_column_double_letter_columns(self):
-        """Test that _get_or_create_column generates correct names for AA-ZZ"""
-        # Test first few double letter columns
-        column_aa = CellService._get_or_create_column(self.sheet, position=26)
-        self.assertEqual(column_aa.name, 'AA')
-        
-        column_ab = CellService._get_or_create_column(self.sheet, position=27)
-        self.assertEqual(column_ab.name, 'AB')
-        
-        column_ba = CellService._get_or_create_column(self.sheet, position=52)
-        self.assertEqual(column_ba.name, 'BA')
-        
-        column_zz = CellService._get_or_create_column(self.sheet, position=701)
-        self.assertEqual(column_zz.name, 'ZZ')
+            self.assertEqual(names[i], chr(ord('A') + i), f"Position {i} should be {chr(ord('A') + i)}")
+
+    def test_resolve_reference_cells_same_position_different_sheets(self):
+        sheet2 = create_test_sheet(self.spreadsheet, name='Sheet 2', position=1)
+
+        cell1 = Cell.objects.get(id=CellService._resolve_reference_cells(self.sheet.id, {(0, 0)})[(0, 0)])
+        cell2 = Cell.objects.get(id=CellService._resolve_reference_cells(sheet2.id, {(0, 0)})[(0, 0)])
+
+        self.assertNotEqual(cell1.id, cell2.id)
+        self.assertNotEqual(cell1.row_id, cell2.row_id)
+        self.assertNotEqual(cell1.column_id, cell2.column_id)
+        self.assertEqual(cell1.row.position, cell2.row.position)
+        self.assertEqual(cell1.column.name, cell2.column.name)
+        self.assertEqual(cell1.row.sheet, self.sheet)
+        self.assertEqual(cell2.row.sheet, sheet2)
 
 
 class WorkflowPatternServiceTest(TestCase):
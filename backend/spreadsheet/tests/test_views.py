@@ -4,6 +4,7 @@ from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
 import time
+from unittest.mock import patch
 
 from spreadsheet.models import (
     Spreadsheet,
@@ -2298,3 +2299,91 @@ class CellBatchUpdateDependencyTest(TestCase):
         self.assertEqual(cells[(0, 0)]['error_code'], '#CYCLE!')
         self.assertEqual(cells[(0, 1)]['error_code'], '#CYCLE!')
 
+
+
+class CellViewportViewTest(TestCase):
+    """Test the compact viewport read endpoint"""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.organization = create_test_organization()
+        self.project = create_test_project(self.organization, owner=self.user)
+        self.spreadsheet = create_test_spreadsheet(self.project)
+        self.sheet = create_test_sheet(self.spreadsheet)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.base_url = f'/api/spreadsheet/spreadsheets/{self.spreadsheet.id}/sheets/{self.sheet.id}'
+
+    def _batch(self, operations):
+        return self.client.post(
+            f'{self.base_url}/cells/batch/',
+            {'operations': operations, 'auto_expand': True},
+            format='json'
+        )
+
+    def _viewport(self, **headers):
+        return self.client.get(
+            f'{self.base_url}/cells/viewport/',
+            {'start_row': 0, 'end_row': 9, 'start_column': 0, 'end_column': 4},
+            **headers
+        )
+
+    def test_viewport_returns_columnar_payload(self):
+        self._batch([
+            {'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '1.50'},
+            {'operation': 'set', 'row': 0, 'column': 1, 'raw_input': '=A1*2'},
+            {'operation': 'set', 'row': 2, 'column': 0, 'raw_input': 'text'},
+            {'operation': 'set', 'row': 20, 'column': 6, 'raw_input': 'outside'},
+        ])
+
+        response = self._viewport()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rows'], [0, 0, 2])
+        self.assertEqual(response.data['columns'], [0, 1, 0])
+        self.assertEqual(response.data['raw_inputs'], ['1.50', '=A1*2', 'text'])
+        self.assertEqual(response.data['values'], ['1.5', '3', 'text'])
+        self.assertEqual(response.data['sheet_row_count'], 21)
+        self.assertEqual(response.data['sheet_column_count'], 7)
+
+    def test_viewport_etag_revalidation(self):
+        self._batch([{'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '1'}])
+
+        response = self._viewport()
+        etag = response['ETag']
+        self.assertEqual(self._viewport(HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self._batch([{'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '2'}])
+        response = self._viewport(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['values'], ['2'])
+
+    def test_cell_write_does_not_update_sheet_row(self):
+        self._batch([{'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '1'}])
+        self.sheet.refresh_from_db()
+        version = self.sheet.content_version
+        etag = self._viewport()['ETag']
+
+        self._batch([{'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '2'}])
+        self.sheet.refresh_from_db()
+        self.assertEqual(self.sheet.content_version, version)
+        self.assertNotEqual(self._viewport()['ETag'], etag)
+
+    def test_cell_write_survives_cache_outage(self):
+        with patch('spreadsheet.services.cache.set', side_effect=ConnectionError('cache down')):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self._batch([{'operation': 'set', 'row': 0, 'column': 0, 'raw_input': '1'}])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(Cell.objects.filter(sheet=self.sheet, raw_input='1', is_deleted=False).exists())
+
+    def test_sheet_dimensions_are_cached(self):
+        self._batch([{'operation': 'set', 'row': 4, 'column': 2, 'raw_input': 'x'}])
+        self._viewport()
+        self.sheet.refresh_from_db()
+        self.assertEqual(self.sheet.cached_row_count, 5)
+        self.assertEqual(self.sheet.cached_column_count, 3)
+
+        self._batch([{'operation': 'set', 'row': 9, 'column': 0, 'raw_input': 'y'}])
+        self.sheet.refresh_from_db()
+        self.assertIsNone(self.sheet.cached_row_count)
+        self.assertEqual(self._viewport().data['sheet_row_count'], 10)
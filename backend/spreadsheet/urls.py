@@ -36,6 +36,7 @@ urlpatterns = [
     
     # Cells
     path('spreadsheets/<int:spreadsheet_id>/sheets/<int:sheet_id>/cells/range/', views.CellRangeReadView.as_view(), name='cell-range-read'),
+    path('spreadsheets/<int:spreadsheet_id>/sheets/<int:sheet_id>/cells/viewport/', views.CellViewportView.as_view(), name='cell-viewport'),
     path('spreadsheets/<int:spreadsheet_id>/sheets/<int:sheet_id>/cells/batch/', views.CellBatchUpdateView.as_view(), name='cell-batch-update'),
     path('spreadsheets/<int:spreadsheet_id>/sheets/<int:sheet_id>/cells/import-finalize/', views.ImportFinalizeView.as_view(), name='cell-import-finalize'),
     path('spreadsheets/<int:spreadsheet_id>/sheets/<int:sheet_id>/pivot-config/', views.PivotConfigView.as_view(), name='pivot-config'),
@@ -50,5 +51,6 @@ urlpatterns = [
     path('patterns/<uuid:id>/', views.WorkflowPatternDetailView.as_view(), name='pattern-detail'),
     path('patterns/<uuid:id>/apply/', views.WorkflowPatternApplyView.as_view(), name='pattern-apply'),
     path('pattern-jobs/<uuid:job_id>/', views.PatternJobStatusView.as_view(), name='pattern-job-status'),
+    path('recalc-jobs/<uuid:job_id>/', views.FormulaRecalcJobStatusView.as_view(), name='recalc-job-status'),
 ]
 
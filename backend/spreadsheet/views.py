@@ -10,6 +10,8 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import ValidationError, NotFound, PermissionDenied
 from django.shortcuts import get_object_or_404
 from django.conf import settings
+from django.utils import timezone
+from django.utils.http import parse_etags
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.paginator import Paginator
 
@@ -21,6 +23,7 @@ from .models import (
     WorkflowPattern,
     PatternJob,
     PatternJobStatus,
+    FormulaRecalcJob,
     SpreadsheetHighlight,
     SpreadsheetCellFormat,
     SpreadsheetHighlightScope,
@@ -52,17 +55,20 @@ from .serializers import (
     WorkflowPatternDetailSerializer,
     PatternApplySerializer,
     PatternJobStatusSerializer,
+    FormulaRecalcJobStatusSerializer,
     SpreadsheetHighlightSerializer,
     SpreadsheetHighlightBatchSerializer,
     SpreadsheetCellFormatSerializer,
     SpreadsheetCellFormatBatchSerializer,
     PivotConfigSerializer,
     PivotConfigCreateUpdateSerializer,
+    PivotRefreshStatusSerializer,
 )
 from .services import SpreadsheetService, SheetService, CellService
 from .models import SheetStructureOperation
 from core.models import Project
-from .tasks import apply_pattern_job
+from .pivot_service import mark_pivots_dirty
+from .tasks import RECALC_INLINE_LOCK_WAIT, apply_pattern_job, recalculate_sheet_job, sheet_recalc_lock
 
 logger = logging.getLogger(__name__)
 
@@ -281,6 +287,15 @@ class PatternJobStatusView(APIView):
         return Response(serializer.data)
 
 
+class FormulaRecalcJobStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(FormulaRecalcJob, id=job_id, created_by=request.user)
+        serializer = FormulaRecalcJobStatusSerializer(job)
+        return Response(serializer.data)
+
+
 class SheetListView(APIView):
     """List and create sheets"""
     permission_classes = [IsAuthenticated]
@@ -849,6 +864,45 @@ class CellRangeReadView(APIView):
         })
 
 
+class CellViewportView(APIView):
+    """Read a grid viewport as a compact columnar payload with ETag revalidation"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, spreadsheet_id, sheet_id):
+        """
+        Read non-empty cells of a viewport as parallel arrays
+        GET /spreadsheets/{spreadsheet_id}/sheets/{sheet_id}/cells/viewport?start_row=&end_row=&start_column=&end_column=
+        Returns 304 when If-None-Match carries the sheet's current content version.
+        """
+        spreadsheet = get_object_or_404(Spreadsheet, id=spreadsheet_id, is_deleted=False)
+        sheet = get_object_or_404(Sheet, id=sheet_id, spreadsheet=spreadsheet, is_deleted=False)
+
+        serializer = CellRangeReadSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        etag = f'"{sheet.id}-{SheetService.get_content_version(sheet.id)}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
+
+        try:
+            result = CellService.read_cell_viewport(
+                sheet=sheet,
+                start_row=serializer.validated_data['start_row'],
+                end_row=serializer.validated_data['end_row'],
+                start_column=serializer.validated_data['start_column'],
+                end_column=serializer.validated_data['end_column']
+            )
+        except DjangoValidationError as e:
+            raise ValidationError({'error': str(e)})
+
+        response = Response(result)
+        response['ETag'] = f'"{sheet.id}-{result["version"]}"'
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
 class CellBatchUpdateView(APIView):
     """Batch update cells"""
     permission_classes = [IsAuthenticated]
@@ -867,6 +921,7 @@ class CellBatchUpdateView(APIView):
         import_id = serializer.validated_data.get('import_id')
         chunk_index = serializer.validated_data.get('chunk_index')
         import_mode = serializer.validated_data.get('import_mode', False)
+        async_recalc = serializer.validated_data.get('async_recalc', False)
         if import_id is not None or chunk_index is not None:
             logger.info(
                 "Cell batch import chunk sheet_id=%s import_id=%s chunk_index=%s",
@@ -878,7 +933,8 @@ class CellBatchUpdateView(APIView):
                 sheet=sheet,
                 operations=serializer.validated_data['operations'],
                 auto_expand=serializer.validated_data.get('auto_expand', True),
-                import_mode=import_mode
+                import_mode=import_mode,
+                async_recalc=async_recalc
             )
         except DjangoValidationError as e:
             # Django's ValidationError has message_dict / messages / str(); it does NOT have .detail
@@ -908,9 +964,66 @@ class CellBatchUpdateView(APIView):
                 }
             raise ValidationError(detail)
 
+        if result.get('stale_cell_count'):
+            result['recalc_job_id'] = self._enqueue_recalc(request, sheet, result['stale_cell_count'])
+
         response_serializer = CellBatchUpdateResponseSerializer(result)
         return Response(response_serializer.data)
 
+    @staticmethod
+    def _enqueue_recalc(request, sheet, stale_cell_count):
+        """Queue a FormulaRecalcJob for the stale cells; recalculate inline if the broker is down."""
+        job = FormulaRecalcJob.objects.create(
+            sheet=sheet,
+            status=PatternJobStatus.QUEUED,
+            progress=0,
+            stale_cell_count=stale_cell_count,
+            created_by=request.user
+        )
+        try:
+            recalculate_sheet_job.delay(str(job.id))
+            return job.id
+        except Exception:
+            logger.exception(
+                "Failed to enqueue formula recalc job %s via broker %s",
+                job.id,
+                settings.CELERY_BROKER_URL
+            )
+        # Nothing will pick the job up, so it always ends here; the cell write has
+        # already committed, so a failed recalc must not fail the response
+        with sheet_recalc_lock(sheet.id, wait=RECALC_INLINE_LOCK_WAIT) as acquired:
+            if not acquired:
+                # A worker is recalculating this sheet; the cells stay stale for the next recalc
+                logger.warning("Sheet %s is locked by a running recalc; failing job %s", sheet.id, job.id)
+                FormulaRecalcJob.objects.filter(id=job.id).update(
+                    status=PatternJobStatus.FAILED,
+                    error_code='SHEET_LOCKED',
+                    error_message='Sheet is being recalculated; stale cells are left for the next recalc',
+                    finished_at=timezone.now()
+                )
+                return job.id
+            try:
+                CellService.recalculate_sheet_formulas(sheet, stale_only=True)
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Inline FormulaRecalcJob %s failed", job.id)
+                FormulaRecalcJob.objects.filter(id=job.id).update(
+                    status=PatternJobStatus.FAILED,
+                    error_code='EXECUTION_ERROR',
+                    error_message=str(exc),
+                    finished_at=timezone.now()
+                )
+                return job.id
+        FormulaRecalcJob.objects.filter(id=job.id).update(
+            status=PatternJobStatus.SUCCEEDED,
+            progress=100,
+            finished_at=timezone.now()
+        )
+        try:
+            mark_pivots_dirty(sheet)
+        except Exception:
+            logger.exception("Marking pivots dirty after FormulaRecalcJob %s failed", job.id)
+        return job.id
+
 
 class ImportFinalizeView(APIView):
     """Finalize import: recompute formulas and update sheet meta after all batch chunks."""
@@ -986,34 +1099,46 @@ class PivotConfigView(APIView):
 
 class PivotRecomputeView(APIView):
     """
-    Trigger pivot recomputation for a pivot sheet based on persisted config.
-    Used as a fire-and-forget endpoint from the frontend; may be slow.
+    Pivot refresh for a pivot sheet based on persisted config.
+    GET:  return freshness (last computed at, pending, running).
+    POST: queue a full background recompute, coalesced with pending source edits.
     """
     permission_classes = [IsAuthenticated]
 
-    def post(self, request, spreadsheet_id, sheet_id):
+    @staticmethod
+    def _get_config(spreadsheet_id, sheet_id):
         spreadsheet = get_object_or_404(Spreadsheet, id=spreadsheet_id, is_deleted=False)
         sheet = get_object_or_404(Sheet, id=sheet_id, spreadsheet=spreadsheet, is_deleted=False)
         try:
-            config = sheet.pivot_config
+            return sheet.pivot_config
         except PivotConfig.DoesNotExist:
             raise NotFound({'error': 'Pivot config not found'})
 
-        from .pivot_service import recompute_pivot
+    def get(self, request, spreadsheet_id, sheet_id):
+        config = self._get_config(spreadsheet_id, sheet_id)
+        return Response(PivotRefreshStatusSerializer(config).data)
+
+    def post(self, request, spreadsheet_id, sheet_id):
+        config = self._get_config(spreadsheet_id, sheet_id)
+
+        from .pivot_service import request_pivot_refresh
 
         try:
-            recompute_pivot(config)
+            request_pivot_refresh(config)
         except Exception as e:
             logger.exception(
                 "Pivot recompute failed via API for sheet_id=%s config_id=%s: %s",
-                sheet.id,
+                sheet_id,
                 config.id,
                 e,
             )
             # Return 202 even on failure; frontend treats this as best-effort background recompute.
             return Response({'status': 'error', 'detail': 'pivot recompute failed'}, status=status.HTTP_202_ACCEPTED)
 
-        return Response({'status': 'ok'}, status=status.HTTP_202_ACCEPTED)
+        return Response(
+            {'status': 'queued', **PivotRefreshStatusSerializer(config).data},
+            status=status.HTTP_202_ACCEPTED
+        )
 
 
 class SpreadsheetHighlightListView(APIView):
@@ -1,5 +1,5 @@
 from contextlib import nullcontext
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django_fsm import FSMField, transition
 from django.contrib.contenttypes.models import ContentType
@@ -163,6 +163,12 @@ class Task(models.Model):
     def __str__(self):
         return f"Task #{self.id} - {self.summary} ({self.status})"
 
+    def save(self, *args, **kwargs):
+        """Save in a transaction: dashboard.signals locks the stored row in
+        pre_save and applies the count delta in post_save."""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     # --- FSM Transition ---
 
     @transition(field=status, source=Status.DRAFT, target=Status.SUBMITTED)
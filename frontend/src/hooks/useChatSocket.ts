@@ -169,10 +169,7 @@ export function useChatSocket(userId: number | null | undefined, options: UseCha
       };
 
       ws.onmessage = (event) => {
-        try {
-          const data: WebSocketMessage = JSON.parse(event.data);
-          console.log('[Chat WebSocket] Message received:', data);
-
+        const handleFrame = (data: WebSocketMessage) => {
           // Get fresh store actions and state
           const { addMessage, updateMessage, chatsByProject, incrementGlobalUnreadCount, currentChatId } = useChatStore.getState();
 
@@ -254,9 +251,12 @@ export function useChatSocket(userId: number | null | undefined, options: UseCha
             case 'message_status_update':
               if (data.message_id && data.status) {
                 // Update message status in store
-                updateMessage(data.message_id, {
-                  statuses: data.message?.statuses,
-                });
+                // Batched status frames carry no message; keep the stored statuses then
+                if (data.message?.statuses) {
+                  updateMessage(data.message_id, {
+                    statuses: data.message.statuses,
+                  });
+                }
                   // Call callback using ref to get latest
                   optionsRef.current.onStatusUpdate?.(data.message_id, data.status);
               }
@@ -284,6 +284,25 @@ export function useChatSocket(userId: number | null | undefined, options: UseCha
             default:
               console.warn('[Chat WebSocket] Unknown message type:', data.type);
           }
+        };
+
+        try {
+          const received: WebSocketMessage = JSON.parse(event.data);
+          console.log('[Chat WebSocket] Message received:', received);
+
+          // Batched frames are unpacked and handled like their single-message forms
+          let frames: WebSocketMessage[] = [received];
+          if (received.type === 'chat_message_batch') {
+            frames = (received.messages || []).map((message): WebSocketMessage => ({ type: 'chat_message', message }));
+          } else if (received.type === 'message_status_batch') {
+            frames = (received.message_ids || []).map((message_id): WebSocketMessage => ({
+              type: 'message_status_update',
+              message_id,
+              user_id: received.user_id,
+              status: received.status,
+            }));
+          }
+          frames.forEach(handleFrame);
         } catch (error) {
           console.error('[Chat WebSocket] Parse error:', error);
         }
@@ -28,6 +28,7 @@ export function useMessageData(options: UseMessageDataOptions = {}) {
   const [isLoadingMessages, setIsLoadingMessages] = useState(false);
   const [isSending, setIsSending] = useState(false);
   const [hasMore, setHasMore] = useState(true);
+  const [prevCursor, setPrevCursor] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
 
   // Fetch messages for current chat
@@ -47,6 +48,7 @@ export function useMessageData(options: UseMessageDataOptions = {}) {
       });
       
       setMessages(targetChatId, response.results);
+      setPrevCursor(response.prev_cursor);
       // prev_cursor indicates there are older messages available
       setHasMore(!!response.prev_cursor || response.results.length === limit);
     } catch (err: any) {
@@ -69,19 +71,20 @@ export function useMessageData(options: UseMessageDataOptions = {}) {
       setIsLoadingMessages(true);
       setError(null);
       
-      // Get the oldest message's timestamp for cursor-based pagination
+      // Prefer the server cursor; it breaks ties between messages sharing a timestamp
       const oldestMessage = currentMessages.length > 0 ? currentMessages[0] : null;
-      const beforeTimestamp = oldestMessage?.created_at;
+      const before = prevCursor ?? oldestMessage?.created_at;
       
       const response = await getMessages({
         chat_id: chatId,
-        before: beforeTimestamp, // Use timestamp instead of ID
+        before,
         limit,
       });
       
       if (response.results.length > 0) {
         prependMessages(chatId, response.results);
       }
+      setPrevCursor(response.prev_cursor);
       // Check if there are more messages (prev_cursor indicates more older messages)
       setHasMore(!!response.prev_cursor || response.results.length === limit);
     } catch (err: any) {
@@ -91,7 +94,7 @@ export function useMessageData(options: UseMessageDataOptions = {}) {
     } finally {
       setIsLoadingMessages(false);
     }
-  }, [chatId, hasMore, isLoadingMessages, currentMessages, limit]);
+  }, [chatId, hasMore, isLoadingMessages, currentMessages, limit, prevCursor]);
 
   // Send new message
   const send = useCallback(async (content: string): Promise<Message | null> => {
@@ -194,6 +197,7 @@ export function useMessageData(options: UseMessageDataOptions = {}) {
   // Auto-fetch messages when chat changes
   useEffect(() => {
     if (autoFetch && chatId) {
+      setPrevCursor(null);
       fetchMessages();
       setHasMore(true); // Reset pagination
     }
@@ -161,8 +161,8 @@ export interface GetChatsParams {
 
 export interface GetMessagesParams {
   chat_id: number;
-  before?: string; // ISO timestamp for cursor-based pagination
-  after?: string;  // ISO timestamp for cursor-based pagination
+  before?: string; // prev_cursor from a previous page (ISO timestamps are still accepted)
+  after?: string;  // next_cursor from a previous page (ISO timestamps are still accepted)
   limit?: number;
 }
 
@@ -190,7 +190,9 @@ export interface MarkAsReadRequest {
 export type WebSocketMessageType = 
   | 'new_message'
   | 'chat_message'
+  | 'chat_message_batch'
   | 'message_status_update'
+  | 'message_status_batch'
   | 'send_message'
   | 'typing_start'
   | 'typing_stop'
@@ -201,6 +203,8 @@ export type WebSocketMessageType =
 export interface WebSocketMessage {
   type: WebSocketMessageType;
   message?: Message;
+  messages?: Message[];
+  message_ids?: number[];
   chat?: Chat;
   chat_id?: number;
   content?: string;